@@ -1,7 +1,9 @@
 import os
 import ssl
+import time
 
 from celery import Celery
+from celery.signals import before_task_publish
 
 # Set the default Django settings module
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "attendee.settings")
@@ -21,3 +23,10 @@ app.config_from_object("django.conf:settings", namespace="CELERY")
 
 # Auto-discover tasks from all registered Django apps
 app.autodiscover_tasks()
+
+
+@before_task_publish.connect
+def add_published_at_header(headers=None, **kwargs):
+    # Lets us report how long the oldest message in each queue has been waiting
+    if headers is not None:
+        headers["published_at"] = time.time()
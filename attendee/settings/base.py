@@ -14,6 +14,7 @@ import os
 from pathlib import Path
 
 from dotenv import load_dotenv
+from kombu import Queue
 
 load_dotenv()
 
@@ -171,6 +172,32 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 
+# Each workload class gets its own queue, so that a large batch of work can't delay realtime work.
+# A worker started without -Q consumes every queue, draining them in the order listed here,
+# so realtime utterances and bot launches are picked up first. Bots run for the whole meeting, so they get a queue of
+# their own rather than holding the slots of the workers that launch bots.
+CELERY_TASK_QUEUES = [
+    Queue("realtime"),
+    Queue("launch"),
+    Queue("bots"),
+    Queue("webhooks"),
+    Queue("batch"),
+    Queue("billing"),
+    Queue("celery"),
+]
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+CELERY_TASK_ROUTES = {
+    "bots.tasks.process_utterance_task.process_utterance": {"queue": "realtime"},
+    "bots.tasks.launch_scheduled_bot_task.launch_scheduled_bot": {"queue": "launch"},
+    "bots.tasks.run_bot_task.run_bot": {"queue": "bots"},
+    "bots.tasks.restart_bot_pod_task.restart_bot_pod": {"queue": "launch"},
+    "bots.tasks.deliver_webhook_task.*": {"queue": "webhooks"},
+    "bots.tasks.process_async_transcription_task.*": {"queue": "batch"},
+    "bots.tasks.sync_calendar_task.sync_calendar": {"queue": "batch"},
+    "bots.tasks.autopay_charge_task.autopay_charge": {"queue": "billing"},
+}
+CELERY_BROKER_TRANSPORT_OPTIONS = {"queue_order_strategy": "priority"}
+
 REST_FRAMEWORK = {
     # YOUR SETTINGS
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
@@ -178,6 +205,11 @@ REST_FRAMEWORK = {
         "project_post": os.getenv("PROJECT_POST_THROTTLE_RATE", "3000/min"),
     },
 }
+# Set API_JSON_BACKEND to "orjson" to render API responses and parse request bodies with orjson. The responses are the
+# same bytes as with DRF's stdlib json renderer, which is used by default, but large ones like transcripts render faster.
+if os.getenv("API_JSON_BACKEND", "json") == "orjson":
+    REST_FRAMEWORK["DEFAULT_RENDERER_CLASSES"] = ["bots.renderers.ORJSONRenderer", "rest_framework.renderers.BrowsableAPIRenderer"]
+    REST_FRAMEWORK["DEFAULT_PARSER_CLASSES"] = ["bots.parsers.ORJSONParser", "rest_framework.parsers.FormParser", "rest_framework.parsers.MultiPartParser"]
 
 SPECTACULAR_SETTINGS = {
     "TITLE": "Attendee API",
@@ -186,6 +218,7 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
     "COMPONENT_SPLIT_REQUEST": True,
     "PARSER_WHITELIST": ["rest_framework.parsers.JSONParser"],
+    "ENUM_NAME_OVERRIDES": {"BotStateEnum": "bots.serializers.BOT_STATE_API_CODES"},
     "TAGS": [
         {"name": "Bots", "description": "Bot management endpoints"},
     ],
@@ -212,6 +245,84 @@ AWS_S3_SIGNATURE_VERSION = "s3v4"
 if os.getenv("USE_IRSA_FOR_S3_STORAGE", "false") == "true":
     AWS_S3_ADDRESSING_STYLE = "virtual"
 AWS_RECORDING_STORAGE_BUCKET_NAME = os.getenv("AWS_RECORDING_STORAGE_BUCKET_NAME")
+# Signed URLs for recordings and debug screenshots are the same for every request in a bucket of
+# PRESIGNED_URL_CACHE_BUCKET_SECONDS, so that browsers and CDNs can cache the files they point to
+PRESIGNED_URL_CACHE_BUCKET_SECONDS = int(os.getenv("PRESIGNED_URL_CACHE_BUCKET_SECONDS", 900))
+PRESIGNED_URL_CACHE_MAX_ENTRIES = int(os.getenv("PRESIGNED_URL_CACHE_MAX_ENTRIES", 10000))
+# Where the raw audio of AudioChunks is kept: "database", "s3" or "filesystem"
+AUDIO_CHUNK_STORAGE_BACKEND = os.getenv("AUDIO_CHUNK_STORAGE_BACKEND", "database")
+AWS_AUDIO_CHUNK_STORAGE_BUCKET_NAME = os.getenv("AWS_AUDIO_CHUNK_STORAGE_BUCKET_NAME", AWS_RECORDING_STORAGE_BUCKET_NAME)
+AUDIO_CHUNK_STORAGE_PATH = os.getenv("AUDIO_CHUNK_STORAGE_PATH", os.path.join(BASE_DIR, "audio_chunks"))
+# How AudioChunk audio is compressed at rest: "flac" (lossless), "opus" (lossy) or "none" to keep raw PCM
+AUDIO_CHUNK_COMPRESSION = os.getenv("AUDIO_CHUNK_COMPRESSION", "flac")
+AUDIO_CHUNK_OPUS_BIT_RATE = int(os.getenv("AUDIO_CHUNK_OPUS_BIT_RATE", 32000))
+# Webhook payloads larger than this are stored compressed outside the WebhookDeliveryAttempt's payload column
+WEBHOOK_PAYLOAD_INLINE_LIMIT_BYTES = int(os.getenv("WEBHOOK_PAYLOAD_INLINE_LIMIT_BYTES", 16384))
+# Where those payloads are kept: "database", "s3" or "filesystem"
+WEBHOOK_PAYLOAD_STORAGE_BACKEND = os.getenv("WEBHOOK_PAYLOAD_STORAGE_BACKEND", "database")
+AWS_WEBHOOK_PAYLOAD_STORAGE_BUCKET_NAME = os.getenv("AWS_WEBHOOK_PAYLOAD_STORAGE_BUCKET_NAME", AWS_RECORDING_STORAGE_BUCKET_NAME)
+WEBHOOK_PAYLOAD_STORAGE_PATH = os.getenv("WEBHOOK_PAYLOAD_STORAGE_PATH", os.path.join(BASE_DIR, "webhook_payloads"))
+# How long the full payload of a large webhook is kept after it was delivered successfully
+WEBHOOK_PAYLOAD_RETENTION_HOURS = int(os.getenv("WEBHOOK_PAYLOAD_RETENTION_HOURS", 24))
+# How webhooks are delivered: "celery" runs a task per delivery, "dispatcher" leaves them for the run_webhook_dispatcher command
+WEBHOOK_DELIVERY_BACKEND = os.getenv("WEBHOOK_DELIVERY_BACKEND", "celery")
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", 3))
+WEBHOOK_RETRY_BACKOFF_MAX_SECONDS = int(os.getenv("WEBHOOK_RETRY_BACKOFF_MAX_SECONDS", 600))
+# Each process caches the webhook subscriptions and secret of the projects and bots it sends webhooks for
+WEBHOOK_SUBSCRIPTION_CACHE_TTL_SECONDS = int(os.getenv("WEBHOOK_SUBSCRIPTION_CACHE_TTL_SECONDS", 300))
+WEBHOOK_SUBSCRIPTION_CACHE_MAX_ENTRIES = int(os.getenv("WEBHOOK_SUBSCRIPTION_CACHE_MAX_ENTRIES", 10000))
+# Every webhook endpoint has a circuit breaker, shared by all workers through Redis. The circuit opens when at least
+# WEBHOOK_CIRCUIT_MIN_REQUESTS were sent in the last WEBHOOK_CIRCUIT_WINDOW_SECONDS and at least
+# WEBHOOK_CIRCUIT_ERROR_RATE_THRESHOLD of them failed. Deliveries are then deferred for WEBHOOK_CIRCUIT_OPEN_SECONDS before
+# a single probe is let through, and are marked as failed once they have been deferred for WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS.
+WEBHOOK_CIRCUIT_BREAKER_ENABLED = os.getenv("WEBHOOK_CIRCUIT_BREAKER_ENABLED", "true") == "true"
+WEBHOOK_CIRCUIT_WINDOW_SECONDS = int(os.getenv("WEBHOOK_CIRCUIT_WINDOW_SECONDS", 60))
+WEBHOOK_CIRCUIT_MIN_REQUESTS = int(os.getenv("WEBHOOK_CIRCUIT_MIN_REQUESTS", 10))
+WEBHOOK_CIRCUIT_ERROR_RATE_THRESHOLD = float(os.getenv("WEBHOOK_CIRCUIT_ERROR_RATE_THRESHOLD", 0.5))
+WEBHOOK_CIRCUIT_OPEN_SECONDS = int(os.getenv("WEBHOOK_CIRCUIT_OPEN_SECONDS", 30))
+WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS = int(os.getenv("WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS", 86400))
+# Requests in flight to an endpoint are limited to between these two. The limit grows while the endpoint's latency EWMA is
+# under WEBHOOK_CIRCUIT_TARGET_LATENCY_MS, and shrinks when it's over or requests fail.
+WEBHOOK_CIRCUIT_TARGET_LATENCY_MS = int(os.getenv("WEBHOOK_CIRCUIT_TARGET_LATENCY_MS", 2000))
+WEBHOOK_CIRCUIT_MIN_CONCURRENCY = int(os.getenv("WEBHOOK_CIRCUIT_MIN_CONCURRENCY", 1))
+WEBHOOK_CIRCUIT_MAX_CONCURRENCY = int(os.getenv("WEBHOOK_CIRCUIT_MAX_CONCURRENCY", 50))
+# Tasks enqueued inside a transaction go through the task outbox. They are published when the transaction commits, and the
+# relay in run_scheduler publishes any that are still waiting this many seconds later, e.g. because the broker was unreachable.
+TASK_OUTBOX_RELAY_DELAY_SECONDS = int(os.getenv("TASK_OUTBOX_RELAY_DELAY_SECONDS", 30))
+# Bot events, participant events, webhook delivery attempts and resource snapshots are partitioned by month. The
+# maintain_partitions command creates partitions this many months ahead, and removes the data of ended bots once it is older
+# than the project's retention period, or DATA_RETENTION_DAYS for projects that don't set one. Nothing is removed if it is unset.
+DATA_RETENTION_DAYS = int(os.getenv("DATA_RETENTION_DAYS")) if os.getenv("DATA_RETENTION_DAYS") else None
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+# Bot events are streamed to clients of /bots/{id}/events/stream through a Redis stream per bot, which keeps the bot's last
+# BOT_EVENT_STREAM_MAX_LENGTH events so that clients can resume with Last-Event-ID. It expires BOT_EVENT_STREAM_TTL_SECONDS after the last event.
+BOT_EVENT_STREAM_MAX_LENGTH = int(os.getenv("BOT_EVENT_STREAM_MAX_LENGTH", 1000))
+BOT_EVENT_STREAM_TTL_SECONDS = int(os.getenv("BOT_EVENT_STREAM_TTL_SECONDS", 86400))
+# Events waiting to be sent to a client are buffered up to this many. Clients that fall further behind catch up from the Redis stream.
+BOT_EVENT_STREAM_QUEUE_SIZE = int(os.getenv("BOT_EVENT_STREAM_QUEUE_SIZE", 100))
+# A comment is sent to clients after this many seconds without events, so that proxies don't close idle connections
+BOT_EVENT_STREAM_KEEPALIVE_SECONDS = int(os.getenv("BOT_EVENT_STREAM_KEEPALIVE_SECONDS", 15))
+# Rendered responses for the transcript, participants, participant events, chat messages and details of bots in a post meeting
+# state are cached in Redis, since they only change when the bot's data is deleted. Responses larger than BOT_RESPONSE_CACHE_MAX_BYTES aren't cached.
+BOT_RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("BOT_RESPONSE_CACHE_TTL_SECONDS", 3600))
+BOT_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("BOT_RESPONSE_CACHE_MAX_BYTES", 4194304))
+# Each process caches the API keys it has authenticated. Disabling or deleting a key is broadcast to every process over
+# Redis, so the TTL only bounds how long a missed broadcast can leave a revoked key usable.
+API_KEY_CACHE_TTL_SECONDS = int(os.getenv("API_KEY_CACHE_TTL_SECONDS", 60))
+API_KEY_CACHE_MAX_ENTRIES = int(os.getenv("API_KEY_CACHE_MAX_ENTRIES", 10000))
+# The concurrent bots limit is checked against per project counts of active bots in Redis. A bot being created holds a
+# reservation until it's counted, which is dropped after ACTIVE_BOT_RESERVATION_LEASE_SECONDS if its process dies. The
+# scheduler reconciles the counts with the database every ACTIVE_BOT_COUNT_RECONCILE_INTERVAL_SECONDS.
+ACTIVE_BOT_RESERVATION_LEASE_SECONDS = int(os.getenv("ACTIVE_BOT_RESERVATION_LEASE_SECONDS", 60))
+ACTIVE_BOT_COUNT_RECONCILE_INTERVAL_SECONDS = int(os.getenv("ACTIVE_BOT_COUNT_RECONCILE_INTERVAL_SECONDS", 300))
+# Each process shares a pool of Redis connections. Connections idle for longer than REDIS_HEALTH_CHECK_INTERVAL_SECONDS
+# are checked before they're used, and a command whose connection dropped is retried up to REDIS_RETRIES times, backing
+# off exponentially with jitter from REDIS_RECONNECT_BACKOFF_BASE_SECONDS up to REDIS_RECONNECT_BACKOFF_CAP_SECONDS.
+REDIS_HEALTH_CHECK_INTERVAL_SECONDS = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL_SECONDS", 30))
+REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS", 5))
+REDIS_RETRIES = int(os.getenv("REDIS_RETRIES", 3))
+REDIS_RECONNECT_BACKOFF_BASE_SECONDS = float(os.getenv("REDIS_RECONNECT_BACKOFF_BASE_SECONDS", 0.05))
+REDIS_RECONNECT_BACKOFF_CAP_SECONDS = float(os.getenv("REDIS_RECONNECT_BACKOFF_CAP_SECONDS", 2))
 CHARGE_CREDITS_FOR_BOTS = os.getenv("CHARGE_CREDITS_FOR_BOTS", "false") == "true"
 
 BOT_POD_NAMESPACE = os.getenv("BOT_POD_NAMESPACE", "attendee")
@@ -5,6 +5,10 @@ from .base import *
 DEBUG = True
 ALLOWED_HOSTS = []
 
+# Tests share one Redis and many of them send failing webhooks to the same URL, so endpoint health would carry over
+# from one test to the next. The circuit breaker tests turn it back on.
+WEBHOOK_CIRCUIT_BREAKER_ENABLED = False
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.postgresql",
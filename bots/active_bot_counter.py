@@ -0,0 +1,157 @@
+import logging
+import uuid
+from contextlib import contextmanager
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+
+from bots.models import Bot, BotEventManager
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "active_bots"
+
+# Each project has a count of its bots in an in meeting state, which BotEventManager.create_event keeps up to date when a
+# transition commits, and a set of reservations for the bots being created that will start joining once their transaction
+# commits. Bots are admitted atomically while the count plus the reservations is below the project's concurrent bots limit,
+# so a burst of requests can't go over it. Reservations are leases, so the ones of a process that dies while creating bots
+# are dropped after ACTIVE_BOT_RESERVATION_LEASE_SECONDS. The counts are seeded from the database the first time they're
+# needed, and reconciled with it by the scheduler.
+
+# Reserves a slot for each reservation id given, as long as the count plus the reservations stays below the limit.
+# Returns {number of reservations made, count plus reservations before they were made}, or {-1, 0} if the count isn't seeded.
+ADMIT_SCRIPT = """
+local count_key = KEYS[1]
+local reservations_key = KEYS[2]
+local limit = tonumber(ARGV[1])
+local lease_seconds = tonumber(ARGV[2])
+
+local count = redis.call("GET", count_key)
+if not count then
+    return {-1, 0}
+end
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("ZREMRANGEBYSCORE", reservations_key, "-inf", now)
+local active = tonumber(count) + redis.call("ZCARD", reservations_key)
+
+local reserved = 0
+for i = 3, #ARGV do
+    if active + reserved >= limit then
+        break
+    end
+    redis.call("ZADD", reservations_key, now + lease_seconds, ARGV[i])
+    reserved = reserved + 1
+end
+if reserved > 0 then
+    redis.call("EXPIRE", reservations_key, lease_seconds)
+end
+return {reserved, active}
+"""
+
+# Adjusts the count if it's seeded. Otherwise it's left to be seeded from the database, which already has the change.
+ADJUST_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("INCRBY", KEYS[1], ARGV[1])
+end
+return nil
+"""
+
+
+def count_key(project_id):
+    return f"{KEY_PREFIX}:{project_id}:count"
+
+
+def reservations_key(project_id):
+    return f"{KEY_PREFIX}:{project_id}:reservations"
+
+
+def count_active_bots_in_database(project_id):
+    return Bot.objects.filter(project_id=project_id).filter(BotEventManager.get_in_meeting_states_q_filter()).count()
+
+
+def admit(project, joining_bots_count=0):
+    """
+    Reserves a slot under the project's concurrent bots limit for each of joining_bots_count bots that will start joining,
+    for as many of them as there's room for. Pass 0 to only check the limit.
+
+    Returns:
+        tuple: (reservation_ids, active_bots_count) where active_bots_count is the number of active and reserved bots
+               before the reservations were made, or None if Redis is unavailable
+    """
+    reservation_ids = [str(uuid.uuid4()) for _ in range(joining_bots_count)]
+    keys = [count_key(project.id), reservations_key(project.id)]
+    try:
+        redis_client = get_redis_client()
+        reserved, active_bots_count = redis_client.eval(ADMIT_SCRIPT, 2, *keys, project.concurrent_bots_limit(), settings.ACTIVE_BOT_RESERVATION_LEASE_SECONDS, *reservation_ids)
+        if reserved == -1:
+            # Another process may have seeded it in the meantime, in which case its count is used
+            redis_client.set(keys[0], count_active_bots_in_database(project.id), nx=True)
+            reserved, active_bots_count = redis_client.eval(ADMIT_SCRIPT, 2, *keys, project.concurrent_bots_limit(), settings.ACTIVE_BOT_RESERVATION_LEASE_SECONDS, *reservation_ids)
+    except redis.RedisError as e:
+        logger.warning(f"Could not admit bots for project {project.object_id} with the active bot counter, falling back to the database: {e}")
+        return None
+
+    return reservation_ids[:reserved], active_bots_count
+
+
+def release(project_id, reservation_ids):
+    if not reservation_ids:
+        return
+    try:
+        get_redis_client().zrem(reservations_key(project_id), *reservation_ids)
+    except redis.RedisError as e:
+        logger.warning(f"Could not release {len(reservation_ids)} active bot reservations for project {project_id}, they will expire in {settings.ACTIVE_BOT_RESERVATION_LEASE_SECONDS} seconds: {e}")
+
+
+@contextmanager
+def holding(project_id, reservation_ids):
+    """
+    Holds the reservations while the block creates the bots they were made for. They're released when the transaction
+    commits, after the bots' transitions have been counted, or right away if the block raises.
+    """
+    try:
+        yield
+    except BaseException:
+        release(project_id, reservation_ids)
+        raise
+    transaction.on_commit(lambda: release(project_id, reservation_ids))
+
+
+def adjust(project_id, delta):
+    try:
+        get_redis_client().eval(ADJUST_SCRIPT, 1, count_key(project_id), delta)
+    except redis.RedisError as e:
+        logger.warning(f"Could not adjust the active bot count of project {project_id} by {delta}, it will be fixed when the counts are reconciled: {e}")
+
+
+def adjust_on_commit(project_id, delta):
+    transaction.on_commit(lambda: adjust(project_id, delta))
+
+
+def reconcile():
+    """
+    Sets each project's count to its number of bots in an in meeting state in the database, in case an adjustment was
+    missed, e.g. because Redis was unreachable when a transition committed. A transition that commits while this runs can
+    leave a count off by one until the next reconciliation. Returns the number of counts that were corrected.
+    """
+    redis_client = get_redis_client()
+    project_ids = [int(key.decode().split(":")[1]) for key in redis_client.scan_iter(match=count_key("*"))]
+    if not project_ids:
+        return 0
+
+    counts = dict(Bot.objects.filter(project_id__in=project_ids).filter(BotEventManager.get_in_meeting_states_q_filter()).values("project_id").annotate(count=Count("id")).values_list("project_id", "count"))
+    pipeline = redis_client.pipeline(transaction=False)
+    for project_id in project_ids:
+        pipeline.set(count_key(project_id), counts.get(project_id, 0), get=True)
+
+    corrected_count = 0
+    for project_id, old_count in zip(project_ids, pipeline.execute()):
+        if old_count is not None and int(old_count) != counts.get(project_id, 0):
+            logger.warning(f"Corrected the active bot count of project {project_id} from {int(old_count)} to {counts.get(project_id, 0)}")
+            corrected_count += 1
+    return corrected_count
@@ -120,7 +120,17 @@ class WebhookDeliveryAttemptAdmin(admin.ModelAdmin):
     list_display = ("webhook_subscription", "webhook_trigger_type", "status", "attempt_count", "created_at", "last_attempt_at", "succeeded_at")
     list_filter = ("status", "webhook_trigger_type", "webhook_subscription")
     search_fields = ("webhook_subscription__url", "idempotency_key")
-    readonly_fields = ("idempotency_key", "payload", "response_body_list")
+    readonly_fields = ("idempotency_key", "payload", "payload_preview_truncated", "response_body_list")
+    exclude = ("payload_blob", "payload_preview")
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("payload_blob")
+
+    @admin.display(description="Payload preview")
+    def payload_preview_truncated(self, obj):
+        if not obj.payload_is_stored_out_of_line():
+            return "-"
+        return obj.payload_preview_display()
 
     def has_add_permission(self, request):
         return False
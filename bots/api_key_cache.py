@@ -0,0 +1,222 @@
+import copy
+import logging
+import os
+import threading
+import time
+from collections import Counter
+
+import redis
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bots.models import ApiKey
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "api_key_invalidations"
+METRICS_KEY = "api_key_cache_metrics"
+
+# How long the listener waits before subscribing again after losing its connection to Redis
+RESUBSCRIBE_DELAY_SECONDS = 5
+# How often each process adds its counts to the totals in Redis
+METRICS_FLUSH_INTERVAL_SECONDS = 10
+
+# Each process keeps the API keys it has authenticated, by key hash. A thread in each process is subscribed to a Redis
+# channel that every change to an API key is published on, and drops the changed key from the cache. The cache is only
+# used while that subscription is up, since a change published while it's down would be missed. Entries also expire after
+# API_KEY_CACHE_TTL_SECONDS, so a dead connection that hasn't been noticed yet can't leave a revoked key usable for long.
+_cache = TTLCache(maxsize=settings.API_KEY_CACHE_MAX_ENTRIES, ttl=settings.API_KEY_CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+# Bumped whenever entries are dropped, so that a key loaded before an invalidation isn't put back in the cache after it
+_generation = 0
+# Lookups served from the cache, loaded from the database, and made while the cache couldn't be used
+_counts = Counter()
+_unflushed_counts = Counter()
+
+
+def _count(name):
+    with _cache_lock:
+        _counts[name] += 1
+        _unflushed_counts[name] += 1
+
+
+def _copy(api_key):
+    # Requests get their own copies, so that related objects loaded by one request, like the project's organization, aren't seen by the next
+    api_key = copy.copy(api_key)
+    api_key.project = copy.copy(api_key.project)
+    return api_key
+
+
+def _load(key_hash):
+    return ApiKey.objects.select_related("project").filter(key_hash=key_hash, disabled_at__isnull=True).first()
+
+
+def get_active_api_key(key_hash):
+    """
+    Returns the enabled API key with the hash, with its project, or None if there isn't one.
+    """
+    _listener.ensure_running()
+    if not _listener.subscribed.is_set():
+        _count("bypasses")
+        return _load(key_hash)
+
+    with _cache_lock:
+        api_key = _cache.get(key_hash)
+        generation = _generation
+    if api_key is not None:
+        _count("hits")
+        return _copy(api_key)
+
+    _count("misses")
+    # Unknown and disabled keys aren't cached, so requests with made up keys can't push out the real ones
+    api_key = _load(key_hash)
+    if api_key is not None:
+        with _cache_lock:
+            if _generation == generation:
+                _cache[key_hash] = _copy(api_key)
+    return api_key
+
+
+def invalidate_locally(key_hash=None):
+    """
+    Drops the key with the hash from this process' cache, or every key if no hash is given.
+    """
+    global _generation
+    with _cache_lock:
+        _generation += 1
+        if key_hash is None:
+            _cache.clear()
+        else:
+            _cache.pop(key_hash, None)
+            _counts["invalidations"] += 1
+            _unflushed_counts["invalidations"] += 1
+
+
+def invalidate(key_hash):
+    invalidate_locally(key_hash)
+    try:
+        get_redis_client().publish(INVALIDATION_CHANNEL, key_hash)
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish the invalidation of an API key, other processes will see the change once their cache expires: {e}")
+
+
+@receiver(post_save, sender=ApiKey)
+@receiver(post_delete, sender=ApiKey)
+def invalidate_on_change(sender, instance, **kwargs):
+    # Wait for the commit, so that no process can reload the old state after the invalidation
+    key_hash = instance.key_hash
+    transaction.on_commit(lambda: invalidate(key_hash))
+
+
+def get_metrics():
+    """
+    Returns the lookup counts of this process.
+    """
+    with _cache_lock:
+        counts = dict(_counts)
+        size = len(_cache)
+    return {**_metrics_from_counts(counts), "size": size, "subscribed": _listener.subscribed.is_set()}
+
+
+def get_total_metrics():
+    """
+    Returns the lookup counts of every process, as of their last flush.
+    """
+    counts = {name.decode(): int(value) for name, value in get_redis_client().hgetall(METRICS_KEY).items()}
+    return _metrics_from_counts(counts)
+
+
+def _metrics_from_counts(counts):
+    hits = counts.get("hits", 0)
+    lookups = hits + counts.get("misses", 0) + counts.get("bypasses", 0)
+    return {
+        "hits": hits,
+        "misses": counts.get("misses", 0),
+        "bypasses": counts.get("bypasses", 0),
+        "invalidations": counts.get("invalidations", 0),
+        "hit_rate": hits / lookups if lookups else None,
+    }
+
+
+def flush_metrics():
+    """
+    Adds the counts since the last flush to the totals in Redis.
+    """
+    with _cache_lock:
+        counts = dict(_unflushed_counts)
+        _unflushed_counts.clear()
+    if not counts:
+        return
+    try:
+        pipeline = get_redis_client().pipeline()
+        for name, value in counts.items():
+            pipeline.hincrby(METRICS_KEY, name, value)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not flush the API key cache metrics: {e}")
+        with _cache_lock:
+            _unflushed_counts.update(counts)
+
+
+class InvalidationListener:
+    """
+    Runs the thread that receives the invalidations published by every process.
+    """
+
+    def __init__(self):
+        self.subscribed = threading.Event()
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def is_running(self):
+        # A forked process inherits the listener, but not its thread
+        return self.pid == os.getpid() and self.thread.is_alive()
+
+    def ensure_running(self):
+        if self.is_running():
+            return
+        with self.lock:
+            if self.is_running():
+                return
+            self.subscribed.clear()
+            invalidate_locally()
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self.run, name="api-key-cache-invalidations", daemon=True)
+            self.thread.start()
+
+    def run(self):
+        while True:
+            try:
+                self.listen()
+            except Exception as e:
+                logger.warning(f"Lost the subscription to API key invalidations, bypassing the cache until it's back: {e}")
+            self.subscribed.clear()
+            # Invalidations published while the subscription was down were missed
+            invalidate_locally()
+            time.sleep(RESUBSCRIBE_DELAY_SECONDS)
+
+    def listen(self):
+        pubsub = get_redis_client().pubsub()
+        try:
+            pubsub.subscribe(INVALIDATION_CHANNEL)
+            last_flushed_at = time.monotonic()
+            while True:
+                message = pubsub.get_message(timeout=1.0)
+                if message is not None:
+                    if message["type"] == "subscribe":
+                        self.subscribed.set()
+                    elif message["type"] == "message":
+                        invalidate_locally(message["data"].decode())
+                if time.monotonic() - last_flushed_at >= METRICS_FLUSH_INTERVAL_SECONDS:
+                    flush_metrics()
+                    last_flushed_at = time.monotonic()
+        finally:
+            pubsub.close()
+
+
+_listener = InvalidationListener()
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class BotsConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "bots"
+
+    def ready(self):
+        # Registers the signal handlers that invalidate cached webhook subscriptions and API keys
+        from bots import api_key_cache, webhook_subscription_cache  # noqa: F401
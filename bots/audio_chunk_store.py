@@ -0,0 +1,21 @@
+from django.conf import settings
+
+from bots.object_store import build_object_store
+
+# The raw audio of AudioChunks can be kept in an object store rather than in Postgres.
+# Each stored object is either a single chunk or a segment holding several chunks of the same recording back to back.
+# The AudioChunk row keeps the object's key along with the offset and length of its audio within the object.
+
+
+def recording_prefix(recording_id):
+    return f"audio_chunks/recording_{recording_id}/"
+
+
+def get_audio_chunk_store():
+    # Returns None when audio chunks are kept in the database
+    backend = settings.AUDIO_CHUNK_STORAGE_BACKEND
+    if backend == "database":
+        return None
+    if backend == "s3":
+        return build_object_store(backend, settings.AWS_AUDIO_CHUNK_STORAGE_BUCKET_NAME)
+    return build_object_store(backend, settings.AUDIO_CHUNK_STORAGE_PATH)
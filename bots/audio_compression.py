@@ -0,0 +1,71 @@
+import io
+
+import av
+import numpy as np
+from av.audio.fifo import AudioFifo
+
+# Opus only runs at these rates, so other rates are resampled to 48kHz for storage and back on decode
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+
+# The container format and codec for each AUDIO_CHUNK_COMPRESSION setting
+COMPRESSION_CODECS = {
+    "flac": ("flac", "flac"),
+    "opus": ("ogg", "libopus"),
+}
+
+# Muxer options for each container format. The FLAC muxer pads its header with 8KB for metadata by default, which is more than a short chunk's audio.
+CONTAINER_OPTIONS = {
+    "flac": {"metadata_header_padding": "0"},
+}
+
+
+def compress_pcm(pcm_data: bytes, sample_rate: int, compression: str, bit_rate: int = None) -> bytes:
+    """
+    Encode 16-bit mono PCM as FLAC or Opus.
+
+    This uses PyAV rather than pydub, since it runs on the bot's main loop for every chunk and pydub starts an ffmpeg process per call.
+    """
+    container_format, codec_name = COMPRESSION_CODECS[compression]
+    codec_sample_rate = sample_rate if codec_name != "libopus" or sample_rate in OPUS_SAMPLE_RATES else 48000
+
+    output = io.BytesIO()
+    with av.open(output, mode="w", format=container_format, options=CONTAINER_OPTIONS.get(container_format, {})) as container:
+        stream = container.add_stream(codec_name, rate=codec_sample_rate)
+        stream.layout = "mono"
+        stream.format = "s16"
+        # FLAC is lossless, so the bit rate only applies to Opus
+        if bit_rate and codec_name == "libopus":
+            stream.bit_rate = bit_rate
+
+        frame = av.AudioFrame.from_ndarray(np.frombuffer(pcm_data, dtype=np.int16).reshape(1, -1), format="s16", layout="mono")
+        frame.sample_rate = sample_rate
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=codec_sample_rate)
+        fifo = AudioFifo()
+        for resampled_frame in resampler.resample(frame) + resampler.resample(None):
+            fifo.write(resampled_frame)
+
+        # Encoders like Opus only accept frames of exactly frame_size samples, except for the last one
+        frame_size = stream.codec_context.frame_size or 4096
+        while (encoder_frame := fifo.read(frame_size)) is not None:
+            for packet in stream.encode(encoder_frame):
+                container.mux(packet)
+        if (encoder_frame := fifo.read()) is not None:
+            for packet in stream.encode(encoder_frame):
+                container.mux(packet)
+        for packet in stream.encode(None):
+            container.mux(packet)
+
+    return output.getvalue()
+
+
+def decompress_to_pcm(compressed_data: bytes, sample_rate: int) -> bytes:
+    """Decode FLAC, Opus or MP3 audio back to 16-bit mono PCM at sample_rate."""
+    pcm_chunks = []
+    with av.open(io.BytesIO(compressed_data), mode="r") as container:
+        resampler = av.AudioResampler(format="s16", layout="mono", rate=sample_rate)
+        for frame in container.decode(audio=0):
+            for resampled_frame in resampler.resample(frame):
+                pcm_chunks.append(resampled_frame.to_ndarray().tobytes())
+        for resampled_frame in resampler.resample(None):
+            pcm_chunks.append(resampled_frame.to_ndarray().tobytes())
+    return b"".join(pcm_chunks)
@@ -16,6 +16,7 @@ from django.utils import timezone
 from bots.automatic_leave_configuration import AutomaticLeaveConfiguration
 from bots.bot_adapter import BotAdapter
 from bots.bot_controller.bot_websocket_client import BotWebsocketClient
+from bots.bot_event_stream import publish_bot_event
 from bots.bots_api_utils import BotCreationSource
 from bots.external_callback_utils import get_zoom_tokens
 from bots.meeting_url_utils import meeting_type_from_url
@@ -47,6 +48,7 @@ from bots.models import (
     Utterance,
     WebhookTriggerTypes,
 )
+from bots.redis_client import get_redis_client, reconnect_backoff
 from bots.webhook_payloads import chat_message_webhook_payload, participant_event_webhook_payload, utterance_webhook_payload
 from bots.webhook_utils import trigger_webhook
 from bots.websocket_payloads import mixed_audio_websocket_payload
@@ -566,14 +568,11 @@ class BotController:
         return not self.should_create_gstreamer_pipeline()
 
     def connect_to_redis(self):
-        # Close both pubsub and client if they exist
+        # Close the pubsub if it exists, which returns its connection to the pool shared by the process
         if self.pubsub:
             self.pubsub.close()
-        if self.redis_client:
-            self.redis_client.close()
 
-        redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
-        self.redis_client = redis.from_url(redis_url)
+        self.redis_client = get_redis_client()
         self.pubsub = self.redis_client.pubsub()
         self.pubsub.subscribe(self.pubsub_channel)
         logger.info(f"Redis connection established for bot {self.bot_in_db.id}")
@@ -611,7 +610,7 @@ class BotController:
         )
 
         self.per_participant_streaming_audio_input_manager = PerParticipantStreamingAudioInputManager(
-            save_utterance_callback=self.save_individual_audio_utterance,
+            save_utterance_callback=self.save_streaming_transcription_utterance,
             get_participant_callback=self.get_participant,
             sample_rate=self.get_per_participant_audio_sample_rate(),
             transcription_provider=self.get_recording_transcription_provider(),
@@ -688,7 +687,7 @@ class BotController:
         self.main_loop = GLib.MainLoop()
 
         def repeatedly_try_to_reconnect_to_redis():
-            reconnect_delay_seconds = 1
+            backoff = reconnect_backoff()
             num_attempts = 0
             while True:
                 try:
@@ -696,7 +695,7 @@ class BotController:
                     break
                 except Exception as e:
                     logger.info(f"Error reconnecting to Redis: {e} Attempt {num_attempts} / 30.")
-                    time.sleep(reconnect_delay_seconds)
+                    time.sleep(backoff.compute(num_attempts))
                     num_attempts += 1
                     if num_attempts > 30:
                         raise Exception("Failed to reconnect to Redis after 30 attempts")
@@ -1056,11 +1055,51 @@ class BotController:
         )
 
         # Create webhook event
+        utterance_payload = utterance_webhook_payload(utterance)
+        trigger_webhook(
+            webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE,
+            bot=self.bot_in_db,
+            payload=utterance_payload,
+        )
+        publish_bot_event(self.bot_in_db, WebhookTriggerTypes.TRANSCRIPT_UPDATE, utterance_payload)
+
+        RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
+
+    def save_streaming_transcription_utterance(self, message):
+        # Create participant record if it doesn't exist
+        participant, _ = Participant.objects.get_or_create(
+            bot=self.bot_in_db,
+            uuid=message["participant_uuid"],
+            defaults={
+                "user_uuid": message["participant_user_uuid"],
+                "full_name": message["participant_full_name"],
+                "is_the_bot": message["participant_is_the_bot"],
+                "is_host": message["participant_is_host"],
+            },
+        )
+
+        recording_in_progress = self.get_recording_in_progress()
+        if recording_in_progress is None:
+            logger.warning("Warning: No recording in progress found so cannot save streaming transcription utterance.")
+            return
+
+        # The streaming transcriber only hands us final segments, so the utterance is already transcribed
+        utterance = Utterance.objects.create(
+            source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
+            recording=recording_in_progress,
+            participant=participant,
+            transcription=message["transcription"],
+            timestamp_ms=message["timestamp_ms"] - self.get_per_participant_audio_utterance_delay_ms(),
+            duration_ms=message["duration_ms"],
+        )
+
+        utterance_payload = utterance_webhook_payload(utterance)
         trigger_webhook(
             webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE,
             bot=self.bot_in_db,
-            payload=utterance_webhook_payload(utterance),
+            payload=utterance_payload,
         )
+        publish_bot_event(self.bot_in_db, WebhookTriggerTypes.TRANSCRIPT_UPDATE, utterance_payload)
 
         RecordingManager.set_recording_transcription_in_progress(recording_in_progress)
 
@@ -1087,16 +1126,17 @@ class BotController:
             logger.warning("Warning: No recording in progress found so cannot save individual audio utterance.")
             return
 
-        audio_chunk = AudioChunk.objects.create(
+        audio_chunk = AudioChunk(
             recording=recording_in_progress,
-            audio_blob=message["audio_data"],
-            audio_format=AudioChunk.AudioFormat.PCM,
             timestamp_ms=message["timestamp_ms"] - self.get_per_participant_audio_utterance_delay_ms(),
             duration_ms=len(message["audio_data"]) / ((message["sample_rate"] / 1000) * 2),
             sample_rate=message["sample_rate"],
             source=AudioChunk.Sources.PER_PARTICIPANT_AUDIO,
             participant=participant,
         )
+        # Compresses the audio and writes it to the audio chunk store if one is configured, otherwise keeps it on the row
+        audio_chunk.set_audio_blob(message["audio_data"])
+        audio_chunk.save()
 
         utterance = Utterance.objects.create(
             source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
@@ -1150,11 +1190,13 @@ class BotController:
         if participant.is_the_bot:
             return
 
+        participant_event_payload = participant_event_webhook_payload(participant_event)
         trigger_webhook(
             webhook_trigger_type=WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE,
             bot=self.bot_in_db,
-            payload=participant_event_webhook_payload(participant_event),
+            payload=participant_event_payload,
         )
+        publish_bot_event(self.bot_in_db, WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE, participant_event_payload)
 
         return
 
@@ -1196,11 +1238,13 @@ class BotController:
         )
 
         # Create webhook event
+        chat_message_payload = chat_message_webhook_payload(chat_message_in_db)
         trigger_webhook(
             webhook_trigger_type=WebhookTriggerTypes.CHAT_MESSAGES_UPDATE,
             bot=self.bot_in_db,
-            payload=chat_message_webhook_payload(chat_message_in_db),
+            payload=chat_message_payload,
         )
+        publish_bot_event(self.bot_in_db, WebhookTriggerTypes.CHAT_MESSAGES_UPDATE, chat_message_payload)
 
         return
 
@@ -1211,6 +1255,9 @@ class BotController:
         if self.per_participant_non_streaming_audio_input_manager:
             logger.info("Flushing utterances...")
             self.per_participant_non_streaming_audio_input_manager.flush_utterances()
+        if self.per_participant_streaming_audio_input_manager:
+            logger.info("Flushing streaming transcription utterances...")
+            self.per_participant_streaming_audio_input_manager.flush_utterances()
         if self.closed_caption_manager:
             logger.info("Flushing captions...")
             self.closed_caption_manager.flush_captions()
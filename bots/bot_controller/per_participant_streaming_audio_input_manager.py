@@ -1,15 +1,23 @@
 import logging
+import os
 import queue
+import threading
 import time
+from collections import OrderedDict
 
 import numpy as np
 import webrtcvad
 
-from bots.models import Credentials, TranscriptionProviders
+from bots.models import TranscriptionProviders
 from bots.transcription_providers.deepgram.deepgram_streaming_transcriber import DeepgramStreamingTranscriber
 
 logger = logging.getLogger(__name__)
 
+# The StreamingTranscriber implementation for each provider that supports streaming
+STREAMING_TRANSCRIBER_CLASSES = {
+    TranscriptionProviders.DEEPGRAM: DeepgramStreamingTranscriber,
+}
+
 
 def calculate_normalized_rms(audio_bytes):
     samples = np.frombuffer(audio_bytes, dtype=np.int16)
@@ -19,7 +27,13 @@ def calculate_normalized_rms(audio_bytes):
 
 
 class PerParticipantStreamingAudioInputManager:
+    MAX_STREAMING_TRANSCRIBERS = 4
+    # How long flush_utterances waits for connections that are being pre-warmed
+    TRANSCRIBER_POOL_JOIN_TIMEOUT_SECONDS = 10
+
     def __init__(self, *, save_utterance_callback, get_participant_callback, sample_rate, transcription_provider, bot):
+        # Utterances finalized by the transcribers, which call back from their own threads.
+        # They are saved from monitor_transcription, which runs on the main loop.
         self.queue = queue.Queue()
 
         self.save_utterance_callback = save_utterance_callback
@@ -28,57 +42,100 @@ class PerParticipantStreamingAudioInputManager:
         self.utterances = {}
         self.sample_rate = sample_rate
 
-        self.last_nonsilent_audio_time = {}
-
         self.SILENCE_DURATION_LIMIT = 10  # seconds
 
         self.vad = webrtcvad.Vad()
         self.transcription_provider = transcription_provider
-        self.streaming_transcribers = {}
+        # Ordered from least to most recently used, so the first entry is the one to evict
+        self.streaming_transcribers = OrderedDict()
         self.last_nonsilent_audio_time = {}
 
         self.project = bot.project
         self.bot = bot
-        self.deepgram_api_key = self.get_deepgram_api_key()
+        self.streaming_transcriber_class = STREAMING_TRANSCRIBER_CLASSES.get(transcription_provider)
+        self.api_key = self.get_api_key()
+
+        # Connections opened ahead of time so that a speaker's first words don't wait on the websocket handshake.
+        # They can't carry per-speaker metadata, so we only use them when the transcripts come back to us rather than to a callback.
+        self.pool_size = int(os.getenv("STREAMING_TRANSCRIBER_POOL_SIZE", 2)) if self.should_prewarm_transcribers() else 0
+        self.transcriber_pool = []
+        self.transcriber_pool_lock = threading.Lock()
+        self.transcriber_pool_thread = None
+        # Set once the meeting has ended, after which no more connections are pre-warmed
+        self.closed = False
+
+    def should_prewarm_transcribers(self):
+        return self.streaming_transcriber_class is not None and self.streaming_transcriber_class.supports_pre_warming(self.bot)
 
     def silence_detected(self, chunk_bytes):
         if calculate_normalized_rms(chunk_bytes) < 0.0025:
             return True
         return not self.vad.is_speech(chunk_bytes, self.sample_rate)
 
-    def get_deepgram_api_key(self):
-        deepgram_credentials_record = self.project.credentials.filter(credential_type=Credentials.CredentialTypes.DEEPGRAM).first()
-        if not deepgram_credentials_record:
+    def get_api_key(self):
+        if self.streaming_transcriber_class is None or self.streaming_transcriber_class.credential_type is None:
+            return None
+
+        credentials_record = self.project.credentials.filter(credential_type=self.streaming_transcriber_class.credential_type).first()
+        if not credentials_record:
             return None
 
-        deepgram_credentials = deepgram_credentials_record.get_credentials()
-        return deepgram_credentials["api_key"]
+        credentials = credentials_record.get_credentials()
+        return credentials["api_key"]
 
     def create_streaming_transcriber(self, speaker_id, metadata):
         logger.info(f"Creating streaming transcriber for speaker {speaker_id}")
-        if self.transcription_provider == TranscriptionProviders.DEEPGRAM:
-            metadata_list = [f"{key}:{value}" for key, value in metadata.items()] if metadata else None
-            return DeepgramStreamingTranscriber(
-                deepgram_api_key=self.deepgram_api_key,
-                interim_results=True,
-                language=self.bot.deepgram_language(),
-                model=self.bot.deepgram_model(),
-                callback=self.bot.deepgram_callback(),
-                sample_rate=self.sample_rate,
-                metadata=metadata_list,
-                redaction_settings=self.bot.deepgram_redaction_settings(),
-            )
-        else:
+        if self.streaming_transcriber_class is None:
             raise Exception(f"Unsupported transcription provider: {self.transcription_provider}")
+        return self.streaming_transcriber_class.create(api_key=self.api_key, bot=self.bot, sample_rate=self.sample_rate, metadata=metadata)
+
+    def replenish_transcriber_pool(self):
+        if not self.api_key or self.closed or (self.transcriber_pool_thread and self.transcriber_pool_thread.is_alive()):
+            return
+        with self.transcriber_pool_lock:
+            missing_count = self.pool_size - len(self.transcriber_pool)
+        if missing_count <= 0:
+            return
+
+        # Opening a connection blocks on the websocket handshake, so don't do it on the main loop
+        def open_transcribers():
+            try:
+                for _ in range(missing_count):
+                    transcriber = self.create_streaming_transcriber("pool", {"bot_id": self.bot.object_id, **(self.bot.metadata or {})})
+                    with self.transcriber_pool_lock:
+                        if not self.closed:
+                            self.transcriber_pool.append(transcriber)
+                            continue
+                    # The meeting ended while the connection was being opened
+                    transcriber.finish()
+                    return
+            except Exception as e:
+                logger.warning(f"Failed to pre-warm streaming transcriber: {e}")
+
+        self.transcriber_pool_thread = threading.Thread(target=open_transcribers, daemon=True)
+        self.transcriber_pool_thread.start()
+
+    def take_transcriber_from_pool(self):
+        with self.transcriber_pool_lock:
+            if self.transcriber_pool:
+                return self.transcriber_pool.pop(0)
+        return None
 
     def find_or_create_streaming_transcriber_for_speaker(self, speaker_id):
         if speaker_id not in self.streaming_transcribers:
-            metadata = {"bot_id": self.bot.object_id, **(self.bot.metadata or {}), **self.get_participant_callback(speaker_id)}
-            self.streaming_transcribers[speaker_id] = self.create_streaming_transcriber(speaker_id, metadata)
+            streaming_transcriber = self.take_transcriber_from_pool()
+            if streaming_transcriber:
+                logger.info(f"Using pre-warmed streaming transcriber for speaker {speaker_id}")
+            else:
+                metadata = {"bot_id": self.bot.object_id, **(self.bot.metadata or {}), **self.get_participant_callback(speaker_id)}
+                streaming_transcriber = self.create_streaming_transcriber(speaker_id, metadata)
+            streaming_transcriber.on_final_callback = lambda utterance: self.queue.put((speaker_id, utterance))
+            self.streaming_transcribers[speaker_id] = streaming_transcriber
+        self.streaming_transcribers.move_to_end(speaker_id)
         return self.streaming_transcribers[speaker_id]
 
     def add_chunk(self, speaker_id, chunk_time, chunk_bytes):
-        if not self.deepgram_api_key:
+        if not self.api_key:
             return
 
         audio_is_silent = self.silence_detected(chunk_bytes)
@@ -92,22 +149,48 @@ class PerParticipantStreamingAudioInputManager:
         streaming_transcriber = self.find_or_create_streaming_transcriber_for_speaker(speaker_id)
         streaming_transcriber.send(chunk_bytes)
 
+    def save_finalized_utterances(self):
+        while not self.queue.empty():
+            speaker_id, utterance = self.queue.get()
+            participant = self.get_participant_callback(speaker_id)
+            if not participant:
+                logger.warning(f"Participant {speaker_id} not found")
+                continue
+            self.save_utterance_callback({**participant, **utterance})
+
+    def stop_streaming_transcriber(self, speaker_id):
+        streaming_transcriber = self.streaming_transcribers.pop(speaker_id)
+        streaming_transcriber.finish()
+        logger.info(f"Streaming transcriber for speaker {speaker_id} finished with metrics {streaming_transcriber.metrics()}")
+
     def monitor_transcription(self):
-        speakers_to_remove = []
-        streaming_transcriber_keys = list(self.streaming_transcribers.keys())
-        for speaker_id in streaming_transcriber_keys:
-            streaming_transcriber = self.streaming_transcribers[speaker_id]
+        for speaker_id in list(self.streaming_transcribers.keys()):
             if time.time() - self.last_nonsilent_audio_time[speaker_id] > self.SILENCE_DURATION_LIMIT:
-                streaming_transcriber.finish()
-                speakers_to_remove.append(speaker_id)
+                self.stop_streaming_transcriber(speaker_id)
                 logger.info(f"Speaker {speaker_id} has been silent for too long, stopping streaming transcriber")
 
-        for speaker_id in speakers_to_remove:
-            del self.streaming_transcribers[speaker_id]
-
-        # If Number of streaming transcibers is greater than 4, then stop the oldest one
-        if len(self.streaming_transcribers) > 4:
-            oldest_transcriber = min(self.streaming_transcribers.values(), key=lambda x: x.last_send_time)
-            oldest_transcriber.finish()
-            del self.streaming_transcribers[oldest_transcriber.speaker_id]
-            logger.info(f"Stopped oldest streaming transcriber for speaker {oldest_transcriber.speaker_id}")
+        # If there are too many streaming transcribers, stop the least recently used ones
+        while len(self.streaming_transcribers) > self.MAX_STREAMING_TRANSCRIBERS:
+            speaker_id = next(iter(self.streaming_transcribers))
+            self.stop_streaming_transcriber(speaker_id)
+            logger.info(f"Stopped least recently used streaming transcriber for speaker {speaker_id}")
+
+        self.save_finalized_utterances()
+
+        if self.pool_size:
+            self.replenish_transcriber_pool()
+
+    def flush_utterances(self):
+        # When the meeting ends, close every connection so the remaining finalized segments are saved
+        for speaker_id in list(self.streaming_transcribers.keys()):
+            self.stop_streaming_transcriber(speaker_id)
+        with self.transcriber_pool_lock:
+            self.closed = True
+        # Connections that the pool thread opens after this are finished by the thread itself
+        if self.transcriber_pool_thread:
+            self.transcriber_pool_thread.join(timeout=self.TRANSCRIBER_POOL_JOIN_TIMEOUT_SECONDS)
+        with self.transcriber_pool_lock:
+            pool, self.transcriber_pool = self.transcriber_pool, []
+        for streaming_transcriber in pool:
+            streaming_transcriber.finish()
+        self.save_finalized_utterances()
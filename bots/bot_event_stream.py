@@ -0,0 +1,311 @@
+import asyncio
+import logging
+import re
+import time
+import weakref
+
+import orjson
+import redis
+import redis.asyncio
+from django.conf import settings
+from django.db import transaction
+
+from bots.models import BotStates, WebhookTriggerTypes
+from bots.redis_client import get_redis_client, redis_url
+from bots.webhook_utils import canonical_json
+
+logger = logging.getLogger(__name__)
+
+STREAM_KEY_PREFIX = "bot_event_stream"
+CHANNEL_PREFIX = "bot_event_stream_notify"
+
+# Event ids are the ids of the entries in the bot's Redis stream
+EVENT_ID_PATTERN = re.compile(r"^\d+-\d+$")
+# How many events are read from a stream at a time, when catching up
+READ_PAGE_SIZE = 100
+# How long the process waits before reading from Redis again after an error
+ERROR_RETRY_SECONDS = 1
+# How long clients wait before reconnecting when the connection drops
+CLIENT_RETRY_MILLISECONDS = 3000
+
+POST_MEETING_STATES = [BotStates.state_to_api_code(state) for state in BotStates.post_meeting_states()]
+
+# Put on a listener's queue in place of the events that didn't fit
+OVERFLOWED = object()
+# Put on the queue of idle listeners, so that proxies don't close the connection while the bot is quiet
+KEEPALIVE = object()
+
+# Every event of a bot that can be streamed is appended to the bot's Redis stream, which keeps its last
+# BOT_EVENT_STREAM_MAX_LENGTH events, and the bot's pub/sub channel is notified. Each process serving event streams has a
+# single pub/sub connection, subscribed to the channels of the bots it has listeners for. On a notification it reads the
+# bot's new events from the stream once, and puts them on the queue of every listener. Resuming from a Last-Event-ID reads
+# the events after it from the stream, so a client that reconnects doesn't miss the events sent while it was away.
+
+
+def stream_key(bot_object_id):
+    return f"{STREAM_KEY_PREFIX}:{bot_object_id}"
+
+
+def channel_name(bot_object_id):
+    return f"{CHANNEL_PREFIX}:{bot_object_id}"
+
+
+def parse_event_id(event_id):
+    milliseconds, sequence = event_id.split("-")
+    return int(milliseconds), int(sequence)
+
+
+def is_valid_event_id(event_id):
+    return bool(EVENT_ID_PATTERN.match(event_id))
+
+
+def publish_bot_event(bot, webhook_trigger_type, payload):
+    """
+    Appends an event to the bot's event stream once the current transaction commits, so that clients never see an event for a change that was rolled back.
+    The event has the same name and payload as the webhook for the trigger type.
+    """
+    bot_object_id = bot.object_id
+    event = WebhookTriggerTypes.trigger_type_to_api_code(webhook_trigger_type)
+    data = canonical_json(payload)
+    transaction.on_commit(lambda: append_event(bot_object_id, event, data))
+
+
+def append_event(bot_object_id, event, data):
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.xadd(stream_key(bot_object_id), {"event": event, "data": data}, maxlen=settings.BOT_EVENT_STREAM_MAX_LENGTH, approximate=True)
+        pipeline.expire(stream_key(bot_object_id), settings.BOT_EVENT_STREAM_TTL_SECONDS)
+        pipeline.publish(channel_name(bot_object_id), event)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not publish {event} event for bot {bot_object_id} to its event stream: {e}")
+
+
+def has_events_after(bot_object_id, event_id):
+    return bool(get_redis_client().xrange(stream_key(bot_object_id), min=f"({event_id}", count=1))
+
+
+class BotStreamEvent:
+    """
+    An event read from a bot's stream. It's shared by all the listeners of the bot, so it's encoded once.
+    """
+
+    __slots__ = ("id", "encoded", "ends_stream")
+
+    def __init__(self, id, event, data):
+        self.id = id
+        self.encoded = f"id: {id[0]}-{id[1]}\nevent: {event}\ndata: ".encode() + data + b"\n\n"
+        # Nothing is published for a bot after it has ended
+        self.ends_stream = event == WebhookTriggerTypes.trigger_type_to_api_code(WebhookTriggerTypes.BOT_STATE_CHANGE) and orjson.loads(data).get("new_state") in POST_MEETING_STATES
+
+    @classmethod
+    def from_stream_entry(cls, entry):
+        entry_id, fields = entry
+        return cls(parse_event_id(entry_id.decode()), fields[b"event"].decode(), fields[b"data"])
+
+
+class BotEventListener:
+    """
+    The events of a bot waiting to be sent to one client. The queue is bounded, so a client that doesn't keep up can't make the
+    process buffer an unbounded number of events for it. Once it's full, the events are dropped and the client catches up by reading them from the bot's stream.
+    """
+
+    def __init__(self, bot_object_id, last_event_id):
+        self.bot_object_id = bot_object_id
+        # The id of the last event of the bot before the listener was added
+        self.last_event_id = last_event_id
+        self.queue = asyncio.Queue(maxsize=settings.BOT_EVENT_STREAM_QUEUE_SIZE)
+        self.overflowed = False
+
+    def put(self, event):
+        if self.overflowed:
+            return
+        if self.queue.full():
+            self.overflowed = True
+            # Drop what's queued, it's read again from the stream
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOWED)
+            return
+        self.queue.put_nowait(event)
+
+    def reset(self):
+        self.overflowed = False
+
+
+class BotEventHub:
+    """
+    Fans out the events of the bots that this process is streaming to their listeners, over a single Redis pub/sub connection.
+    """
+
+    def __init__(self):
+        self.redis_client = redis.asyncio.from_url(redis_url())
+        self.pubsub = self.redis_client.pubsub()
+        self.listeners = {}
+        # The id of the last event read from each bot's stream
+        self.last_event_ids = {}
+        self.reader_task = None
+        # Held while subscribing to or unsubscribing from a bot's channel
+        self.subscription_lock = asyncio.Lock()
+
+    async def add_listener(self, bot_object_id):
+        async with self.subscription_lock:
+            if bot_object_id not in self.listeners:
+                latest_entries = await self.redis_client.xrevrange(stream_key(bot_object_id), count=1)
+                await self.pubsub.subscribe(channel_name(bot_object_id))
+                self.last_event_ids[bot_object_id] = parse_event_id(latest_entries[0][0].decode()) if latest_entries else (0, 0)
+                self.listeners[bot_object_id] = set()
+                # Events published between reading where the stream was at and subscribing weren't notified
+                await self.dispatch_new_events([bot_object_id])
+
+            listener = BotEventListener(bot_object_id, self.last_event_ids[bot_object_id])
+            self.listeners[bot_object_id].add(listener)
+
+        if self.reader_task is None or self.reader_task.done():
+            self.reader_task = asyncio.create_task(self.read_notifications())
+        return listener
+
+    async def remove_listener(self, listener):
+        async with self.subscription_lock:
+            bot_listeners = self.listeners[listener.bot_object_id]
+            bot_listeners.discard(listener)
+            if bot_listeners:
+                return
+
+            del self.listeners[listener.bot_object_id]
+            del self.last_event_ids[listener.bot_object_id]
+            try:
+                await self.pubsub.unsubscribe(channel_name(listener.bot_object_id))
+            except redis.RedisError as e:
+                logger.warning(f"Could not unsubscribe from the event stream of bot {listener.bot_object_id}: {e}")
+
+    async def read_notifications(self):
+        last_keepalive_at = time.monotonic()
+        while self.listeners:
+            if time.monotonic() - last_keepalive_at >= settings.BOT_EVENT_STREAM_KEEPALIVE_SECONDS:
+                self.send_keepalives()
+                last_keepalive_at = time.monotonic()
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                notified_bot_object_ids = {message["channel"].decode().split(":", 1)[1]}
+                # Read the events of everything that was notified in the meantime together
+                while message := await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=0):
+                    notified_bot_object_ids.add(message["channel"].decode().split(":", 1)[1])
+                await self.dispatch_new_events(notified_bot_object_ids)
+            except Exception as e:
+                logger.warning(f"Error reading bot event notifications, retrying in {ERROR_RETRY_SECONDS} seconds: {e}")
+                await asyncio.sleep(ERROR_RETRY_SECONDS)
+                # Notifications sent while the connection was down are lost, so look for new events in every stream
+                try:
+                    await self.dispatch_new_events(set(self.listeners))
+                except Exception as e:
+                    logger.warning(f"Error reading bot events after reconnecting: {e}")
+
+    def send_keepalives(self):
+        # Done here rather than with a timeout on every wait for an event, which would cost a timer per event sent
+        for bot_listeners in self.listeners.values():
+            for listener in bot_listeners:
+                if listener.queue.empty():
+                    listener.queue.put_nowait(KEEPALIVE)
+
+    async def dispatch_new_events(self, bot_object_ids):
+        bot_object_ids = [bot_object_id for bot_object_id in bot_object_ids if bot_object_id in self.listeners]
+        while bot_object_ids:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            for bot_object_id in bot_object_ids:
+                last_event_id = self.last_event_ids[bot_object_id]
+                pipeline.xrange(stream_key(bot_object_id), min=f"({last_event_id[0]}-{last_event_id[1]}", count=READ_PAGE_SIZE)
+            results = await pipeline.execute()
+
+            bot_object_ids_with_more_events = []
+            for bot_object_id, entries in zip(bot_object_ids, results):
+                # The last listener may have gone while we were reading
+                if bot_object_id not in self.listeners:
+                    continue
+                for entry in entries:
+                    event = BotStreamEvent.from_stream_entry(entry)
+                    # Already dispatched by a read that overlapped with this one
+                    if event.id <= self.last_event_ids[bot_object_id]:
+                        continue
+                    self.last_event_ids[bot_object_id] = event.id
+                    for listener in self.listeners[bot_object_id]:
+                        listener.put(event)
+                if len(entries) == READ_PAGE_SIZE:
+                    bot_object_ids_with_more_events.append(bot_object_id)
+            bot_object_ids = bot_object_ids_with_more_events
+
+    async def read_events_after(self, bot_object_id, event_id):
+        """
+        Yields the events in the bot's stream after event_id, a page at a time.
+        """
+        while True:
+            entries = await self.redis_client.xrange(stream_key(bot_object_id), min=f"({event_id[0]}-{event_id[1]}", count=READ_PAGE_SIZE)
+            for entry in entries:
+                event = BotStreamEvent.from_stream_entry(entry)
+                event_id = event.id
+                yield event
+            if len(entries) < READ_PAGE_SIZE:
+                return
+
+
+# Each event loop has its own hub, since the Redis connections belong to the loop they were made in
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    loop = asyncio.get_running_loop()
+    hub = _hubs.get(loop)
+    if hub is None:
+        hub = _hubs[loop] = BotEventHub()
+    return hub
+
+
+async def stream_bot_events(bot_object_id, last_event_id=None, bot_has_ended=False):
+    """
+    Yields the bot's events as server-sent events: the events after last_event_id if it's given, then the events published from now on.
+    The stream ends after the bot moves to a post meeting state. If it's already in one, only the events after last_event_id are sent,
+    so there should be some, see has_events_after.
+    """
+    hub = get_hub()
+    last_event_id = parse_event_id(last_event_id) if last_event_id else None
+    yield f"retry: {CLIENT_RETRY_MILLISECONDS}\n\n".encode()
+
+    if bot_has_ended:
+        if last_event_id:
+            async for event in hub.read_events_after(bot_object_id, last_event_id):
+                yield event.encoded
+        return
+
+    listener = await hub.add_listener(bot_object_id)
+    try:
+        catch_up = last_event_id is not None
+        if last_event_id is None:
+            last_event_id = listener.last_event_id
+        while True:
+            if catch_up:
+                listener.reset()
+                async for event in hub.read_events_after(bot_object_id, last_event_id):
+                    last_event_id = event.id
+                    yield event.encoded
+                    if event.ends_stream:
+                        return
+                catch_up = False
+
+            event = await listener.queue.get()
+            if event is KEEPALIVE:
+                yield b": keepalive\n\n"
+                continue
+            if event is OVERFLOWED:
+                catch_up = True
+                continue
+            # Events that were already sent while catching up
+            if event.id <= last_event_id:
+                continue
+            last_event_id = event.id
+            yield event.encoded
+            if event.ends_stream:
+                return
+    finally:
+        await hub.remove_listener(listener)
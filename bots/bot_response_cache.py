@@ -0,0 +1,112 @@
+import hashlib
+import logging
+
+import redis
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from bots.models import BotStates
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "bot_response_cache"
+INDEX_KEY_PREFIX = "bot_response_cache_keys"
+
+# Once a bot is in a post meeting state, its transcript, participants, participant events, chat messages and details only
+# change when its data is deleted. Responses for those bots have an ETag and a Last-Modified date, derived from when the bot
+# and the rows in the response were last updated, so clients can re-fetch them with a conditional request and get a 304.
+# The rendered responses are also kept in Redis under their ETag. Deleting the bot's data updates the bot, which changes the
+# ETag of every response, and removes the responses that were cached for it.
+
+
+def cache_key(bot_object_id, etag):
+    return f"{KEY_PREFIX}:{bot_object_id}:{etag}"
+
+
+def index_key(bot_object_id):
+    # The set of the bot's cached responses, so they can be removed together
+    return f"{INDEX_KEY_PREFIX}:{bot_object_id}"
+
+
+def get_cached_response(bot_object_id, etag):
+    try:
+        entry = get_redis_client().hgetall(cache_key(bot_object_id, etag))
+    except redis.RedisError as e:
+        logger.warning(f"Could not read a cached response for bot {bot_object_id}: {e}")
+        return None
+    if not entry:
+        return None
+    return HttpResponse(entry[b"content"], content_type=entry[b"content_type"].decode())
+
+
+def cache_response(bot_object_id, etag, response):
+    if len(response.content) > settings.BOT_RESPONSE_CACHE_MAX_BYTES:
+        return
+    key = cache_key(bot_object_id, etag)
+    try:
+        pipeline = get_redis_client().pipeline()
+        pipeline.hset(key, mapping={"content_type": response["Content-Type"], "content": response.content})
+        pipeline.expire(key, settings.BOT_RESPONSE_CACHE_TTL_SECONDS)
+        pipeline.sadd(index_key(bot_object_id), key)
+        pipeline.expire(index_key(bot_object_id), settings.BOT_RESPONSE_CACHE_TTL_SECONDS)
+        pipeline.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not cache a response for bot {bot_object_id}: {e}")
+
+
+def delete_cached_responses(bot_object_id):
+    """
+    Removes every cached response for the bot.
+    """
+    try:
+        redis_client = get_redis_client()
+        keys = redis_client.smembers(index_key(bot_object_id))
+        redis_client.delete(index_key(bot_object_id), *keys)
+    except redis.RedisError as e:
+        logger.warning(f"Could not delete the cached responses for bot {bot_object_id}, they will expire in {settings.BOT_RESPONSE_CACHE_TTL_SECONDS} seconds: {e}")
+
+
+# Adds conditional requests and response caching to a view of a bot's resources. The view calls cached_response once it has
+# found the bot, and returns what it gives back if it isn't None. This isn't a docstring, since the API docs would show it.
+class PostMeetingResponseCacheMixin:
+    def get_resource_last_modified(self, bot):
+        """
+        Returns when the rows in the view's responses for the bot were last updated, or None if there aren't any.
+        By default responses are versioned by the bot's updated_at alone, which changes when its data is deleted.
+        Views whose rows can change after the meeting override this.
+        """
+        return None
+
+    def cached_response(self, request, bot):
+        self.response_cache_bot_object_id = None
+        if bot.state not in BotStates.post_meeting_states():
+            return None
+
+        last_modified = max(filter(None, [bot.updated_at, self.get_resource_last_modified(bot)]))
+        # Responses vary with the query parameters, the format, and the host, which the next page URLs are built with
+        version = "\n".join([type(self).__name__, bot.object_id, last_modified.isoformat(), request.build_absolute_uri(), request.accepted_media_type])
+        self.response_cache_etag = hashlib.sha256(version.encode()).hexdigest()[:32]
+        self.response_cache_last_modified = int(last_modified.timestamp())
+        self.response_cache_bot_object_id = bot.object_id
+
+        not_modified_response = get_conditional_response(request, etag=quote_etag(self.response_cache_etag), last_modified=self.response_cache_last_modified)
+        if not_modified_response is not None:
+            return not_modified_response
+        return get_cached_response(bot.object_id, self.response_cache_etag)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if getattr(self, "response_cache_bot_object_id", None) is None or response.status_code not in (200, 304):
+            return response
+
+        response["ETag"] = quote_etag(self.response_cache_etag)
+        response["Last-Modified"] = http_date(self.response_cache_last_modified)
+        # Streamed responses and responses that came from the cache aren't cached
+        if isinstance(response, Response) and response.status_code == 200:
+            response.render()
+            cache_response(self.response_cache_bot_object_id, self.response_cache_etag, response)
+        return response
@@ -4,6 +4,8 @@ from . import bots_api_views
 
 urlpatterns = [
     path("bots", bots_api_views.BotListCreateView.as_view(), name="bot-list-create"),
+    path("bots/batch", bots_api_views.BotBatchCreateView.as_view(), name="bot-batch-create"),
+    path("bots/status", bots_api_views.BotStatusView.as_view(), name="bot-status"),
     path(
         "bots/<str:object_id>",
         bots_api_views.BotDetailView.as_view(),
@@ -49,6 +51,11 @@ urlpatterns = [
         bots_api_views.ChatMessagesView.as_view(),
         name="bot-chat-messages",
     ),
+    path(
+        "bots/<str:object_id>/events/stream",
+        bots_api_views.BotEventStreamView.as_view(),
+        name="bot-event-stream",
+    ),
     path(
         "bots/<str:object_id>/send_chat_message",
         bots_api_views.SendChatMessageView.as_view(),
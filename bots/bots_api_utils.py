@@ -1,14 +1,16 @@
 import json
 import logging
 import os
+import random
+import string
 import uuid
 from enum import Enum
 
-import redis
 from django.core.exceptions import ValidationError
 from django.db import IntegrityError, transaction
 from django.urls import reverse
 
+from . import active_bot_counter
 from .meeting_url_utils import meeting_type_from_url
 from .models import (
     Bot,
@@ -29,21 +31,21 @@ from .models import (
     WebhookSubscription,
     WebhookTriggerTypes,
 )
+from .redis_client import get_redis_client
 from .serializers import (
     CreateBotSerializer,
     PatchBotSerializer,
 )
 from .utils import transcription_provider_from_bot_creation_data
+from .webhook_subscription_cache import invalidate_project
 
 logger = logging.getLogger(__name__)
 
 
 def send_sync_command(bot, command="sync"):
-    redis_url = os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
-    redis_client = redis.from_url(redis_url)
     channel = f"bot_{bot.id}"
     message = {"command": command}
-    redis_client.publish(channel, json.dumps(message))
+    get_redis_client().publish(channel, json.dumps(message))
 
 
 def create_bot_chat_message_request(bot, chat_message_data):
@@ -107,24 +109,53 @@ def validate_meeting_url_and_credentials(meeting_url, project):
     return None
 
 
+def bot_concurrency_limit_error(project, concurrent_bots_limit):
+    logger.error(f"Project {project.object_id} has exceeded the maximum number of concurrent bots ({concurrent_bots_limit}).")
+    return {"error": f"You have exceeded the maximum number of concurrent bots ({concurrent_bots_limit}) for your account. Please reach out to customer support to increase the limit."}
+
+
 def validate_bot_concurrency_limit(project):
     active_bots_count = Bot.objects.filter(project=project).filter(BotEventManager.get_in_meeting_states_q_filter()).count()
     concurrent_bots_limit = project.concurrent_bots_limit()
     if active_bots_count >= concurrent_bots_limit:
-        logger.error(f"Project {project.object_id} has exceeded the maximum number of concurrent bots ({concurrent_bots_limit}).")
-        return {"error": f"You have exceeded the maximum number of concurrent bots ({concurrent_bots_limit}) for your account. Please reach out to customer support to increase the limit."}
+        return bot_concurrency_limit_error(project, concurrent_bots_limit)
 
     return None
 
 
+def admit_bot(project, joins_immediately):
+    """
+    Checks that the project is below its concurrent bots limit and, if the bot will start joining right away, reserves a
+    slot for it with the active bot counter. The check and the reservation are atomic, so concurrent requests can't go
+    over the limit. The reservation is held with active_bot_counter.holding while the bot is created.
+
+    Returns:
+        tuple: (reservation_ids, error) where error is None if the bot was admitted
+    """
+    admission = active_bot_counter.admit(project, 1 if joins_immediately else 0)
+    if admission is None:
+        # The counter is unavailable, so fall back to counting the project's active bots in the database
+        return [], validate_bot_concurrency_limit(project)
+
+    reservation_ids, active_bots_count = admission
+    concurrent_bots_limit = project.concurrent_bots_limit()
+    if active_bots_count >= concurrent_bots_limit:
+        return [], bot_concurrency_limit_error(project, concurrent_bots_limit)
+
+    return reservation_ids, None
+
+
 # Returns a tuple of (calendar_event, error)
 # Side effect: sets the meeting_url and join_at in the data dictionary if the calendar event is found
-def initialize_bot_creation_data_from_calendar_event(data, project):
+# calendar_events is an optional dictionary of the project's calendar events by object id, for callers that fetched them already
+def initialize_bot_creation_data_from_calendar_event(data, project, calendar_events=None):
     calendar_event = None
     if data.get("calendar_event_id"):
-        try:
-            calendar_event = CalendarEvent.objects.get(object_id=data["calendar_event_id"], calendar__project=project)
-        except CalendarEvent.DoesNotExist:
+        if calendar_events is not None:
+            calendar_event = calendar_events.get(data["calendar_event_id"])
+        else:
+            calendar_event = CalendarEvent.objects.filter(object_id=data["calendar_event_id"], calendar__project=project).first()
+        if calendar_event is None:
             return None, {"error": f"Calendar event with id {data['calendar_event_id']} does not exist in this project."}
 
         if data.get("meeting_url"):
@@ -150,6 +181,56 @@ def validate_external_media_storage_settings(external_media_storage_settings, pr
     return None
 
 
+def new_object_id(model):
+    # Models generate their object ids in save(), which bulk_create doesn't call
+    random_string = "".join(random.choices(string.ascii_letters + string.digits, k=16))
+    return f"{model.OBJECT_ID_PREFIX}{random_string}"
+
+
+def build_bot(validated_data, project, calendar_event):
+    """
+    Returns an unsaved Bot for data validated by CreateBotSerializer. It's scheduled if it has a join_at, otherwise it's ready to join.
+    """
+    settings = {
+        "transcription_settings": validated_data["transcription_settings"],
+        "rtmp_settings": validated_data["rtmp_settings"],
+        "recording_settings": validated_data["recording_settings"],
+        "debug_settings": validated_data["debug_settings"],
+        "automatic_leave_settings": validated_data["automatic_leave_settings"],
+        "teams_settings": validated_data["teams_settings"],
+        "zoom_settings": validated_data["zoom_settings"],
+        "websocket_settings": validated_data["websocket_settings"],
+        "callback_settings": validated_data["callback_settings"],
+        "external_media_storage_settings": validated_data["external_media_storage_settings"],
+        "voice_agent_settings": validated_data["voice_agent_settings"],
+    }
+
+    return Bot(
+        project=project,
+        meeting_url=validated_data["meeting_url"],
+        name=validated_data["bot_name"],
+        settings=settings,
+        metadata=validated_data["metadata"],
+        join_at=validated_data["join_at"],
+        deduplication_key=validated_data["deduplication_key"],
+        state=BotStates.SCHEDULED if validated_data["join_at"] else BotStates.READY,
+        calendar_event=calendar_event,
+    )
+
+
+def build_default_recording(bot, validated_data):
+    """
+    Returns an unsaved default Recording for a bot built from data validated by CreateBotSerializer.
+    """
+    return Recording(
+        bot=bot,
+        recording_type=bot.recording_type(),
+        transcription_type=TranscriptionTypes.NON_REALTIME,
+        transcription_provider=transcription_provider_from_bot_creation_data(validated_data),
+        is_default_recording=True,
+    )
+
+
 class BotCreationSource(str, Enum):
     API = "api"
     DASHBOARD = "dashboard"
@@ -178,69 +259,24 @@ def create_bot(data: dict, source: BotCreationSource, project: Project) -> tuple
     if error:
         return None, error
 
-    bot_name = serializer.validated_data["bot_name"]
-    transcription_settings = serializer.validated_data["transcription_settings"]
-    rtmp_settings = serializer.validated_data["rtmp_settings"]
-    recording_settings = serializer.validated_data["recording_settings"]
-    debug_settings = serializer.validated_data["debug_settings"]
-    automatic_leave_settings = serializer.validated_data["automatic_leave_settings"]
-    teams_settings = serializer.validated_data["teams_settings"]
-    zoom_settings = serializer.validated_data["zoom_settings"]
     bot_image = serializer.validated_data["bot_image"]
     bot_chat_message = serializer.validated_data["bot_chat_message"]
-    metadata = serializer.validated_data["metadata"]
-    websocket_settings = serializer.validated_data["websocket_settings"]
-    join_at = serializer.validated_data["join_at"]
-    deduplication_key = serializer.validated_data["deduplication_key"]
     webhook_subscriptions = serializer.validated_data["webhooks"]
-    callback_settings = serializer.validated_data["callback_settings"]
-    external_media_storage_settings = serializer.validated_data["external_media_storage_settings"]
-    voice_agent_settings = serializer.validated_data["voice_agent_settings"]
-    initial_state = BotStates.SCHEDULED if join_at else BotStates.READY
 
-    error = validate_external_media_storage_settings(external_media_storage_settings, project)
+    error = validate_external_media_storage_settings(serializer.validated_data["external_media_storage_settings"], project)
     if error:
         return None, error
 
-    error = validate_bot_concurrency_limit(project)
+    reservation_ids, error = admit_bot(project, joins_immediately=not serializer.validated_data["join_at"])
     if error:
         return None, error
 
-    settings = {
-        "transcription_settings": transcription_settings,
-        "rtmp_settings": rtmp_settings,
-        "recording_settings": recording_settings,
-        "debug_settings": debug_settings,
-        "automatic_leave_settings": automatic_leave_settings,
-        "teams_settings": teams_settings,
-        "zoom_settings": zoom_settings,
-        "websocket_settings": websocket_settings,
-        "callback_settings": callback_settings,
-        "external_media_storage_settings": external_media_storage_settings,
-        "voice_agent_settings": voice_agent_settings,
-    }
-
     try:
-        with transaction.atomic():
-            bot = Bot.objects.create(
-                project=project,
-                meeting_url=meeting_url,
-                name=bot_name,
-                settings=settings,
-                metadata=metadata,
-                join_at=join_at,
-                deduplication_key=deduplication_key,
-                state=initial_state,
-                calendar_event=calendar_event,
-            )
-
-            Recording.objects.create(
-                bot=bot,
-                recording_type=bot.recording_type(),
-                transcription_type=TranscriptionTypes.NON_REALTIME,
-                transcription_provider=transcription_provider_from_bot_creation_data(serializer.validated_data),
-                is_default_recording=True,
-            )
+        with transaction.atomic(), active_bot_counter.holding(project.id, reservation_ids):
+            bot = build_bot(serializer.validated_data, project, calendar_event)
+            bot.save()
+
+            build_default_recording(bot, serializer.validated_data).save()
 
             if bot_image:
                 create_bot_media_request_for_image(bot, bot_image)
@@ -271,6 +307,178 @@ def create_bot(data: dict, source: BotCreationSource, project: Project) -> tuple
         return None, {"error": f"An error occurred while creating the bot. Error ID: {error_id}"}
 
 
+def create_bots(data_list: list, source: BotCreationSource, project: Project) -> list[tuple[Bot | None, dict | None]]:
+    """
+    Creates several bots at once. Each item is validated the way create_bot validates a single bot, with the checks against
+    the project's credentials, bots and calendar events done once for the whole batch. The valid bots are then created in
+    one transaction, with one insert for the bots, one for their recordings and one for their webhook subscriptions.
+
+    Args:
+        data_list: List of bot creation data dictionaries
+        source: Where the request to create the bots came from
+        project: The Project instance
+
+    Returns:
+        list: A (bot, error) tuple for each item, in order, where one is None
+    """
+    if project.organization.out_of_credits():
+        logger.error(f"Organization {project.organization.id} has insufficient credits. Please add credits in the Account -> Billing page.")
+        return [(None, {"error": "Organization has run out of credits. Please add more credits in the Account -> Billing page."})] * len(data_list)
+
+    calendar_event_ids = {data["calendar_event_id"] for data in data_list if isinstance(data, dict) and isinstance(data.get("calendar_event_id"), str)}
+    calendar_events = {calendar_event.object_id: calendar_event for calendar_event in CalendarEvent.objects.filter(object_id__in=calendar_event_ids, calendar__project=project)} if calendar_event_ids else {}
+
+    deduplication_keys = {data["deduplication_key"] for data in data_list if isinstance(data, dict) and isinstance(data.get("deduplication_key"), str)}
+    deduplication_keys_in_use = set(Bot.objects.filter(project=project, deduplication_key__in=deduplication_keys).exclude(state__in=BotStates.post_meeting_states()).values_list("deduplication_key", flat=True)) if deduplication_keys else set()
+
+    # The credentials checks only depend on the meeting type and on whether external media storage is used
+    meeting_url_errors = {}
+    external_media_storage_errors = {}
+
+    def validate(data):
+        # Returns a tuple of (validated_data, calendar_event, error)
+        if not isinstance(data, dict):
+            return None, None, {"error": "Each bot must be a JSON object."}
+
+        calendar_event, error = initialize_bot_creation_data_from_calendar_event(data, project, calendar_events)
+        if error:
+            return None, None, error
+
+        serializer = CreateBotSerializer(data=data)
+        if not serializer.is_valid():
+            return None, None, serializer.errors
+        validated_data = serializer.validated_data
+
+        meeting_type = meeting_type_from_url(validated_data["meeting_url"])
+        if meeting_type not in meeting_url_errors:
+            meeting_url_errors[meeting_type] = validate_meeting_url_and_credentials(validated_data["meeting_url"], project)
+        if meeting_url_errors[meeting_type]:
+            return None, None, meeting_url_errors[meeting_type]
+
+        uses_external_media_storage = bool(validated_data["external_media_storage_settings"])
+        if uses_external_media_storage not in external_media_storage_errors:
+            external_media_storage_errors[uses_external_media_storage] = validate_external_media_storage_settings(validated_data["external_media_storage_settings"], project)
+        if external_media_storage_errors[uses_external_media_storage]:
+            return None, None, external_media_storage_errors[uses_external_media_storage]
+
+        # Bot-level webhooks are checked against the other webhooks in the item, since the bot doesn't exist yet
+        webhook_urls = set()
+        for webhook_data in validated_data["webhooks"] or []:
+            url = webhook_data.get("url", "")
+            error = validate_webhook_settings(url, webhook_data.get("triggers", []), webhook_data.get("batch_max_size"), webhook_data.get("batch_max_delay_ms"))
+            if not error and url in webhook_urls:
+                error = "URL already subscribed for this bot"
+            if not error and len(webhook_urls) >= 2:
+                error = "You have reached the maximum number of webhooks for a single bot"
+            if error:
+                return None, None, {"error": error}
+            webhook_urls.add(url)
+
+        return validated_data, calendar_event, None
+
+    results = [None] * len(data_list)
+    # A tuple of (index, validated_data, calendar_event) for each item that passed validation
+    validated_items = []
+    for index, data in enumerate(data_list):
+        validated_data, calendar_event, error = validate(data)
+        if error:
+            results[index] = (None, error)
+        else:
+            validated_items.append((index, validated_data, calendar_event))
+
+    # Reserve a slot for each of the bots that would join right away in one go, as many as there's room for
+    concurrent_bots_limit = project.concurrent_bots_limit()
+    admission = active_bot_counter.admit(project, sum(1 for _, validated_data, _ in validated_items if not validated_data["join_at"]))
+    if admission is None:
+        # The counter is unavailable, so fall back to counting the project's active bots in the database
+        reservation_ids, active_bots_count = [], active_bot_counter.count_active_bots_in_database(project.id)
+    else:
+        reservation_ids, active_bots_count = admission
+
+    # A tuple of (index, validated_data, calendar_event) for each item that will be created
+    valid_items = []
+    for index, validated_data, calendar_event in validated_items:
+        # Bots that join right away count towards the limit of the ones after them, as they would if they were created one at a time
+        if active_bots_count >= concurrent_bots_limit:
+            results[index] = (None, bot_concurrency_limit_error(project, concurrent_bots_limit))
+            continue
+
+        deduplication_key = validated_data["deduplication_key"]
+        if deduplication_key is not None:
+            if deduplication_key in deduplication_keys_in_use:
+                results[index] = (None, {"error": "Deduplication key already in use. A bot in a non-terminal state with this deduplication key already exists. Please use a different deduplication key or wait for that bot to terminate."})
+                continue
+            deduplication_keys_in_use.add(deduplication_key)
+
+        if not validated_data["join_at"]:
+            active_bots_count += 1
+        valid_items.append((index, validated_data, calendar_event))
+
+    if not valid_items:
+        active_bot_counter.release(project.id, reservation_ids)
+        return results
+
+    try:
+        # The reservations that weren't needed, because of a deduplication key that's in use, are released with the others
+        with transaction.atomic(), active_bot_counter.holding(project.id, reservation_ids):
+            bots = []
+            for _, validated_data, calendar_event in valid_items:
+                bot = build_bot(validated_data, project, calendar_event)
+                bot.object_id = new_object_id(Bot)
+                bots.append(bot)
+            Bot.objects.bulk_create(bots)
+
+            recordings = []
+            webhook_subscriptions = []
+            for bot, (_, validated_data, _) in zip(bots, valid_items):
+                recording = build_default_recording(bot, validated_data)
+                recording.object_id = new_object_id(Recording)
+                recordings.append(recording)
+
+                for webhook_data in validated_data["webhooks"] or []:
+                    webhook_subscription = build_webhook_subscription(webhook_data.get("url", ""), webhook_data.get("triggers", []), project, bot, webhook_data.get("batch_max_size"), webhook_data.get("batch_max_delay_ms"))
+                    webhook_subscription.object_id = new_object_id(WebhookSubscription)
+                    webhook_subscriptions.append(webhook_subscription)
+            Recording.objects.bulk_create(recordings)
+
+            if webhook_subscriptions:
+                WebhookSecret.objects.get_or_create(project=project)
+                WebhookSubscription.objects.bulk_create(webhook_subscriptions)
+                # bulk_create doesn't send the signals that invalidate the cached webhook subscriptions
+                transaction.on_commit(lambda: invalidate_project(project.id))
+
+            for bot, (_, validated_data, _) in zip(bots, valid_items):
+                if validated_data["bot_image"]:
+                    create_bot_media_request_for_image(bot, validated_data["bot_image"])
+
+                if validated_data["bot_chat_message"]:
+                    create_bot_chat_message_request(bot, validated_data["bot_chat_message"])
+
+                if bot.state == BotStates.READY:
+                    # Try to transition the state from READY to JOINING
+                    BotEventManager.create_event(bot=bot, event_type=BotEventTypes.JOIN_REQUESTED, event_metadata={"source": source})
+
+    except Exception as e:
+        # The bots are created together, so an error creating one of them means none of them were created
+        if isinstance(e, ValidationError):
+            logger.error(f"ValidationError creating bots: {e}")
+            error = {"error": e.messages[0]}
+        elif isinstance(e, IntegrityError) and "unique_bot_deduplication_key" in str(e):
+            logger.error(f"IntegrityError due to unique_bot_deduplication_key constraint violation creating bots: {e}")
+            error = {"error": "Deduplication key already in use. A bot in a non-terminal state with this deduplication key already exists. Please use a different deduplication key or wait for that bot to terminate."}
+        else:
+            error_id = str(uuid.uuid4())
+            logger.error(f"Error creating bots (error_id={error_id}): {e}")
+            error = {"error": f"An error occurred while creating the bot. Error ID: {error_id}"}
+        for index, _, _ in valid_items:
+            results[index] = (None, error)
+        return results
+
+    for bot, (index, _, _) in zip(bots, valid_items):
+        results[index] = (bot, None)
+    return results
+
+
 def patch_bot(bot: Bot, data: dict) -> tuple[Bot | None, dict | None]:
     """
     Updates a scheduled bot with the provided data.
@@ -338,7 +546,31 @@ def delete_bot(bot: Bot) -> tuple[bool, dict | None]:
         return False, {"error": f"An error occurred while deleting the bot. Error ID: {error_id}"}
 
 
-def validate_webhook_data(url, triggers, project, bot=None):
+def validate_webhook_settings(url, triggers, batch_max_size=None, batch_max_delay_ms=None):
+    """
+    Validates the parts of a webhook that don't depend on the project's existing webhooks: the triggers, the URL and
+    the batching settings. Returns an error message if validation fails, None if it succeeds.
+    """
+
+    # Check if the trigger codes are valid
+    for trigger in triggers:
+        if WebhookTriggerTypes.api_code_to_trigger_type(trigger) is None:
+            return f"Invalid webhook trigger type: {trigger}"
+
+    # Check if URL is valid
+    if not url.startswith("https://") and not url.startswith("http://"):
+        return "webhook URL must start with http:// or https://"
+
+    # Check the batching settings
+    if batch_max_size is not None and not 1 <= batch_max_size <= 1000:
+        return "batch_max_size must be between 1 and 1000"
+    if batch_max_delay_ms is not None and not 0 <= batch_max_delay_ms <= 60000:
+        return "batch_max_delay_ms must be between 0 and 60000"
+
+    return None
+
+
+def validate_webhook_data(url, triggers, project, bot=None, batch_max_size=None, batch_max_delay_ms=None):
     """
     Validates webhook URL and triggers for both project-level and bot-level webhooks.
     Returns error message if validation fails.
@@ -348,19 +580,16 @@ def validate_webhook_data(url, triggers, project, bot=None):
         triggers: List of trigger types as strings
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
+        batch_max_size: Optional maximum number of events per batch, for webhooks that deliver in batches
+        batch_max_delay_ms: Optional maximum time an event is buffered before its batch is delivered
 
     Returns:
         error_message: None if validation succeeds, otherwise an error message
     """
 
-    # Check if the trigger codes are valid
-    for trigger in triggers:
-        if WebhookTriggerTypes.api_code_to_trigger_type(trigger) is None:
-            return f"Invalid webhook trigger type: {trigger}"
-
-    # Check if URL is valid
-    if not url.startswith("https://") and not url.startswith("http://"):
-        return "webhook URL must start with http:// or https://"
+    error = validate_webhook_settings(url, triggers, batch_max_size, batch_max_delay_ms)
+    if error:
+        return error
 
     # Check for duplicate URLs
     existing_webhook_query = project.webhook_subscriptions.filter(url=url)
@@ -389,7 +618,7 @@ def validate_webhook_data(url, triggers, project, bot=None):
     return None
 
 
-def create_webhook_subscription(url, triggers, project, bot=None):
+def create_webhook_subscription(url, triggers, project, bot=None, batch_max_size=None, batch_max_delay_ms=None):
     """
     Creates a single webhook subscription for a project or bot.
 
@@ -398,6 +627,8 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         triggers: List of trigger types (api codes as strings)
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
+        batch_max_size: Optional maximum number of events per batch. If set, events are delivered in batches
+        batch_max_delay_ms: Optional maximum time an event is buffered before its batch is delivered
 
     Returns:
         None
@@ -406,23 +637,33 @@ def create_webhook_subscription(url, triggers, project, bot=None):
         ValidationError: If the webhook data is invalid
     """
     # Validate the webhook data
-    error = validate_webhook_data(url, triggers, project, bot)
+    error = validate_webhook_data(url, triggers, project, bot, batch_max_size, batch_max_delay_ms)
     if error:
         raise ValidationError(error)
 
     # Get or create webhook secret for the project
     WebhookSecret.objects.get_or_create(project=project)
 
-    # Map the triggers to integers
+    # Create the webhook subscription
+    build_webhook_subscription(url, triggers, project, bot, batch_max_size, batch_max_delay_ms).save()
+
+
+def build_webhook_subscription(url, triggers, project, bot=None, batch_max_size=None, batch_max_delay_ms=None):
+    """
+    Returns an unsaved webhook subscription for validated webhook data, with the triggers mapped to integers.
+    """
     triggers_mapped_to_integers = [WebhookTriggerTypes.api_code_to_trigger_type(trigger) for trigger in triggers]
 
-    # Create the webhook subscription
-    WebhookSubscription.objects.create(
+    webhook_subscription = WebhookSubscription(
         project=project,
         bot=bot,
         url=url,
         triggers=triggers_mapped_to_integers,
+        batch_max_size=batch_max_size,
     )
+    if batch_max_delay_ms is not None:
+        webhook_subscription.batch_max_delay_ms = batch_max_delay_ms
+    return webhook_subscription
 
 
 def create_webhook_subscriptions(webhook_data_list, project, bot=None):
@@ -430,7 +671,7 @@ def create_webhook_subscriptions(webhook_data_list, project, bot=None):
     Creates multiple webhook subscriptions for a project or bot.
 
     Args:
-        webhook_data_list: List of webhook data dictionaries with 'url' and 'triggers'
+        webhook_data_list: List of webhook data dictionaries with 'url', 'triggers' and optionally the batching settings
         project: The Project instance
         bot: Optional Bot instance for bot-level webhooks
 
@@ -449,4 +690,4 @@ def create_webhook_subscriptions(webhook_data_list, project, bot=None):
         url = webhook_data.get("url", "")
         triggers = webhook_data.get("triggers", [])
 
-        create_webhook_subscription(url, triggers, project, bot)
+        create_webhook_subscription(url, triggers, project, bot, webhook_data.get("batch_max_size"), webhook_data.get("batch_max_delay_ms"))
@@ -1,9 +1,15 @@
+import base64
+import binascii
 import logging
 import os
 import time
 
 from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.db import connection, models
+from django.http import HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse
+from django.utils.cache import patch_cache_control
 from django.utils.dateparse import parse_datetime
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -15,11 +21,15 @@ from rest_framework import status
 from rest_framework.generics import GenericAPIView
 from rest_framework.pagination import CursorPagination
 from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
 from rest_framework.views import APIView
 
 from .authentication import ApiKeyAuthentication
-from .bots_api_utils import BotCreationSource, create_bot, create_bot_chat_message_request, create_bot_media_request_for_image, delete_bot, patch_bot, send_sync_command
-from .launch_bot_utils import launch_bot
+from .bot_event_stream import has_events_after, is_valid_event_id, stream_bot_events
+from .bot_response_cache import PostMeetingResponseCacheMixin
+from .bots_api_utils import BotCreationSource, create_bot, create_bot_chat_message_request, create_bot_media_request_for_image, create_bots, delete_bot, patch_bot, send_sync_command
+from .launch_bot_utils import launch_bot, launch_bots
 from .meeting_url_utils import meeting_type_from_url
 from .models import (
     AsyncTranscription,
@@ -41,13 +51,19 @@ from .models import (
     Recording,
     Utterance,
 )
+from .presigned_url_cache import seconds_until_url_changes
+from .renderers import NDJSONRenderer, ServerSentEventsRenderer, ndjson_line
 from .serializers import (
     AsyncTranscriptionSerializer,
     BotChatMessageRequestSerializer,
     BotImageSerializer,
     BotSerializer,
+    BotStatusListSerializer,
+    BotStatusSerializer,
     ChatMessageSerializer,
     CreateBotSerializer,
+    CreateBotsResultSerializer,
+    CreateBotsSerializer,
     ParticipantEventSerializer,
     ParticipantSerializer,
     PatchBotSerializer,
@@ -216,7 +232,7 @@ class BotListCreateView(GenericAPIView):
                 bots_query = bots_query.filter(state__in=state_values)
 
         # Apply ordering for cursor pagination
-        bots = bots_query.order_by("created_at")
+        bots = BotSerializer.prefetch_queryset(bots_query.order_by("created_at"))
 
         # Let the pagination class handle the rest
         page = self.paginate_queryset(bots)
@@ -255,6 +271,82 @@ class BotListCreateView(GenericAPIView):
         return Response(BotSerializer(bot).data, status=status.HTTP_201_CREATED)
 
 
+class BotBatchCreateView(APIView):
+    authentication_classes = [ApiKeyAuthentication]
+    throttle_classes = [ProjectPostThrottle]
+
+    @extend_schema(
+        operation_id="Create Bots",
+        summary="Create several bots",
+        description="Creates up to 500 bots in one request. Each bot is validated on its own, and the result for each one is returned in the order they were given. The bots that are valid are created together, and the ones without a join_at attempt to join their meeting.",
+        request=CreateBotsSerializer,
+        responses={
+            200: OpenApiResponse(
+                response=CreateBotsResultSerializer,
+                description="The result for each bot",
+            ),
+            400: OpenApiResponse(description="Invalid input"),
+        },
+        parameters=TokenHeaderParameter,
+        tags=["Bots"],
+    )
+    def post(self, request):
+        serializer = CreateBotsSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = create_bots(data_list=serializer.validated_data["bots"], source=BotCreationSource.API, project=request.auth.project)
+
+        # Scheduled bots aren't launched yet
+        launch_bots([bot for bot, _ in results if bot and bot.state == BotStates.JOINING])
+
+        # Fetched again so the created bots are serialized together, rather than with a few queries each
+        created_bots = {bot.id: bot for bot in BotSerializer.prefetch_queryset(Bot.objects.filter(id__in=[bot.id for bot, _ in results if bot]))}
+        return Response({"results": [{"status": status.HTTP_201_CREATED, "bot": BotSerializer(created_bots[bot.id]).data} if bot else {"status": status.HTTP_400_BAD_REQUEST, "error": error} for bot, error in results]})
+
+
+class BotStatusView(APIView):
+    authentication_classes = [ApiKeyAuthentication]
+
+    MAX_IDS = 500
+
+    @extend_schema(
+        operation_id="Get Bot Statuses",
+        summary="Get the state of several bots",
+        description=f"Returns the state, recording state and transcription state of up to {MAX_IDS} bots, for clients that poll many bots at once.",
+        responses={
+            200: OpenApiResponse(
+                response=BotStatusListSerializer,
+                description="The states of the bots",
+            ),
+            400: OpenApiResponse(description="Invalid input"),
+        },
+        parameters=[
+            *TokenHeaderParameter,
+            OpenApiParameter(
+                name="ids",
+                type={"type": "array", "items": {"type": "string"}},
+                location=OpenApiParameter.QUERY,
+                description=f"The IDs of the bots, either comma separated or with the parameter repeated. Up to {MAX_IDS} IDs can be given.",
+                required=True,
+                explode=False,
+                examples=[OpenApiExample("Bot IDs Example", value=["bot_xxxxxxxxxxx", "bot_yyyyyyyyyyy"])],
+            ),
+        ],
+        tags=["Bots"],
+    )
+    def get(self, request):
+        object_ids = list(dict.fromkeys(object_id for value in request.query_params.getlist("ids") for object_id in value.split(",") if object_id))
+        if not object_ids:
+            return Response({"error": "ids is required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(object_ids) > self.MAX_IDS:
+            return Response({"error": f"At most {self.MAX_IDS} ids can be given"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bots_by_object_id = {bot.object_id: bot for bot in BotStatusSerializer.annotate_default_recording_states(Bot.objects.filter(project=request.auth.project, object_id__in=object_ids).only("object_id", "state"))}
+        bots = [bots_by_object_id[object_id] for object_id in object_ids if object_id in bots_by_object_id]
+        return Response({"results": BotStatusSerializer(bots, many=True).data, "not_found": [object_id for object_id in object_ids if object_id not in bots_by_object_id]})
+
+
 class SpeechView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     throttle_classes = [ProjectPostThrottle]
@@ -661,12 +753,13 @@ class RecordingView(APIView):
     @extend_schema(
         operation_id="Get Bot Recording",
         summary="Get the recording for a bot",
-        description="Returns a short-lived S3 URL for the recording of the bot.",
+        description="Returns a short-lived S3 URL for the recording of the bot. The URL stays the same for a while, so the recording can be cached by browsers and CDNs. Pass redirect=true to be redirected to the recording instead, e.g. to stream it in a video player.",
         responses={
             200: OpenApiResponse(
                 response=RecordingSerializer,
                 description="Short-lived S3 URL for the recording",
-            )
+            ),
+            302: OpenApiResponse(description="Redirect to the short-lived S3 URL for the recording, when redirect is true"),
         },
         parameters=[
             *TokenHeaderParameter,
@@ -677,6 +770,13 @@ class RecordingView(APIView):
                 description="Bot ID",
                 examples=[OpenApiExample("Bot ID Example", value="bot_xxxxxxxxxxx")],
             ),
+            OpenApiParameter(
+                name="redirect",
+                type=bool,
+                location=OpenApiParameter.QUERY,
+                description="Whether to redirect to the recording instead of returning its URL. Defaults to false.",
+                required=False,
+            ),
         ],
         tags=["Bots"],
     )
@@ -698,24 +798,63 @@ class RecordingView(APIView):
                     status=status.HTTP_404_NOT_FOUND,
                 )
 
+            if request.query_params.get("redirect", "false").lower() == "true":
+                # The redirect can be cached for as long as the same URL is handed out
+                response = HttpResponseRedirect(recording.url)
+                patch_cache_control(response, private=True, max_age=seconds_until_url_changes())
+                return response
+
             return Response(RecordingSerializer(recording).data)
 
         except Bot.DoesNotExist:
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class TranscriptView(APIView):
+def encode_transcript_cursor(utterance):
+    return base64.urlsafe_b64encode(f"{utterance.timestamp_ms}:{utterance.id}".encode()).decode()
+
+
+def decode_transcript_cursor(cursor):
+    # Returns the timestamp_ms and id of the last utterance on the previous page, or None if the cursor is invalid
+    try:
+        timestamp_ms, utterance_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        return int(timestamp_ms), int(utterance_id)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+
+
+def transcript_entry(utterance, include_words):
+    return {
+        "speaker_name": utterance.participant.full_name,
+        "speaker_uuid": utterance.participant.uuid,
+        "speaker_user_uuid": utterance.participant.user_uuid,
+        "timestamp_ms": utterance.timestamp_ms,
+        "duration_ms": utterance.duration_ms,
+        "transcription": utterance.transcription if include_words else utterance.transcription_without_words,
+    }
+
+
+class TranscriptView(PostMeetingResponseCacheMixin, APIView):
     authentication_classes = [ApiKeyAuthentication]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, NDJSONRenderer]
+
+    MAX_LIMIT = 1000
+    STREAM_CHUNK_SIZE = 500
+
+    def get_resource_last_modified(self, bot):
+        return Utterance.objects.filter(recording__bot=bot, recording__is_default_recording=True).aggregate(last_modified=models.Max("updated_at"))["last_modified"]
 
     @extend_schema(
         operation_id="Get Bot Transcript",
         summary="Get the transcript for a bot",
-        description="If the meeting is still in progress, this returns the transcript so far.",
+        description="If the meeting is still in progress, this returns the transcript so far. Pass `limit` to page through long transcripts: the response is then an object with the page of utterances in `results`, and the URL of the next page in `next`, which is null on the last page. To stream the whole transcript instead, request `application/x-ndjson` in the Accept header or pass `format=ndjson`, and each utterance is sent as a line of JSON.",
         responses={
             200: OpenApiResponse(
                 response=TranscriptUtteranceSerializer(many=True),
                 description="List of transcribed utterances",
             ),
+            304: OpenApiResponse(description="Not modified, when the bot is in a post meeting state and the If-None-Match or If-Modified-Since header matches the ETag or Last-Modified header of the previous response"),
+            400: OpenApiResponse(description="Invalid parameters"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -735,12 +874,36 @@ class TranscriptView(APIView):
                 required=False,
                 examples=[OpenApiExample("DateTime Example", value="2024-01-18T12:34:56Z")],
             ),
+            OpenApiParameter(
+                name="limit",
+                type=int,
+                location=OpenApiParameter.QUERY,
+                description=f"Return at most this many utterances, and the URL of the next page. At most {MAX_LIMIT}. Without it, the whole transcript is returned as a list.",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="cursor",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Cursor for pagination, taken from the next URL of the previous page",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="include_words",
+                type=bool,
+                location=OpenApiParameter.QUERY,
+                description="Whether to include the word level timestamps in the transcription of each utterance. Defaults to true, except when streaming NDJSON.",
+                required=False,
+            ),
         ],
         tags=["Bots"],
     )
     def get(self, request, object_id):
         try:
             bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+            cached_response = self.cached_response(request, bot)
+            if cached_response is not None:
+                return cached_response
 
             recording = Recording.objects.filter(bot=bot, is_default_recording=True).first()
             if not recording:
@@ -757,8 +920,8 @@ class TranscriptView(APIView):
                 if async_transcription.state != AsyncTranscriptionStates.COMPLETE:
                     return Response({"error": f"Async transcription {async_transcription.object_id} is not complete. It is in state {AsyncTranscriptionStates.state_to_api_code(async_transcription.state)}"}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Get all utterances with transcriptions, sorted by timeline
-            utterances_query = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False, async_transcription=async_transcription)
+            # Get all utterances with non-empty transcriptions
+            utterances_query = Utterance.objects.select_related("participant").filter(recording=recording, transcription__isnull=False, async_transcription=async_transcription, transcription__has_key="transcript").exclude(transcription__transcript="").exclude(transcription__transcript=None)
 
             # Apply updated_after filter if provided
             updated_after = request.query_params.get("updated_after")
@@ -775,25 +938,47 @@ class TranscriptView(APIView):
                     )
                 utterances_query = utterances_query.filter(updated_at__gt=updated_after_datetime)
 
-            # Apply ordering
-            utterances = utterances_query.order_by("timestamp_ms")
-
-            # Format the response, skipping empty transcriptions
-            transcript_data = [
-                {
-                    "speaker_name": utterance.participant.full_name,
-                    "speaker_uuid": utterance.participant.uuid,
-                    "speaker_user_uuid": utterance.participant.user_uuid,
-                    "timestamp_ms": utterance.timestamp_ms,
-                    "duration_ms": utterance.duration_ms,
-                    "transcription": utterance.transcription,
-                }
-                for utterance in utterances
-                if utterance.transcription.get("transcript", "")
-            ]
-
-            serializer = TranscriptUtteranceSerializer(transcript_data, many=True)
-            return Response(serializer.data)
+            streaming = request.accepted_renderer.format == NDJSONRenderer.format
+            include_words = request.query_params.get("include_words", "false" if streaming else "true").lower() == "true"
+            if not include_words:
+                # Leave the word arrays, which make up most of a transcription, in the database
+                utterances_query = utterances_query.defer("transcription").annotate(transcription_without_words=models.Func(models.F("transcription"), models.Value("words", output_field=models.TextField()), arg_joiner=" - ", template="(%(expressions)s)", output_field=models.JSONField()))
+
+            # Apply ordering, with the id to break ties so that pages don't overlap
+            utterances = utterances_query.order_by("timestamp_ms", "id")
+
+            if streaming:
+                return StreamingHttpResponse((ndjson_line(transcript_entry(utterance, include_words)) for utterance in utterances.iterator(chunk_size=self.STREAM_CHUNK_SIZE)), content_type=NDJSONRenderer.media_type)
+
+            limit = request.query_params.get("limit")
+            cursor = request.query_params.get("cursor")
+            if limit is None and cursor is None:
+                serializer = TranscriptUtteranceSerializer([transcript_entry(utterance, include_words) for utterance in utterances], many=True)
+                return Response(serializer.data)
+
+            try:
+                limit = int(limit) if limit is not None else self.MAX_LIMIT
+            except ValueError:
+                limit = 0
+            if not 1 <= limit <= self.MAX_LIMIT:
+                return Response({"error": f"Invalid limit. It must be a number between 1 and {self.MAX_LIMIT}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            if cursor is not None:
+                position = decode_transcript_cursor(cursor)
+                if position is None:
+                    return Response({"error": "Invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+                timestamp_ms, utterance_id = position
+                utterances = utterances.filter(models.Q(timestamp_ms__gt=timestamp_ms) | models.Q(timestamp_ms=timestamp_ms, id__gt=utterance_id))
+
+            # Fetch one more than the limit to find out if there is a next page
+            page = list(utterances[: limit + 1])
+            next_url = None
+            if len(page) > limit:
+                page = page[:limit]
+                next_url = replace_query_param(request.build_absolute_uri(), "cursor", encode_transcript_cursor(page[-1]))
+
+            serializer = TranscriptUtteranceSerializer([transcript_entry(utterance, include_words) for utterance in page], many=True)
+            return Response({"next": next_url, "results": serializer.data})
 
         except Bot.DoesNotExist:
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -837,9 +1022,13 @@ class TranscriptView(APIView):
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class BotDetailView(APIView):
+class BotDetailView(PostMeetingResponseCacheMixin, APIView):
     authentication_classes = [ApiKeyAuthentication]
 
+    def get_resource_last_modified(self, bot):
+        # The details include the bot's events and the state of its default recording
+        return max(filter(None, [bot.bot_events.aggregate(last_modified=models.Max("created_at"))["last_modified"], bot.recordings.aggregate(last_modified=models.Max("updated_at"))["last_modified"]]), default=None)
+
     @extend_schema(
         operation_id="Get Bot",
         summary="Get the details for a bot",
@@ -849,6 +1038,7 @@ class BotDetailView(APIView):
                 description="Bot details",
                 examples=[NewlyCreatedBotExample],
             ),
+            304: OpenApiResponse(description="Not modified, when the bot is in a post meeting state and the If-None-Match or If-Modified-Since header matches the ETag or Last-Modified header of the previous response"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -866,6 +1056,9 @@ class BotDetailView(APIView):
     def get(self, request, object_id):
         try:
             bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+            cached_response = self.cached_response(request, bot)
+            if cached_response is not None:
+                return cached_response
             return Response(BotSerializer(bot).data)
 
         except Bot.DoesNotExist:
@@ -949,11 +1142,14 @@ class ChatMessageCursorPagination(CursorPagination):
     page_size = 25
 
 
-class ChatMessagesView(GenericAPIView):
+class ChatMessagesView(PostMeetingResponseCacheMixin, GenericAPIView):
     authentication_classes = [ApiKeyAuthentication]
     pagination_class = ChatMessageCursorPagination
     serializer_class = ChatMessageSerializer
 
+    def get_resource_last_modified(self, bot):
+        return bot.chat_messages.aggregate(last_modified=models.Max("updated_at"))["last_modified"]
+
     @extend_schema(
         operation_id="Get Chat Messages",
         summary="Get chat messages sent in the meeting",
@@ -963,6 +1159,7 @@ class ChatMessagesView(GenericAPIView):
                 response=ChatMessageSerializer(many=True),
                 description="List of chat messages",
             ),
+            304: OpenApiResponse(description="Not modified, when the bot is in a post meeting state and the If-None-Match or If-Modified-Since header matches the ETag or Last-Modified header of the previous response"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -996,6 +1193,9 @@ class ChatMessagesView(GenericAPIView):
         try:
             # Get the bot and verify it belongs to the project
             bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+            cached_response = self.cached_response(request, bot)
+            if cached_response is not None:
+                return cached_response
 
             # Get optional updated_after parameter
             updated_after = request.query_params.get("updated_after")
@@ -1033,6 +1233,79 @@ class ChatMessagesView(GenericAPIView):
             return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
+class BotEventStreamView(APIView):
+    authentication_classes = [ApiKeyAuthentication]
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ServerSentEventsRenderer]
+
+    @extend_schema(
+        operation_id="Stream Bot Events",
+        summary="Stream the events of a bot",
+        description="Streams the events of a bot as server-sent events while it is in the meeting, so that you don't have to poll the transcript, chat messages and participant events endpoints. Each event is named after the webhook trigger it corresponds to (`bot.state_change`, `transcript.update`, `chat_messages.update` or `participant_events.join_leave`) and its data is the same as that webhook's data. The stream ends after the bot's state changes to `ended`, `fatal_error` or `data_deleted`, and connecting once the bot has ended and every event has been received returns 204 No Content, which tells `EventSource` clients to stop reconnecting. The stream is authenticated with the `Authorization` header, so it's meant for server-side clients rather than browsers' `EventSource`. To resume after a disconnection, pass the id of the last event received in the `Last-Event-ID` header or the `last_event_id` query parameter, and the events sent since then are sent first. Only the most recent events of a bot are kept for resuming.",
+        responses={
+            200: OpenApiResponse(description="Stream of server-sent events"),
+            204: OpenApiResponse(description="The bot has ended and there are no events after Last-Event-ID"),
+            400: OpenApiResponse(description="Invalid Last-Event-ID"),
+            404: OpenApiResponse(description="Bot not found"),
+        },
+        parameters=[
+            *TokenHeaderParameter,
+            OpenApiParameter(
+                name="object_id",
+                type=str,
+                location=OpenApiParameter.PATH,
+                description="Bot ID",
+                examples=[OpenApiExample("Bot ID Example", value="bot_xxxxxxxxxxx")],
+            ),
+            OpenApiParameter(
+                name="Last-Event-ID",
+                type=str,
+                location=OpenApiParameter.HEADER,
+                description="Resume the stream after the event with this id",
+                required=False,
+            ),
+            OpenApiParameter(
+                name="last_event_id",
+                type=str,
+                location=OpenApiParameter.QUERY,
+                description="Same as the Last-Event-ID header",
+                required=False,
+            ),
+        ],
+        tags=["Bots"],
+    )
+    def get(self, request, object_id):
+        try:
+            bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+        except Bot.DoesNotExist:
+            return Response({"error": "Bot not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        last_event_id = request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id")
+        if last_event_id and not is_valid_event_id(last_event_id):
+            return Response({"error": "Invalid Last-Event-ID"}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Under WSGI the stream would be read to the end before anything is sent, and it only ends with the meeting
+        if not isinstance(request._request, ASGIRequest):
+            return Response({"error": "Event streams are only served by the ASGI application"}, status=status.HTTP_400_BAD_REQUEST)
+
+        bot_has_ended = BotEventManager.is_post_meeting_state(bot.state)
+        # EventSource reconnects whenever a stream closes, including after the event for the bot ending. Once the client
+        # has every event of an ended bot, 204 is the only response that makes it stop
+        if bot_has_ended and not (last_event_id and has_events_after(bot.object_id, last_event_id)):
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        # The response streams for as long as the bot is in the meeting, so don't hold on to a database connection meanwhile
+        connection.close()
+
+        response = StreamingHttpResponse(
+            stream_bot_events(bot.object_id, last_event_id=last_event_id, bot_has_ended=bot_has_ended),
+            content_type=ServerSentEventsRenderer.media_type,
+        )
+        response["Cache-Control"] = "no-cache"
+        # Stop nginx from buffering the events
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
 class SendChatMessageView(APIView):
     authentication_classes = [ApiKeyAuthentication]
     throttle_classes = [ProjectPostThrottle]
@@ -1277,11 +1550,15 @@ class ParticipantEventCursorPagination(CursorPagination):
     page_size = 25
 
 
-class ParticipantEventsView(GenericAPIView):
+class ParticipantEventsView(PostMeetingResponseCacheMixin, GenericAPIView):
     authentication_classes = [ApiKeyAuthentication]
     pagination_class = ParticipantEventCursorPagination
     serializer_class = ParticipantEventSerializer
 
+    def get_resource_last_modified(self, bot):
+        # Participant events are never updated, but the participants they include are
+        return max(filter(None, [ParticipantEvent.objects.filter(participant__bot=bot).aggregate(last_modified=models.Max("created_at"))["last_modified"], bot.participants.aggregate(last_modified=models.Max("updated_at"))["last_modified"]]), default=None)
+
     @extend_schema(
         operation_id="Get Participant Events",
         summary="Get participant events for a bot",
@@ -1291,6 +1568,7 @@ class ParticipantEventsView(GenericAPIView):
                 response=ParticipantEventSerializer(many=True),
                 description="List of participant events",
             ),
+            304: OpenApiResponse(description="Not modified, when the bot is in a post meeting state and the If-None-Match or If-Modified-Since header matches the ETag or Last-Modified header of the previous response"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -1332,6 +1610,9 @@ class ParticipantEventsView(GenericAPIView):
         try:
             # Get the bot and verify it belongs to the project
             bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+            cached_response = self.cached_response(request, bot)
+            if cached_response is not None:
+                return cached_response
 
             # Get optional after and before parameters
             after = request.query_params.get("after")
@@ -1389,11 +1670,14 @@ class ParticipantCursorPagination(CursorPagination):
     page_size = 25
 
 
-class ParticipantsView(GenericAPIView):
+class ParticipantsView(PostMeetingResponseCacheMixin, GenericAPIView):
     authentication_classes = [ApiKeyAuthentication]
     pagination_class = ParticipantCursorPagination
     serializer_class = ParticipantSerializer
 
+    def get_resource_last_modified(self, bot):
+        return bot.participants.aggregate(last_modified=models.Max("updated_at"))["last_modified"]
+
     @extend_schema(
         operation_id="Get Participants",
         summary="Get participants for a bot",
@@ -1403,6 +1687,7 @@ class ParticipantsView(GenericAPIView):
                 response=ParticipantSerializer(many=True),
                 description="List of participants",
             ),
+            304: OpenApiResponse(description="Not modified, when the bot is in a post meeting state and the If-None-Match or If-Modified-Since header matches the ETag or Last-Modified header of the previous response"),
             404: OpenApiResponse(description="Bot not found"),
         },
         parameters=[
@@ -1443,6 +1728,9 @@ class ParticipantsView(GenericAPIView):
         try:
             # Get the bot and verify it belongs to the project
             bot = Bot.objects.get(object_id=object_id, project=request.auth.project)
+            cached_response = self.cached_response(request, bot)
+            if cached_response is not None:
+                return cached_response
 
             # Query participants for this bot. Do not show the participant for the bot itself
             participants_query = Participant.objects.filter(bot=bot, is_the_bot=False)
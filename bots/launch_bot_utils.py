@@ -2,6 +2,8 @@ import json
 import logging
 import os
 
+from django.db import transaction
+
 from bots.models import BotEventManager, BotEventSubTypes, BotEventTypes
 
 logger = logging.getLogger(__name__)
@@ -34,3 +36,21 @@ def launch_bot(bot):
         from .tasks.run_bot_task import run_bot
 
         run_bot.delay(bot.id)
+
+
+def launch_bots(bots):
+    """
+    Launches several bots. With Celery, their tasks are enqueued in one transaction, so they're published together over
+    one broker connection when it commits.
+    """
+    if os.getenv("LAUNCH_BOT_METHOD") == "kubernetes":
+        for bot in bots:
+            launch_bot(bot)
+        return
+
+    from .task_outbox import enqueue_task
+    from .tasks.run_bot_task import run_bot
+
+    with transaction.atomic():
+        for bot in bots:
+            enqueue_task(run_bot, [bot.id])
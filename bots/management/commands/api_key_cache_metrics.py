@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bots.api_key_cache import get_total_metrics
+
+
+class Command(BaseCommand):
+    help = "Prints the hit rate of the API key cache, across every process serving the API"
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(get_total_metrics()))
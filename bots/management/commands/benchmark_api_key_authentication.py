@@ -0,0 +1,63 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Organization
+from bots.api_key_cache import _listener, get_metrics, invalidate_locally
+from bots.models import ApiKey, Bot, BotStates, Project
+
+
+class Command(BaseCommand):
+    help = "Sends authenticated requests for a bot to the API in this process, the way a client polling the bot's state would, and compares their throughput with the API key cache cold and warm. The project is deleted afterwards. Needs Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000, help="Number of requests sent with the cache cold and with it warm")
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.create(name="API key authentication benchmark")
+        project = Project.objects.create(name="API key authentication benchmark", organization=organization)
+        _, api_key = ApiKey.create(project=project, name="API key authentication benchmark")
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        client = Client(HTTP_HOST="localhost")
+
+        def get_bot():
+            response = client.get(f"/api/v1/bots/{bot.object_id}", HTTP_AUTHORIZATION=f"Token {api_key}")
+            if response.status_code != 200:
+                raise Exception(f"Request failed with status {response.status_code}")
+
+        try:
+            # Loads the URLs and views, and subscribes to invalidations
+            get_bot()
+            deadline = time.monotonic() + 10
+            while not _listener.subscribed.is_set():
+                if time.monotonic() > deadline:
+                    raise Exception("Could not subscribe to API key invalidations")
+                time.sleep(0.1)
+
+            # Without the cache, every request looks the key up in the database
+            result = {"requests": options["requests"]}
+            for name, before_request in [("cold", invalidate_locally), ("warm", lambda: None)]:
+                before_request()
+                with CaptureQueriesContext(connection) as queries:
+                    get_bot()
+                result[f"{name}_queries_per_request"] = len(queries)
+
+                hits_before = get_metrics()["hits"]
+                elapsed = 0.0
+                for _ in range(options["requests"]):
+                    before_request()
+                    started_at = time.perf_counter()
+                    get_bot()
+                    elapsed += time.perf_counter() - started_at
+                result[f"{name}_requests_per_second"] = round(options["requests"] / elapsed, 1)
+                result[f"{name}_cache_hits"] = get_metrics()["hits"] - hits_before
+            result["speedup"] = round(result["warm_requests_per_second"] / result["cold_requests_per_second"], 2)
+            self.stdout.write(json.dumps(result))
+        finally:
+            bot.delete()
+            project.delete()
+            organization.delete()
@@ -0,0 +1,57 @@
+import json
+import statistics
+import time
+
+import redis
+from django.core.management.base import BaseCommand
+
+from accounts.models import Organization
+from bots.bots_api_utils import send_sync_command
+from bots.models import Bot, BotStates, Project
+from bots.redis_client import get_redis_client, redis_url
+
+
+class Command(BaseCommand):
+    help = "Publishes commands to a bot the way the API does, and compares their latency when each one opens a new Redis connection and when they share the pooled client. The project is deleted afterwards. Needs Redis. The gap is larger against a remote Redis over TLS than a local one."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--commands", type=int, default=2000, help="Number of commands published in each mode")
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.create(name="Bot commands benchmark")
+        project = Project.objects.create(name="Bot commands benchmark", organization=organization)
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+
+        def send_with_new_connection(bot, command):
+            # How commands were published before the client was shared
+            redis_client = redis.from_url(redis_url())
+            try:
+                redis_client.publish(f"bot_{bot.id}", json.dumps({"command": command}))
+            finally:
+                redis_client.close()
+
+        def measure(send):
+            latencies = []
+            for _ in range(options["commands"]):
+                started_at = time.perf_counter()
+                send(bot, "sync_media_requests")
+                latencies.append((time.perf_counter() - started_at) * 1000)
+            latencies.sort()
+            return {
+                "mean_ms": round(statistics.mean(latencies), 3),
+                "p50_ms": round(latencies[len(latencies) // 2], 3),
+                "p95_ms": round(latencies[int(len(latencies) * 0.95)], 3),
+            }
+
+        try:
+            # Opens the pooled connection
+            get_redis_client().ping()
+            result = {"commands": options["commands"]}
+            result["new_connection_per_command"] = measure(send_with_new_connection)
+            result["pooled_per_command"] = measure(send_sync_command)
+            result["pooled_speedup"] = round(result["new_connection_per_command"]["mean_ms"] / result["pooled_per_command"]["mean_ms"], 2)
+            self.stdout.write(json.dumps(result))
+        finally:
+            bot.delete()
+            project.delete()
+            organization.delete()
@@ -0,0 +1,157 @@
+import asyncio
+import json
+import resource
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+
+from accounts.models import Organization
+from bots.bot_event_stream import append_event, get_hub, stream_key
+from bots.models import ApiKey, Bot, BotStates, Project, WebhookTriggerTypes
+from bots.redis_client import get_redis_client
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+class Subscriber:
+    """
+    A client of the event stream, connected to the ASGI application in this process rather than over a socket.
+    """
+
+    def __init__(self, application, path, api_key):
+        self.application = application
+        self.path = path
+        self.api_key = api_key
+        self.disconnected = asyncio.Event()
+        self.request_sent = False
+        self.status = None
+        self.latencies = []
+        self.task = None
+
+    def start(self):
+        self.task = asyncio.create_task(self.application(self.scope(), self.receive, self.send))
+
+    def scope(self):
+        return {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": self.path,
+            "raw_path": self.path.encode(),
+            "query_string": b"",
+            "root_path": "",
+            "headers": [(b"host", b"localhost"), (b"accept", b"text/event-stream"), (b"authorization", f"Token {self.api_key}".encode())],
+            "client": ("127.0.0.1", 0),
+            "server": ("localhost", 80),
+        }
+
+    async def receive(self):
+        if not self.request_sent:
+            self.request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await self.disconnected.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(self, message):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            return
+        for line in message.get("body", b"").split(b"\n"):
+            if line.startswith(b"data: "):
+                self.latencies.append(time.time() - json.loads(line[len(b"data: ") :])["published_at"])
+
+    async def disconnect(self):
+        self.disconnected.set()
+        await self.task
+
+
+class Command(BaseCommand):
+    help = "Opens many concurrent connections to the event stream of a few bots through the ASGI application, publishes events to the bots and reports how long the events took to reach the subscribers and how much memory each connection takes. The project is deleted afterwards. Needs Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--subscribers", type=int, default=5000, help="Number of concurrent connections")
+        parser.add_argument("--bots", type=int, default=10, help="Number of bots the connections are spread over")
+        parser.add_argument("--events", type=int, default=20, help="Number of events published to each bot")
+        parser.add_argument("--interval-ms", type=int, default=100, help="Time between events")
+        parser.add_argument("--connect-batch-size", type=int, default=50, help="Number of connections opened at once. Each one opens a database connection to authenticate, so this has to stay under Postgres' max_connections")
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.create(name="Bot event stream benchmark")
+        project = Project.objects.create(name="Bot event stream benchmark", organization=organization)
+        _, api_key = ApiKey.create(project=project, name="Bot event stream benchmark")
+        bots = [Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING) for _ in range(options["bots"])]
+        try:
+            result = asyncio.run(self.run(api_key, bots, options))
+            self.stdout.write(json.dumps(result))
+        finally:
+            get_redis_client().delete(*[stream_key(bot.object_id) for bot in bots])
+            Bot.objects.filter(project=project).delete()
+            project.delete()
+            organization.delete()
+
+    async def run(self, api_key, bots, options):
+        application = get_asgi_application()
+        hub = get_hub()
+        subscribers = [Subscriber(application, f"/api/v1/bots/{bots[index % len(bots)].object_id}/events/stream", api_key) for index in range(options["subscribers"])]
+
+        # The first connection loads the URLs and views, so the memory is measured from after it
+        await self.connect(hub, subscribers[:1])
+        max_rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        started_at = time.perf_counter()
+        for batch_start in range(1, len(subscribers), options["connect_batch_size"]):
+            await self.connect(hub, subscribers[batch_start : batch_start + options["connect_batch_size"]])
+        connect_seconds = time.perf_counter() - started_at
+        max_rss_connected = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        chat_messages_update = WebhookTriggerTypes.trigger_type_to_api_code(WebhookTriggerTypes.CHAT_MESSAGES_UPDATE)
+        for event_index in range(options["events"]):
+            for bot in bots:
+                data = json.dumps({"text": f"message {event_index}", "published_at": time.time()}).encode()
+                await sync_to_async(append_event)(bot.object_id, chat_messages_update, data)
+            await asyncio.sleep(options["interval_ms"] / 1000)
+
+        # Give the last events time to arrive
+        expected_count = options["events"] * len(subscribers)
+        deadline = time.perf_counter() + 10
+        while sum(len(subscriber.latencies) for subscriber in subscribers) < expected_count and time.perf_counter() < deadline:
+            await asyncio.sleep(0.1)
+        max_rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+        await asyncio.gather(*[subscriber.disconnect() for subscriber in subscribers])
+        await hub.pubsub.aclose()
+        await hub.redis_client.aclose()
+
+        latencies = [latency for subscriber in subscribers for latency in subscriber.latencies]
+        return {
+            "subscribers": len(subscribers),
+            "bots": len(bots),
+            "connect_seconds": round(connect_seconds, 2),
+            # ru_maxrss is in kilobytes on Linux
+            "memory_per_connection_kb": round((max_rss_connected - max_rss_before) / max(1, len(subscribers) - 1), 2),
+            "memory_growth_while_streaming_kb": max_rss_after - max_rss_connected,
+            "events_expected": expected_count,
+            "events_received": len(latencies),
+            "latency_p50_ms": round(percentile(latencies, 0.5) * 1000, 2) if latencies else None,
+            "latency_p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+            "latency_max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+        }
+
+    async def connect(self, hub, subscribers):
+        expected_listener_count = sum(len(listeners) for listeners in hub.listeners.values()) + len(subscribers)
+        for subscriber in subscribers:
+            subscriber.start()
+        # Every connection has a listener once its response has started streaming
+        while sum(len(listeners) for listeners in hub.listeners.values()) < expected_listener_count:
+            closed_subscriber = next((subscriber for subscriber in subscribers if subscriber.task.done()), None)
+            if closed_subscriber:
+                raise Exception(f"A connection was closed before any event was sent, with status {closed_subscriber.status}")
+            await asyncio.sleep(0.1)
@@ -0,0 +1,73 @@
+import json
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Organization
+from bots.models import Bot, BotEvent, BotEventTypes, BotStates, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionTypes
+from bots.serializers import BotSerializer
+
+EVENTS_PER_BOT = [
+    (BotEventTypes.JOIN_REQUESTED, BotStates.READY, BotStates.JOINING),
+    (BotEventTypes.BOT_JOINED_MEETING, BotStates.JOINING, BotStates.JOINED_NOT_RECORDING),
+    (BotEventTypes.BOT_RECORDING_PERMISSION_GRANTED, BotStates.JOINED_NOT_RECORDING, BotStates.JOINED_RECORDING),
+    (BotEventTypes.MEETING_ENDED, BotStates.JOINED_RECORDING, BotStates.POST_PROCESSING),
+    (BotEventTypes.POST_PROCESSING_COMPLETED, BotStates.POST_PROCESSING, BotStates.ENDED),
+]
+
+
+def time_per_call(function, iterations):
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started_at) / iterations
+
+
+class Command(BaseCommand):
+    help = "Creates a project with many ended bots, and compares the time and number of queries it takes to serialize a page of the bot list with and without BotSerializer.prefetch_queryset. The project is deleted afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bots", type=int, default=10000, help="Number of bots in the project")
+        parser.add_argument("--page-sizes", type=int, nargs="+", default=[25, 100], help="Number of bots per page")
+        parser.add_argument("--iterations", type=int, default=20, help="Number of times to serialize each page")
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.create(name="Bot list benchmark")
+        project = Project.objects.create(name="Bot list benchmark", organization=organization)
+        try:
+            self.create_bots(project, options["bots"])
+            results = []
+            for page_size in options["page_sizes"]:
+                # A page in the middle of the list, the way cursor pagination fetches it
+                middle_bot = Bot.objects.filter(project=project).order_by("created_at")[options["bots"] // 2]
+                bots = Bot.objects.filter(project=project, created_at__gte=middle_bot.created_at).order_by("created_at")
+
+                def serialize_page(queryset):
+                    return BotSerializer(list(queryset[:page_size]), many=True).data
+
+                result = {"bots": options["bots"], "page_size": page_size}
+                for name, queryset in [("previous", bots), ("current", BotSerializer.prefetch_queryset(bots))]:
+                    with CaptureQueriesContext(connection) as queries:
+                        serialize_page(queryset)
+                    result[f"{name}_queries"] = len(queries)
+                    result[f"{name}_ms"] = round(time_per_call(lambda: serialize_page(queryset), options["iterations"]) * 1000, 2)
+                result["speedup"] = round(result["previous_ms"] / result["current_ms"], 2)
+                results.append(result)
+            self.stdout.write(json.dumps(results))
+        finally:
+            with transaction.atomic():
+                BotEvent.objects.filter(bot__project=project).delete()
+                Recording.objects.filter(bot__project=project).delete()
+                Bot.objects.filter(project=project).delete()
+                project.delete()
+                organization.delete()
+
+    def create_bots(self, project, count):
+        batch_size = 1000
+        for batch_start in range(0, count, batch_size):
+            bots = Bot.objects.bulk_create([Bot(project=project, object_id=f"bot_{uuid.uuid4().hex[:16]}", meeting_url="https://zoom.us/j/123", state=BotStates.ENDED) for _ in range(batch_start, min(count, batch_start + batch_size))])
+            BotEvent.objects.bulk_create([BotEvent(bot=bot, event_type=event_type, old_state=old_state, new_state=new_state) for bot in bots for event_type, old_state, new_state in EVENTS_PER_BOT])
+            Recording.objects.bulk_create([Recording(bot=bot, object_id=f"rec_{uuid.uuid4().hex[:16]}", recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.COMPLETE, transcription_state=RecordingTranscriptionStates.COMPLETE) for bot in bots])
@@ -0,0 +1,68 @@
+import io
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from bots.parsers import ORJSONParser
+from bots.renderers import ORJSONRenderer
+from bots.serializers import TranscriptUtteranceSerializer
+
+
+def build_transcript(hours, speakers):
+    """Transcript endpoint response data for a meeting of the given length, with an utterance every 5 seconds and word level timestamps."""
+    utterances = []
+    for index in range(int(hours * 3600 / 5)):
+        timestamp_ms = index * 5000
+        words = [{"word": f"word{word_index}", "start": round(word_index * 0.37, 2), "end": round(word_index * 0.37 + 0.31, 2), "confidence": 0.9812} for word_index in range(12)]
+        utterances.append(
+            {
+                "speaker_name": f"Speaker {index % speakers}",
+                "speaker_uuid": f"{16778240 + index % speakers}",
+                "speaker_user_uuid": None,
+                "timestamp_ms": 1733114771000 + timestamp_ms,
+                "duration_ms": 4620,
+                "transcription": {"transcript": " ".join(word["word"] for word in words), "words": words},
+            }
+        )
+    return TranscriptUtteranceSerializer(utterances, many=True).data
+
+
+def time_per_call(function, iterations):
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started_at) / iterations
+
+
+class Command(BaseCommand):
+    help = "Compares the time to render a long meeting's transcript and parse it back with DRF's JSONRenderer and JSONParser against ORJSONRenderer and ORJSONParser, and checks they produce the same bytes and data"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--hours", type=float, default=3, help="Length of the meeting the transcript is for")
+        parser.add_argument("--speakers", type=int, default=6, help="Number of people speaking in the meeting")
+        parser.add_argument("--iterations", type=int, default=20, help="Number of times the transcript is rendered and parsed by each")
+
+    def handle(self, *args, **options):
+        data = build_transcript(options["hours"], options["speakers"])
+        body = JSONRenderer().render(data, "application/json")
+        if ORJSONRenderer().render(data, "application/json") != body:
+            raise Exception("ORJSONRenderer rendered different bytes than JSONRenderer")
+        if ORJSONParser().parse(io.BytesIO(body)) != JSONParser().parse(io.BytesIO(body)):
+            raise Exception("ORJSONParser parsed different data than JSONParser")
+
+        iterations = options["iterations"]
+        result = {"utterances": len(data), "response_bytes": len(body), "iterations": iterations}
+        for name, json_function, orjson_function in [
+            ("render", lambda: JSONRenderer().render(data, "application/json"), lambda: ORJSONRenderer().render(data, "application/json")),
+            ("parse", lambda: JSONParser().parse(io.BytesIO(body)), lambda: ORJSONParser().parse(io.BytesIO(body))),
+        ]:
+            json_seconds = time_per_call(json_function, iterations)
+            orjson_seconds = time_per_call(orjson_function, iterations)
+            result[f"{name}_json_ms"] = round(json_seconds * 1000, 3)
+            result[f"{name}_orjson_ms"] = round(orjson_seconds * 1000, 3)
+            result[f"{name}_speedup"] = round(json_seconds / orjson_seconds, 2)
+
+        self.stdout.write(json.dumps(result))
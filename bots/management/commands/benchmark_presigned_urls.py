@@ -0,0 +1,74 @@
+import json
+import time
+import uuid
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import Client
+from django.urls import reverse
+
+from accounts.models import Organization, User, UserRole
+from bots.models import Bot, BotDebugScreenshot, BotEvent, BotEventTypes, BotStates, Project
+from bots.presigned_url_cache import MIN_VALIDITY_SECONDS, clear_local_cache, sign_url
+
+
+def sign_every_time(file):
+    # How URLs were handed out before they were cached
+    if not file.name:
+        return None
+    return sign_url(file.storage, file.name, MIN_VALIDITY_SECONDS)
+
+
+class Command(BaseCommand):
+    help = "Creates a bot with many debug screenshots, and compares how long its page in the dashboard takes to render when their URLs are signed on every request and when they're cached. The project is deleted afterwards. Needs Redis and S3 credentials, which are only used to sign URLs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--screenshots", type=int, default=200, help="Number of debug screenshots the bot has")
+        parser.add_argument("--requests", type=int, default=20, help="Number of times the page is rendered in each mode")
+
+    def handle(self, *args, **options):
+        organization = Organization.objects.create(name="Presigned URLs benchmark")
+        project = Project.objects.create(name="Presigned URLs benchmark", organization=organization)
+        user = User.objects.create_user(username=f"presigned-urls-benchmark-{uuid.uuid4().hex}", password=uuid.uuid4().hex, role=UserRole.ADMIN, organization=organization)
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/123", state=BotStates.FATAL_ERROR)
+        events = BotEvent.objects.bulk_create([BotEvent(bot=bot, event_type=BotEventTypes.FATAL_ERROR, old_state=BotStates.JOINING, new_state=BotStates.FATAL_ERROR) for _ in range(10)])
+        BotDebugScreenshot.objects.bulk_create([BotDebugScreenshot(object_id=f"shot_{uuid.uuid4().hex[:16]}", bot_event=events[index % len(events)], file=f"{bot.object_id}/screenshot_{index}.png") for index in range(options["screenshots"])])
+
+        client = Client(HTTP_HOST="localhost")
+        client.force_login(user)
+        url = reverse("bots:project-bot-detail", kwargs={"object_id": project.object_id, "bot_object_id": bot.object_id})
+
+        def render_page():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise Exception(f"Request failed with status {response.status_code}")
+
+        def ms_per_request():
+            started_at = time.perf_counter()
+            for _ in range(options["requests"]):
+                render_page()
+            return round((time.perf_counter() - started_at) * 1000 / options["requests"], 2)
+
+        try:
+            result = {"screenshots": options["screenshots"], "requests": options["requests"]}
+            with patch("bots.models.get_presigned_url", sign_every_time):
+                render_page()
+                result["signed_every_time_ms"] = ms_per_request()
+
+            clear_local_cache()
+            # Signs the URLs that the other requests reuse
+            started_at = time.perf_counter()
+            render_page()
+            result["cached_first_request_ms"] = round((time.perf_counter() - started_at) * 1000, 2)
+            result["cached_ms"] = ms_per_request()
+            result["speedup"] = round(result["signed_every_time_ms"] / result["cached_ms"], 2)
+            self.stdout.write(json.dumps(result))
+        finally:
+            with transaction.atomic():
+                BotDebugScreenshot.objects.filter(bot_event__bot=bot).delete()
+                BotEvent.objects.filter(bot=bot).delete()
+                bot.delete()
+                user.delete()
+                project.delete()
+                organization.delete()
@@ -0,0 +1,133 @@
+import json
+import os
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from bots.bot_controller.per_participant_streaming_audio_input_manager import PerParticipantStreamingAudioInputManager
+from bots.models import Bot, Credentials, Organization, Participant, Project, Recording, RecordingTranscriptionStates, TranscriptionProviders, TranscriptionTypes, Utterance
+from bots.transcription_providers.deepgram.mock_deepgram_streaming_server import MockDeepgramStreamingServer
+
+SAMPLE_RATE = 16000
+CHUNK_DURATION_SECONDS = 0.02
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Command(BaseCommand):
+    help = "Measures the time from a speaker's audio being sent to their utterance being persisted, using a local stand-in for Deepgram. Nothing is written to the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--speakers", type=int, default=4, help="Number of participants speaking at the same time")
+        parser.add_argument("--duration", type=float, default=10.0, help="Seconds of audio each speaker sends")
+        parser.add_argument("--phrase-duration", type=float, default=2.0, help="Seconds of audio in each transcribed phrase")
+        parser.add_argument("--processing-delay", type=float, default=0.05, help="Seconds the stand-in server takes to return each result")
+
+    def handle(self, *args, **options):
+        speakers = [f"speaker-{i}" for i in range(options["speakers"])]
+        phrase_bytes = int(options["phrase_duration"] * SAMPLE_RATE) * 2
+        chunk_samples = int(CHUNK_DURATION_SECONDS * SAMPLE_RATE)
+        chunk = (np.sin(np.arange(chunk_samples) / 3) * 20000).astype(np.int16).tobytes()
+
+        server = MockDeepgramStreamingServer(phrase_duration_seconds=options["phrase_duration"], processing_delay_seconds=options["processing_delay"]).start()
+        previous_url = os.environ.get("DEEPGRAM_STREAMING_URL")
+        os.environ["DEEPGRAM_STREAMING_URL"] = server.url
+        try:
+            with transaction.atomic():
+                results = self.run_benchmark(speakers, chunk, phrase_bytes, options["duration"])
+                transaction.set_rollback(True)
+        finally:
+            if previous_url is None:
+                os.environ.pop("DEEPGRAM_STREAMING_URL", None)
+            else:
+                os.environ["DEEPGRAM_STREAMING_URL"] = previous_url
+            server.stop()
+
+        self.stdout.write(json.dumps(results))
+
+    def run_benchmark(self, speakers, chunk, phrase_bytes, duration):
+        organization = Organization.objects.create(name="Streaming transcription benchmark")
+        project = Project.objects.create(name="Streaming transcription benchmark", organization=organization)
+        credentials = Credentials.objects.create(project=project, credential_type=Credentials.CredentialTypes.DEEPGRAM)
+        credentials.set_credentials({"api_key": "benchmark"})
+        bot = Bot.objects.create(project=project, meeting_url="https://zoom.us/j/benchmark", settings={"transcription_settings": {"deepgram": {"use_streaming": True}}})
+        recording = Recording.objects.create(
+            bot=bot,
+            recording_type=bot.recording_type(),
+            transcription_type=TranscriptionTypes.REALTIME,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+            transcription_state=RecordingTranscriptionStates.IN_PROGRESS,
+            is_default_recording=True,
+        )
+
+        # Wall clock time at which the last chunk of each phrase was sent, keyed by (speaker, phrase index)
+        phrase_sent_at = {}
+        latencies = []
+
+        def save_utterance(message):
+            participant, _ = Participant.objects.get_or_create(bot=bot, uuid=message["participant_uuid"], defaults={"full_name": message["participant_full_name"]})
+            Utterance.objects.create(recording=recording, participant=participant, transcription=message["transcription"], timestamp_ms=message["timestamp_ms"], duration_ms=message["duration_ms"])
+            sent_at = phrase_sent_at.get((message["participant_uuid"], int(message["transcription"]["transcript"].split()[-1])))
+            if sent_at is not None:
+                latencies.append(time.time() - sent_at)
+
+        manager = PerParticipantStreamingAudioInputManager(
+            save_utterance_callback=save_utterance,
+            get_participant_callback=lambda speaker_id: {"participant_uuid": speaker_id, "participant_full_name": speaker_id},
+            sample_rate=SAMPLE_RATE,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+            bot=bot,
+        )
+        # Every speaker talks for the whole benchmark, so none of them should be evicted and the tone we send counts as speech
+        manager.MAX_STREAMING_TRANSCRIBERS = max(manager.MAX_STREAMING_TRANSCRIBERS, len(speakers))
+        manager.silence_detected = lambda chunk_bytes: False
+
+        # Give the pre-warmed connections a chance to open, like they would while the bot waits in the meeting
+        manager.monitor_transcription()
+        if manager.transcriber_pool_thread:
+            manager.transcriber_pool_thread.join()
+
+        # Send the audio in real time, one chunk per speaker every CHUNK_DURATION_SECONDS, like the adapters do
+        bytes_sent = 0
+        chunk_count = int(duration / CHUNK_DURATION_SECONDS)
+        start_time = time.time()
+        for chunk_index in range(chunk_count):
+            for speaker_id in speakers:
+                manager.add_chunk(speaker_id, None, chunk)
+            bytes_sent += len(chunk)
+            if bytes_sent % phrase_bytes < len(chunk):
+                now = time.time()
+                for speaker_id in speakers:
+                    phrase_sent_at[(speaker_id, bytes_sent // phrase_bytes - 1)] = now
+
+            if chunk_index % 5 == 0:
+                manager.monitor_transcription()
+            time.sleep(max(0, start_time + (chunk_index + 1) * CHUNK_DURATION_SECONDS - time.time()))
+
+        # Wait for the results of the last full phrases before closing the connections
+        deadline = time.time() + 5
+        while len(latencies) < len(phrase_sent_at) and time.time() < deadline:
+            manager.monitor_transcription()
+            time.sleep(CHUNK_DURATION_SECONDS)
+        transcriber_metrics = [transcriber.metrics() for transcriber in manager.streaming_transcribers.values()]
+        if manager.transcriber_pool_thread:
+            manager.transcriber_pool_thread.join()
+        manager.flush_utterances()
+
+        latencies.sort()
+        return {
+            "speakers": len(speakers),
+            "phrases_sent": len(phrase_sent_at),
+            "utterances_persisted": Utterance.objects.filter(recording=recording).count(),
+            "latency_p50_ms": None if not latencies else round(percentile(latencies, 0.5) * 1000, 1),
+            "latency_p95_ms": None if not latencies else round(percentile(latencies, 0.95) * 1000, 1),
+            "latency_max_ms": None if not latencies else round(latencies[-1] * 1000, 1),
+            "partial_results": sum(metrics["partial_count"] for metrics in transcriber_metrics),
+            "final_results": sum(metrics["final_count"] for metrics in transcriber_metrics),
+        }
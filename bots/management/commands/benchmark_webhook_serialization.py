@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from bots.webhook_utils import build_webhook_body, canonical_json, sign_body
+
+PAYLOAD_SIZES = [1024, 10 * 1024, 100 * 1024, 1024 * 1024, 5 * 1024 * 1024]
+
+
+def build_payload(size):
+    """A transcript.update style payload of roughly the given size in bytes, with word level timestamps."""
+    words = []
+    payload = {"speaker_name": "Ünïcode Speaker", "speaker_uuid": "16778240", "speaker_is_host": True, "timestamp_ms": 1079, "duration_ms": 7710, "transcription": {"transcript": "", "words": words}}
+    while (payload_size := len(canonical_json(payload))) < size:
+        # Each word adds at least 100 bytes, counting its part of the transcript, so this never adds more than needed
+        for index in range(len(words), len(words) + max(1, (size - payload_size) // 100)):
+            words.append({"word": f"word{index}", "start": index * 0.37, "end": index * 0.37 + 0.31, "confidence": 0.98})
+        payload["transcription"]["transcript"] = " ".join(word["word"] for word in words)
+    return payload
+
+
+def time_per_call(function, iterations):
+    started_at = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - started_at) / iterations
+
+
+class Command(BaseCommand):
+    help = "Compares the time to serialize and sign a webhook the way it used to be done, with stdlib json for the signature and again for the request body, against serializing it once with orjson"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--min-seconds", type=float, default=1.0, help="Roughly how long to spend measuring each payload size and method")
+
+    def handle(self, *args, **options):
+        secret = os.urandom(32)
+        webhook_data = {"idempotency_key": "6f1e2a4c-2b0c-4f5e-9d5a-3f2b1c0d9e8f", "bot_id": "bot_3hfP0PXEsNinIZmh", "bot_metadata": {"customer": "benchmark"}, "trigger": "transcript.update"}
+
+        results = []
+        for size in PAYLOAD_SIZES:
+            payload = build_payload(size)
+
+            def previous_delivery():
+                # Signed over sorted keys, then serialized again by requests.post(json=...)
+                body = {**webhook_data, "data": payload}
+                sign_body(json.dumps(body, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8"), secret)
+                json.dumps(body, allow_nan=False).encode("utf-8")
+
+            def current_delivery():
+                sign_body(build_webhook_body(webhook_data, canonical_json(payload)), secret)
+
+            iterations = max(3, int(options["min_seconds"] / max(time_per_call(previous_delivery, 1), 1e-6)))
+            previous_seconds = time_per_call(previous_delivery, iterations)
+            current_seconds = time_per_call(current_delivery, iterations)
+            results.append(
+                {
+                    "payload_bytes": len(canonical_json(payload)),
+                    "iterations": iterations,
+                    "previous_ms": round(previous_seconds * 1000, 3),
+                    "current_ms": round(current_seconds * 1000, 3),
+                    "speedup": round(previous_seconds / current_seconds, 2),
+                }
+            )
+
+        self.stdout.write(json.dumps(results))
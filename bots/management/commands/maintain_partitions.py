@@ -0,0 +1,30 @@
+import logging
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bots.partitioning import PARTITIONED_MODELS, create_partitions, remove_expired_data
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Creates the monthly partitions of the bot event, participant event, webhook delivery attempt and resource snapshot tables ahead of time, and removes the data of ended bots once it is older than their project's retention period"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--months-ahead", type=int, default=settings.PARTITION_MONTHS_AHEAD, help="Number of months ahead to create partitions for")
+        parser.add_argument("--archive", action="store_true", help="Detach expired partitions from their table instead of dropping them, so they can be archived")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Number of expired rows to delete per batch")
+
+    def handle(self, *args, **options):
+        created_partitions = []
+        for model in PARTITIONED_MODELS:
+            created_partitions += create_partitions(model, options["months_ahead"])
+        for partition in created_partitions:
+            logger.info(f"Created partition {partition}")
+
+        removed_partitions, deleted_count = remove_expired_data(archive=options["archive"], batch_size=options["batch_size"])
+        for partition in removed_partitions:
+            logger.info(f"{'Detached' if options['archive'] else 'Dropped'} partition {partition}")
+
+        self.stdout.write(f"Created {len(created_partitions)} partitions, {'detached' if options['archive'] else 'dropped'} {len(removed_partitions)} expired partitions and deleted {deleted_count} expired rows")
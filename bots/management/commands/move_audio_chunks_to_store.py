@@ -0,0 +1,97 @@
+import logging
+import uuid
+from itertools import groupby
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from bots.audio_chunk_store import get_audio_chunk_store, recording_prefix
+from bots.models import AudioChunk, Utterance
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Moves audio that is still in the database into the configured audio chunk store, one segment object per recording per batch"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100, help="Number of rows to move per batch")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop after this many batches of each kind")
+
+    def handle(self, *args, **options):
+        audio_chunk_store = get_audio_chunk_store()
+        if audio_chunk_store is None:
+            raise CommandError("AUDIO_CHUNK_STORAGE_BACKEND is set to database, so there is nowhere to move the audio to")
+
+        moved_utterances = self.move_legacy_utterance_audio(audio_chunk_store, options["batch_size"], options["max_batches"])
+        moved_audio_chunks = self.move_audio_chunks(audio_chunk_store, options["batch_size"], options["max_batches"])
+        self.stdout.write(f"Moved audio for {moved_audio_chunks} audio chunks and {moved_utterances} utterances")
+
+    def write_segments(self, audio_chunk_store, audio_chunks_and_blobs):
+        # Pack the chunks of each recording back to back into a single object, and point each row at its slice
+        for recording_id, group in groupby(audio_chunks_and_blobs, key=lambda item: item[0].recording_id):
+            group = list(group)
+            key = f"{recording_prefix(recording_id)}segment_{uuid.uuid4().hex}"
+            offset = 0
+            for audio_chunk, audio_blob in group:
+                audio_chunk.audio_blob = None
+                audio_chunk.audio_blob_key = key
+                audio_chunk.audio_blob_offset = offset
+                audio_chunk.audio_blob_length = len(audio_blob)
+                offset += len(audio_blob)
+            audio_chunk_store.write(key, b"".join(audio_blob for _, audio_blob in group))
+
+    def move_audio_chunks(self, audio_chunk_store, batch_size, max_batches):
+        moved_count = 0
+        batch_count = 0
+        last_id = 0
+        while max_batches is None or batch_count < max_batches:
+            audio_chunks = list(AudioChunk.objects.filter(id__gt=last_id, audio_blob_key__isnull=True, audio_blob__isnull=False).order_by("id")[:batch_size])
+            if not audio_chunks:
+                break
+            last_id = audio_chunks[-1].id
+
+            audio_chunks_and_blobs = sorted(((audio_chunk, bytes(audio_chunk.audio_blob)) for audio_chunk in audio_chunks), key=lambda item: item[0].recording_id)
+            self.write_segments(audio_chunk_store, audio_chunks_and_blobs)
+            AudioChunk.objects.bulk_update(audio_chunks, ["audio_blob", "audio_blob_key", "audio_blob_offset", "audio_blob_length"])
+
+            moved_count += len(audio_chunks)
+            batch_count += 1
+            logger.info(f"Moved {moved_count} audio chunks to the audio chunk store")
+        return moved_count
+
+    def move_legacy_utterance_audio(self, audio_chunk_store, batch_size, max_batches):
+        # Utterances from before the AudioChunk model keep their audio on the utterance row, so give them an audio chunk
+        moved_count = 0
+        batch_count = 0
+        last_id = 0
+        while max_batches is None or batch_count < max_batches:
+            utterances = list(Utterance.objects.filter(id__gt=last_id, audio_chunk__isnull=True, sample_rate__isnull=False).exclude(audio_blob=b"").order_by("id")[:batch_size])
+            if not utterances:
+                break
+            last_id = utterances[-1].id
+
+            audio_chunks_and_blobs = []
+            for utterance in sorted(utterances, key=lambda utterance: utterance.recording_id):
+                audio_chunk = AudioChunk(
+                    recording_id=utterance.recording_id,
+                    participant_id=utterance.participant_id,
+                    audio_format=utterance.audio_format or AudioChunk.AudioFormat.PCM,
+                    timestamp_ms=utterance.timestamp_ms,
+                    duration_ms=utterance.duration_ms,
+                    sample_rate=utterance.sample_rate,
+                    source=AudioChunk.Sources.PER_PARTICIPANT_AUDIO,
+                )
+                audio_chunks_and_blobs.append((audio_chunk, bytes(utterance.audio_blob)))
+                utterance.audio_chunk = audio_chunk
+                utterance.audio_blob = b""
+            self.write_segments(audio_chunk_store, audio_chunks_and_blobs)
+
+            with transaction.atomic():
+                AudioChunk.objects.bulk_create([audio_chunk for audio_chunk, _ in audio_chunks_and_blobs])
+                Utterance.objects.bulk_update(utterances, ["audio_chunk", "audio_blob"])
+
+            moved_count += len(utterances)
+            batch_count += 1
+            logger.info(f"Moved audio for {moved_count} utterances to the audio chunk store")
+        return moved_count
@@ -0,0 +1,21 @@
+import logging
+
+from django.core.management.base import BaseCommand
+
+from bots.models import WebhookDeliveryAttempt
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Drops the stored payloads of large webhooks that were delivered more than WEBHOOK_PAYLOAD_RETENTION_HOURS ago"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of payloads to purge per batch")
+
+    def handle(self, *args, **options):
+        purged_count = 0
+        while batch_purged_count := WebhookDeliveryAttempt.purge_expired_payloads(batch_size=options["batch_size"]):
+            purged_count += batch_purged_count
+            logger.info(f"Purged {purged_count} webhook payloads")
+        self.stdout.write(f"Purged {purged_count} webhook payloads")
@@ -2,13 +2,17 @@ import logging
 import signal
 import time
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db import connection, models, transaction
 from django.db.models import Q
 from django.utils import timezone
 
 from accounts.models import Organization
-from bots.models import Bot, BotStates, Calendar, CalendarStates
+from bots import active_bot_counter
+from bots.models import Bot, BotStates, Calendar, CalendarStates, WebhookDeliveryAttempt
+from bots.partitioning import PARTITIONED_MODELS, create_partitions
+from bots.task_outbox import relay_task_outbox
 from bots.tasks.autopay_charge_task import enqueue_autopay_charge_task
 from bots.tasks.launch_scheduled_bot_task import launch_scheduled_bot
 from bots.tasks.sync_calendar_task import enqueue_sync_calendar_task
@@ -29,6 +33,10 @@ class Command(BaseCommand):
 
     # Graceful shutdown flags
     _keep_running = True
+    # When the partitions were last checked, as a time.monotonic() value
+    _partitions_checked_at = None
+    # When the active bot counts were last reconciled, as a time.monotonic() value
+    _active_bot_counts_reconciled_at = None
 
     def _graceful_exit(self, signum, frame):
         log.info("Received %s, shutting down after current cycle", signum)
@@ -48,6 +56,10 @@ class Command(BaseCommand):
                 self._run_scheduled_bots()
                 self._run_periodic_calendar_syncs()
                 self._run_autopay_tasks()
+                self._run_webhook_payload_purge()
+                self._run_task_outbox_relay()
+                self._run_partition_creation()
+                self._run_active_bot_count_reconciliation()
             except Exception:
                 log.exception("Scheduler cycle failed")
             finally:
@@ -156,3 +168,44 @@ class Command(BaseCommand):
             enqueue_autopay_charge_task(organization)
 
         log.info("Enqueued %d autopay tasks", len(organizations))
+
+    def _run_webhook_payload_purge(self):
+        """
+        Drop the stored payloads of large webhooks once their retention period has passed.
+        Only one batch is purged per cycle so a backlog doesn't hold up scheduling bots.
+        """
+        purged_count = WebhookDeliveryAttempt.purge_expired_payloads()
+        if purged_count:
+            log.info("Purged %d webhook payloads", purged_count)
+
+    def _run_task_outbox_relay(self):
+        """
+        Publish tasks from the task outbox that weren't published when their transaction committed.
+        """
+        published_count = relay_task_outbox()
+        if published_count:
+            log.warning("Relayed %d tasks from the task outbox", published_count)
+
+    def _run_partition_creation(self):
+        """
+        Make sure the partitioned tables have partitions for the coming months, so that new rows don't pile up in their
+        default partitions. Partitions are created months ahead, so checking once an hour is plenty.
+        """
+        if self._partitions_checked_at is not None and time.monotonic() - self._partitions_checked_at < 3600:
+            return
+        for model in PARTITIONED_MODELS:
+            for partition in create_partitions(model, settings.PARTITION_MONTHS_AHEAD):
+                log.info("Created partition %s", partition)
+        self._partitions_checked_at = time.monotonic()
+
+    def _run_active_bot_count_reconciliation(self):
+        """
+        Correct the per project counts of active bots that the concurrent bots limit is checked against, in case an update
+        to them was missed.
+        """
+        if self._active_bot_counts_reconciled_at is not None and time.monotonic() - self._active_bot_counts_reconciled_at < settings.ACTIVE_BOT_COUNT_RECONCILE_INTERVAL_SECONDS:
+            return
+        corrected_count = active_bot_counter.reconcile()
+        if corrected_count:
+            log.warning("Corrected the active bot counts of %d projects", corrected_count)
+        self._active_bot_counts_reconciled_at = time.monotonic()
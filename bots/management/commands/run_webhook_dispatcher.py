@@ -0,0 +1,46 @@
+import asyncio
+import logging
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bots.webhook_dispatcher import WebhookDispatcher
+
+log = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Delivers webhooks over pooled keep-alive connections. Used when WEBHOOK_DELIVERY_BACKEND is set to dispatcher."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--max-in-flight", type=int, default=200, help="Maximum number of webhooks being delivered at once (default: 200)")
+        parser.add_argument("--max-connections-per-host", type=int, default=10, help="Maximum number of webhooks being delivered to a single host at once (default: 10)")
+        parser.add_argument("--timeout", type=float, default=10, help="Request timeout in seconds (default: 10)")
+        parser.add_argument("--poll-interval", type=float, default=1, help="How often to look for due webhooks when there is nothing to deliver, in seconds (default: 1)")
+
+    def handle(self, *args, **options):
+        if settings.WEBHOOK_DELIVERY_BACKEND != "dispatcher":
+            log.warning("WEBHOOK_DELIVERY_BACKEND is not set to dispatcher, so only retries of webhooks that were already handed to the dispatcher will be delivered")
+
+        # httpx logs every request at INFO, which is far too much at webhook volumes. Results are recorded on the delivery attempts instead.
+        logging.getLogger("httpx").setLevel(logging.WARNING)
+
+        dispatcher = WebhookDispatcher(
+            max_in_flight=options["max_in_flight"],
+            max_connections_per_host=options["max_connections_per_host"],
+            timeout_seconds=options["timeout"],
+            poll_interval_seconds=options["poll_interval"],
+        )
+
+        # Trap SIGINT / SIGTERM so in-flight deliveries finish before the container stops
+        def graceful_exit(signum, frame):
+            log.info("Received %s, shutting down after in-flight deliveries finish", signum)
+            dispatcher.stop()
+
+        signal.signal(signal.SIGINT, graceful_exit)
+        signal.signal(signal.SIGTERM, graceful_exit)
+
+        log.info("Webhook dispatcher started")
+        asyncio.run(dispatcher.run())
+        log.info("Webhook dispatcher stopped")
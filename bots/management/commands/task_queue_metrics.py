@@ -0,0 +1,13 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from bots.task_queue_metrics import get_task_queue_metrics
+
+
+class Command(BaseCommand):
+    help = "Prints the depth and oldest message age of each Celery queue, for per-queue worker autoscaling"
+
+    def handle(self, *args, **options):
+        for queue_metrics in get_task_queue_metrics():
+            self.stdout.write(json.dumps(queue_metrics))
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.12 on 2026-10-19 09:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0058_alter_webhookdeliveryattempt_webhook_trigger_type_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_key',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_length',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='audiochunk',
+            name='audio_blob_offset',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='audiochunk',
+            name='audio_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.12 on 2026-10-19 09:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0060_audiochunk_audio_blob_key_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='audiochunk',
+            name='audio_format',
+            field=models.IntegerField(choices=[(1, 'PCM'), (2, 'MP3'), (3, 'FLAC'), (4, 'Opus')], default=1),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.12 on 2026-10-19 09:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0061_alter_audiochunk_audio_format'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='payload_blob',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='payload_blob_key',
+            field=models.CharField(blank=True, max_length=512, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='payload_preview',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='payload_purged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='payload_size',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdeliveryattempt',
+            index=models.Index(condition=models.Q(('payload_purged_at__isnull', True), ('payload_size__isnull', False)), fields=['succeeded_at'], name='webhook_attempt_purgeable_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.12 on 2026-10-19 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0062_webhookdeliveryattempt_payload_blob_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='batch_idempotency_key',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_flush_due_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_max_delay_ms',
+            field=models.IntegerField(default=1000),
+        ),
+        migrations.AddField(
+            model_name='webhooksubscription',
+            name='batch_max_size',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='webhookdeliveryattempt',
+            index=models.Index(condition=models.Q(('batch_idempotency_key__isnull', True), ('status', 1)), fields=['webhook_subscription', 'created_at'], name='webhook_attempt_unbatched_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.12 on 2026-10-19 10:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0065_taskoutboxentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='signature',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='webhookdeliveryattempt',
+            name='webhook_data',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,102 @@
+# Generated by Django 5.1.12 on 2026-10-19 11:11
+
+import datetime
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+PARTITIONED_TABLES = ["bots_botevent", "bots_participantevent", "bots_webhookdeliveryattempt", "bots_botresourcesnapshot"]
+
+
+def build_partition_keys(apps, schema_editor):
+    """
+    Do the slow parts of partitioning the tables without blocking writes to them, so that migration 0068 only has to
+    change the catalog while it holds its locks.
+
+    The primary key and unique constraints of a partitioned table have to include created_at, so this builds unique
+    indexes on (id, created_at) and on (column, created_at) for each unique column, which 0068 turns into the constraints
+    of the existing table once it becomes a partition. It also adds a validated check that every row was created before
+    the month after next, which is the range the existing table will hold, so attaching it doesn't have to scan it.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    now = datetime.datetime.now(datetime.timezone.utc)
+    next_month = (now.replace(day=1, hour=0, minute=0, second=0, microsecond=0) + datetime.timedelta(days=32)).replace(day=1)
+    # A month of margin, so the check can't start rejecting new rows before 0068 has run
+    partition_end = (next_month + datetime.timedelta(days=32)).replace(day=1)
+
+    with schema_editor.connection.cursor() as cursor:
+        for table in PARTITIONED_TABLES:
+            cursor.execute("SELECT array(SELECT attname FROM pg_attribute WHERE attrelid = conrelid AND attnum = ANY(conkey)) FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'u'", [table])
+            unique_columns = [row[0][0] for row in cursor.fetchall()]
+
+            # A concurrent build that failed leaves an invalid index behind, so start from scratch if this is run again
+            for index_name, columns in [(f"{table}_legacy_pkey", ["id"]), *[(f"{table}_{column}_legacy_uniq", [column]) for column in unique_columns]]:
+                cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{index_name}"')
+                cursor.execute(f'CREATE UNIQUE INDEX CONCURRENTLY "{index_name}" ON "{table}" ({", ".join(columns)}, created_at)')
+
+            # Adding the check as NOT VALID only locks the table briefly, and validating it doesn't block writes
+            cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT IF EXISTS "{table}_legacy_created_at_check"')
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{table}_legacy_created_at_check" CHECK (created_at < %s) NOT VALID', [partition_end])
+            cursor.execute(f'ALTER TABLE "{table}" VALIDATE CONSTRAINT "{table}_legacy_created_at_check"')
+
+
+class Migration(migrations.Migration):
+    # Indexes can only be built concurrently outside of a transaction
+    atomic = False
+
+    dependencies = [
+        ("bots", "0066_webhookdeliveryattempt_signature"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="project",
+            name="data_retention_days",
+            field=models.PositiveIntegerField(blank=True, help_text="How many days to keep the events, participant events, webhook delivery attempts and resource snapshots of ended bots. Defaults to DATA_RETENTION_DAYS, and they are kept forever if neither is set.", null=True),
+        ),
+        migrations.AlterField(
+            model_name="botdebugscreenshot",
+            name="bot_event",
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name="debug_screenshots", to="bots.botevent"),
+        ),
+        AddIndexConcurrently(
+            model_name="botevent",
+            index=models.Index(fields=["bot", "created_at"], name="bot_event_bot_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="botresourcesnapshot",
+            index=models.Index(fields=["bot", "created_at"], name="resource_snapshot_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="participantevent",
+            index=models.Index(fields=["participant", "created_at"], name="participant_event_created_idx"),
+        ),
+        AddIndexConcurrently(
+            model_name="webhookdeliveryattempt",
+            index=models.Index(fields=["bot", "created_at"], name="webhook_attempt_bot_idx"),
+        ),
+        migrations.AlterField(
+            model_name="botevent",
+            name="bot",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="bot_events", to="bots.bot"),
+        ),
+        migrations.AlterField(
+            model_name="botresourcesnapshot",
+            name="bot",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="resource_snapshots", to="bots.bot"),
+        ),
+        migrations.AlterField(
+            model_name="participantevent",
+            name="participant",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="events", to="bots.participant"),
+        ),
+        migrations.AlterField(
+            model_name="webhookdeliveryattempt",
+            name="bot",
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="webhook_delivery_attempts", to="bots.bot"),
+        ),
+        migrations.RunPython(build_partition_keys),
+    ]
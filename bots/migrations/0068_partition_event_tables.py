@@ -0,0 +1,128 @@
+# Generated by Django 5.1.12 on 2026-10-19 11:11
+
+from django.db import migrations, models, transaction
+
+PARTITIONED_TABLES = ["bots_botevent", "bots_participantevent", "bots_webhookdeliveryattempt", "bots_botresourcesnapshot"]
+
+# The names of the unique constraints that replace the single column ones, which match the constraints in the models
+UNIQUE_CONSTRAINT_NAMES = {
+    ("bots_participantevent", "object_id"): "participant_event_object_id_uniq",
+    ("bots_webhookdeliveryattempt", "idempotency_key"): "webhook_attempt_idempotency_key_uniq",
+}
+
+
+def partition_table(cursor, table):
+    legacy_partition = f"{table}_legacy"
+    check_name = f"{table}_legacy_created_at_check"
+
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = %s::regclass", [table])
+    if cursor.fetchone()[0] == "p":
+        # Already partitioned by an earlier run that failed on a later table
+        return
+
+    cursor.execute("SELECT substring(pg_get_constraintdef(oid) from '''(.*)''') FROM pg_constraint WHERE conrelid = %s::regclass AND conname = %s", [table, check_name])
+    partition_end = cursor.fetchone()[0]
+    cursor.execute("SELECT conname, contype, pg_get_constraintdef(oid), array(SELECT attname FROM pg_attribute WHERE attrelid = conrelid AND attnum = ANY(conkey)) FROM pg_constraint WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'f')", [table])
+    constraints = cursor.fetchall()
+    unique_columns = [columns[0] for _, constraint_type, _, columns in constraints if constraint_type == "u"]
+    partition_key_indexes = [f"{table}_legacy_pkey", *[f"{table}_{column}_legacy_uniq" for column in unique_columns]]
+    cursor.execute("SELECT indexname, indexdef FROM pg_indexes WHERE tablename = %s AND indexname NOT IN (SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass)", [table, table])
+    indexes = [(index_name, index_definition) for index_name, index_definition in cursor.fetchall() if index_name not in partition_key_indexes]
+    # Django adds an index for LIKE queries to unique text columns, which these aren't any more
+    like_indexes = [index_name for index_name, _ in indexes if index_name.endswith("_like") and any(index_name.startswith(f"{table}_{column}_") for column in unique_columns)]
+
+    # Free up the names of the table, its constraints, its indexes and its id sequence for the partitioned table
+    for name, constraint_type, _, _ in constraints:
+        if constraint_type in ("p", "u"):
+            cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+    for index_name in like_indexes:
+        cursor.execute(f'DROP INDEX "{index_name}"')
+    indexes = [(index_name, index_definition) for index_name, index_definition in indexes if index_name not in like_indexes]
+    for index_name, _ in indexes:
+        cursor.execute(f'ALTER INDEX "{index_name}" RENAME TO "{index_name[:56]}_legacy"')
+    cursor.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy_partition}"')
+    cursor.execute(f'CREATE TABLE "{table}" (LIKE "{legacy_partition}" INCLUDING DEFAULTS INCLUDING IDENTITY INCLUDING CONSTRAINTS INCLUDING STORAGE) PARTITION BY RANGE (created_at)')
+    cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{check_name}"')
+    cursor.execute("SELECT pg_get_serial_sequence(%s, 'id'), pg_get_serial_sequence(%s, 'id')", [legacy_partition, table])
+    legacy_sequence, sequence = cursor.fetchone()
+    cursor.execute(f"SELECT last_value, is_called FROM {legacy_sequence}")
+    cursor.execute("SELECT setval(%s, %s, %s)", [sequence, *cursor.fetchone()])
+    cursor.execute(f'ALTER TABLE "{legacy_partition}" ALTER COLUMN id DROP IDENTITY')
+    cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {table}_id_seq")
+
+    # The indexes built by migration 0067 become the legacy partition's constraints, and attaching it to the partitioned
+    # table's constraints reuses them rather than building new ones
+    cursor.execute(f'ALTER TABLE "{legacy_partition}" ADD CONSTRAINT "{table}_legacy_pkey" PRIMARY KEY USING INDEX "{table}_legacy_pkey"')
+    for column in unique_columns:
+        cursor.execute(f'ALTER TABLE "{legacy_partition}" ADD CONSTRAINT "{table}_{column}_legacy_uniq" UNIQUE USING INDEX "{table}_{column}_legacy_uniq"')
+    for name, constraint_type, definition, columns in constraints:
+        if constraint_type == "p":
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" PRIMARY KEY ({", ".join(columns)}, created_at)')
+        elif constraint_type == "u":
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{UNIQUE_CONSTRAINT_NAMES[(table, columns[0])]}" UNIQUE ({", ".join(columns)}, created_at)')
+        else:
+            cursor.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{name}" {definition}')
+
+    # The validated check implies the partition's range, so Postgres doesn't scan the table to check it
+    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{legacy_partition}" FOR VALUES FROM (MINVALUE) TO (%s)', [partition_end])
+    cursor.execute(f'ALTER TABLE "{legacy_partition}" DROP CONSTRAINT "{check_name}"')
+    cursor.execute(f'CREATE TABLE "{table}_default" PARTITION OF "{table}" DEFAULT')
+    # The legacy partition's indexes are attached to these rather than built again
+    for _, index_definition in indexes:
+        cursor.execute(index_definition)
+
+
+def partition_by_created_at(apps, schema_editor):
+    """
+    Turn each table into one that is range partitioned by created_at. The existing table becomes the partition for everything
+    created before the end of the range checked by migration 0067, so its rows aren't copied, and a default partition takes
+    the rows of months that the maintain_partitions command hasn't created a partition for yet.
+
+    Each table is swapped in its own transaction, so the tables are only locked one at a time, and only for catalog changes.
+
+    The primary key and unique constraints of a partitioned table have to include created_at, so the primary key becomes
+    (id, created_at) and the unique constraints on idempotency_key and object_id become (idempotency_key, created_at) and
+    (object_id, created_at). The ids still come from one sequence, and the other unique values are random. Django 5.1 can't
+    describe a primary key with more than one column, so the models still have id as their primary key.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    for table in PARTITIONED_TABLES:
+        with transaction.atomic(using=schema_editor.connection.alias), schema_editor.connection.cursor() as cursor:
+            partition_table(cursor, table)
+
+
+class Migration(migrations.Migration):
+    # Each table is partitioned in its own transaction
+    atomic = False
+
+    dependencies = [
+        ("bots", "0067_prepare_event_table_partitioning"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_by_created_at),
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name="participantevent",
+                    name="object_id",
+                    field=models.CharField(editable=False, max_length=255),
+                ),
+                migrations.AlterField(
+                    model_name="webhookdeliveryattempt",
+                    name="idempotency_key",
+                    field=models.UUIDField(editable=False),
+                ),
+                migrations.AddConstraint(
+                    model_name="participantevent",
+                    constraint=models.UniqueConstraint(fields=("object_id", "created_at"), name="participant_event_object_id_uniq"),
+                ),
+                migrations.AddConstraint(
+                    model_name="webhookdeliveryattempt",
+                    constraint=models.UniqueConstraint(fields=("idempotency_key", "created_at"), name="webhook_attempt_idempotency_key_uniq"),
+                ),
+            ],
+        ),
+    ]
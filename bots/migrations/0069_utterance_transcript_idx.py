@@ -0,0 +1,17 @@
+# Generated by Django 5.1.12 on 2026-10-19 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bots', '0068_partition_event_tables'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='utterance',
+            index=models.Index(condition=models.Q(('transcription__isnull', False)), fields=['recording', 'async_transcription', 'timestamp_ms', 'id'], name='utterance_transcript_idx'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+import functools
 import hashlib
 import json
 import math
@@ -5,6 +6,8 @@ import os
 import random
 import secrets
 import string
+import uuid
+import zlib
 
 from concurrency.exceptions import RecordModifiedError
 from concurrency.fields import IntegerVersionField
@@ -18,7 +21,11 @@ from django.utils import timezone
 from django.utils.crypto import get_random_string
 
 from accounts.models import Organization, User, UserRole
-from bots.webhook_utils import trigger_webhook
+from bots.audio_chunk_store import get_audio_chunk_store, recording_prefix
+from bots.audio_compression import compress_pcm, decompress_to_pcm
+from bots.presigned_url_cache import get_presigned_url
+from bots.webhook_payload_store import get_webhook_payload_store
+from bots.webhook_utils import canonical_json, trigger_webhook
 
 # Create your models here.
 
@@ -33,6 +40,8 @@ class Project(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    data_retention_days = models.PositiveIntegerField(null=True, blank=True, help_text="How many days to keep the events, participant events, webhook delivery attempts and resource snapshots of ended bots. Defaults to DATA_RETENTION_DAYS, and they are kept forever if neither is set.")
+
     @classmethod
     def accessible_to(cls, user):
         if not user.is_active:
@@ -47,6 +56,11 @@ class Project(models.Model):
     def concurrent_bots_limit(self):
         return int(os.getenv("CONCURRENT_BOTS_LIMIT", 2500))
 
+    def effective_data_retention_days(self):
+        if self.data_retention_days is not None:
+            return self.data_retention_days
+        return settings.DATA_RETENTION_DAYS
+
     def save(self, *args, **kwargs):
         if not self.object_id:
             # Generate a random 16-character string
@@ -314,6 +328,8 @@ class Bot(models.Model):
     calendar_event = models.ForeignKey(CalendarEvent, on_delete=models.SET_NULL, null=True, blank=True, related_name="bots")
 
     def delete_data(self):
+        from bots.bot_response_cache import delete_cached_responses
+
         # Check if bot is in a state where the data deleted event can be created
         if not BotEventManager.event_can_be_created_for_state(BotEventTypes.DATA_DELETED, self.state):
             raise ValueError("Bot is not in a state where the data deleted event can be created")
@@ -323,10 +339,14 @@ class Bot(models.Model):
             BotDebugScreenshot.objects.filter(bot_event__bot=self).delete()
 
             # Delete all utterances and recording files for each recording
+            audio_chunk_store = get_audio_chunk_store()
             for recording in self.recordings.all():
                 # Delete all audio chunks and utterances first
                 recording.audio_chunks.all().delete()
                 recording.utterances.all().delete()
+                if audio_chunk_store:
+                    # Object storage isn't transactional, so only remove the audio once the rows are gone for good
+                    transaction.on_commit(functools.partial(audio_chunk_store.delete_prefix, recording_prefix(recording.id)))
 
                 # Delete the actual recording file if it exists
                 if recording.file and recording.file.name:
@@ -344,6 +364,9 @@ class Bot(models.Model):
 
             BotEventManager.create_event(bot=self, event_type=BotEventTypes.DATA_DELETED)
 
+            # Cached API responses include the deleted data
+            transaction.on_commit(functools.partial(delete_cached_responses, self.object_id))
+
     def set_heartbeat(self):
         retry_count = 0
         max_retries = 10
@@ -492,7 +515,8 @@ class Bot(models.Model):
         return self.settings.get("transcription_settings", {}).get("deepgram", {}).get("keywords", None)
 
     def deepgram_use_streaming(self):
-        return self.deepgram_callback() is not None
+        # Streaming is always used with a callback, since Deepgram only supports callbacks for streaming transcription
+        return self.deepgram_callback() is not None or self.settings.get("transcription_settings", {}).get("deepgram", {}).get("use_streaming", False)
 
     def deepgram_model(self):
         model_from_settings = self.settings.get("transcription_settings", {}).get("deepgram", {}).get("model", None)
@@ -905,7 +929,8 @@ class BotEventSubTypes(models.IntegerChoices):
 
 
 class BotEvent(models.Model):
-    bot = models.ForeignKey(Bot, on_delete=models.CASCADE, related_name="bot_events")
+    # Indexed together with created_at, see Meta.indexes
+    bot = models.ForeignKey(Bot, on_delete=models.CASCADE, related_name="bot_events", db_index=False)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -957,6 +982,9 @@ class BotEvent(models.Model):
                 name="valid_event_type_event_sub_type_combinations",
             )
         ]
+        indexes = [
+            models.Index(fields=["bot", "created_at"], name="bot_event_bot_created_idx"),
+        ]
 
 
 class BotEventTransitionFunctions:
@@ -1144,6 +1172,10 @@ class BotEventManager:
     def is_post_meeting_state(cls, state: int):
         return state in BotStates.post_meeting_states()
 
+    @classmethod
+    def is_in_meeting_state(cls, state: int):
+        return state not in BotStates.pre_meeting_states() and state not in BotStates.post_meeting_states()
+
     @classmethod
     def bot_event_type_should_incur_charges(cls, event_type: int):
         if event_type == BotEventTypes.FATAL_ERROR:
@@ -1269,6 +1301,9 @@ class BotEventManager:
         Raises:
             ValidationError: If the state transition is not valid
         """
+        from bots import active_bot_counter
+        from bots.bot_event_stream import publish_bot_event
+
         if event_metadata is None:
             event_metadata = {}
         retry_count = 0
@@ -1310,6 +1345,10 @@ class BotEventManager:
                     if bot.state != new_state:
                         raise ValidationError(f"Bot state was modified by another thread to be '{BotStates.state_to_api_code(bot.state)}' instead of '{BotStates.state_to_api_code(new_state)}'.")
 
+                    # Keep the project's count of active bots up to date, once the transition commits
+                    if cls.is_in_meeting_state(new_state) != cls.is_in_meeting_state(old_state):
+                        active_bot_counter.adjust_on_commit(bot.project_id, 1 if cls.is_in_meeting_state(new_state) else -1)
+
                     # These four blocks below are hooks for things that need to happen when the bot state changes
                     if new_state == BotStates.STAGED:
                         cls.after_new_state_is_staged(bot=bot, new_state=new_state, event_metadata=event_metadata)
@@ -1345,19 +1384,23 @@ class BotEventManager:
                         metadata=event_metadata,
                     )
 
+                    state_change_payload = {
+                        "event_type": BotEventTypes.type_to_api_code(event_type),
+                        "event_sub_type": BotEventSubTypes.sub_type_to_api_code(event_sub_type),
+                        "event_metadata": event_metadata,
+                        "old_state": BotStates.state_to_api_code(old_state),
+                        "new_state": BotStates.state_to_api_code(bot.state),
+                        "created_at": event.created_at.isoformat(),
+                    }
+
                     # Trigger webhook for this event
                     trigger_webhook(
                         webhook_trigger_type=WebhookTriggerTypes.BOT_STATE_CHANGE,
                         bot=bot,
-                        payload={
-                            "event_type": BotEventTypes.type_to_api_code(event_type),
-                            "event_sub_type": BotEventSubTypes.sub_type_to_api_code(event_sub_type),
-                            "event_metadata": event_metadata,
-                            "old_state": BotStates.state_to_api_code(old_state),
-                            "new_state": BotStates.state_to_api_code(bot.state),
-                            "created_at": event.created_at.isoformat(),
-                        },
+                        payload=state_change_payload,
                     )
+                    # And send it to the bot's event stream, once the transaction commits
+                    publish_bot_event(bot, WebhookTriggerTypes.BOT_STATE_CHANGE, state_change_payload)
 
                     return event
 
@@ -1412,9 +1455,11 @@ class ParticipantEventTypes(models.IntegerChoices):
 
 
 class ParticipantEvent(models.Model):
-    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name="events")
+    # Indexed together with created_at, see Meta.indexes
+    participant = models.ForeignKey(Participant, on_delete=models.CASCADE, related_name="events", db_index=False)
     event_type = models.IntegerField(choices=ParticipantEventTypes.choices)
-    object_id = models.CharField(max_length=255, unique=True, editable=False)
+    # Unique together with created_at, see Meta.constraints
+    object_id = models.CharField(max_length=255, editable=False)
 
     event_data = models.JSONField(null=False, default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1422,6 +1467,15 @@ class ParticipantEvent(models.Model):
 
     OBJECT_ID_PREFIX = "pe_"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["participant", "created_at"], name="participant_event_created_idx"),
+        ]
+        constraints = [
+            # The table is partitioned by created_at, and Postgres can only enforce uniqueness across partitions when it includes the partition key
+            models.UniqueConstraint(fields=["object_id", "created_at"], name="participant_event_object_id_uniq"),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.object_id:
             # Generate a random 16-character string
@@ -1546,14 +1600,8 @@ class Recording(models.Model):
 
     @property
     def url(self):
-        if not self.file.name:
-            return None
-        # Generate a temporary signed URL that expires in 30 minutes (1800 seconds)
-        return self.file.storage.bucket.meta.client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.file.storage.bucket_name, "Key": self.file.name},
-            ExpiresIn=1800,
-        )
+        # A signed URL that's valid for at least 30 minutes, and is handed out again until it's due to change
+        return get_presigned_url(self.file)
 
     OBJECT_ID_PREFIX = "rec_"
     object_id = models.CharField(max_length=32, unique=True, editable=False)
@@ -1832,9 +1880,26 @@ class AudioChunk(models.Model):
     class AudioFormat(models.IntegerChoices):
         PCM = 1, "PCM"
         MP3 = 2, "MP3"
+        FLAC = 3, "FLAC"
+        OPUS = 4, "Opus"
+
+    COMPRESSION_AUDIO_FORMATS = {
+        "flac": AudioFormat.FLAC,
+        "opus": AudioFormat.OPUS,
+    }
+
+    MIME_TYPES = {
+        AudioFormat.MP3: "audio/mpeg",
+        AudioFormat.FLAC: "audio/flac",
+        AudioFormat.OPUS: "audio/ogg",
+    }
 
     recording = models.ForeignKey(Recording, on_delete=models.CASCADE, related_name="audio_chunks")
-    audio_blob = models.BinaryField()
+    # Null when the audio is kept in the audio chunk store, in which case it's at audio_blob_offset in the object at audio_blob_key
+    audio_blob = models.BinaryField(null=True, blank=True)
+    audio_blob_key = models.CharField(max_length=512, null=True, blank=True)
+    audio_blob_offset = models.BigIntegerField(null=True, blank=True)
+    audio_blob_length = models.IntegerField(null=True, blank=True)
     audio_format = models.IntegerField(choices=AudioFormat.choices, default=AudioFormat.PCM)
     timestamp_ms = models.BigIntegerField()
     duration_ms = models.IntegerField()
@@ -1845,6 +1910,43 @@ class AudioChunk(models.Model):
     source = models.IntegerField(choices=Sources.choices, default=Sources.PER_PARTICIPANT_AUDIO)
     participant = models.ForeignKey(Participant, on_delete=models.PROTECT, related_name="audio_chunks")
 
+    def set_audio_blob(self, audio_blob):
+        # Takes raw PCM and compresses it according to AUDIO_CHUNK_COMPRESSION, so sample_rate must already be set
+        if settings.AUDIO_CHUNK_COMPRESSION in self.COMPRESSION_AUDIO_FORMATS:
+            audio_blob = compress_pcm(bytes(audio_blob), self.sample_rate, settings.AUDIO_CHUNK_COMPRESSION, bit_rate=settings.AUDIO_CHUNK_OPUS_BIT_RATE)
+            self.audio_format = self.COMPRESSION_AUDIO_FORMATS[settings.AUDIO_CHUNK_COMPRESSION]
+        else:
+            self.audio_format = AudioChunk.AudioFormat.PCM
+
+        audio_chunk_store = get_audio_chunk_store()
+        if audio_chunk_store is None:
+            self.audio_blob = audio_blob
+            return
+
+        audio_blob = bytes(audio_blob)
+        self.audio_blob_key = f"{recording_prefix(self.recording_id)}{uuid.uuid4().hex}"
+        audio_chunk_store.write(self.audio_blob_key, audio_blob)
+        self.audio_blob = None
+        self.audio_blob_offset = 0
+        self.audio_blob_length = len(audio_blob)
+
+    def get_stored_audio_blob(self):
+        # The audio as stored, which may be compressed. Returns a memoryview either way, since that's what the database gives us for a BinaryField
+        if not self.audio_blob_key:
+            return None if self.audio_blob is None else memoryview(self.audio_blob)
+
+        audio_chunk_store = get_audio_chunk_store()
+        if audio_chunk_store is None:
+            raise Exception(f"Audio chunk {self.id} is in the audio chunk store, but AUDIO_CHUNK_STORAGE_BACKEND is set to database")
+        return memoryview(audio_chunk_store.read(self.audio_blob_key, self.audio_blob_offset, self.audio_blob_length))
+
+    def get_audio_blob(self):
+        # The audio as raw PCM
+        stored_audio_blob = self.get_stored_audio_blob()
+        if self.audio_format == AudioChunk.AudioFormat.PCM or stored_audio_blob is None:
+            return stored_audio_blob
+        return memoryview(decompress_to_pcm(stored_audio_blob.tobytes(), self.sample_rate))
+
 
 class Utterance(models.Model):
     # If transcription is None and failure_data is not None, then the transcription failed
@@ -1883,6 +1985,12 @@ class Utterance(models.Model):
     audio_format = models.IntegerField(choices=AudioFormat.choices, default=AudioFormat.PCM, null=True)
     sample_rate = models.IntegerField(null=True, default=None)
 
+    class Meta:
+        indexes = [
+            # For reading a recording's transcript in order, a page at a time
+            models.Index(fields=["recording", "async_transcription", "timestamp_ms", "id"], name="utterance_transcript_idx", condition=Q(transcription__isnull=False)),
+        ]
+
     def __str__(self):
         return f"Utterance at {self.timestamp_ms}ms ({self.duration_ms}ms long)"
 
@@ -1890,7 +1998,7 @@ class Utterance(models.Model):
     # on the utterance model and not using the separate audio chunk model.
     def get_audio_blob(self):
         if self.audio_chunk:
-            return self.audio_chunk.audio_blob
+            return self.audio_chunk.get_audio_blob()
         return self.audio_blob
 
     def get_sample_rate(self):
@@ -1898,6 +2006,12 @@ class Utterance(models.Model):
             return self.audio_chunk.sample_rate
         return self.sample_rate
 
+    def get_compressed_audio(self):
+        # Returns the stored audio and its mime type if it's in a compressed format that transcription providers accept as is, otherwise None
+        if not self.audio_chunk or self.audio_chunk.audio_format not in AudioChunk.MIME_TYPES:
+            return None
+        return self.audio_chunk.get_stored_audio_blob().tobytes(), AudioChunk.MIME_TYPES[self.audio_chunk.audio_format]
+
 
 class Credentials(models.Model):
     class CredentialTypes(models.IntegerChoices):
@@ -2191,7 +2305,8 @@ class BotDebugScreenshot(models.Model):
     OBJECT_ID_PREFIX = "shot_"
     object_id = models.CharField(max_length=32, unique=True, editable=False)
 
-    bot_event = models.ForeignKey(BotEvent, on_delete=models.CASCADE, related_name="debug_screenshots")
+    # Bot events are partitioned by created_at, so Postgres can't enforce this foreign key. Deleting through the ORM still cascades.
+    bot_event = models.ForeignKey(BotEvent, on_delete=models.CASCADE, related_name="debug_screenshots", db_constraint=False)
 
     metadata = models.JSONField(null=False, default=dict)
 
@@ -2207,14 +2322,8 @@ class BotDebugScreenshot(models.Model):
 
     @property
     def url(self):
-        if not self.file.name:
-            return None
-        # Generate a temporary signed URL that expires in 30 minutes (1800 seconds)
-        return self.file.storage.bucket.meta.client.generate_presigned_url(
-            "get_object",
-            Params={"Bucket": self.file.storage.bucket_name, "Key": self.file.name},
-            ExpiresIn=1800,
-        )
+        # A signed URL that's valid for at least 30 minutes, and is handed out again until it's due to change
+        return get_presigned_url(self.file)
 
     def __str__(self):
         return f"Debug Screenshot {self.object_id} for event {self.bot_event}"
@@ -2304,9 +2413,17 @@ class WebhookSubscription(models.Model):
     url = models.URLField()
     triggers = models.JSONField(default=default_triggers)
     is_active = models.BooleanField(default=True)
+    # If batch_max_size is set, events are buffered for up to batch_max_delay_ms and delivered together as a JSON array
+    batch_max_size = models.IntegerField(null=True, blank=True)
+    batch_max_delay_ms = models.IntegerField(default=1000)
+    # When the next batch is due to be flushed, or null if no flush is scheduled
+    batch_flush_due_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    def delivers_in_batches(self):
+        return self.batch_max_size is not None
+
 
 class WebhookDeliveryAttemptStatus(models.IntegerChoices):
     PENDING = 1, "Pending"
@@ -2317,10 +2434,27 @@ class WebhookDeliveryAttemptStatus(models.IntegerChoices):
 class WebhookDeliveryAttempt(models.Model):
     webhook_subscription = models.ForeignKey(WebhookSubscription, on_delete=models.CASCADE, related_name="webhookdelivery_attempts")
     webhook_trigger_type = models.IntegerField(choices=WebhookTriggerTypes.choices, default=WebhookTriggerTypes.BOT_STATE_CHANGE, null=False)
-    idempotency_key = models.UUIDField(unique=True, editable=False)
-    bot = models.ForeignKey(Bot, on_delete=models.SET_NULL, null=True, related_name="webhook_delivery_attempts")
+    # Unique together with created_at, see Meta.constraints
+    idempotency_key = models.UUIDField(editable=False)
+    # Indexed together with created_at, see Meta.indexes
+    bot = models.ForeignKey(Bot, on_delete=models.SET_NULL, null=True, related_name="webhook_delivery_attempts", db_index=False)
     calendar = models.ForeignKey(Calendar, on_delete=models.SET_NULL, null=True, related_name="webhook_delivery_attempts")
     payload = models.JSONField(default=dict)
+    # Payloads larger than WEBHOOK_PAYLOAD_INLINE_LIMIT_BYTES are stored as compressed canonical JSON, either in payload_blob
+    # or in the webhook payload store at payload_blob_key. In that case payload is left empty and payload_size is set.
+    payload_blob = models.BinaryField(null=True, blank=True)
+    payload_blob_key = models.CharField(max_length=512, null=True, blank=True)
+    payload_size = models.IntegerField(null=True, blank=True)
+    payload_preview = models.TextField(null=True, blank=True)
+    payload_purged_at = models.DateTimeField(null=True, blank=True)
+    # Set when the attempt is claimed by a batch, for subscriptions that deliver in batches
+    batch_idempotency_key = models.UUIDField(null=True, blank=True, db_index=True)
+    # When the webhook dispatcher should next try to deliver this attempt, or null if it isn't waiting on the dispatcher
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    # The fields of the webhook other than its data, and the signature of the body they make up with the payload. Both are
+    # set on the first try, so that retries send exactly the same bytes with the same signature.
+    webhook_data = models.JSONField(null=True, blank=True)
+    signature = models.CharField(max_length=64, null=True, blank=True)
     status = models.IntegerField(choices=WebhookDeliveryAttemptStatus.choices, default=WebhookDeliveryAttemptStatus.PENDING, null=False)
     attempt_count = models.IntegerField(default=0)
     last_attempt_at = models.DateTimeField(null=True, blank=True)
@@ -2329,6 +2463,83 @@ class WebhookDeliveryAttempt(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    PAYLOAD_PREVIEW_LENGTH = 1000
+
+    class Meta:
+        indexes = [
+            # For finding large payloads whose retention period has passed
+            models.Index(fields=["succeeded_at"], name="webhook_attempt_purgeable_idx", condition=Q(payload_size__isnull=False, payload_purged_at__isnull=True)),
+            # For finding the attempts waiting to be claimed by a batch
+            models.Index(fields=["webhook_subscription", "created_at"], name="webhook_attempt_unbatched_idx", condition=Q(status=WebhookDeliveryAttemptStatus.PENDING, batch_idempotency_key__isnull=True)),
+            # For the webhook dispatcher to find the attempts that are due
+            models.Index(fields=["next_attempt_at"], name="webhook_attempt_due_idx", condition=Q(next_attempt_at__isnull=False)),
+            # For listing a bot's attempts, newest first
+            models.Index(fields=["bot", "created_at"], name="webhook_attempt_bot_idx"),
+        ]
+        constraints = [
+            # The table is partitioned by created_at, and Postgres can only enforce uniqueness across partitions when it includes the partition key
+            models.UniqueConstraint(fields=["idempotency_key", "created_at"], name="webhook_attempt_idempotency_key_uniq"),
+        ]
+
+    def payload_is_stored_out_of_line(self):
+        return self.payload_size is not None
+
+    def set_payload(self, payload, payload_json=None):
+        # payload_json is the canonical JSON of the payload, if the caller already has it
+        if payload_json is None:
+            payload_json = canonical_json(payload)
+        if len(payload_json) <= settings.WEBHOOK_PAYLOAD_INLINE_LIMIT_BYTES:
+            self.payload = payload
+            return
+
+        self.payload = {}
+        self.payload_size = len(payload_json)
+        self.payload_preview = payload_json[: self.PAYLOAD_PREVIEW_LENGTH].decode("utf-8", errors="ignore")
+        compressed_payload = zlib.compress(payload_json)
+        webhook_payload_store = get_webhook_payload_store()
+        if webhook_payload_store is None:
+            self.payload_blob = compressed_payload
+        else:
+            self.payload_blob_key = f"webhook_payloads/{self.idempotency_key}"
+            webhook_payload_store.write(self.payload_blob_key, compressed_payload)
+
+    def get_payload_json(self):
+        # The canonical JSON of the payload, which is what gets signed and sent
+        if not self.payload_is_stored_out_of_line():
+            return canonical_json(self.payload)
+        if self.payload_purged_at:
+            raise ValueError(f"The payload of webhook delivery attempt {self.id} was purged at {self.payload_purged_at}")
+        if self.payload_blob_key:
+            compressed_payload = get_webhook_payload_store().read(self.payload_blob_key)
+        else:
+            compressed_payload = bytes(self.payload_blob)
+        return zlib.decompress(compressed_payload)
+
+    def get_payload(self):
+        if not self.payload_is_stored_out_of_line():
+            return self.payload
+        return json.loads(self.get_payload_json())
+
+    def payload_preview_display(self):
+        if self.payload_purged_at:
+            return f"{self.payload_preview}... ({self.payload_size} bytes, full payload purged after delivery)"
+        return f"{self.payload_preview}... ({self.payload_size} bytes, truncated)"
+
+    @classmethod
+    def purge_expired_payloads(cls, batch_size=500):
+        """Drop the stored payloads of large webhooks that were delivered more than WEBHOOK_PAYLOAD_RETENTION_HOURS ago. Returns how many were purged."""
+        cutoff = timezone.now() - timezone.timedelta(hours=settings.WEBHOOK_PAYLOAD_RETENTION_HOURS)
+        delivery_attempts = list(cls.objects.filter(payload_size__isnull=False, payload_purged_at__isnull=True, succeeded_at__lt=cutoff).only("id", "payload_blob_key")[:batch_size])
+        if not delivery_attempts:
+            return 0
+
+        webhook_payload_store = get_webhook_payload_store()
+        for delivery_attempt in delivery_attempts:
+            if delivery_attempt.payload_blob_key and webhook_payload_store:
+                webhook_payload_store.delete(delivery_attempt.payload_blob_key)
+        cls.objects.filter(id__in=[delivery_attempt.id for delivery_attempt in delivery_attempts]).update(payload_blob=None, payload_blob_key=None, payload_purged_at=timezone.now())
+        return len(delivery_attempts)
+
     def add_to_response_body_list(self, response_body):
         """Add content to the response body list without saving."""
         if self.response_body_list is None:
@@ -2337,6 +2548,22 @@ class WebhookDeliveryAttempt(models.Model):
             self.response_body_list.append(response_body)
 
 
+class TaskOutboxEntry(models.Model):
+    """
+    A Celery task enqueued inside a database transaction. The entry is written in the same transaction as the rows the task
+    works on, and is published once the transaction has committed. Entries are deleted as soon as they are published.
+    """
+
+    task_name = models.CharField(max_length=255)
+    args = models.JSONField(default=list)
+    # When the task should run, or null if it should run right away
+    eta = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return f"{self.task_name}{tuple(self.args)}"
+
+
 class ChatMessageToOptions(models.IntegerChoices):
     ONLY_BOT = 1, "only_bot"
     EVERYONE = 2, "everyone"
@@ -2366,9 +2593,15 @@ class ChatMessage(models.Model):
 
 
 class BotResourceSnapshot(models.Model):
-    bot = models.ForeignKey(Bot, on_delete=models.CASCADE, related_name="resource_snapshots")
+    # Indexed together with created_at, see Meta.indexes
+    bot = models.ForeignKey(Bot, on_delete=models.CASCADE, related_name="resource_snapshots", db_index=False)
     data = models.JSONField(null=False, default=dict)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["bot", "created_at"], name="resource_snapshot_created_idx"),
+        ]
+
     def __str__(self):
         return f"Resource snapshot for {self.bot.object_id} at {self.created_at}"
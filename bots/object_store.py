@@ -0,0 +1,99 @@
+import functools
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+import boto3
+
+
+class ObjectStore(ABC):
+    """
+    Object storage for data that doesn't have to live in Postgres, like the raw audio of AudioChunks and large webhook payloads.
+    Callers namespace their keys with a prefix, so different kinds of objects can share a bucket or directory.
+    """
+
+    @abstractmethod
+    def write(self, key, data):
+        pass
+
+    @abstractmethod
+    def read(self, key, offset=0, length=None):
+        # Reads to the end of the object if length is None
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    @abstractmethod
+    def delete_prefix(self, prefix):
+        pass
+
+
+class S3ObjectStore(ObjectStore):
+    def __init__(self, bucket_name):
+        self.bucket_name = bucket_name
+        self.s3_client = boto3.client("s3", endpoint_url=os.getenv("AWS_ENDPOINT_URL"))
+
+    def write(self, key, data):
+        self.s3_client.put_object(Bucket=self.bucket_name, Key=key, Body=data)
+
+    def read(self, key, offset=0, length=None):
+        if length == 0:
+            return b""
+        # Only fetch the requested bytes of the object
+        byte_range = f"bytes={offset}-" if length is None else f"bytes={offset}-{offset + length - 1}"
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key, Range=byte_range)
+        return response["Body"].read()
+
+    def delete(self, key):
+        self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+
+    def delete_prefix(self, prefix):
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            objects = [{"Key": obj["Key"]} for obj in page.get("Contents", [])]
+            if objects:
+                self.s3_client.delete_objects(Bucket=self.bucket_name, Delete={"Objects": objects})
+
+
+class FileSystemObjectStore(ObjectStore):
+    def __init__(self, root_path):
+        self.root_path = root_path
+
+    def path_for_key(self, key):
+        return os.path.join(self.root_path, key)
+
+    def write(self, key, data):
+        path = self.path_for_key(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file first so readers never see a partially written object
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    def read(self, key, offset=0, length=None):
+        with open(self.path_for_key(key), "rb") as file:
+            file.seek(offset)
+            return file.read(-1 if length is None else length)
+
+    def delete(self, key):
+        path = self.path_for_key(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def delete_prefix(self, prefix):
+        path = self.path_for_key(prefix)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+
+
+@functools.lru_cache(maxsize=None)
+def build_object_store(backend, location):
+    # location is the bucket name for the s3 backend, and the root directory for the filesystem one
+    if backend == "s3":
+        return S3ObjectStore(bucket_name=location)
+    if backend == "filesystem":
+        return FileSystemObjectStore(root_path=location)
+    raise ValueError(f"Unknown object storage backend: {backend}")
@@ -0,0 +1,33 @@
+import codecs
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+from bots.renderers import DIGITS_TO_ZERO
+
+# orjson reads integers over 64 bits as floats, so bodies with a run of 19 digits or more are parsed with json instead
+LONG_NUMBER = b"0" * 19
+
+
+class ORJSONParser(JSONParser):
+    """
+    Parses bodies into the same data as JSONParser, several times faster for large ones. Bodies that orjson can't parse
+    the same way, e.g. ones that aren't UTF-8, have integers over 64 bits or aren't valid JSON, are parsed by JSONParser,
+    which also raises the same errors for them.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+
+        body = stream.read()
+        if LONG_NUMBER not in body.translate(DIGITS_TO_ZERO):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                pass
+        return super().parse(io.BytesIO(body), media_type, parser_context)
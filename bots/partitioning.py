@@ -0,0 +1,180 @@
+import datetime
+import logging
+import re
+from dataclasses import dataclass
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from bots.models import BotDebugScreenshot, BotEvent, BotResourceSnapshot, BotStates, ParticipantEvent, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus
+from bots.webhook_payload_store import get_webhook_payload_store
+
+logger = logging.getLogger(__name__)
+
+# These tables are range partitioned by created_at, with a partition per month, see migrations 0067 and 0068. Rows created in a month
+# that doesn't have a partition yet go to the default partition.
+PARTITIONED_MODELS = [BotEvent, ParticipantEvent, WebhookDeliveryAttempt, BotResourceSnapshot]
+
+# Which rows the retention period applies to. The rows of bots that haven't ended are kept however old they are, since the
+# bot still needs them, and so are webhooks that are still waiting to be delivered.
+EXPIRABLE_ROWS = {
+    BotEvent: Q(bot__state__in=BotStates.post_meeting_states()),
+    ParticipantEvent: Q(participant__bot__state__in=BotStates.post_meeting_states()),
+    WebhookDeliveryAttempt: ~Q(status=WebhookDeliveryAttemptStatus.PENDING),
+    BotResourceSnapshot: Q(bot__state__in=BotStates.post_meeting_states()),
+}
+
+PROJECT_LOOKUPS = {
+    BotEvent: "bot__project",
+    ParticipantEvent: "participant__bot__project",
+    WebhookDeliveryAttempt: "webhook_subscription__project",
+    BotResourceSnapshot: "bot__project",
+}
+
+PARTITION_BOUND_REGEX = re.compile(r"FOR VALUES FROM \((?:MINVALUE|'(?P<start>[^']+)')\) TO \('(?P<end>[^']+)'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    # None for the partition that holds everything created before end
+    start: datetime.datetime | None
+    end: datetime.datetime
+
+
+def month_start(moment):
+    return moment.astimezone(datetime.timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def next_month_start(moment):
+    return month_start(month_start(moment) + datetime.timedelta(days=32))
+
+
+def get_partitions(model):
+    """The partitions of the model's table other than the default partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT partition.relname, pg_get_expr(partition.relpartbound, partition.oid) FROM pg_inherits JOIN pg_class partition ON partition.oid = pg_inherits.inhrelid WHERE pg_inherits.inhparent = %s::regclass",
+            [model._meta.db_table],
+        )
+        rows = cursor.fetchall()
+
+    partitions = []
+    for name, bound in rows:
+        match = PARTITION_BOUND_REGEX.fullmatch(bound)
+        if match:
+            partitions.append(Partition(name=name, start=parse_datetime(match["start"]) if match["start"] else None, end=parse_datetime(match["end"])))
+    return sorted(partitions, key=lambda partition: partition.end)
+
+
+def create_partitions(model, months_ahead):
+    """
+    Create the monthly partitions of the model's table up to months_ahead months from now. Rows that went to the default
+    partition because their month didn't have a partition yet are moved into the new one. Returns the names of the
+    partitions that were created.
+    """
+    table = model._meta.db_table
+    last_month = month_start(timezone.now())
+    for _ in range(months_ahead):
+        last_month = next_month_start(last_month)
+
+    created_partitions = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # So that schedulers running at the same time don't try to create the same partition
+        cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [table])
+        partitions = get_partitions(model)
+        month = partitions[-1].end if partitions else month_start(timezone.now())
+        while month <= last_month:
+            end = next_month_start(month)
+            partition = f"{table}_p{month:%Y%m}"
+            cursor.execute(f'CREATE TABLE "{partition}" (LIKE "{table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+            cursor.execute(f'WITH moved AS (DELETE FROM "{table}_default" WHERE created_at >= %s AND created_at < %s RETURNING *) INSERT INTO "{partition}" SELECT * FROM moved', [month, end])
+            cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{partition}" FOR VALUES FROM (%s) TO (%s)', [month, end])
+            created_partitions.append(partition)
+            month = end
+    return created_partitions
+
+
+def expired_rows(model, cutoff):
+    return model.objects.filter(EXPIRABLE_ROWS[model], created_at__lt=cutoff)
+
+
+def delete_stored_data(model, rows):
+    """Delete what the rows keep outside their own table. Must be called in the transaction that deletes the rows."""
+    if model is BotEvent:
+        BotDebugScreenshot.objects.filter(bot_event__in=rows).delete()
+    elif model is WebhookDeliveryAttempt:
+        webhook_payload_store = get_webhook_payload_store()
+        if webhook_payload_store:
+            payload_blob_keys = list(rows.filter(payload_blob_key__isnull=False).values_list("payload_blob_key", flat=True))
+            # Object storage isn't transactional, so only remove the payloads once the rows are gone for good
+            transaction.on_commit(lambda: [webhook_payload_store.delete(payload_blob_key) for payload_blob_key in payload_blob_keys])
+
+
+def expire_partitions(model, cutoff, archive=False):
+    """
+    Remove the partitions of the model's table that only hold rows created before cutoff, unless some of their rows have to be
+    kept. They are dropped, or detached from the table to be archived if archive is set. Returns the names of the partitions
+    that were removed.
+    """
+    table = model._meta.db_table
+    removed_partitions = []
+    for partition in get_partitions(model):
+        if partition.end > cutoff:
+            break
+
+        rows = model.objects.filter(created_at__lt=partition.end)
+        if partition.start is not None:
+            rows = rows.filter(created_at__gte=partition.start)
+        if rows.exclude(EXPIRABLE_ROWS[model]).exists():
+            logger.info("Not removing partition %s since it has rows of bots that haven't ended or webhooks that haven't been delivered", partition.name)
+            continue
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            delete_stored_data(model, rows)
+            if archive:
+                cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{partition.name}"')
+            else:
+                cursor.execute(f'DROP TABLE "{partition.name}"')
+        removed_partitions.append(partition.name)
+    return removed_partitions
+
+
+def delete_expired_rows(model, project, cutoff, batch_size=1000):
+    """Delete the project's rows of the model's table that were created before cutoff, in batches. Returns how many were deleted."""
+    deleted_count = 0
+    project_expired_rows = expired_rows(model, cutoff).filter(**{PROJECT_LOOKUPS[model]: project})
+    while ids := list(project_expired_rows.values_list("id", flat=True)[:batch_size]):
+        with transaction.atomic():
+            rows = model.objects.filter(id__in=ids, created_at__lt=cutoff)
+            delete_stored_data(model, rows)
+            rows.delete()
+        deleted_count += len(ids)
+    return deleted_count
+
+
+def remove_expired_data(archive=False, batch_size=1000):
+    """
+    Remove the rows of the partitioned tables once they are older than their project's retention period. Whole partitions
+    are removed once they are older than the longest retention period of any project, and the rows of projects with
+    shorter retention periods are deleted from the partitions that are left. Returns the names of the partitions that were
+    removed and how many rows were deleted.
+    """
+    now = timezone.now()
+    retention_days_by_project = {project: project.effective_data_retention_days() for project in Project.objects.all()}
+
+    removed_partitions = []
+    if retention_days_by_project and None not in retention_days_by_project.values():
+        partition_cutoff = now - datetime.timedelta(days=max(retention_days_by_project.values()))
+        for model in PARTITIONED_MODELS:
+            removed_partitions += expire_partitions(model, partition_cutoff, archive=archive)
+
+    deleted_count = 0
+    for project, retention_days in retention_days_by_project.items():
+        if retention_days is None:
+            continue
+        for model in PARTITIONED_MODELS:
+            deleted_count += delete_expired_rows(model, project, now - datetime.timedelta(days=retention_days), batch_size=batch_size)
+    return removed_partitions, deleted_count
@@ -0,0 +1,88 @@
+import logging
+import math
+import threading
+import time
+
+import redis
+from cachetools import TTLCache
+from django.conf import settings
+
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "presigned_url"
+
+# How long a URL is valid for, at least, from when it's handed out
+MIN_VALIDITY_SECONDS = 1800
+
+# Signed URLs for files in S3 are handed out by expiry bucket, rather than signed again on every request, so that
+# browsers and CDNs can cache what they point to. Time is split into buckets of PRESIGNED_URL_CACHE_BUCKET_SECONDS, and
+# every URL handed out for a file during a bucket is the same one, which expires MIN_VALIDITY_SECONDS after the bucket
+# ends. The first process to sign a URL in a bucket stores it in Redis for the others, and each process also keeps the
+# URLs it has handed out, so a page with many files doesn't need a round trip to Redis for each of them.
+_cache = TTLCache(maxsize=settings.PRESIGNED_URL_CACHE_MAX_ENTRIES, ttl=settings.PRESIGNED_URL_CACHE_BUCKET_SECONDS)
+_cache_lock = threading.Lock()
+
+
+def cache_key(bucket_name, name, expiry_bucket):
+    return f"{KEY_PREFIX}:{bucket_name}:{expiry_bucket}:{name}"
+
+
+def sign_url(storage, name, expires_in):
+    return storage.bucket.meta.client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": storage.bucket_name, "Key": name},
+        ExpiresIn=expires_in,
+    )
+
+
+def seconds_until_url_changes(now=None):
+    """
+    Returns how long the URLs handed out now will keep being handed out, so responses that contain them can be cached for that long.
+    """
+    now = time.time() if now is None else now
+    bucket_seconds = settings.PRESIGNED_URL_CACHE_BUCKET_SECONDS
+    return max(math.ceil(bucket_seconds - now % bucket_seconds), 1)
+
+
+def get_presigned_url(file):
+    """
+    Returns a signed URL for the file that's valid for at least MIN_VALIDITY_SECONDS, or None if the file has no name.
+    """
+    if not file.name:
+        return None
+
+    now = time.time()
+    expiry_bucket = int(now // settings.PRESIGNED_URL_CACHE_BUCKET_SECONDS)
+    key = cache_key(file.storage.bucket_name, file.name, expiry_bucket)
+    with _cache_lock:
+        url = _cache.get(key)
+    if url is not None:
+        return url
+
+    seconds_left_in_bucket = seconds_until_url_changes(now)
+    expires_in = seconds_left_in_bucket + MIN_VALIDITY_SECONDS
+    url = None
+    try:
+        redis_client = get_redis_client()
+        shared_url = redis_client.get(key)
+        if shared_url is None:
+            url = sign_url(file.storage, file.name, expires_in)
+            # Another process may have stored its URL first, in which case that one is used
+            shared_url = redis_client.set(key, url, ex=seconds_left_in_bucket, nx=True, get=True)
+        if shared_url is not None:
+            url = shared_url.decode()
+    except redis.RedisError as e:
+        logger.warning(f"Could not share the signed URL for {file.name} with other processes: {e}")
+    if url is None:
+        url = sign_url(file.storage, file.name, expires_in)
+
+    with _cache_lock:
+        _cache[key] = url
+    return url
+
+
+def clear_local_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -51,6 +51,7 @@ from .models import (
 )
 from .stripe_utils import credit_amount_for_purchase_amount_dollars, process_checkout_session_completed
 from .utils import generate_recordings_json_for_bot_detail_view
+from .webhook_circuit_breaker import WebhookCircuitBreaker
 
 logger = logging.getLogger(__name__)
 
@@ -551,7 +552,7 @@ class ProjectCalendarDetailView(LoginRequiredMixin, ProjectUrlContextMixin, List
         project = get_project_for_user(user=self.request.user, project_object_id=self.kwargs["object_id"])
 
         # Get webhook delivery attempts for this calendar (from calendar-related webhook subscriptions)
-        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(calendar=calendar).select_related("webhook_subscription").order_by("-created_at")
+        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(calendar=calendar).select_related("webhook_subscription").defer("payload_blob").order_by("-created_at")
 
         context.update(self.get_project_context(self.kwargs["object_id"], project))
         context.update(
@@ -616,7 +617,7 @@ class ProjectBotDetailView(LoginRequiredMixin, ProjectUrlContextMixin, View):
             return redirect("bots:project-bots", object_id=object_id)
 
         # Get webhook delivery attempts for this bot (from both project-level and bot-specific webhook subscriptions)
-        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=bot).select_related("webhook_subscription").order_by("-created_at")
+        webhook_delivery_attempts = WebhookDeliveryAttempt.objects.filter(bot=bot).select_related("webhook_subscription").defer("payload_blob").order_by("-created_at")
 
         # Get chat messages for this bot
         chat_messages = ChatMessage.objects.filter(bot=bot).select_related("participant").order_by("created_at")
@@ -704,7 +705,10 @@ class ProjectWebhooksView(LoginRequiredMixin, ProjectUrlContextMixin, View):
 
         context = self.get_project_context(object_id, project)
         # Only show project-level webhooks, not bot-level ones
-        context["webhooks"] = project.webhook_subscriptions.filter(bot__isnull=True).order_by("-created_at")
+        context["webhooks"] = list(project.webhook_subscriptions.filter(bot__isnull=True).order_by("-created_at"))
+        if settings.WEBHOOK_CIRCUIT_BREAKER_ENABLED:
+            for webhook in context["webhooks"]:
+                webhook.circuit_status = WebhookCircuitBreaker(webhook.url).status()
         context["webhook_options"] = [trigger_type for trigger_type in WebhookTriggerTypes]
         context["webhook_secret"] = base64.b64encode(webhook_secret.get_secret()).decode("utf-8")
         return render(request, "projects/project_webhooks.html", context)
@@ -859,9 +863,16 @@ class CreateWebhookView(LoginRequiredMixin, ProjectUrlContextMixin, View):
         url = request.POST.get("url")
         triggers = request.POST.getlist("triggers[]")
 
+        # Batching is optional, leaving the fields blank delivers each event on its own
+        try:
+            batch_max_size = int(request.POST["batch_max_size"]) if request.POST.get("batch_max_size") else None
+            batch_max_delay_ms = int(request.POST["batch_max_delay_ms"]) if request.POST.get("batch_max_delay_ms") else None
+        except ValueError:
+            return HttpResponse("Batch settings must be whole numbers", status=400)
+
         # Create webhook subscription using shared function
         try:
-            create_webhook_subscription(url, triggers, project, bot=None)
+            create_webhook_subscription(url, triggers, project, bot=None, batch_max_size=batch_max_size, batch_max_delay_ms=batch_max_delay_ms)
         except ValidationError as e:
             return HttpResponse(e.messages[0], status=400)
 
@@ -0,0 +1,45 @@
+import os
+import threading
+
+import redis
+from django.conf import settings
+from redis.backoff import EqualJitterBackoff
+from redis.retry import Retry
+
+# Every process shares one client, so the API views, Celery tasks and bot processes reuse pooled connections instead of
+# opening a new one, with its TCP and TLS handshakes, for each command. Connections that have been idle for longer than
+# REDIS_HEALTH_CHECK_INTERVAL_SECONDS are checked with a PING before they're used, and commands that fail because the
+# connection dropped are retried on a new one, backing off between attempts. A retried command runs twice if the
+# connection dropped after Redis ran it. The pool is reset in a forked child, so Celery's worker processes don't share
+# the parent's sockets.
+
+_redis_client = None
+_redis_client_lock = threading.Lock()
+
+
+def redis_url():
+    return os.getenv("REDIS_URL") + ("?ssl_cert_reqs=none" if os.getenv("DISABLE_REDIS_SSL") else "")
+
+
+def reconnect_backoff():
+    return EqualJitterBackoff(cap=settings.REDIS_RECONNECT_BACKOFF_CAP_SECONDS, base=settings.REDIS_RECONNECT_BACKOFF_BASE_SECONDS)
+
+
+def create_connection_pool():
+    return redis.ConnectionPool.from_url(
+        redis_url(),
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT_SECONDS,
+        socket_keepalive=True,
+        retry=Retry(reconnect_backoff(), settings.REDIS_RETRIES),
+        retry_on_error=[redis.ConnectionError, redis.TimeoutError],
+    )
+
+
+def get_redis_client():
+    global _redis_client
+    if _redis_client is None:
+        with _redis_client_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis(connection_pool=create_connection_pool())
+    return _redis_client
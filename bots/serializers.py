@@ -8,6 +8,7 @@ logger = logging.getLogger(__name__)
 
 import jsonschema
 from dateutil.relativedelta import relativedelta
+from django.db.models import OuterRef, Prefetch, Subquery
 from django.utils import timezone
 from drf_spectacular.utils import (
     OpenApiExample,
@@ -22,6 +23,7 @@ from .models import (
     AsyncTranscriptionStates,
     Bot,
     BotChatMessageToOptions,
+    BotEvent,
     BotEventSubTypes,
     BotEventTypes,
     BotStates,
@@ -55,6 +57,26 @@ def get_openai_model_enum():
 from .meeting_url_utils import meeting_type_from_url, normalize_meeting_url
 from .utils import is_valid_png, transcription_provider_from_bot_creation_data
 
+# The validator for each schema, by the schema's id. The schema is kept with it, so its id can't be reused by another object
+_schema_validators = {}
+
+
+def validate_json_schema(instance, schema):
+    """
+    Same as jsonschema.validate, except that the schema is only checked against its metaschema, which takes much longer
+    than validating a typical instance, the first time it's used.
+    """
+    cached = _schema_validators.get(id(schema))
+    if cached is None or cached[0] is not schema:
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        cached = _schema_validators[id(schema)] = (schema, validator_class(schema))
+
+    error = jsonschema.exceptions.best_match(cached[1].iter_errors(instance))
+    if error is not None:
+        raise error
+
+
 # Define the schema once
 BOT_IMAGE_SCHEMA = {
     "type": "object",
@@ -161,6 +183,10 @@ class BotImageSerializer(serializers.Serializer):
                         "type": "string",
                         "description": "The URL to send the transcriptions to. If used, the transcriptions will be sent directly from Deepgram to your server so you will not be able to access them via the Attendee API. See here for details: https://developers.deepgram.com/docs/callback",
                     },
+                    "use_streaming": {
+                        "type": "boolean",
+                        "description": "Whether to transcribe each participant's audio over a streaming connection instead of in batches. The transcriptions are saved and sent to your webhook as soon as Deepgram finalizes each segment. Streaming is always used when a callback is specified.",
+                    },
                     "keyterms": {
                         "type": "array",
                         "items": {"type": "string"},
@@ -471,6 +497,18 @@ def get_webhook_trigger_enum():
                     "description": "List of webhook trigger types",
                     "uniqueItems": True,
                 },
+                "batch_max_size": {
+                    "type": "integer",
+                    "minimum": 1,
+                    "maximum": 1000,
+                    "description": "If set, events are buffered and delivered together as a JSON array of up to this many webhooks, signed as a whole. Each item has its own idempotency_key.",
+                },
+                "batch_max_delay_ms": {
+                    "type": "integer",
+                    "minimum": 0,
+                    "maximum": 60000,
+                    "description": "The longest an event is buffered before its batch is delivered. Only used if batch_max_size is set. Defaults to 1000.",
+                },
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -684,6 +722,8 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                     "minItems": 1,
                     "uniqueItems": True,
                 },
+                "batch_max_size": {"type": "integer", "minimum": 1, "maximum": 1000},
+                "batch_max_delay_ms": {"type": "integer", "minimum": 0, "maximum": 60000},
             },
             "required": ["url", "triggers"],
             "additionalProperties": False,
@@ -695,7 +735,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             return value
 
         try:
-            jsonschema.validate(instance=value, schema=self.WEBHOOKS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.WEBHOOKS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -718,7 +758,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             return value
 
         try:
-            jsonschema.validate(instance=value, schema=self.CALLBACK_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.CALLBACK_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -748,7 +788,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             return value
 
         try:
-            jsonschema.validate(instance=value, schema=self.EXTERNAL_MEDIA_STORAGE_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.EXTERNAL_MEDIA_STORAGE_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -773,7 +813,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             raise serializers.ValidationError("Voice agents are not enabled. Please set the ENABLE_VOICE_AGENTS environment variable to true to use voice agents.")
 
         try:
-            jsonschema.validate(instance=value, schema=self.VOICE_AGENT_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.VOICE_AGENT_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -809,6 +849,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                     },
                     "detect_language": {"type": "boolean"},
                     "callback": {"type": "string"},
+                    "use_streaming": {"type": "boolean"},
                     "keyterms": {"type": "array", "items": {"type": "string"}},
                     "keywords": {"type": "array", "items": {"type": "string"}},
                     "model": {"type": "string"},
@@ -1096,7 +1137,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                 return None
 
         try:
-            jsonschema.validate(instance=value, schema=self.TRANSCRIPTION_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.TRANSCRIPTION_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1114,7 +1155,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             if transcription_provider_from_bot_creation_data(initial_data_with_value) == TranscriptionProviders.CLOSED_CAPTION_FROM_PLATFORM:
                 raise serializers.ValidationError({"transcription_settings": "Closed caption based transcription is not supported for Zoom when using the native SDK. Please set 'zoom_settings.sdk' to 'web' in the bot creation request."})
 
-        if value.get("deepgram", {}).get("callback") and value.get("deepgram", {}).get("detect_language"):
+        if (value.get("deepgram", {}).get("callback") or value.get("deepgram", {}).get("use_streaming")) and value.get("deepgram", {}).get("detect_language"):
             raise serializers.ValidationError({"transcription_settings": "Language detection is not supported for streaming transcription. Please pass language='multi' instead of detect_language=true."})
 
         return value
@@ -1154,7 +1195,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
                 value["audio"]["sample_rate"] = 16000
 
         try:
-            jsonschema.validate(instance=value, schema=self.WEBSOCKET_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.WEBSOCKET_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1187,7 +1228,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             return value
 
         try:
-            jsonschema.validate(instance=value, schema=self.RTMP_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.RTMP_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1227,7 +1268,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
         defaults = {"format": RecordingFormats.MP4, "view": RecordingViews.SPEAKER_VIEW, "resolution": RecordingResolutions.HD_1080P, "record_chat_messages_when_paused": False}
 
         try:
-            jsonschema.validate(instance=value, schema=self.RECORDING_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.RECORDING_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1272,7 +1313,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
         defaults = {"use_login": False}
 
         try:
-            jsonschema.validate(instance=value, schema=self.TEAMS_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.TEAMS_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1321,7 +1362,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
         defaults = {"sdk": "native"}
 
         try:
-            jsonschema.validate(instance=value, schema=self.ZOOM_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.ZOOM_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1353,7 +1394,7 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
             return value
 
         try:
-            jsonschema.validate(instance=value, schema=self.DEBUG_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.DEBUG_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1432,6 +1473,10 @@ class CreateBotSerializer(BotValidationMixin, serializers.Serializer):
         return data
 
 
+# Named in SPECTACULAR_SETTINGS, since both BotSerializer and BotStatusSerializer use it
+BOT_STATE_API_CODES = [BotStates.state_to_api_code(state.value) for state in BotStates]
+
+
 class BotSerializer(serializers.ModelSerializer):
     id = serializers.CharField(source="object_id")
     metadata = serializers.SerializerMethodField()
@@ -1442,10 +1487,37 @@ class BotSerializer(serializers.ModelSerializer):
     join_at = serializers.DateTimeField()
     deduplication_key = serializers.CharField()
 
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """
+        Prefetch the events of the bots and annotate them with the states of their default recording, so that serializing
+        any number of them takes two queries instead of three per bot.
+        """
+        return cls.annotate_default_recording_states(queryset.prefetch_related(Prefetch("bot_events", queryset=BotEvent.objects.order_by("created_at"))))
+
+    @classmethod
+    def annotate_default_recording_states(cls, queryset):
+        """
+        Annotate the bots with the state and transcription state of their default recording, so they're fetched in the same query.
+        """
+        default_recording = Recording.objects.filter(bot=OuterRef("pk"), is_default_recording=True).order_by("pk")
+        return queryset.annotate(
+            default_recording_state=Subquery(default_recording.values("state")[:1]),
+            default_recording_transcription_state=Subquery(default_recording.values("transcription_state")[:1]),
+        )
+
+    def default_recording_states(self, obj):
+        # The state and transcription state of the bot's default recording, or None if it doesn't have one
+        if not hasattr(obj, "default_recording_state"):
+            return Recording.objects.filter(bot=obj, is_default_recording=True).values_list("state", "transcription_state").first()
+        if obj.default_recording_state is None:
+            return None
+        return obj.default_recording_state, obj.default_recording_transcription_state
+
     @extend_schema_field(
         {
             "type": "string",
-            "enum": [BotStates.state_to_api_code(state.value) for state in BotStates],
+            "enum": BOT_STATE_API_CODES,
         }
     )
     def get_state(self, obj):
@@ -1487,11 +1559,11 @@ class BotSerializer(serializers.ModelSerializer):
         }
     )
     def get_transcription_state(self, obj):
-        default_recording = Recording.objects.filter(bot=obj, is_default_recording=True).first()
-        if not default_recording:
+        default_recording_states = self.default_recording_states(obj)
+        if not default_recording_states:
             return None
 
-        return RecordingTranscriptionStates.state_to_api_code(default_recording.transcription_state)
+        return RecordingTranscriptionStates.state_to_api_code(default_recording_states[1])
 
     @extend_schema_field(
         {
@@ -1500,11 +1572,11 @@ class BotSerializer(serializers.ModelSerializer):
         }
     )
     def get_recording_state(self, obj):
-        default_recording = Recording.objects.filter(bot=obj, is_default_recording=True).first()
-        if not default_recording:
+        default_recording_states = self.default_recording_states(obj)
+        if not default_recording_states:
             return None
 
-        return RecordingStates.state_to_api_code(default_recording.state)
+        return RecordingStates.state_to_api_code(default_recording_states[0])
 
     class Meta:
         model = Bot
@@ -1522,6 +1594,49 @@ class BotSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
 
+# The state of a bot and of its default recording. Serializing bots annotated with annotate_default_recording_states doesn't take any queries.
+class BotStatusSerializer(BotSerializer):
+    metadata = None
+    events = None
+    join_at = None
+    deduplication_key = None
+
+    class Meta(BotSerializer.Meta):
+        fields = ["id", "state", "recording_state", "transcription_state"]
+        read_only_fields = fields
+
+
+class BotStatusListSerializer(serializers.Serializer):
+    results = BotStatusSerializer(many=True, help_text="The bots that were found, in the order their IDs were given")
+    not_found = serializers.ListField(child=serializers.CharField(), help_text="The IDs that don't belong to a bot in the project")
+
+
+@extend_schema_field(CreateBotSerializer(many=True))
+class CreateBotsListField(serializers.ListField):
+    pass
+
+
+class CreateBotsSerializer(serializers.Serializer):
+    MAX_BOTS = 500
+
+    bots = CreateBotsListField(
+        child=serializers.DictField(),
+        min_length=1,
+        max_length=MAX_BOTS,
+        help_text=f"The bots to create, with the same fields as when creating a single bot. Up to {MAX_BOTS} bots can be created at once.",
+    )
+
+
+class BotCreationResultSerializer(serializers.Serializer):
+    status = serializers.IntegerField(help_text="201 if the bot was created, 400 if it was not")
+    bot = BotSerializer(required=False, help_text="The bot that was created")
+    error = serializers.JSONField(required=False, help_text="Why the bot was not created, in the same format as the errors returned when creating a single bot")
+
+
+class CreateBotsResultSerializer(serializers.Serializer):
+    results = BotCreationResultSerializer(many=True, help_text="The result for each bot, in the order they were given")
+
+
 class TranscriptUtteranceSerializer(serializers.Serializer):
     speaker_name = serializers.CharField()
     speaker_uuid = serializers.CharField()
@@ -1618,7 +1733,7 @@ class SpeechSerializer(serializers.Serializer):
             return None
 
         try:
-            jsonschema.validate(instance=value, schema=self.TEXT_TO_SPEECH_SETTINGS_SCHEMA)
+            validate_json_schema(instance=value, schema=self.TEXT_TO_SPEECH_SETTINGS_SCHEMA)
         except jsonschema.exceptions.ValidationError as e:
             raise serializers.ValidationError(e.message)
 
@@ -1919,7 +2034,7 @@ class CalendarEventSerializer(serializers.ModelSerializer):
     @extend_schema_field(BotSerializer(many=True))
     def get_bots(self, obj):
         """Get associated bots for this calendar event"""
-        return BotSerializer(obj.bots.all(), many=True).data
+        return BotSerializer(BotSerializer.prefetch_queryset(obj.bots.all()), many=True).data
 
     class Meta:
         model = CalendarEvent
@@ -0,0 +1,104 @@
+import logging
+import threading
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from bots.models import TaskOutboxEntry
+
+logger = logging.getLogger(__name__)
+
+_local = threading.local()
+
+
+class OutboxBatch:
+    """
+    The tasks enqueued during one transaction. It's registered with transaction.on_commit, so they are all published
+    together as soon as the transaction commits. Anything it fails to publish is left for the relay.
+    """
+
+    def __init__(self):
+        self.tasks_by_entry_id = {}
+
+    def __call__(self):
+        try:
+            with transaction.atomic():
+                # Entries the relay is already publishing are locked, and entries rolled back with a savepoint are gone
+                entries = list(TaskOutboxEntry.objects.select_for_update(skip_locked=True).filter(id__in=self.tasks_by_entry_id).order_by("id"))
+                publish_outbox_entries(entries, self.tasks_by_entry_id)
+        except Exception:
+            logger.exception(f"Could not publish {len(self.tasks_by_entry_id)} tasks from the task outbox, the relay will publish them")
+
+
+def enqueue_task(task, args=(), countdown=None):
+    """
+    Enqueue a Celery task. Inside a transaction, the task is written to the task outbox and only published once the
+    transaction commits, so it can't run before the rows it works on are visible, and is never sent if the transaction
+    rolls back. Outside a transaction it's published right away.
+    """
+    args = list(args)
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        if countdown is None:
+            task.delay(*args)
+        else:
+            task.apply_async(args=args, countdown=countdown)
+        return
+
+    eta = timezone.now() + timezone.timedelta(seconds=countdown) if countdown is not None else None
+    entry = TaskOutboxEntry.objects.create(task_name=task.name, args=args, eta=eta)
+
+    # Django drops the on_commit callbacks of a transaction or savepoint that rolls back, so a batch is only reused while it's still registered
+    batch = getattr(_local, "batch", None)
+    if batch is None or not any(callback is batch for _, callback, _ in connection.run_on_commit):
+        batch = _local.batch = OutboxBatch()
+        transaction.on_commit(batch)
+    batch.tasks_by_entry_id[entry.id] = task
+
+
+def publish_outbox_entries(entries, tasks_by_entry_id=None):
+    """
+    Publish locked task outbox entries over a single broker connection and delete the ones that were published.
+    Stops at the first entry that fails to publish, since the broker is most likely unreachable. Returns how many were published.
+    """
+    tasks_by_entry_id = tasks_by_entry_id or {}
+    published_entry_ids = []
+    with current_app.producer_or_acquire() as producer:
+        for entry in entries:
+            task = tasks_by_entry_id.get(entry.id)
+            if task is None:
+                try:
+                    task = import_string(entry.task_name)
+                except ImportError:
+                    logger.error(f"Task outbox entry {entry.id} refers to unknown task {entry.task_name}, skipping it")
+                    continue
+
+            try:
+                task.apply_async(args=entry.args, eta=entry.eta, producer=producer)
+            except Exception:
+                logger.exception(f"Could not publish task outbox entry {entry.id} ({entry.task_name})")
+                break
+            published_entry_ids.append(entry.id)
+
+    TaskOutboxEntry.objects.filter(id__in=published_entry_ids).delete()
+    return len(published_entry_ids)
+
+
+def relay_task_outbox(batch_size=500):
+    """
+    Publish the task outbox entries that weren't published when their transaction committed, because the process died or
+    the broker was unreachable. Only entries older than TASK_OUTBOX_RELAY_DELAY_SECONDS are relayed, so the on_commit
+    fast path gets to publish its own. Returns how many were published.
+    """
+    cutoff = timezone.now() - timezone.timedelta(seconds=settings.TASK_OUTBOX_RELAY_DELAY_SECONDS)
+    published_count = 0
+    while True:
+        with transaction.atomic():
+            entries = list(TaskOutboxEntry.objects.select_for_update(skip_locked=True).filter(created_at__lt=cutoff).order_by("id")[:batch_size])
+            batch_published_count = publish_outbox_entries(entries) if entries else 0
+        published_count += batch_published_count
+        if batch_published_count < batch_size:
+            return published_count
@@ -0,0 +1,52 @@
+import json
+import time
+
+import redis
+from django.conf import settings
+
+# Kombu's Redis transport emulates priorities by keeping a separate list per priority step for each queue.
+# Priority 0 lives under the queue's own name, the other steps under "<queue><sep><priority>".
+PRIORITY_STEPS = [0, 3, 6, 9]
+PRIORITY_SEP = "\x06\x16"
+
+
+def _queue_list_keys(queue_name):
+    return [queue_name if priority == 0 else f"{queue_name}{PRIORITY_SEP}{priority}" for priority in PRIORITY_STEPS]
+
+
+def _published_at(raw_message):
+    try:
+        return float(json.loads(raw_message)["headers"]["published_at"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def get_task_queue_metrics(redis_client=None):
+    """
+    Returns the depth of each Celery queue and how long its oldest message has been waiting.
+    Messages are pushed onto the left of each list and consumed from the right, so the oldest one is last.
+    """
+    redis_client = redis_client or redis.from_url(settings.CELERY_BROKER_URL)
+    queue_names = [queue.name for queue in settings.CELERY_TASK_QUEUES]
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for queue_name in queue_names:
+        for key in _queue_list_keys(queue_name):
+            pipeline.llen(key)
+            pipeline.lindex(key, -1)
+    results = pipeline.execute()
+
+    now = time.time()
+    metrics = []
+    for i, queue_name in enumerate(queue_names):
+        queue_results = results[i * len(PRIORITY_STEPS) * 2 : (i + 1) * len(PRIORITY_STEPS) * 2]
+        depth = sum(queue_results[0::2])
+        published_ats = [published_at for published_at in (_published_at(raw_message) for raw_message in queue_results[1::2] if raw_message) if published_at is not None]
+        metrics.append(
+            {
+                "queue": queue_name,
+                "depth": depth,
+                "oldest_message_age_seconds": max(0.0, now - min(published_ats)) if published_ats else None,
+            }
+        )
+    return metrics
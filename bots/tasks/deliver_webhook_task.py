@@ -1,15 +1,78 @@
 import logging
+import uuid
 
 import requests
 from celery import shared_task
+from django.db import transaction
 from django.utils import timezone
 
-from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookTriggerTypes
-from bots.webhook_utils import sign_payload
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSubscription, WebhookTriggerTypes
+from bots.webhook_circuit_breaker import WebhookCircuitBreaker, circuit_open_response, deferred_for_too_long
+from bots.webhook_subscription_cache import get_active_webhook_secret
+from bots.webhook_utils import build_webhook_body, schedule_webhook_batch_flush, sign_body
 
 logger = logging.getLogger(__name__)
 
 
+def build_webhook_data(delivery):
+    """
+    The fields of the webhook sent for a delivery attempt, other than its data.
+    """
+    related_object_specific_webhook_data = {}
+
+    if delivery.bot:
+        related_object_specific_webhook_data["bot_id"] = delivery.bot.object_id
+        related_object_specific_webhook_data["bot_metadata"] = delivery.bot.metadata
+    elif delivery.calendar:
+        related_object_specific_webhook_data["calendar_id"] = delivery.calendar.object_id
+        related_object_specific_webhook_data["calendar_deduplication_key"] = delivery.calendar.deduplication_key
+        related_object_specific_webhook_data["calendar_metadata"] = delivery.calendar.metadata
+
+    return {
+        "idempotency_key": str(delivery.idempotency_key),
+        **related_object_specific_webhook_data,
+        "trigger": WebhookTriggerTypes.trigger_type_to_api_code(delivery.webhook_trigger_type),
+    }
+
+
+def build_delivery_body(delivery):
+    """
+    The canonical JSON of the webhook sent for a delivery attempt.
+    """
+    return build_webhook_body(delivery.webhook_data or build_webhook_data(delivery), delivery.get_payload_json())
+
+
+def build_signed_delivery_body(delivery):
+    """
+    The canonical JSON of the webhook sent for a delivery attempt, which is sent exactly as signed.
+    The webhook fields and the signature are kept on the attempt the first time, so retries send the same body with the same signature.
+    """
+    if delivery.webhook_data is None:
+        delivery.webhook_data = build_webhook_data(delivery)
+    body = build_delivery_body(delivery)
+    if delivery.signature is None:
+        delivery.signature = sign_body(body, get_active_webhook_secret(delivery.webhook_subscription.project_id).get_secret())
+    return body
+
+
+def defer_delivery(task, task_arg, deliveries, retry_after):
+    """
+    Put off sending to an endpoint whose circuit is open or which has no spare concurrency, by running the task again later.
+    This doesn't count as an attempt. Deliveries that have been put off for too long are marked as failed instead.
+    """
+    subscription = deliveries[0].webhook_subscription
+    if not any(deferred_for_too_long(delivery) for delivery in deliveries):
+        logger.info(f"Deferring webhook delivery to {subscription.url} for {retry_after:.1f} seconds, the endpoint is unhealthy or busy")
+        task.apply_async(args=[task_arg], countdown=retry_after)
+        return
+
+    for delivery in deliveries:
+        delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+        delivery.add_to_response_body_list(circuit_open_response(subscription.url))
+    WebhookDeliveryAttempt.objects.bulk_update(deliveries, ["status", "response_body_list"])
+    logger.error(f"Gave up on webhook delivery to {subscription.url} after deferring it for too long. Webhook IDs: {[delivery.id for delivery in deliveries]}")
+
+
 @shared_task(
     bind=True,
     retry_backoff=True,  # Enable exponential backoff
@@ -21,7 +84,7 @@ def deliver_webhook(self, delivery_id):
     Deliver a webhook to its destination.
     """
     try:
-        delivery = WebhookDeliveryAttempt.objects.get(id=delivery_id)
+        delivery = WebhookDeliveryAttempt.objects.select_related("webhook_subscription", "bot", "calendar").get(id=delivery_id)
     except WebhookDeliveryAttempt.DoesNotExist:
         logger.error(f"Webhook delivery attempt {delivery_id} not found")
         raise  # Re-raises the original exception with preserved traceback
@@ -41,27 +104,14 @@ def deliver_webhook(self, delivery_id):
         delivery.save()
         return
 
-    related_object_specific_webhook_data = {}
-
-    if delivery.bot:
-        related_object_specific_webhook_data["bot_id"] = delivery.bot.object_id
-        related_object_specific_webhook_data["bot_metadata"] = delivery.bot.metadata
-    elif delivery.calendar:
-        related_object_specific_webhook_data["calendar_id"] = delivery.calendar.object_id
-        related_object_specific_webhook_data["calendar_deduplication_key"] = delivery.calendar.deduplication_key
-        related_object_specific_webhook_data["calendar_metadata"] = delivery.calendar.metadata
-
-    # Prepare the webhook payload
-    webhook_data = {
-        "idempotency_key": str(delivery.idempotency_key),
-        **related_object_specific_webhook_data,
-        "trigger": WebhookTriggerTypes.trigger_type_to_api_code(delivery.webhook_trigger_type),
-        "data": delivery.payload,
-    }
+    circuit_breaker = WebhookCircuitBreaker(subscription.url)
+    retry_after = circuit_breaker.acquire()
+    if retry_after:
+        defer_delivery(deliver_webhook, delivery_id, [delivery], retry_after)
+        return
 
-    # Sign the payload
-    active_secret = subscription.project.webhook_secrets.filter().order_by("-created_at").first()
-    signature = sign_payload(webhook_data, active_secret.get_secret())
+    # Serialize and sign the webhook. The exact bytes that were signed are sent, so receivers can verify the raw body.
+    request_body = build_signed_delivery_body(delivery)
 
     # Increment attempt counter
     delivery.attempt_count += 1
@@ -71,11 +121,11 @@ def deliver_webhook(self, delivery_id):
     try:
         response = requests.post(
             subscription.url,
-            json=webhook_data,
+            data=request_body,
             headers={
                 "Content-Type": "application/json",
                 "User-Agent": "Attendee-Webhook/1.0",
-                "X-Webhook-Signature": signature,
+                "X-Webhook-Signature": delivery.signature,
             },
             timeout=10,  # 10-second timeout
         )
@@ -87,6 +137,8 @@ def deliver_webhook(self, delivery_id):
         response_body = response.text[:10000]
         delivery.add_to_response_body_list(response_body)
 
+        circuit_breaker.release(succeeded=200 <= response.status_code < 300)
+
         # Check if the delivery was successful (2xx status code)
         if 200 <= response.status_code < 300:
             delivery.status = WebhookDeliveryAttemptStatus.SUCCESS
@@ -99,6 +151,7 @@ def deliver_webhook(self, delivery_id):
 
     except requests.RequestException as e:
         # Handle network errors, timeouts, etc.
+        circuit_breaker.release(succeeded=False)
         delivery.status = WebhookDeliveryAttemptStatus.FAILURE
         error_response = {
             "status_code": None,  # No HTTP status since request failed
@@ -117,3 +170,124 @@ def deliver_webhook(self, delivery_id):
         else:
             logger.info(f"Retrying webhook delivery {delivery.id} (attempt {delivery.attempt_count}/{self.max_retries})")
             raise Exception("Retry due to failure")
+
+
+@shared_task
+def flush_webhook_batch(webhook_subscription_id):
+    """
+    Claim the pending delivery attempts of a subscription that delivers in batches, and send them as one batch.
+    """
+    subscription = WebhookSubscription.objects.filter(id=webhook_subscription_id).first()
+    if subscription is None:
+        return
+    batch_max_size = subscription.batch_max_size or 1
+
+    batch_idempotency_key = uuid.uuid4()
+    with transaction.atomic():
+        # Clear the flush first, so that events arriving from now on schedule the next one
+        WebhookSubscription.objects.filter(id=subscription.id).update(batch_flush_due_at=None)
+        unbatched_attempts = WebhookDeliveryAttempt.objects.filter(webhook_subscription=subscription, status=WebhookDeliveryAttemptStatus.PENDING, batch_idempotency_key__isnull=True)
+        delivery_ids = list(unbatched_attempts.select_for_update(skip_locked=True).order_by("created_at", "id").values_list("id", flat=True)[:batch_max_size])
+        WebhookDeliveryAttempt.objects.filter(id__in=delivery_ids).update(batch_idempotency_key=batch_idempotency_key)
+
+    if delivery_ids:
+        deliver_webhook_batch.delay(str(batch_idempotency_key))
+
+    # Events that didn't fit in this batch, or that arrived while it was being claimed, go in the next one
+    remaining_count = unbatched_attempts.count()
+    if remaining_count >= batch_max_size:
+        flush_webhook_batch.delay(subscription.id)
+    elif remaining_count and subscription.delivers_in_batches():
+        schedule_webhook_batch_flush(subscription)
+
+
+@shared_task(
+    bind=True,
+    retry_backoff=True,  # Enable exponential backoff
+    max_retries=3,
+    autoretry_for=(Exception,),
+)
+def deliver_webhook_batch(self, batch_idempotency_key):
+    """
+    Deliver a batch of webhooks to their destination as a JSON array, with one signature for the whole array.
+    Each item is the same object that would be sent on its own, so receivers can deduplicate items by their idempotency keys.
+    """
+    deliveries = list(WebhookDeliveryAttempt.objects.filter(batch_idempotency_key=batch_idempotency_key).select_related("webhook_subscription", "bot", "calendar").order_by("created_at", "id"))
+    if not deliveries:
+        logger.error(f"Webhook delivery batch {batch_idempotency_key} not found")
+        return
+
+    subscription = deliveries[0].webhook_subscription
+    updated_fields = ["status", "response_body_list"]
+
+    if not subscription.is_active:
+        for delivery in deliveries:
+            delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+            delivery.add_to_response_body_list(
+                {
+                    "status_code": None,
+                    "error_type": "InactiveSubscription",
+                    "error_message": "Webhook subscription is no longer active",
+                    "request_url": subscription.url,
+                }
+            )
+        WebhookDeliveryAttempt.objects.bulk_update(deliveries, updated_fields)
+        return
+
+    circuit_breaker = WebhookCircuitBreaker(subscription.url)
+    retry_after = circuit_breaker.acquire()
+    if retry_after:
+        defer_delivery(deliver_webhook_batch, batch_idempotency_key, deliveries, retry_after)
+        return
+
+    # Sign the batch
+    active_secret = get_active_webhook_secret(subscription.project_id)
+    request_body = b"[" + b",".join(build_delivery_body(delivery) for delivery in deliveries) + b"]"
+    signature = sign_body(request_body, active_secret.get_secret())
+
+    attempt_count = max(delivery.attempt_count for delivery in deliveries) + 1
+    last_attempt_at = timezone.now()
+    succeeded_at = None
+
+    # Send the batch
+    try:
+        response = requests.post(
+            subscription.url,
+            data=request_body,
+            headers={
+                "Content-Type": "application/json",
+                "User-Agent": "Attendee-Webhook/1.0",
+                "X-Webhook-Signature": signature,
+            },
+            timeout=10,  # 10-second timeout
+        )
+        # Limit response body storage to prevent DB issues with large responses
+        response_body = response.text[:10000]
+        circuit_breaker.release(succeeded=200 <= response.status_code < 300)
+        if 200 <= response.status_code < 300:
+            succeeded_at = timezone.now()
+    except requests.RequestException as e:
+        # Handle network errors, timeouts, etc.
+        circuit_breaker.release(succeeded=False)
+        response_body = {
+            "status_code": None,  # No HTTP status since request failed
+            "error_type": type(e).__name__,
+            "error_message": str(e),
+            "request_url": subscription.url,
+        }
+
+    for delivery in deliveries:
+        delivery.attempt_count = attempt_count
+        delivery.last_attempt_at = last_attempt_at
+        delivery.succeeded_at = succeeded_at
+        delivery.status = WebhookDeliveryAttemptStatus.SUCCESS if succeeded_at else WebhookDeliveryAttemptStatus.FAILURE
+        delivery.add_to_response_body_list(response_body)
+    WebhookDeliveryAttempt.objects.bulk_update(deliveries, updated_fields + ["attempt_count", "last_attempt_at", "succeeded_at"])
+
+    if not succeeded_at:
+        # Check if this was the last retry attempt
+        if attempt_count >= self.max_retries:
+            logger.error(f"Webhook batch delivery failed after {attempt_count} attempts. " + f"Batch: {batch_idempotency_key}, Size: {len(deliveries)}, URL: {subscription.url}")
+        else:
+            logger.info(f"Retrying webhook batch delivery {batch_idempotency_key} (attempt {attempt_count}/{self.max_retries})")
+            raise Exception("Retry due to failure")
@@ -1,6 +1,6 @@
 import logging
 
-from celery import shared_task
+from celery import chord, shared_task
 from django.utils import timezone
 
 from bots.models import AsyncTranscription, AsyncTranscriptionManager, AsyncTranscriptionStates, TranscriptionFailureReasons, Utterance
@@ -8,28 +8,46 @@ from bots.tasks.process_utterance_task import process_utterance
 
 logger = logging.getLogger(__name__)
 
+ASYNC_TRANSCRIPTION_TIMEOUT = timezone.timedelta(minutes=30)
+UTTERANCE_BULK_CREATE_BATCH_SIZE = 1000
+
 
 def create_utterances_for_transcription(async_transcription):
     recording = async_transcription.recording
 
-    # Get all the audio chunks for the recording
-    # then create utterances for each audio chunk
-    for audio_chunk in recording.audio_chunks.all():
-        utterance = Utterance.objects.create(
-            source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
-            recording=recording,
-            async_transcription=async_transcription,
-            participant=audio_chunk.participant,
-            audio_chunk=audio_chunk,
-            timestamp_ms=audio_chunk.timestamp_ms,
-            duration_ms=audio_chunk.duration_ms,
-        )
-
-        process_utterance.delay(utterance.id)
-
-    # After the utterances have been created and queued for transcription, set the recording artifact to in progress
+    # Get all the audio chunks for the recording, then create an utterance for each audio chunk in bulk.
+    # We only load the columns we need, so that we don't pull every audio blob into memory.
+    audio_chunks = recording.audio_chunks.only("id", "participant_id", "timestamp_ms", "duration_ms").order_by("id")
+    utterances = Utterance.objects.bulk_create(
+        [
+            Utterance(
+                source=Utterance.Sources.PER_PARTICIPANT_AUDIO,
+                recording=recording,
+                async_transcription=async_transcription,
+                participant_id=audio_chunk.participant_id,
+                audio_chunk_id=audio_chunk.id,
+                timestamp_ms=audio_chunk.timestamp_ms,
+                duration_ms=audio_chunk.duration_ms,
+            )
+            for audio_chunk in audio_chunks.iterator(chunk_size=UTTERANCE_BULK_CREATE_BATCH_SIZE)
+        ],
+        batch_size=UTTERANCE_BULK_CREATE_BATCH_SIZE,
+    )
+
+    # After the utterances have been created, set the recording artifact to in progress
     AsyncTranscriptionManager.set_async_transcription_in_progress(async_transcription)
 
+    if not utterances:
+        logger.info(f"No audio chunks found for recording artifact {async_transcription.id}, terminating transcription")
+        terminate_transcription(async_transcription)
+        return
+
+    # Publish all the utterance tasks in a single chord. The callback runs once the last utterance task finishes,
+    # so completion is driven by the workers instead of by polling. The utterances go to the batch queue
+    # so that a large re-transcription doesn't hold up utterances from meetings that are in progress.
+    logger.info(f"Queueing {len(utterances)} utterances for transcription for recording artifact {async_transcription.id}")
+    chord([process_utterance.si(utterance.id).set(queue="batch") for utterance in utterances])(finish_async_transcription.si(async_transcription.id))
+
 
 def terminate_transcription(async_transcription):
     # We'll mark it as failed if there are any failed utterances or any in progress utterances
@@ -45,17 +63,21 @@ def terminate_transcription(async_transcription):
 
 
 def check_for_transcription_completion(async_transcription):
+    # This is a safety net in case the chord callback never runs (for example, if an utterance task exhausted its retries).
+    # Normally the transcription has already been terminated by finish_async_transcription by the time we get here.
     in_progress_utterances = async_transcription.utterances.filter(transcription__isnull=True, failure_data__isnull=True)
+    time_since_start = timezone.now() - async_transcription.started_at
 
     # If no in progress utterances exist or it's been more than 30 minutes, then we need to terminate the transcription
-    if not in_progress_utterances.exists() or timezone.now() - async_transcription.started_at > timezone.timedelta(minutes=30):
+    if not in_progress_utterances.exists() or time_since_start > ASYNC_TRANSCRIPTION_TIMEOUT:
         logger.info(f"Terminating transcription for recording artifact {async_transcription.id} because no in progress utterances exist or it's been more than 30 minutes")
         terminate_transcription(async_transcription)
         return
 
-    # An in progress utterance exists and we haven't timed out, so we need to check again in 1 minute
-    logger.info(f"Checking for transcription completion for recording artifact {async_transcription.id} again in 1 minute")
-    process_async_transcription.apply_async(args=[async_transcription.id], countdown=60)
+    # An in progress utterance exists and we haven't timed out, so check again when the timeout is reached
+    countdown = max(int((ASYNC_TRANSCRIPTION_TIMEOUT - time_since_start).total_seconds()) + 1, 1)
+    logger.info(f"Checking for transcription completion for recording artifact {async_transcription.id} again in {countdown} seconds")
+    process_async_transcription.apply_async(args=[async_transcription.id], countdown=countdown)
 
 
 @shared_task(
@@ -71,9 +93,27 @@ def process_async_transcription(self, async_transcription_id):
 
         if async_transcription.state == AsyncTranscriptionStates.NOT_STARTED:
             create_utterances_for_transcription(async_transcription)
+            # Schedule a single check for when the timeout is reached, in case the chord callback never runs
+            process_async_transcription.apply_async(args=[async_transcription.id], countdown=int(ASYNC_TRANSCRIPTION_TIMEOUT.total_seconds()))
+            return
 
         check_for_transcription_completion(async_transcription)
 
     except Exception as e:
         logger.exception(f"Unexpected exception in process_async_transcription: {str(e)}")
         AsyncTranscriptionManager.set_async_transcription_failed(async_transcription, failure_data={})
+
+
+@shared_task(
+    bind=True,
+    soft_time_limit=3600,
+)
+def finish_async_transcription(self, async_transcription_id):
+    # Called as the chord callback once every utterance task for the transcription has finished
+    async_transcription = AsyncTranscription.objects.get(id=async_transcription_id)
+
+    if async_transcription.state != AsyncTranscriptionStates.IN_PROGRESS:
+        return
+
+    logger.info(f"All utterances finished processing for recording artifact {async_transcription.id}, terminating transcription")
+    terminate_transcription(async_transcription)
@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import random
 import time
 import base64
 
@@ -10,10 +11,17 @@ from celery import shared_task
 logger = logging.getLogger(__name__)
 
 from bots.models import Credentials, RecordingManager, TranscriptionFailureReasons, TranscriptionProviders, Utterance, WebhookTriggerTypes
+from bots.transcription_rate_limiter import TranscriptionRateLimiter, TranscriptionRateLimitExceeded
 from bots.utils import pcm_to_mp3
 from bots.webhook_payloads import utterance_webhook_payload
 from bots.webhook_utils import trigger_webhook
 
+# Deferrals are cheap (no request is made), so we allow many more of them than regular retries
+TRANSCRIPTION_RATE_LIMIT_MAX_DEFERRALS = int(os.getenv("TRANSCRIPTION_RATE_LIMIT_MAX_DEFERRALS", 100))
+
+# File extensions for the mime types of compressed audio chunks, for providers that take a file upload
+AUDIO_FILE_EXTENSIONS = {"audio/mpeg": "mp3", "audio/flac": "flac", "audio/ogg": "ogg"}
+
 
 def is_retryable_failure(failure_data):
     return failure_data.get("reason") in [
@@ -26,6 +34,14 @@ def is_retryable_failure(failure_data):
 
 
 def get_transcription(utterance, recording):
+    # Check with the cluster-wide rate limiter for the provider account before making a request,
+    # so that we don't burn a request (and a retry) on a 429.
+    rate_limiter = TranscriptionRateLimiter.for_recording(recording)
+    if rate_limiter:
+        retry_after = rate_limiter.acquire()
+        if retry_after:
+            raise TranscriptionRateLimitExceeded(rate_limiter.key, retry_after)
+
     try:
         if recording.transcription_provider == TranscriptionProviders.DEEPGRAM:
             transcription, failure_data = get_transcription_via_deepgram(utterance)
@@ -45,6 +61,20 @@ def get_transcription(utterance, recording):
         return transcription, failure_data
     except Exception as e:
         return None, {"reason": TranscriptionFailureReasons.INTERNAL_ERROR, "error": str(e)}
+    finally:
+        if rate_limiter:
+            rate_limiter.release()
+
+
+def get_transcription_or_defer(task, utterance, recording):
+    """Calls get_transcription, deferring the task with retry(countdown=...) if the provider account has no capacity."""
+    try:
+        return get_transcription(utterance, recording)
+    except TranscriptionRateLimitExceeded as e:
+        # Add some jitter so deferred tasks don't all come back at the same moment
+        countdown = e.retry_after * random.uniform(1, 1.25)
+        logger.info(f"Deferring transcription of utterance {utterance.id} for {countdown:.2f} seconds: {e}")
+        raise task.retry(countdown=countdown, max_retries=TRANSCRIPTION_RATE_LIMIT_MAX_DEFERRALS)
 
 
 @shared_task(
@@ -202,8 +232,10 @@ def get_transcription_via_deepgram(utterance):
     )
 
     recording = utterance.recording
+    # Deepgram reads the format of compressed audio from its container, so only raw PCM needs its encoding spelled out
+    compressed_audio = utterance.get_compressed_audio()
     payload: FileSource = {
-        "buffer": utterance.get_audio_blob().tobytes(),
+        "buffer": compressed_audio[0] if compressed_audio else utterance.get_audio_blob().tobytes(),
     }
 
     deepgram_model = recording.bot.deepgram_model()
@@ -215,8 +247,8 @@ def get_transcription_via_deepgram(utterance):
         detect_language=recording.bot.deepgram_detect_language(),
         keyterm=recording.bot.deepgram_keyterms(),
         keywords=recording.bot.deepgram_keywords(),
-        encoding="linear16",  # for 16-bit PCM
-        sample_rate=utterance.get_sample_rate(),
+        encoding=None if compressed_audio else "linear16",  # for 16-bit PCM
+        sample_rate=None if compressed_audio else utterance.get_sample_rate(),
         redact=recording.bot.deepgram_redaction_settings(),
     )
 
@@ -263,8 +295,13 @@ def get_transcription_via_openai(utterance):
         logger.info(f"OpenAI transcription skipped for utterance {utterance.id} because it's less than 80ms in duration")
         return {"transcript": ""}, None
 
-    # Convert PCM audio to MP3
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    compressed_audio = utterance.get_compressed_audio()
+    if compressed_audio:
+        # OpenAI accepts FLAC and Ogg Opus, so compressed audio is sent as stored
+        audio_file = (f"file.{AUDIO_FILE_EXTENSIONS[compressed_audio[1]]}", compressed_audio[0], compressed_audio[1])
+    else:
+        # Convert PCM audio to MP3
+        audio_file = ("file.mp3", pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate()), "audio/mpeg")
 
     # Prepare the request for OpenAI's transcription API
     base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
@@ -272,7 +309,7 @@ def get_transcription_via_openai(utterance):
     headers = {
         "Authorization": f"Bearer {openai_credentials['api_key']}",
     }
-    files = {"file": ("file.mp3", payload_mp3, "audio/mpeg"), "model": (None, recording.bot.openai_transcription_model())}
+    files = {"file": audio_file, "model": (None, recording.bot.openai_transcription_model())}
     if recording.bot.openai_transcription_prompt():
         files["prompt"] = (None, recording.bot.openai_transcription_prompt())
     if recording.bot.openai_transcription_language():
@@ -312,9 +349,11 @@ def get_transcription_via_assemblyai(utterance):
     headers = {"authorization": api_key}
     base_url = recording.bot.assemblyai_base_url()
 
-    payload_mp3 = pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
+    # AssemblyAI detects the format of the upload, so compressed audio is sent as stored
+    compressed_audio = utterance.get_compressed_audio()
+    payload = compressed_audio[0] if compressed_audio else pcm_to_mp3(utterance.get_audio_blob().tobytes(), sample_rate=utterance.get_sample_rate())
 
-    upload_response = requests.post(f"{base_url}/upload", headers=headers, data=payload_mp3)
+    upload_response = requests.post(f"{base_url}/upload", headers=headers, data=payload)
 
     if upload_response.status_code == 401:
         return None, {"reason": TranscriptionFailureReasons.CREDENTIALS_INVALID}
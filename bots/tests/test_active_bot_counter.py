@@ -0,0 +1,117 @@
+import threading
+from datetime import timedelta
+from unittest.mock import patch
+
+import redis
+from django.db import transaction
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots import active_bot_counter
+from bots.bots_api_utils import BotCreationSource, create_bot
+from bots.models import Bot, BotEventManager, BotEventTypes, BotStates, Organization, Project
+from bots.redis_client import get_redis_client
+
+
+class ActiveBotCounterTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.addCleanup(get_redis_client().delete, active_bot_counter.count_key(self.project.id), active_bot_counter.reservations_key(self.project.id))
+
+    def _count(self):
+        count = get_redis_client().get(active_bot_counter.count_key(self.project.id))
+        return None if count is None else int(count)
+
+    def _reservations(self):
+        return get_redis_client().zcard(active_bot_counter.reservations_key(self.project.id))
+
+    def _create_bot(self, **data):
+        return create_bot(data={"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Test Bot", **data}, source=BotCreationSource.API, project=self.project)
+
+    def test_count_is_seeded_from_the_database_and_follows_transitions(self):
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.ENDED)
+        self.assertIsNone(self._count())
+        self.assertEqual(active_bot_counter.admit(self.project), ([], 1))
+        self.assertEqual(self._count(), 1)
+
+        bot = Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.READY)
+        BotEventManager.create_event(bot=bot, event_type=BotEventTypes.JOIN_REQUESTED)
+        self.assertEqual(self._count(), 2)
+        BotEventManager.create_event(bot=bot, event_type=BotEventTypes.BOT_JOINED_MEETING)
+        self.assertEqual(self._count(), 2)
+
+        # A transition that's rolled back isn't counted
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                BotEventManager.create_event(bot=bot, event_type=BotEventTypes.FATAL_ERROR)
+                raise RuntimeError("rolled back")
+        self.assertEqual(self._count(), 2)
+
+        BotEventManager.create_event(bot=bot, event_type=BotEventTypes.FATAL_ERROR)
+        self.assertEqual(self._count(), 1)
+
+    @patch("bots.models.Project.concurrent_bots_limit", return_value=3)
+    def test_concurrent_admissions_do_not_go_over_the_limit(self, mock_limit):
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+        active_bot_counter.admit(self.project)
+
+        reservation_ids = []
+        barrier = threading.Barrier(10)
+
+        def admit():
+            barrier.wait()
+            reservation_ids.extend(active_bot_counter.admit(self.project, 1)[0])
+
+        threads = [threading.Thread(target=admit) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(reservation_ids), 2)
+        self.assertEqual(active_bot_counter.admit(self.project, 5), ([], 3))
+        active_bot_counter.release(self.project.id, reservation_ids)
+        self.assertEqual(len(active_bot_counter.admit(self.project, 5)[0]), 2)
+
+    @patch("bots.models.Project.concurrent_bots_limit", return_value=1)
+    def test_created_bots_take_the_place_of_their_reservations(self, mock_limit):
+        bot, error = self._create_bot(deduplication_key="key-1")
+        self.assertIsNone(error)
+        self.assertEqual(bot.state, BotStates.JOINING)
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(self._reservations(), 0)
+
+        # Scheduled bots are also turned away at the limit, but don't take a slot
+        join_at = (timezone.now() + timedelta(days=1)).isoformat()
+        bot, error = self._create_bot(join_at=join_at)
+        self.assertIn("maximum number of concurrent bots (1)", error["error"])
+        mock_limit.return_value = 2
+        bot, error = self._create_bot(join_at=join_at)
+        self.assertEqual(bot.state, BotStates.SCHEDULED)
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(self._reservations(), 0)
+
+        # A bot that fails to be created releases its reservation right away
+        bot, error = self._create_bot(deduplication_key="key-1")
+        self.assertIn("Deduplication key already in use", error["error"])
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(self._reservations(), 0)
+
+    def test_reconcile_corrects_counts_that_drifted(self):
+        active_bot_counter.admit(self.project)
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+        self.assertEqual(self._count(), 0)
+
+        self.assertGreaterEqual(active_bot_counter.reconcile(), 1)
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(active_bot_counter.reconcile(), 0)
+
+    @patch("bots.models.Project.concurrent_bots_limit", return_value=1)
+    def test_limit_is_checked_against_the_database_when_redis_is_unavailable(self, mock_limit):
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+        with patch("bots.active_bot_counter.get_redis_client", side_effect=redis.ConnectionError("unavailable")):
+            bot, error = self._create_bot()
+        self.assertIsNone(bot)
+        self.assertIn("maximum number of concurrent bots (1)", error["error"])
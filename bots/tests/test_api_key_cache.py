@@ -0,0 +1,97 @@
+import time
+from unittest.mock import patch
+
+from django.test import Client, TransactionTestCase
+from django.utils import timezone
+
+from bots import api_key_cache
+from bots.api_key_cache import INVALIDATION_CHANNEL, METRICS_KEY, flush_metrics, get_active_api_key, get_metrics, get_total_metrics, invalidate_locally
+from bots.models import ApiKey, Bot, BotStates, Organization, Project
+from bots.redis_client import get_redis_client
+
+
+class ApiKeyCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.api_key, self.key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.client = Client()
+        self._get()
+        self._wait_for(api_key_cache._listener.subscribed.is_set)
+        # Creating the key published an invalidation. Since invalidations arrive in order, once one sent now has been applied, so has that one
+        invalidations = get_metrics()["invalidations"]
+        get_redis_client().publish(INVALIDATION_CHANNEL, "0" * 64)
+        self._wait_for(lambda: get_metrics()["invalidations"] > invalidations)
+        invalidate_locally(self.api_key.key_hash)
+
+    def _get(self):
+        return self.client.get(f"/api/v1/bots/{self.bot.object_id}", HTTP_AUTHORIZATION=f"Token {self.key}")
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def _is_cached(self):
+        return self.api_key.key_hash in api_key_cache._cache
+
+    def test_cached_key_is_authenticated_without_a_query(self):
+        self.assertIsNotNone(get_active_api_key(self.api_key.key_hash))
+
+        with self.assertNumQueries(0):
+            api_key = get_active_api_key(self.api_key.key_hash)
+        self.assertEqual(api_key.id, self.api_key.id)
+        self.assertEqual(api_key.project.id, self.project.id)
+
+        # Each request gets its own copy of the key and project
+        self.assertIsNot(get_active_api_key(self.api_key.key_hash).project, api_key.project)
+
+    def test_deleted_and_disabled_keys_are_rejected(self):
+        self.assertEqual(self._get().status_code, 200)
+        self.assertTrue(self._is_cached())
+
+        self.api_key.disabled_at = timezone.now()
+        self.api_key.save()
+        self.assertFalse(self._is_cached())
+        self.assertEqual(self._get().status_code, 401)
+
+        other_api_key, other_key = ApiKey.create(project=self.project, name="Other API Key")
+        response = self.client.get(f"/api/v1/bots/{self.bot.object_id}", HTTP_AUTHORIZATION=f"Token {other_key}")
+        self.assertEqual(response.status_code, 200)
+        other_api_key.delete()
+        response = self.client.get(f"/api/v1/bots/{self.bot.object_id}", HTTP_AUTHORIZATION=f"Token {other_key}")
+        self.assertEqual(response.status_code, 401)
+
+    def test_invalidations_from_another_process_are_applied(self):
+        self.assertEqual(self._get().status_code, 200)
+
+        # An update that doesn't send signals in this process, followed by the invalidation another process would publish
+        ApiKey.objects.filter(id=self.api_key.id).update(disabled_at=timezone.now())
+        self.assertEqual(self._get().status_code, 200)
+        get_redis_client().publish(INVALIDATION_CHANNEL, self.api_key.key_hash)
+        self._wait_for(lambda: not self._is_cached())
+        self.assertEqual(self._get().status_code, 401)
+
+    @patch("bots.api_key_cache._listener")
+    def test_cache_is_bypassed_while_not_subscribed(self, mock_listener):
+        mock_listener.subscribed.is_set.return_value = False
+        bypasses = get_metrics()["bypasses"]
+        with self.assertNumQueries(1):
+            self.assertIsNotNone(get_active_api_key(self.api_key.key_hash))
+        self.assertEqual(get_metrics()["bypasses"], bypasses + 1)
+
+    def test_metrics_are_flushed_to_redis(self):
+        get_redis_client().delete(METRICS_KEY)
+        flush_metrics()
+        get_redis_client().delete(METRICS_KEY)
+
+        # A miss that caches the key, two hits, and a miss for a key that doesn't exist
+        for key_hash in [self.api_key.key_hash, self.api_key.key_hash, self.api_key.key_hash, "0" * 64]:
+            get_active_api_key(key_hash)
+        flush_metrics()
+        metrics = get_total_metrics()
+        self.assertEqual(metrics["hits"], 2)
+        self.assertEqual(metrics["misses"], 2)
+        self.assertEqual(metrics["hit_rate"], 0.5)
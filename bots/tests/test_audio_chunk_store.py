@@ -0,0 +1,101 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+
+from bots.audio_chunk_store import recording_prefix
+from bots.models import AudioChunk, Bot, BotStates, Organization, Participant, Project, Recording, Utterance
+from bots.object_store import ObjectStore, S3ObjectStore
+
+
+@override_settings(AUDIO_CHUNK_COMPRESSION="none")
+class AudioChunkStoreTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant-1")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1)
+        self.other_recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1)
+        self.storage_dir = tempfile.TemporaryDirectory()
+        self.filesystem_settings = override_settings(AUDIO_CHUNK_STORAGE_BACKEND="filesystem", AUDIO_CHUNK_STORAGE_PATH=self.storage_dir.name)
+
+    def tearDown(self):
+        self.storage_dir.cleanup()
+
+    def _audio_chunk(self, recording, audio_blob):
+        audio_chunk = AudioChunk(recording=recording, participant=self.participant, timestamp_ms=0, duration_ms=10, sample_rate=16000)
+        audio_chunk.set_audio_blob(audio_blob)
+        audio_chunk.save()
+        return audio_chunk
+
+    def test_audio_stays_in_the_database_by_default(self):
+        audio_chunk = self._audio_chunk(self.recording, b"\x01\x02")
+        audio_chunk.refresh_from_db()
+
+        self.assertIsNone(audio_chunk.audio_blob_key)
+        self.assertEqual(audio_chunk.get_audio_blob().tobytes(), b"\x01\x02")
+
+    def test_audio_is_written_to_the_store_and_loaded_lazily(self):
+        with self.filesystem_settings:
+            audio_chunk = self._audio_chunk(self.recording, b"\x01\x02\x03")
+            utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=0, duration_ms=10)
+            utterance = Utterance.objects.get(id=utterance.id)
+
+            self.assertIsNone(AudioChunk.objects.get(id=audio_chunk.id).audio_blob)
+            self.assertTrue(audio_chunk.audio_blob_key.startswith(recording_prefix(self.recording.id)))
+            self.assertEqual(utterance.get_audio_blob().tobytes(), b"\x01\x02\x03")
+
+    def test_backfill_packs_each_recordings_chunks_into_a_segment(self):
+        audio_chunks = [self._audio_chunk(self.recording, b"aaaa"), self._audio_chunk(self.other_recording, b"bb"), self._audio_chunk(self.recording, b"cccccc")]
+        legacy_utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"legacy", sample_rate=16000, timestamp_ms=5, duration_ms=20)
+
+        with self.filesystem_settings:
+            call_command("move_audio_chunks_to_store", "--batch-size", "3", stdout=StringIO())
+
+            for audio_chunk, expected in zip(audio_chunks, [b"aaaa", b"bb", b"cccccc"]):
+                audio_chunk.refresh_from_db()
+                self.assertIsNone(audio_chunk.audio_blob)
+                self.assertEqual(audio_chunk.get_audio_blob().tobytes(), expected)
+            # Both of the first recording's chunks were in the same batch, so they share a segment
+            self.assertEqual(audio_chunks[0].audio_blob_key, audio_chunks[2].audio_blob_key)
+            self.assertEqual(audio_chunks[2].audio_blob_offset, 4)
+
+            legacy_utterance.refresh_from_db()
+            self.assertEqual(legacy_utterance.audio_blob.tobytes(), b"")
+            self.assertEqual(legacy_utterance.get_audio_blob().tobytes(), b"legacy")
+            self.assertEqual(legacy_utterance.get_sample_rate(), 16000)
+
+    def test_delete_data_removes_stored_audio(self):
+        with self.filesystem_settings:
+            self._audio_chunk(self.recording, b"\x01\x02")
+            recording_dir = os.path.join(self.storage_dir.name, recording_prefix(self.recording.id))
+            self.assertTrue(os.path.isdir(recording_dir))
+
+            self.bot.state = BotStates.ENDED
+            self.bot.save()
+            self.bot.delete_data()
+
+            self.assertFalse(os.path.exists(recording_dir))
+
+    def test_store_without_every_method_cannot_be_created(self):
+        class StoreWithoutDelete(ObjectStore):
+            def write(self, key, data):
+                pass
+
+            def read(self, key, offset=0, length=None):
+                return b""
+
+        with self.assertRaises(TypeError):
+            StoreWithoutDelete()
+
+    @mock.patch("bots.object_store.boto3.client")
+    def test_s3_store_reads_only_the_chunks_byte_range(self, mock_client):
+        mock_client.return_value.get_object.return_value = {"Body": mock.Mock(read=mock.Mock(return_value=b"xyz"))}
+        store = S3ObjectStore(bucket_name="bucket")
+
+        self.assertEqual(store.read("segment", 10, 3), b"xyz")
+        mock_client.return_value.get_object.assert_called_once_with(Bucket="bucket", Key="segment", Range="bytes=10-12")
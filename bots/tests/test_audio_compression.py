@@ -0,0 +1,103 @@
+from unittest import mock
+
+import numpy as np
+from django.test import TransactionTestCase, override_settings
+
+from bots.audio_compression import compress_pcm
+from bots.models import AudioChunk, Bot, Credentials, Organization, Participant, Project, Recording, TranscriptionProviders, Utterance
+from bots.tasks.process_utterance_task import get_transcription_via_deepgram, get_transcription_via_openai
+
+
+def speech_like_pcm(sample_rate, seconds=2):
+    t = np.arange(int(sample_rate * seconds)) / sample_rate
+    # A tone that fades in and out, with a little noise, compresses roughly like speech
+    envelope = np.abs(np.sin(2 * np.pi * 0.5 * t))
+    return (np.sin(2 * np.pi * 220 * t) * envelope * 8000 + np.random.default_rng(0).normal(0, 50, len(t))).astype(np.int16).tobytes()
+
+
+class AudioCompressionTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant-1")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, transcription_provider=TranscriptionProviders.DEEPGRAM)
+
+    def _utterance(self, pcm, sample_rate):
+        audio_chunk = AudioChunk(recording=self.recording, participant=self.participant, timestamp_ms=0, duration_ms=len(pcm) // (sample_rate // 500), sample_rate=sample_rate)
+        audio_chunk.set_audio_blob(pcm)
+        audio_chunk.save()
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=0, duration_ms=audio_chunk.duration_ms)
+
+    def test_flac_is_the_default_and_lossless(self):
+        pcm = speech_like_pcm(32000)
+        utterance = Utterance.objects.get(id=self._utterance(pcm, 32000).id)
+
+        self.assertEqual(utterance.audio_chunk.audio_format, AudioChunk.AudioFormat.FLAC)
+        self.assertLess(len(utterance.audio_chunk.audio_blob), len(pcm) * 0.75)
+        self.assertEqual(utterance.get_audio_blob().tobytes(), pcm)
+        self.assertEqual(utterance.get_compressed_audio()[1], "audio/flac")
+
+    def test_flac_is_smaller_than_pcm_for_short_chunks(self):
+        # Half a second of audio, which is shorter than the padding the FLAC muxer adds to its header by default
+        pcm = speech_like_pcm(16000, seconds=0.5)
+        utterance = Utterance.objects.get(id=self._utterance(pcm, 16000).id)
+
+        self.assertLess(len(utterance.audio_chunk.audio_blob), len(pcm))
+        self.assertLess(len(compress_pcm(bytes(32000), 16000, "flac")), 1000)
+        self.assertEqual(utterance.get_audio_blob().tobytes(), pcm)
+
+    @override_settings(AUDIO_CHUNK_COMPRESSION="opus")
+    def test_opus_keeps_the_sample_rate_and_length(self):
+        # 32kHz isn't an Opus rate, so it's stored at 48kHz and resampled back
+        pcm = speech_like_pcm(32000)
+        utterance = Utterance.objects.get(id=self._utterance(pcm, 32000).id)
+
+        self.assertEqual(utterance.audio_chunk.audio_format, AudioChunk.AudioFormat.OPUS)
+        self.assertLess(len(utterance.audio_chunk.audio_blob), len(pcm) / 10)
+        self.assertEqual(len(utterance.get_audio_blob()), len(pcm))
+
+    @override_settings(AUDIO_CHUNK_COMPRESSION="none")
+    def test_compression_can_be_disabled(self):
+        pcm = speech_like_pcm(16000)
+        utterance = Utterance.objects.get(id=self._utterance(pcm, 16000).id)
+
+        self.assertEqual(utterance.audio_chunk.audio_format, AudioChunk.AudioFormat.PCM)
+        self.assertEqual(utterance.audio_chunk.audio_blob.tobytes(), pcm)
+        self.assertIsNone(utterance.get_compressed_audio())
+
+    @mock.patch("deepgram.DeepgramClient")
+    @mock.patch("deepgram.PrerecordedOptions")
+    def test_deepgram_receives_the_compressed_audio_as_stored(self, mock_prerecorded_options, mock_deepgram_client):
+        credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.DEEPGRAM)
+        credentials.set_credentials({"api_key": "test_api_key"})
+        utterance = self._utterance(speech_like_pcm(16000), 16000)
+        mock_response = mock.Mock()
+        mock_response.results.channels = [mock.Mock(alternatives=[mock.Mock()])]
+        mock_response.results.channels[0].alternatives[0].to_json.return_value = '{"transcript": "hi"}'
+        transcribe_file = mock_deepgram_client.return_value.listen.rest.v.return_value.transcribe_file
+        transcribe_file.return_value = mock_response
+
+        transcription, failure = get_transcription_via_deepgram(utterance)
+
+        self.assertIsNone(failure)
+        self.assertTrue(transcribe_file.call_args.args[0]["buffer"].startswith(b"fLaC"))
+        self.assertIsNone(mock_prerecorded_options.call_args.kwargs["encoding"])
+        self.assertIsNone(mock_prerecorded_options.call_args.kwargs["sample_rate"])
+
+    @mock.patch("bots.tasks.process_utterance_task.pcm_to_mp3")
+    @mock.patch("bots.tasks.process_utterance_task.requests.post")
+    def test_openai_receives_a_flac_file_without_transcoding(self, mock_post, mock_pcm_to_mp3):
+        self.recording.transcription_provider = TranscriptionProviders.OPENAI
+        self.recording.save()
+        credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.OPENAI)
+        credentials.set_credentials({"api_key": "test_api_key"})
+        utterance = self._utterance(speech_like_pcm(16000), 16000)
+        mock_post.return_value = mock.Mock(status_code=200, json=mock.Mock(return_value={"text": "hi"}))
+
+        transcription, failure = get_transcription_via_openai(utterance)
+
+        self.assertEqual(transcription, {"transcript": "hi"})
+        file_name, _, mime_type = mock_post.call_args.kwargs["files"]["file"]
+        self.assertEqual((file_name, mime_type), ("file.flac", "audio/flac"))
+        mock_pcm_to_mp3.assert_not_called()
@@ -0,0 +1,123 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotEventManager, BotEventTypes, BotStates, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionTypes, WebhookSubscription, WebhookTriggerTypes
+
+
+@patch("bots.tasks.run_bot_task.run_bot.apply_async")
+class BotBatchApiTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.client = Client()
+        self.join_at = (timezone.now() + timedelta(days=1)).isoformat()
+
+    def _create_bots(self, bots):
+        return self.client.post("/api/v1/bots/batch", {"bots": bots}, content_type="application/json", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+
+    def _get_statuses(self, query):
+        return self.client.get(f"/api/v1/bots/status?{query}", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+
+    def test_batch_returns_a_result_for_each_bot(self, mock_run_bot_apply_async):
+        response = self._create_bots(
+            [
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 1", "deduplication_key": "key-1"},
+                {"bot_name": "Bot without a meeting URL"},
+                {"meeting_url": "https://zoom.us/j/123", "bot_name": "Zoom bot without credentials"},
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 2", "deduplication_key": "key-1"},
+                {
+                    "meeting_url": "https://meet.google.com/abc-defg-hij",
+                    "bot_name": "Scheduled bot",
+                    "join_at": self.join_at,
+                    "webhooks": [{"url": "https://example.com/webhook", "triggers": ["bot.state_change"]}],
+                },
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 3"},
+            ]
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [201, 400, 400, 400, 201, 201])
+        self.assertIn("meeting_url", results[1]["error"])
+        self.assertIn("Zoom App credentials are required", results[2]["error"]["error"])
+        self.assertIn("Deduplication key already in use", results[3]["error"]["error"])
+        self.assertEqual([results[index]["bot"]["state"] for index in [0, 4, 5]], ["joining", "scheduled", "joining"])
+
+        bots = {bot.object_id: bot for bot in Bot.objects.filter(project=self.project)}
+        self.assertEqual(set(bots), {results[index]["bot"]["id"] for index in [0, 4, 5]})
+        self.assertEqual(Recording.objects.filter(bot__project=self.project, is_default_recording=True).count(), 3)
+        webhook_subscription = WebhookSubscription.objects.get(project=self.project)
+        self.assertEqual(webhook_subscription.bot, bots[results[4]["bot"]["id"]])
+        self.assertEqual(webhook_subscription.triggers, [WebhookTriggerTypes.BOT_STATE_CHANGE])
+
+        # The bots that join right away are launched together, over one broker connection
+        self.assertEqual(sorted(call.kwargs["args"][0] for call in mock_run_bot_apply_async.call_args_list), sorted(bots[results[index]["bot"]["id"]].id for index in [0, 5]))
+        self.assertEqual(len({id(call.kwargs["producer"]) for call in mock_run_bot_apply_async.call_args_list}), 1)
+
+    def test_created_bots_are_serialized_together(self, mock_run_bot_apply_async):
+        with CaptureQueriesContext(connection) as queries:
+            response = self._create_bots([{"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": f"Bot {index}"} for index in range(3)])
+        self.assertEqual([result["bot"]["events"][0]["type"] for result in response.json()["results"]], ["join_requested"] * 3)
+        # Rather than fetching the events and default recording of each bot
+        self.assertEqual(len([query for query in queries if query["sql"].startswith('SELECT "bots_botevent"')]), 1)
+        self.assertEqual(len([query for query in queries if query["sql"].startswith('SELECT "bots_recording"')]), 0)
+
+    @patch("bots.models.Project.concurrent_bots_limit", return_value=2)
+    def test_bots_that_join_right_away_count_towards_the_concurrency_limit(self, mock_limit, mock_run_bot_apply_async):
+        Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.JOINED_RECORDING)
+        response = self._create_bots(
+            [
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 1", "join_at": self.join_at},
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 2"},
+                {"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot 3"},
+            ]
+        )
+        results = response.json()["results"]
+        self.assertEqual([result["status"] for result in results], [201, 201, 400])
+        self.assertIn("maximum number of concurrent bots (2)", results[2]["error"]["error"])
+        self.assertEqual(mock_run_bot_apply_async.call_count, 1)
+
+    def test_invalid_batches_are_rejected(self, mock_run_bot_apply_async):
+        self.assertEqual(self._create_bots([]).status_code, 400)
+        self.assertEqual(self._create_bots(["not a bot"]).status_code, 400)
+        self.assertEqual(self._create_bots([{"meeting_url": "https://meet.google.com/abc-defg-hij", "bot_name": "Bot"}] * 501).status_code, 400)
+        self.assertEqual(Bot.objects.count(), 0)
+
+    def test_statuses_of_many_bots_are_fetched_in_one_query(self, mock_run_bot_apply_async):
+        bots = []
+        for index in range(3):
+            bot = Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.READY)
+            BotEventManager.create_event(bot=bot, event_type=BotEventTypes.JOIN_REQUESTED)
+            bots.append(bot)
+        Recording.objects.create(bot=bots[0], recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS, transcription_state=RecordingTranscriptionStates.IN_PROGRESS)
+        other_project = Project.objects.create(name="Other Project", organization=self.organization)
+        other_bot = Bot.objects.create(project=other_project, meeting_url="https://meet.google.com/abc-defg-hij")
+
+        self._get_statuses(f"ids={bots[0].object_id}")
+        with CaptureQueriesContext(connection) as queries:
+            response = self._get_statuses(f"ids={bots[1].object_id},{bots[0].object_id}&ids={other_bot.object_id},bot_missing&ids={bots[2].object_id}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"id": bots[1].object_id, "state": "joining", "recording_state": None, "transcription_state": None},
+                {"id": bots[0].object_id, "state": "joining", "recording_state": "in_progress", "transcription_state": "in_progress"},
+                {"id": bots[2].object_id, "state": "joining", "recording_state": None, "transcription_state": None},
+            ],
+        )
+        self.assertEqual(response.json()["not_found"], [other_bot.object_id, "bot_missing"])
+
+        with CaptureQueriesContext(connection) as more_queries:
+            self._get_statuses(f"ids={bots[0].object_id}")
+        self.assertEqual(len(queries), len(more_queries))
+
+    def test_status_needs_between_one_and_500_ids(self, mock_run_bot_apply_async):
+        self.assertEqual(self._get_statuses("ids=").status_code, 400)
+        self.assertEqual(self._get_statuses("ids=" + ",".join(f"bot_{index}" for index in range(501))).status_code, 400)
+        self.assertEqual(self._get_statuses("ids=" + ",".join(f"bot_{index}" for index in range(500))).status_code, 200)
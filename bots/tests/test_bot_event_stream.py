@@ -0,0 +1,171 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.test import AsyncClient, Client, TransactionTestCase, override_settings
+
+from bots.bot_event_stream import append_event, get_hub, stream_key
+from bots.models import ApiKey, Bot, BotEventManager, BotEventTypes, BotStates, Organization, Project, WebhookTriggerTypes
+from bots.redis_client import get_redis_client
+
+CHAT_MESSAGES_UPDATE = WebhookTriggerTypes.trigger_type_to_api_code(WebhookTriggerTypes.CHAT_MESSAGES_UPDATE)
+
+
+def parse_server_sent_event(chunk):
+    fields = {}
+    for line in chunk.decode().strip().split("\n"):
+        name, _, value = line.partition(": ")
+        fields[name] = value
+    return fields
+
+
+class BotEventStreamTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.url = f"/api/v1/bots/{self.bot.object_id}/events/stream"
+
+    def tearDown(self):
+        get_redis_client().delete(stream_key(self.bot.object_id))
+
+    def _append_chat_message(self, text):
+        append_event(self.bot.object_id, CHAT_MESSAGES_UPDATE, f'{{"text":"{text}"}}'.encode())
+        return get_redis_client().xrevrange(stream_key(self.bot.object_id), count=1)[0][0].decode()
+
+    async def _connect(self, **headers):
+        response = await AsyncClient().get(self.url, headers={"Authorization": f"Token {self.api_key}", **headers})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = response.streaming_content
+        self.assertTrue((await anext(events)).startswith(b"retry: "))
+        return events
+
+    async def _next_event(self, events):
+        return parse_server_sent_event(await asyncio.wait_for(anext(events), timeout=5))
+
+    async def _wait_for_listener(self):
+        hub = get_hub()
+        while not hub.listeners.get(self.bot.object_id):
+            await asyncio.sleep(0.01)
+        return next(iter(hub.listeners[self.bot.object_id]))
+
+    async def _disconnect(self, events):
+        # When the client disconnects, Django cancels the task that's sending the response
+        waiting_for_event = asyncio.create_task(anext(events))
+        await asyncio.sleep(0.1)
+        waiting_for_event.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting_for_event
+        await self._close_hub()
+
+    async def _close_hub(self):
+        hub = get_hub()
+        self.assertNotIn(self.bot.object_id, hub.listeners)
+        if hub.reader_task:
+            await asyncio.wait_for(hub.reader_task, timeout=5)
+        await hub.pubsub.aclose()
+        await hub.redis_client.aclose()
+
+    async def test_events_are_streamed_until_the_bot_ends(self):
+        events = await self._connect()
+        next_event = asyncio.create_task(self._next_event(events))
+        await self._wait_for_listener()
+
+        await sync_to_async(self._append_chat_message)("hello")
+        event = await next_event
+        self.assertEqual(event["event"], "chat_messages.update")
+        self.assertEqual(event["data"], '{"text":"hello"}')
+
+        await sync_to_async(BotEventManager.create_event)(self.bot, BotEventTypes.MEETING_ENDED)
+        event = await self._next_event(events)
+        self.assertEqual(event["event"], "bot.state_change")
+        self.assertIn('"new_state":"post_processing"', event["data"])
+
+        await sync_to_async(BotEventManager.create_event)(self.bot, BotEventTypes.POST_PROCESSING_COMPLETED)
+        event = await self._next_event(events)
+        self.assertIn('"new_state":"ended"', event["data"])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+        await self._close_hub()
+
+        # EventSource reconnects after the stream ends, and is told to stop
+        response = await AsyncClient().get(self.url, headers={"Authorization": f"Token {self.api_key}", "Last-Event-ID": event["id"]})
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_resumes_after_the_last_event_id(self):
+        first_event_id = await sync_to_async(self._append_chat_message)("first")
+        await sync_to_async(self._append_chat_message)("second")
+        third_event_id = await sync_to_async(self._append_chat_message)("third")
+
+        events = await self._connect(**{"Last-Event-ID": first_event_id})
+        self.assertEqual((await self._next_event(events))["data"], '{"text":"second"}')
+        event = await self._next_event(events)
+        self.assertEqual(event["id"], third_event_id)
+        self.assertEqual(event["data"], '{"text":"third"}')
+
+        await sync_to_async(self._append_chat_message)("fourth")
+        self.assertEqual((await self._next_event(events))["data"], '{"text":"fourth"}')
+        await self._disconnect(events)
+
+    @override_settings(BOT_EVENT_STREAM_QUEUE_SIZE=2)
+    async def test_client_that_falls_behind_catches_up_from_the_stream(self):
+        events = await self._connect()
+        first_event = asyncio.create_task(self._next_event(events))
+        listener = await self._wait_for_listener()
+        await sync_to_async(self._append_chat_message)("0")
+        await first_event
+
+        for index in range(1, 6):
+            await sync_to_async(self._append_chat_message)(str(index))
+        while not listener.overflowed:
+            await asyncio.sleep(0.01)
+        # Only the marker is buffered, not the events that didn't fit
+        self.assertEqual(listener.queue.qsize(), 1)
+
+        received = [(await self._next_event(events))["data"] for _ in range(5)]
+        self.assertEqual(received, [f'{{"text":"{index}"}}' for index in range(1, 6)])
+
+        await sync_to_async(self._append_chat_message)("6")
+        self.assertEqual((await self._next_event(events))["data"], '{"text":"6"}')
+        await self._disconnect(events)
+
+    @override_settings(BOT_EVENT_STREAM_KEEPALIVE_SECONDS=0)
+    async def test_idle_stream_is_kept_alive(self):
+        events = await self._connect()
+        self.assertEqual(await asyncio.wait_for(anext(events), timeout=5), b": keepalive\n\n")
+        await self._disconnect(events)
+
+    async def test_ended_bot_only_sends_the_events_after_the_last_event_id(self):
+        first_event_id = await sync_to_async(self._append_chat_message)("first")
+        await sync_to_async(self._append_chat_message)("second")
+        await Bot.objects.filter(id=self.bot.id).aupdate(state=BotStates.ENDED)
+
+        events = await self._connect(**{"Last-Event-ID": first_event_id})
+        self.assertEqual((await self._next_event(events))["data"], '{"text":"second"}')
+        with self.assertRaises(StopAsyncIteration):
+            await anext(events)
+        await self._close_hub()
+
+    async def test_ended_bot_without_events_to_send_returns_no_content(self):
+        last_event_id = await sync_to_async(self._append_chat_message)("last")
+        await Bot.objects.filter(id=self.bot.id).aupdate(state=BotStates.FATAL_ERROR)
+
+        for headers in [{}, {"Last-Event-ID": last_event_id}]:
+            response = await AsyncClient().get(self.url, headers={"Authorization": f"Token {self.api_key}", **headers})
+            self.assertEqual(response.status_code, 204, headers)
+            self.assertEqual(response.content, b"")
+
+    def test_invalid_requests_are_rejected(self):
+        client = Client()
+        response = client.get("/api/v1/bots/bot_doesnotexist/events/stream", HTTP_AUTHORIZATION=f"Token {self.api_key}", HTTP_ACCEPT="text/event-stream")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.content, b'event: error\ndata: {"error":"Bot not found"}\n\n')
+
+        response = client.get(f"{self.url}?last_event_id=abc", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {"error": "Invalid Last-Event-ID"})
+
+        # The stream never ends while the bot is in the meeting, so it can't be served under WSGI
+        response = client.get(self.url, HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 400)
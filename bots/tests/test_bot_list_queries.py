@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import Client, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotEventManager, BotEventTypes, BotStates, Project, Recording, RecordingStates, RecordingTranscriptionStates, RecordingTypes, TranscriptionTypes
+
+
+class BotListQueriesTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.client = Client()
+        # Look the API key up every time, so that whether it was cached doesn't change the number of queries
+        bypass_api_key_cache = patch("bots.api_key_cache._listener")
+        bypass_api_key_cache.start().subscribed.is_set.return_value = False
+        self.addCleanup(bypass_api_key_cache.stop)
+
+    def _create_bots(self, count):
+        for _ in range(count):
+            bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.READY)
+            BotEventManager.create_event(bot=bot, event_type=BotEventTypes.JOIN_REQUESTED)
+            BotEventManager.create_event(bot=bot, event_type=BotEventTypes.BOT_JOINED_MEETING)
+            Recording.objects.create(bot=bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS, transcription_state=RecordingTranscriptionStates.IN_PROGRESS)
+        # A bot without a recording
+        Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/456", state=BotStates.READY)
+
+    def _list_bots(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/bots", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"], len(queries)
+
+    def test_listing_bots_takes_the_same_number_of_queries_however_many_bots_there_are(self):
+        self._create_bots(2)
+        results, query_count = self._list_bots()
+        self.assertEqual(len(results), 3)
+
+        self._create_bots(20)
+        results, query_count_with_more_bots = self._list_bots()
+        self.assertEqual(len(results), 24)
+        self.assertEqual(query_count_with_more_bots, query_count)
+
+        self.assertEqual([event["type"] for event in results[0]["events"]], ["join_requested", "joined_meeting"])
+        self.assertEqual(results[0]["recording_state"], "in_progress")
+        self.assertEqual(results[0]["transcription_state"], "in_progress")
+        self.assertEqual(results[2]["events"], [])
+        self.assertIsNone(results[2]["recording_state"])
+        self.assertIsNone(results[2]["transcription_state"])
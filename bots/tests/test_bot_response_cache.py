@@ -0,0 +1,87 @@
+from unittest.mock import patch
+
+from django.test import Client, TransactionTestCase
+from django.utils.http import http_date
+
+from accounts.models import Organization
+from bots.bot_response_cache import PostMeetingResponseCacheMixin, delete_cached_responses, index_key
+from bots.bots_api_views import ChatMessagesView
+from bots.models import ApiKey, Bot, BotStates, ChatMessage, ChatMessageToOptions, Participant, ParticipantEvent, ParticipantEventTypes, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, Utterance
+from bots.redis_client import get_redis_client
+
+
+class BotResponseCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.ENDED)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.COMPLETE)
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant-1", full_name="Participant One")
+        ParticipantEvent.objects.create(participant=self.participant, event_type=ParticipantEventTypes.JOIN, timestamp_ms=1000)
+        ChatMessage.objects.create(bot=self.bot, to=ChatMessageToOptions.EVERYONE, participant=self.participant, text="Hello", timestamp=1000)
+        self.utterance = Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=1000, duration_ms=500, transcription={"transcript": "hello"})
+        self.client = Client()
+
+    def tearDown(self):
+        delete_cached_responses(self.bot.object_id)
+
+    def _get(self, path, **headers):
+        return self.client.get(f"/api/v1/bots/{self.bot.object_id}{path}", HTTP_AUTHORIZATION=f"Token {self.api_key}", **headers)
+
+    def test_conditional_requests_get_a_not_modified_response(self):
+        for path in ["", "/transcript", "/participants", "/participant_events", "/chat_messages"]:
+            response = self._get(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertIn("Last-Modified", response, path)
+
+            response = self._get(path, HTTP_IF_NONE_MATCH=response["ETag"])
+            self.assertEqual(response.status_code, 304, path)
+            self.assertEqual(response.content, b"", path)
+            self.assertIn("ETag", response, path)
+
+            response = self._get(path, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+            self.assertEqual(response.status_code, 304, path)
+
+    def test_views_that_dont_override_the_last_modified_date_use_the_bots(self):
+        with patch.object(ChatMessagesView, "get_resource_last_modified", PostMeetingResponseCacheMixin.get_resource_last_modified):
+            response = self._get("/chat_messages")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Last-Modified"], http_date(int(self.bot.updated_at.timestamp())))
+            self.assertEqual(self._get("/chat_messages", HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+
+    def test_responses_vary_with_the_query_and_format(self):
+        etags = {self._get(path)["ETag"] for path in ["/transcript", "/transcript?limit=1", "/transcript?format=ndjson"]}
+        self.assertEqual(len(etags), 3)
+
+    def test_responses_are_served_from_the_cache_until_the_data_is_deleted(self):
+        response = self._get("/transcript")
+        self.assertEqual(response.json()[0]["transcription"]["transcript"], "hello")
+        bot_response = self._get("")
+
+        # An update that doesn't change updated_at, so the response for the same ETag comes from the cache
+        Utterance.objects.filter(id=self.utterance.id).update(transcription={"transcript": "changed"})
+        cached_response = self._get("/transcript")
+        self.assertEqual(cached_response.content, response.content)
+        self.assertEqual(cached_response["ETag"], response["ETag"])
+
+        response = self.client.post(f"/api/v1/bots/{self.bot.object_id}/delete_data", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(get_redis_client().exists(index_key(self.bot.object_id)))
+
+        response = self._get("/transcript", HTTP_IF_NONE_MATCH=cached_response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], cached_response["ETag"])
+        self.assertEqual(response.json(), [])
+
+        response = self._get("", HTTP_IF_NONE_MATCH=bot_response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "data_deleted")
+
+    def test_bots_in_the_meeting_are_not_cached(self):
+        Bot.objects.filter(id=self.bot.id).update(state=BotStates.JOINED_RECORDING)
+
+        response = self._get("/transcript")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("ETag", response)
+        self.assertFalse(get_redis_client().exists(index_key(self.bot.object_id)))
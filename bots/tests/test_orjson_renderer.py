@@ -0,0 +1,131 @@
+import datetime
+import io
+import uuid
+from collections import OrderedDict
+from decimal import Decimal
+from unittest.mock import patch
+from zoneinfo import ZoneInfo
+
+from django.test import Client, TransactionTestCase
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotEventManager, BotEventTypes, BotStates, ChatMessage, ChatMessageToOptions, Participant, ParticipantEvent, ParticipantEventTypes, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, Utterance
+from bots.parsers import ORJSONParser
+from bots.renderers import ORJSONRenderer
+
+VALUES = {
+    "utc_datetime": datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+    "utc_datetime_with_microseconds": datetime.datetime(2025, 1, 2, 3, 4, 5, 6789, tzinfo=ZoneInfo("UTC")),
+    "london_datetime_in_winter": datetime.datetime(2025, 1, 2, 3, 4, 5, tzinfo=ZoneInfo("Europe/London")),
+    "offset_datetime": datetime.datetime(2025, 7, 2, 3, 4, 5, 123000, tzinfo=ZoneInfo("Asia/Kolkata")),
+    "naive_datetime": datetime.datetime(2025, 1, 2, 3, 4, 5),
+    "date": datetime.date(2025, 1, 2),
+    "time": datetime.time(3, 4, 5, 6),
+    "timedelta": datetime.timedelta(hours=1, microseconds=5),
+    "decimals": [Decimal("1.10"), Decimal("-0.5"), Decimal("1e-7"), Decimal("12345678901234567890.5")],
+    "uuid": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+    "floats": [0.1, 1 / 3, -0.0, 100.0, 0.0001, 123456789.125, 1e15],
+    "small_float": 1e-05,
+    "large_float": 1e16,
+    "large_integer": 2**70,
+    "non_string_keys": {1: "one", None: "none", False: "false", 2.5: "two and a half"},
+    "lazy_string": gettext_lazy("Not found."),
+    "error_detail": ErrorDetail("Invalid input.", code="invalid"),
+    "ordered_dict": OrderedDict([("b", 1), ("a", 2)]),
+    "tuple": (1, "two", None, True),
+    "strings": ["plain", "caf\u00e9 \U0001f600", "line\nbreak\ttab", "control \x00\x1f\x7f", 'quote " backslash \\', "separators \u2028 \u2029"],
+    "empty": [{}, [], ""],
+}
+
+
+class ORJSONRendererTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.READY, metadata={"customer": 'Example "Co"', "score": 0.25, "tags": ["a", "b"]})
+        BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+        BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.BOT_JOINED_MEETING)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.IN_PROGRESS)
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant-1", user_uuid="user-1", full_name="Participant One")
+        ParticipantEvent.objects.create(participant=self.participant, event_type=ParticipantEventTypes.JOIN, timestamp_ms=1000, event_data={"is_host": True})
+        ChatMessage.objects.create(bot=self.bot, to=ChatMessageToOptions.EVERYONE, participant=self.participant, text="Hello\tthere", timestamp=1000, additional_data={"reply_to": None})
+        for index in range(3):
+            words = [{"word": "hello", "start": 1.25 + index, "end": 1.5 + index, "confidence": 0.9876}]
+            Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=1000 * index, duration_ms=500, transcription={"transcript": f"hello {index}", "words": words})
+
+    def _get(self, path):
+        response = Client().get(f"/api/v1{path}", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 200, path)
+        return response
+
+    def test_api_responses_are_rendered_the_same(self):
+        paths = [
+            "/bots",
+            f"/bots/{self.bot.object_id}",
+            f"/bots/status?ids={self.bot.object_id}",
+            f"/bots/{self.bot.object_id}/transcript",
+            f"/bots/{self.bot.object_id}/transcript?limit=2",
+            f"/bots/{self.bot.object_id}/participants",
+            f"/bots/{self.bot.object_id}/participant_events",
+            f"/bots/{self.bot.object_id}/chat_messages",
+        ]
+        for path in paths:
+            response = self._get(path)
+            # Rendered by orjson, without falling back to JSONRenderer
+            with patch.object(JSONRenderer, "render", side_effect=AssertionError("fell back to JSONRenderer")):
+                self.assertEqual(ORJSONRenderer().render(response.data, "application/json"), response.content, path)
+
+    def test_values_are_rendered_the_same(self):
+        for name, value in VALUES.items():
+            self.assertEqual(ORJSONRenderer().render({name: value}), JSONRenderer().render({name: value}), name)
+        self.assertEqual(ORJSONRenderer().render(VALUES), JSONRenderer().render(VALUES))
+        self.assertEqual(ORJSONRenderer().render(list(VALUES.values())), JSONRenderer().render(list(VALUES.values())))
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+        for accepted_media_type in ["application/json; indent=4", "application/json; indent=0"]:
+            self.assertEqual(ORJSONRenderer().render(VALUES, accepted_media_type), JSONRenderer().render(VALUES, accepted_media_type), accepted_media_type)
+        self.assertEqual(ORJSONRenderer().render(VALUES, renderer_context={"indent": 4}), JSONRenderer().render(VALUES, renderer_context={"indent": 4}))
+
+    def test_values_that_cannot_be_rendered_raise_the_same_errors(self):
+        for value in [datetime.time(3, 4, tzinfo=datetime.timezone.utc), object(), {("a", "b"): 1}]:
+            with self.assertRaises((TypeError, ValueError)) as json_error:
+                JSONRenderer().render({"value": value})
+            with self.assertRaises(type(json_error.exception)) as orjson_error:
+                ORJSONRenderer().render({"value": value})
+            self.assertEqual(str(orjson_error.exception), str(json_error.exception))
+
+        # Strict JSON doesn't allow NaN, which orjson renders as null
+        self.assertEqual(ORJSONRenderer().render({"value": float("nan")}), b'{"value":null}')
+
+
+class ORJSONParserTest(TransactionTestCase):
+    def _parse(self, parser, body, encoding="utf-8"):
+        return parser.parse(io.BytesIO(body), "application/json", {"encoding": encoding})
+
+    def test_bodies_are_parsed_the_same(self):
+        bodies = [
+            b'{"meeting_url": "https://zoom.us/j/123", "bot_name": "Caf\xc3\xa9 \\u00e9 \\ud83d\\ude00", "metadata": {"a": [1, 2.5, -0.0, 1e-7, 1E+400, true, null]}}',
+            b"[9223372036854775807, 18446744073709551616, -9223372036854775809, 123456789012345678901234567890]",
+            b'{"a": 1, "a": 2, "separators": "\xe2\x80\xa8", "escaped": "\\u0000 \\n \\" \\\\"}',
+            b'  "just a string"\n',
+            b"0.1000000000000000055511151231257827",
+        ]
+        for body in bodies:
+            orjson_data = self._parse(ORJSONParser(), body)
+            json_data = self._parse(JSONParser(), body)
+            self.assertEqual(orjson_data, json_data, body)
+            self.assertEqual(repr(orjson_data), repr(json_data), body)
+        self.assertEqual(self._parse(ORJSONParser(), '{"café": 1}'.encode("latin-1"), encoding="latin-1"), {"café": 1})
+
+    def test_invalid_bodies_raise_the_same_errors(self):
+        for body in [b"", b"{", b"[1,]", b'{"a": NaN}', b"Infinity", b"\xef\xbb\xbf{}", b'"\x01"', b"\xff"]:
+            with self.assertRaises(ParseError) as json_error:
+                self._parse(JSONParser(), body)
+            with self.assertRaises(ParseError) as orjson_error:
+                self._parse(ORJSONParser(), body)
+            self.assertEqual(str(orjson_error.exception), str(json_error.exception), body)
@@ -0,0 +1,108 @@
+from unittest.mock import patch
+
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bots.models import Bot, BotEvent, BotEventTypes, BotResourceSnapshot, BotStates, Organization, Participant, ParticipantEvent, ParticipantEventTypes, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSubscription, WebhookTriggerTypes
+from bots.partitioning import PARTITIONED_MODELS, create_partitions, expire_partitions, get_partitions, month_start, remove_expired_data
+
+
+def days_ago(days):
+    return timezone.now() - timezone.timedelta(days=days)
+
+
+class PartitioningTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization, data_retention_days=30)
+        self.webhook_subscription = WebhookSubscription.objects.create(project=self.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE])
+        self.ended_bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.ENDED)
+        self.active_bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/456", state=BotStates.JOINED_RECORDING)
+
+    def _create_bot_event(self, bot, created_at):
+        bot_event = BotEvent.objects.create(bot=bot, old_state=BotStates.READY, new_state=BotStates.JOINING, event_type=BotEventTypes.JOIN_REQUESTED)
+        BotEvent.objects.filter(id=bot_event.id).update(created_at=created_at)
+        return bot_event
+
+    def _partition_of(self, model, id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT tableoid::regclass::text FROM {model._meta.db_table} WHERE id = %s", [id])
+            return cursor.fetchone()[0]
+
+    def test_new_partitions_take_the_rows_of_their_month_from_the_default_partition(self):
+        created_at = timezone.now() + timezone.timedelta(days=400)
+        snapshot = BotResourceSnapshot.objects.create(bot=self.ended_bot, data={"ram_usage_megabytes": 1024})
+        BotResourceSnapshot.objects.filter(id=snapshot.id).update(created_at=created_at)
+
+        create_partitions(BotResourceSnapshot, months_ahead=14)
+
+        partitions = get_partitions(BotResourceSnapshot)
+        for partition, next_partition in zip(partitions, partitions[1:]):
+            self.assertEqual(partition.end, next_partition.start)
+        self.assertGreater(partitions[-1].end, created_at)
+        self.assertEqual(self._partition_of(BotResourceSnapshot, snapshot.id), f"bots_botresourcesnapshot_p{month_start(created_at):%Y%m}")
+        # Partitions that already exist aren't created again
+        self.assertEqual(create_partitions(BotResourceSnapshot, months_ahead=14), [])
+
+    @override_settings(DATA_RETENTION_DAYS=None)
+    def test_expired_rows_of_ended_bots_are_deleted_according_to_the_project_retention_period(self):
+        other_project = Project.objects.create(name="Project Without Retention", organization=self.organization)
+        other_project_bot = Bot.objects.create(project=other_project, meeting_url="https://zoom.us/j/789", state=BotStates.ENDED)
+
+        expired_event = self._create_bot_event(self.ended_bot, days_ago(40))
+        recent_event = self._create_bot_event(self.ended_bot, days_ago(10))
+        active_bot_event = self._create_bot_event(self.active_bot, days_ago(40))
+        other_project_event = self._create_bot_event(other_project_bot, days_ago(40))
+        participant = Participant.objects.create(bot=self.ended_bot, uuid="participant-1")
+        ParticipantEvent.objects.create(participant=participant, event_type=ParticipantEventTypes.JOIN, timestamp_ms=0)
+        ParticipantEvent.objects.update(created_at=days_ago(40))
+        BotResourceSnapshot.objects.create(bot=self.ended_bot, data={})
+        BotResourceSnapshot.objects.update(created_at=days_ago(40))
+        WebhookDeliveryAttempt.objects.create(webhook_subscription=self.webhook_subscription, bot=self.ended_bot, idempotency_key="00000000-0000-0000-0000-000000000001", status=WebhookDeliveryAttemptStatus.SUCCESS)
+        pending_attempt = WebhookDeliveryAttempt.objects.create(webhook_subscription=self.webhook_subscription, bot=self.ended_bot, idempotency_key="00000000-0000-0000-0000-000000000002", status=WebhookDeliveryAttemptStatus.PENDING)
+        WebhookDeliveryAttempt.objects.update(created_at=days_ago(40))
+
+        removed_partitions, deleted_count = remove_expired_data()
+
+        self.assertEqual(removed_partitions, [])
+        self.assertEqual(deleted_count, 4)
+        self.assertEqual(set(BotEvent.objects.values_list("id", flat=True)), {recent_event.id, active_bot_event.id, other_project_event.id})
+        self.assertFalse(BotEvent.objects.filter(id=expired_event.id).exists())
+        self.assertEqual(ParticipantEvent.objects.count(), 0)
+        self.assertEqual(BotResourceSnapshot.objects.count(), 0)
+        self.assertEqual(list(WebhookDeliveryAttempt.objects.values_list("id", flat=True)), [pending_attempt.id])
+
+    def test_partition_with_rows_of_a_bot_that_has_not_ended_is_kept(self):
+        self._create_bot_event(self.active_bot, days_ago(40))
+        oldest_partition = get_partitions(BotEvent)[0]
+
+        self.assertEqual(expire_partitions(BotEvent, oldest_partition.end), [])
+        self.assertEqual(get_partitions(BotEvent)[0], oldest_partition)
+        self.assertEqual(BotEvent.objects.count(), 1)
+
+    @override_settings(DATA_RETENTION_DAYS=None)
+    def test_expired_partitions_are_detached_for_archiving(self):
+        self._create_bot_event(self.ended_bot, days_ago(40))
+        partitions_by_model = {model: get_partitions(model) for model in PARTITIONED_MODELS}
+        self.addCleanup(self._reattach_partitions, partitions_by_model)
+        oldest_partition = partitions_by_model[BotEvent][0]
+
+        # Once even the oldest partition is past every project's retention period
+        with patch("bots.partitioning.timezone.now", return_value=oldest_partition.end + timezone.timedelta(days=31)):
+            removed_partitions, _ = remove_expired_data(archive=True)
+
+        self.assertIn(oldest_partition.name, removed_partitions)
+        self.assertNotIn(oldest_partition, get_partitions(BotEvent))
+        self.assertEqual(BotEvent.objects.count(), 0)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM "{oldest_partition.name}"')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def _reattach_partitions(self, partitions_by_model):
+        with connection.cursor() as cursor:
+            for model, partitions in partitions_by_model.items():
+                for partition in set(partitions) - set(get_partitions(model)):
+                    cursor.execute(f'TRUNCATE "{partition.name}"')
+                    start = "MINVALUE" if partition.start is None else "%s"
+                    cursor.execute(f'ALTER TABLE "{model._meta.db_table}" ATTACH PARTITION "{partition.name}" FOR VALUES FROM ({start}) TO (%s)', [partition.start, partition.end] if partition.start else [partition.end])
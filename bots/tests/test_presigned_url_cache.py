@@ -0,0 +1,85 @@
+from unittest.mock import patch
+
+import redis
+from django.test import Client, TransactionTestCase
+
+from bots import presigned_url_cache
+from bots.models import ApiKey, Bot, BotDebugScreenshot, BotEventManager, BotEventTypes, BotStates, Organization, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes
+from bots.redis_client import get_redis_client
+
+NOW = 1_800_000_000.0
+
+
+class PresignedUrlCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij", state=BotStates.READY)
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=RecordingTypes.AUDIO_AND_VIDEO,
+            transcription_type=TranscriptionTypes.NON_REALTIME,
+            is_default_recording=True,
+            state=RecordingStates.COMPLETE,
+            file=f"{self.bot.object_id}.mp4",
+        )
+        event = BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+        self.screenshot = BotDebugScreenshot.objects.create(bot_event=event, file=f"{self.bot.object_id}/screenshot.png")
+
+        presigned_url_cache.clear_local_cache()
+        self.addCleanup(presigned_url_cache.clear_local_cache)
+        self.addCleanup(self._delete_shared_urls)
+
+        sign_url_patcher = patch("bots.presigned_url_cache.sign_url", side_effect=lambda storage, name, expires_in: f"https://bucket.s3.amazonaws.com/{name}?X-Amz-Expires={expires_in}&n={self.mock_sign_url.call_count}")
+        self.mock_sign_url = sign_url_patcher.start()
+        self.addCleanup(sign_url_patcher.stop)
+        time_patcher = patch("bots.presigned_url_cache.time")
+        self.mock_time = time_patcher.start()
+        self.mock_time.time.return_value = NOW
+        self.addCleanup(time_patcher.stop)
+
+    def _delete_shared_urls(self):
+        keys = list(get_redis_client().scan_iter(match=f"{presigned_url_cache.KEY_PREFIX}:*{self.bot.object_id}*"))
+        if keys:
+            get_redis_client().delete(*keys)
+
+    def test_same_url_is_handed_out_until_the_bucket_ends(self):
+        url = self.recording.url
+        bucket_seconds = 900
+        seconds_left_in_bucket = bucket_seconds - int(NOW % bucket_seconds)
+        self.assertIn(f"X-Amz-Expires={seconds_left_in_bucket + presigned_url_cache.MIN_VALIDITY_SECONDS}", url)
+
+        self.mock_time.time.return_value = NOW + seconds_left_in_bucket - 1
+        self.assertEqual(Recording.objects.get(id=self.recording.id).url, url)
+        # Other processes get the URL from Redis rather than signing their own
+        presigned_url_cache.clear_local_cache()
+        self.assertEqual(self.recording.url, url)
+        self.assertEqual(self.mock_sign_url.call_count, 1)
+
+        self.mock_time.time.return_value = NOW + seconds_left_in_bucket
+        next_url = self.recording.url
+        self.assertNotEqual(next_url, url)
+        self.assertIn(f"X-Amz-Expires={bucket_seconds + presigned_url_cache.MIN_VALIDITY_SECONDS}", next_url)
+
+        self.assertNotEqual(self.screenshot.url, next_url)
+        self.assertEqual(self.mock_sign_url.call_count, 3)
+        self.assertIsNone(Recording(bot=self.bot).url)
+
+    def test_urls_are_still_signed_when_redis_is_unavailable(self):
+        with patch("bots.presigned_url_cache.get_redis_client", side_effect=redis.ConnectionError("unavailable")):
+            url = self.screenshot.url
+            self.assertEqual(self.screenshot.url, url)
+        self.assertEqual(self.mock_sign_url.call_count, 1)
+
+    def test_recording_view_can_redirect_to_the_recording(self):
+        client = Client()
+        response = client.get(f"/api/v1/bots/{self.bot.object_id}/recording", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 200)
+        url = response.json()["url"]
+
+        response = client.get(f"/api/v1/bots/{self.bot.object_id}/recording?redirect=true", HTTP_AUTHORIZATION=f"Token {self.api_key}")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(response["Location"], url)
+        self.assertEqual(response["Cache-Control"], f"private, max-age={presigned_url_cache.seconds_until_url_changes(NOW)}")
+        self.assertEqual(self.mock_sign_url.call_count, 1)
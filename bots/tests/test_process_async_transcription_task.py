@@ -0,0 +1,113 @@
+import uuid
+from unittest import mock
+
+from django.test import TransactionTestCase
+from django.utils import timezone
+
+from bots.models import (
+    AsyncTranscription,
+    AsyncTranscriptionStates,
+    AudioChunk,
+    Bot,
+    Organization,
+    Participant,
+    Project,
+    Recording,
+    RecordingStates,
+    TranscriptionFailureReasons,
+    Utterance,
+)
+from bots.tasks.process_async_transcription_task import finish_async_transcription, process_async_transcription
+
+
+class ProcessAsyncTranscriptionTaskTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(
+            bot=self.bot,
+            recording_type=1,
+            transcription_type=1,
+            state=RecordingStates.COMPLETE,
+            transcription_provider=1,
+        )
+        self.participant = Participant.objects.create(bot=self.bot, uuid=str(uuid.uuid4()))
+        self.audio_chunks = [AudioChunk.objects.create(recording=self.recording, participant=self.participant, audio_blob=b"rawpcmbytes", timestamp_ms=i * 500, duration_ms=500, sample_rate=16000) for i in range(3)]
+        self.async_transcription = AsyncTranscription.objects.create(recording=self.recording)
+
+        # Make Celery run synchronously inside tests
+        from django.conf import settings
+
+        settings.CELERY_TASK_ALWAYS_EAGER = True
+        settings.CELERY_TASK_EAGER_PROPAGATES = True
+
+    @mock.patch("bots.tasks.process_async_transcription_task.chord")
+    def test_utterances_are_bulk_created_and_published_in_one_chord(self, mock_chord):
+        with mock.patch("bots.tasks.process_async_transcription_task.process_async_transcription.apply_async") as mock_apply_async:
+            process_async_transcription.run(self.async_transcription.id)
+
+        utterances = Utterance.objects.filter(async_transcription=self.async_transcription).order_by("timestamp_ms")
+        self.assertEqual(utterances.count(), len(self.audio_chunks))
+        self.assertEqual([u.audio_chunk_id for u in utterances], [c.id for c in self.audio_chunks])
+
+        # A single chord is published with one signature per utterance, and the callback finishes the transcription
+        mock_chord.assert_called_once()
+        header = mock_chord.call_args.args[0]
+        self.assertEqual(sorted(sig.args[0] for sig in header), sorted(u.id for u in utterances))
+        self.assertTrue(all(sig.options["queue"] == "batch" for sig in header))
+        callback = mock_chord.return_value.call_args.args[0]
+        self.assertEqual(callback.task, finish_async_transcription.name)
+        self.assertEqual(callback.args, (self.async_transcription.id,))
+
+        # Instead of polling every minute, a single safety net check is scheduled for the timeout
+        mock_apply_async.assert_called_once_with(args=[self.async_transcription.id], countdown=1800)
+
+        self.async_transcription.refresh_from_db()
+        self.assertEqual(self.async_transcription.state, AsyncTranscriptionStates.IN_PROGRESS)
+
+    def test_finish_marks_transcription_complete_when_all_utterances_are_transcribed(self):
+        self.async_transcription.state = AsyncTranscriptionStates.IN_PROGRESS
+        self.async_transcription.started_at = timezone.now()
+        self.async_transcription.save()
+        for audio_chunk in self.audio_chunks:
+            Utterance.objects.create(recording=self.recording, async_transcription=self.async_transcription, participant=self.participant, audio_chunk=audio_chunk, timestamp_ms=audio_chunk.timestamp_ms, duration_ms=audio_chunk.duration_ms, transcription={"transcript": "hi"})
+
+        finish_async_transcription.run(self.async_transcription.id)
+
+        self.async_transcription.refresh_from_db()
+        self.assertEqual(self.async_transcription.state, AsyncTranscriptionStates.COMPLETE)
+
+    def test_finish_marks_transcription_failed_when_utterances_are_still_in_progress(self):
+        self.async_transcription.state = AsyncTranscriptionStates.IN_PROGRESS
+        self.async_transcription.started_at = timezone.now()
+        self.async_transcription.save()
+        Utterance.objects.create(recording=self.recording, async_transcription=self.async_transcription, participant=self.participant, audio_chunk=self.audio_chunks[0], timestamp_ms=0, duration_ms=500)
+
+        finish_async_transcription.run(self.async_transcription.id)
+
+        self.async_transcription.refresh_from_db()
+        self.assertEqual(self.async_transcription.state, AsyncTranscriptionStates.FAILED)
+        self.assertIn(TranscriptionFailureReasons.UTTERANCES_STILL_IN_PROGRESS_WHEN_TRANSCRIPTION_TERMINATED, self.async_transcription.failure_data["failure_reasons"])
+
+    def test_finish_is_a_no_op_once_transcription_is_terminated(self):
+        self.async_transcription.state = AsyncTranscriptionStates.COMPLETE
+        self.async_transcription.save()
+
+        with mock.patch("bots.tasks.process_async_transcription_task.terminate_transcription") as mock_terminate:
+            finish_async_transcription.run(self.async_transcription.id)
+
+        mock_terminate.assert_not_called()
+
+    def test_safety_net_terminates_transcription_after_timeout(self):
+        self.async_transcription.state = AsyncTranscriptionStates.IN_PROGRESS
+        self.async_transcription.started_at = timezone.now() - timezone.timedelta(minutes=31)
+        self.async_transcription.save()
+        Utterance.objects.create(recording=self.recording, async_transcription=self.async_transcription, participant=self.participant, audio_chunk=self.audio_chunks[0], timestamp_ms=0, duration_ms=500)
+
+        with mock.patch("bots.tasks.process_async_transcription_task.process_async_transcription.apply_async") as mock_apply_async:
+            process_async_transcription.run(self.async_transcription.id)
+
+        mock_apply_async.assert_not_called()
+        self.async_transcription.refresh_from_db()
+        self.assertEqual(self.async_transcription.state, AsyncTranscriptionStates.FAILED)
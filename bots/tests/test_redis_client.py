@@ -0,0 +1,65 @@
+import json
+import threading
+from unittest.mock import patch
+
+import redis
+from django.test import TransactionTestCase
+
+from bots.bots_api_utils import send_sync_command
+from bots.models import Bot, Organization, Project
+from bots.redis_client import get_redis_client
+
+
+class RedisClientTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://meet.google.com/abc-defg-hij")
+
+    def test_client_is_shared_across_threads(self):
+        clients = []
+        threads = [threading.Thread(target=lambda: clients.append(get_redis_client())) for _ in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual({id(client) for client in clients}, {id(get_redis_client())})
+
+        connection_kwargs = get_redis_client().connection_pool.connection_kwargs
+        self.assertEqual(connection_kwargs["health_check_interval"], 30)
+        self.assertTrue(connection_kwargs["socket_keepalive"])
+        self.assertEqual(connection_kwargs["retry"]._retries, 3)
+
+    def test_commands_reuse_pooled_connections(self):
+        connection_pool = get_redis_client().connection_pool
+        send_sync_command(self.bot, "sync")
+        created_connections = connection_pool._created_connections
+        for _ in range(50):
+            send_sync_command(self.bot, "sync")
+        self.assertEqual(connection_pool._created_connections, created_connections)
+
+    def test_command_is_published_to_the_bot(self):
+        pubsub = get_redis_client().pubsub(ignore_subscribe_messages=True)
+        self.addCleanup(pubsub.close)
+        pubsub.subscribe(f"bot_{self.bot.id}")
+        pubsub.get_message(timeout=1.0)
+
+        send_sync_command(self.bot, "pause_recording")
+        message = pubsub.get_message(timeout=1.0)
+        self.assertEqual(json.loads(message["data"]), {"command": "pause_recording"})
+
+    def test_command_is_retried_when_its_connection_dropped(self):
+        send_sync_command(self.bot, "sync")
+        send_packed_command = redis.connection.Connection.send_packed_command
+        publishes = []
+
+        def drop_first_publish(connection, command, *args, **kwargs):
+            if b"PUBLISH" in b"".join(command if isinstance(command, list) else [command]):
+                publishes.append(connection)
+                if len(publishes) == 1:
+                    raise redis.ConnectionError("Connection closed by server.")
+            return send_packed_command(connection, command, *args, **kwargs)
+
+        with patch.object(redis.connection.Connection, "send_packed_command", autospec=True, side_effect=drop_first_publish):
+            send_sync_command(self.bot, "sync")
+        self.assertEqual(len(publishes), 2)
@@ -0,0 +1,234 @@
+import json
+import threading
+import time
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from bots.bot_controller.per_participant_streaming_audio_input_manager import PerParticipantStreamingAudioInputManager
+from bots.models import Bot, Credentials, Organization, Project, TranscriptionProviders, Utterance
+from bots.transcription_providers.deepgram.deepgram_streaming_transcriber import DeepgramStreamingTranscriber
+from bots.transcription_providers.deepgram.mock_deepgram_streaming_server import MockDeepgramStreamingServer
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriber
+
+
+def deepgram_result(transcript, start, duration, is_final, speech_final=False, words=None):
+    alternative = mock.Mock(transcript=transcript)
+    alternative.to_json.return_value = json.dumps({"transcript": transcript, "words": words or []})
+    return SimpleNamespace(channel=SimpleNamespace(alternatives=[alternative]), start=start, duration=duration, is_final=is_final, speech_final=speech_final)
+
+
+@mock.patch("bots.transcription_providers.deepgram.deepgram_streaming_transcriber.DeepgramClient")
+class DeepgramStreamingTranscriberTest(TransactionTestCase):
+    def _transcriber(self):
+        utterances = []
+        transcriber = DeepgramStreamingTranscriber(deepgram_api_key="key", interim_results=True, language="en", model="nova-3", sample_rate=16000, metadata=None, callback=None, on_final_callback=utterances.append)
+        transcriber.audio_start_time = 1000.0
+        return transcriber, utterances
+
+    def test_interim_results_are_only_kept_in_memory(self, mock_client):
+        transcriber, utterances = self._transcriber()
+
+        transcriber.handle_result(deepgram_result("hello", 0.5, 0.4, is_final=False))
+        transcriber.handle_result(deepgram_result("hello wor", 0.5, 0.8, is_final=False))
+
+        self.assertEqual(transcriber.interim_transcript, "hello wor")
+        self.assertEqual(utterances, [])
+
+    def test_final_segments_are_coalesced_until_speech_final(self, mock_client):
+        transcriber, utterances = self._transcriber()
+
+        transcriber.handle_result(deepgram_result("hello world", 0.5, 1.0, is_final=True, words=[{"word": "hello", "start": 0.5, "end": 0.9}]))
+        self.assertEqual(utterances, [])
+        transcriber.handle_result(deepgram_result("how are you", 1.5, 1.0, is_final=True, speech_final=True, words=[{"word": "how", "start": 1.6, "end": 1.8}]))
+
+        self.assertEqual(len(utterances), 1)
+        self.assertEqual(utterances[0]["transcription"]["transcript"], "hello world how are you")
+        self.assertEqual(utterances[0]["timestamp_ms"], 1000500)
+        self.assertEqual(utterances[0]["duration_ms"], 2000)
+        self.assertAlmostEqual(utterances[0]["transcription"]["words"][1]["start"], 1.1)
+        self.assertIsNone(transcriber.interim_transcript)
+
+    def test_finish_saves_pending_final_segments(self, mock_client):
+        transcriber, utterances = self._transcriber()
+
+        transcriber.handle_result(deepgram_result("goodbye", 3.0, 0.5, is_final=True))
+        transcriber.finish()
+
+        self.assertEqual([utterance["transcription"]["transcript"] for utterance in utterances], ["goodbye"])
+
+    def test_metrics_count_results_and_bytes(self, mock_client):
+        transcriber, utterances = self._transcriber()
+        partials = []
+        transcriber.on_partial_callback = partials.append
+
+        transcriber.send(b"\x00" * 640)
+        transcriber.handle_result(deepgram_result("hi", 0.0, 0.2, is_final=False))
+        transcriber.handle_result(deepgram_result("hi there", 0.0, 0.4, is_final=True, speech_final=True))
+
+        self.assertEqual(partials, ["hi"])
+        metrics = transcriber.metrics()
+        self.assertEqual(metrics["bytes_sent"], 640)
+        self.assertEqual(metrics["partial_count"], 1)
+        self.assertEqual(metrics["final_count"], 1)
+        self.assertEqual(metrics["utterance_count"], 1)
+
+    def test_transcriber_without_send_cannot_be_created(self, mock_client):
+        class TranscriberWithoutSend(StreamingTranscriber):
+            @classmethod
+            def create(cls, *, api_key, bot, sample_rate, metadata):
+                return cls()
+
+        with self.assertRaises(TypeError):
+            TranscriberWithoutSend.create(api_key="key", bot=None, sample_rate=16000, metadata=None)
+
+
+class MockDeepgramStreamingServerTest(TransactionTestCase):
+    def test_deepgram_client_receives_timed_transcripts(self):
+        utterances = []
+        partials = []
+        with MockDeepgramStreamingServer(phrase_duration_seconds=0.5, processing_delay_seconds=0.01) as server:
+            transcriber = DeepgramStreamingTranscriber(deepgram_api_key="key", interim_results=True, language="en", model="nova-3", sample_rate=16000, metadata=None, callback=None, url=server.url, on_final_callback=utterances.append, on_partial_callback=partials.append)
+            # One second of audio is two phrases
+            for _ in range(50):
+                transcriber.send(b"\x00" * 640)
+            deadline = time.time() + 5
+            while len(utterances) < 2 and time.time() < deadline:
+                time.sleep(0.01)
+            transcriber.finish()
+
+        self.assertEqual([utterance["transcription"]["transcript"] for utterance in utterances], ["phrase 0", "phrase 1"])
+        self.assertEqual(utterances[1]["duration_ms"], 500)
+        self.assertEqual(utterances[1]["timestamp_ms"] - utterances[0]["timestamp_ms"], 500)
+        self.assertEqual(partials, ["phrase", "phrase"])
+
+    def test_benchmark_persists_utterances_for_each_speaker_and_rolls_back(self):
+        output = StringIO()
+        call_command("benchmark_streaming_transcription", "--speakers", "2", "--duration", "1", "--phrase-duration", "0.5", "--processing-delay", "0.01", stdout=output)
+
+        results = json.loads(output.getvalue())
+        self.assertEqual(results["phrases_sent"], 4)
+        self.assertEqual(results["utterances_persisted"], 4)
+        self.assertGreater(results["latency_p50_ms"], 0)
+        self.assertFalse(Utterance.objects.exists())
+        self.assertFalse(Organization.objects.filter(name="Streaming transcription benchmark").exists())
+
+
+class PerParticipantStreamingAudioInputManagerTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.DEEPGRAM)
+        credentials.set_credentials({"api_key": "test_api_key"})
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz", settings={"transcription_settings": {"deepgram": {"use_streaming": True}}})
+        self.saved_utterances = []
+        self.speech = (np.sin(np.arange(480) / 3) * 20000).astype(np.int16).tobytes()
+
+    def _manager(self):
+        manager = PerParticipantStreamingAudioInputManager(
+            save_utterance_callback=self.saved_utterances.append,
+            get_participant_callback=lambda speaker_id: {"participant_uuid": speaker_id},
+            sample_rate=16000,
+            transcription_provider=TranscriptionProviders.DEEPGRAM,
+            bot=self.bot,
+        )
+        manager.silence_detected = lambda chunk_bytes: False
+        return manager
+
+    @mock.patch.object(DeepgramStreamingTranscriber, "create")
+    def test_least_recently_used_transcriber_is_evicted(self, mock_create):
+        mock_create.side_effect = lambda **kwargs: mock.Mock()
+        manager = self._manager()
+        manager.pool_size = 0
+
+        for speaker_id in ["a", "b", "c", "d", "e"]:
+            manager.add_chunk(speaker_id, None, self.speech)
+        # Speaker a speaks again, so b is now the least recently used
+        manager.add_chunk("a", None, self.speech)
+        transcriber_b = manager.streaming_transcribers["b"]
+
+        manager.monitor_transcription()
+
+        self.assertEqual(list(manager.streaming_transcribers.keys()), ["c", "d", "e", "a"])
+        transcriber_b.finish.assert_called_once()
+
+    @mock.patch.object(DeepgramStreamingTranscriber, "create")
+    def test_finalized_utterances_are_saved_on_the_main_loop(self, mock_create):
+        mock_create.side_effect = lambda **kwargs: mock.Mock()
+        manager = self._manager()
+        manager.pool_size = 0
+
+        manager.add_chunk("a", None, self.speech)
+        manager.streaming_transcribers["a"].on_final_callback({"transcription": {"transcript": "hi"}, "timestamp_ms": 1, "duration_ms": 2})
+        self.assertEqual(self.saved_utterances, [])
+
+        manager.monitor_transcription()
+
+        self.assertEqual(self.saved_utterances, [{"participant_uuid": "a", "transcription": {"transcript": "hi"}, "timestamp_ms": 1, "duration_ms": 2}])
+
+    @mock.patch.object(DeepgramStreamingTranscriber, "create")
+    def test_pre_warmed_transcriber_is_used_for_first_speech(self, mock_create):
+        mock_create.side_effect = lambda **kwargs: mock.Mock()
+        manager = self._manager()
+        self.assertEqual(manager.pool_size, 2)
+
+        manager.monitor_transcription()
+        manager.transcriber_pool_thread.join()
+        self.assertEqual(len(manager.transcriber_pool), 2)
+        pooled_transcriber = manager.transcriber_pool[0]
+
+        manager.add_chunk("a", None, self.speech)
+
+        self.assertIs(manager.streaming_transcribers["a"], pooled_transcriber)
+        self.assertEqual(mock_create.call_count, 2)
+        pooled_transcriber.send.assert_called_once_with(self.speech)
+
+    @mock.patch.object(DeepgramStreamingTranscriber, "create")
+    def test_connections_pre_warmed_while_flushing_are_finished(self, mock_create):
+        handshake_done = threading.Event()
+        created_transcribers = []
+
+        def create(**kwargs):
+            handshake_done.wait(timeout=5)
+            created_transcribers.append(mock.Mock())
+            return created_transcribers[-1]
+
+        mock_create.side_effect = create
+        manager = self._manager()
+        manager.monitor_transcription()
+
+        flush = threading.Thread(target=manager.flush_utterances)
+        flush.start()
+        while not manager.closed:
+            time.sleep(0.01)
+        # The connection comes up after the manager was closed
+        handshake_done.set()
+        flush.join(timeout=5)
+
+        self.assertFalse(flush.is_alive())
+        self.assertFalse(manager.transcriber_pool_thread.is_alive())
+        self.assertEqual(manager.transcriber_pool, [])
+        self.assertEqual(len(created_transcribers), 1)
+        created_transcribers[0].finish.assert_called_once()
+
+        manager.monitor_transcription()
+        self.assertEqual(mock_create.call_count, 1)
+
+    def test_pre_warming_is_disabled_with_a_deepgram_callback(self):
+        self.bot.settings = {"transcription_settings": {"deepgram": {"callback": "https://example.com/callback"}}}
+        self.bot.save()
+
+        self.assertEqual(self._manager().pool_size, 0)
+
+    def test_transcriber_class_decides_whether_to_pre_warm(self):
+        self.bot.settings = {}
+        self.bot.save()
+        self.assertEqual(self._manager().pool_size, 0)
+
+        # The manager doesn't check Deepgram's settings itself, so other providers can pre-warm too
+        with mock.patch.object(DeepgramStreamingTranscriber, "supports_pre_warming", return_value=True):
+            self.assertEqual(self._manager().pool_size, 2)
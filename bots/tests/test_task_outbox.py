@@ -0,0 +1,77 @@
+from unittest.mock import patch
+
+from django.db import transaction
+from django.test import TransactionTestCase, override_settings
+
+from bots.models import Bot, BotEventManager, BotEventTypes, BotStates, Organization, Project, TaskOutboxEntry, WebhookDeliveryAttempt, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.task_outbox import relay_task_outbox
+
+
+@patch("bots.tasks.deliver_webhook_task.deliver_webhook.apply_async")
+class TaskOutboxTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        WebhookSecret.objects.create(project=self.project)
+        WebhookSubscription.objects.create(project=self.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE])
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.READY)
+
+    def _published_delivery_attempt_ids(self, mock_deliver_webhook_apply_async):
+        return [call.kwargs["args"][0] for call in mock_deliver_webhook_apply_async.call_args_list]
+
+    def test_webhook_task_is_published_once_the_event_is_committed(self, mock_deliver_webhook_apply_async):
+        with transaction.atomic():
+            BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+            mock_deliver_webhook_apply_async.assert_not_called()
+            self.assertEqual(TaskOutboxEntry.objects.count(), 1)
+
+        self.assertEqual(self._published_delivery_attempt_ids(mock_deliver_webhook_apply_async), [WebhookDeliveryAttempt.objects.get().id])
+        self.assertEqual(TaskOutboxEntry.objects.count(), 0)
+
+    def test_rolled_back_event_publishes_nothing(self, mock_deliver_webhook_apply_async):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+                raise RuntimeError("rolled back")
+
+        mock_deliver_webhook_apply_async.assert_not_called()
+        self.assertEqual(TaskOutboxEntry.objects.count(), 0)
+        self.assertEqual(WebhookDeliveryAttempt.objects.count(), 0)
+
+    def test_tasks_of_one_transaction_are_published_together(self, mock_deliver_webhook_apply_async):
+        with transaction.atomic():
+            BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+            BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.BOT_JOINED_MEETING)
+
+        delivery_attempt_ids = list(WebhookDeliveryAttempt.objects.order_by("id").values_list("id", flat=True))
+        self.assertEqual(self._published_delivery_attempt_ids(mock_deliver_webhook_apply_async), delivery_attempt_ids)
+        # Both were sent with the same producer, so over one broker connection
+        self.assertEqual(len({id(call.kwargs["producer"]) for call in mock_deliver_webhook_apply_async.call_args_list}), 1)
+
+    def test_events_rolled_back_to_a_savepoint_are_not_published(self, mock_deliver_webhook_apply_async):
+        with transaction.atomic():
+            BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.BOT_JOINED_MEETING)
+                    raise RuntimeError("rolled back")
+
+        self.assertEqual(self._published_delivery_attempt_ids(mock_deliver_webhook_apply_async), [WebhookDeliveryAttempt.objects.get().id])
+
+    @override_settings(TASK_OUTBOX_RELAY_DELAY_SECONDS=0)
+    def test_relay_publishes_tasks_the_commit_could_not(self, mock_deliver_webhook_apply_async):
+        mock_deliver_webhook_apply_async.side_effect = ConnectionError("broker unreachable")
+        BotEventManager.create_event(bot=self.bot, event_type=BotEventTypes.JOIN_REQUESTED)
+
+        # The event was still committed, and its task is left in the outbox
+        self.bot.refresh_from_db()
+        self.assertEqual(self.bot.state, BotStates.JOINING)
+        self.assertEqual(TaskOutboxEntry.objects.count(), 1)
+
+        mock_deliver_webhook_apply_async.side_effect = None
+        mock_deliver_webhook_apply_async.reset_mock()
+        self.assertEqual(relay_task_outbox(), 1)
+
+        self.assertEqual(self._published_delivery_attempt_ids(mock_deliver_webhook_apply_async), [WebhookDeliveryAttempt.objects.get().id])
+        self.assertEqual(TaskOutboxEntry.objects.count(), 0)
+        self.assertEqual(relay_task_outbox(), 0)
@@ -0,0 +1,61 @@
+import json
+import time
+
+import redis
+from celery.signals import before_task_publish
+from django.conf import settings
+from django.test import TestCase
+
+from attendee.celery import app
+from bots.task_queue_metrics import PRIORITY_SEP, get_task_queue_metrics
+
+
+class TaskRoutingTest(TestCase):
+    def _queue_for(self, task_name):
+        return app.amqp.router.route({}, task_name)["queue"].name
+
+    def test_tasks_are_routed_to_their_workload_queue(self):
+        self.assertEqual(self._queue_for("bots.tasks.process_utterance_task.process_utterance"), "realtime")
+        self.assertEqual(self._queue_for("bots.tasks.launch_scheduled_bot_task.launch_scheduled_bot"), "launch")
+        self.assertEqual(self._queue_for("bots.tasks.run_bot_task.run_bot"), "bots")
+        self.assertEqual(self._queue_for("bots.tasks.restart_bot_pod_task.restart_bot_pod"), "launch")
+        self.assertEqual(self._queue_for("bots.tasks.deliver_webhook_task.deliver_webhook"), "webhooks")
+        self.assertEqual(self._queue_for("bots.tasks.process_async_transcription_task.process_async_transcription"), "batch")
+        self.assertEqual(self._queue_for("bots.tasks.process_async_transcription_task.finish_async_transcription"), "batch")
+        self.assertEqual(self._queue_for("bots.tasks.sync_calendar_task.sync_calendar"), "batch")
+        self.assertEqual(self._queue_for("bots.tasks.autopay_charge_task.autopay_charge"), "billing")
+
+    def test_default_worker_consumes_realtime_and_launch_first(self):
+        queue_names = [queue.name for queue in settings.CELERY_TASK_QUEUES]
+        self.assertEqual(queue_names[:2], ["realtime", "launch"])
+        self.assertIn(settings.CELERY_TASK_DEFAULT_QUEUE, queue_names)
+
+
+class TaskQueueMetricsTest(TestCase):
+    def setUp(self):
+        self.redis_client = redis.from_url(settings.CELERY_BROKER_URL)
+        self.keys = ["webhooks", f"webhooks{PRIORITY_SEP}3"]
+        self.redis_client.delete(*self.keys)
+
+    def tearDown(self):
+        self.redis_client.delete(*self.keys)
+
+    def _push(self, key, published_at):
+        self.redis_client.lpush(key, json.dumps({"body": "", "headers": {"published_at": published_at}, "properties": {}}))
+
+    def test_reports_depth_and_oldest_message_age(self):
+        now = time.time()
+        self._push("webhooks", now - 30)
+        self._push("webhooks", now - 5)
+        self._push(f"webhooks{PRIORITY_SEP}3", now - 90)
+
+        metrics = {queue_metrics["queue"]: queue_metrics for queue_metrics in get_task_queue_metrics(self.redis_client)}
+
+        self.assertEqual(metrics["webhooks"]["depth"], 3)
+        self.assertGreaterEqual(metrics["webhooks"]["oldest_message_age_seconds"], 90)
+        self.assertLess(metrics["webhooks"]["oldest_message_age_seconds"], 120)
+
+    def test_published_at_header_is_added_when_tasks_are_published(self):
+        headers = {}
+        before_task_publish.send(sender="bots.tasks.deliver_webhook_task.deliver_webhook", headers=headers)
+        self.assertAlmostEqual(headers["published_at"], time.time(), delta=5)
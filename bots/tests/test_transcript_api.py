@@ -0,0 +1,77 @@
+import json
+
+from django.test import Client, TransactionTestCase
+
+from accounts.models import Organization
+from bots.models import ApiKey, Bot, BotStates, Participant, Project, Recording, RecordingStates, RecordingTypes, TranscriptionTypes, Utterance
+
+
+class TranscriptApiTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        _, self.api_key = ApiKey.create(project=self.project, name="Test API Key")
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.ENDED)
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=RecordingTypes.AUDIO_AND_VIDEO, transcription_type=TranscriptionTypes.NON_REALTIME, is_default_recording=True, state=RecordingStates.COMPLETE)
+        self.participant = Participant.objects.create(bot=self.bot, uuid="participant-1", full_name="Participant One")
+        # Two utterances start at the same time, so pages have to break ties by id
+        for index, timestamp_ms in enumerate([3000, 1000, 2000, 2000, 5000]):
+            self._create_utterance(timestamp_ms, {"transcript": f"utterance {index}", "words": [{"word": "utterance", "start": 0.0, "end": 0.4}, {"word": str(index), "start": 0.5, "end": 0.6}]})
+        self._create_utterance(4000, {"transcript": ""})
+        self.client = Client()
+
+    def _create_utterance(self, timestamp_ms, transcription):
+        return Utterance.objects.create(recording=self.recording, participant=self.participant, timestamp_ms=timestamp_ms, duration_ms=500, transcription=transcription)
+
+    def _get(self, url, **headers):
+        return self.client.get(url, HTTP_AUTHORIZATION=f"Token {self.api_key}", **headers)
+
+    def test_transcript_without_limit_is_the_whole_list(self):
+        response = self._get(f"/api/v1/bots/{self.bot.object_id}/transcript")
+
+        self.assertEqual(response.status_code, 200)
+        transcript = response.json()
+        self.assertEqual([entry["timestamp_ms"] for entry in transcript], [1000, 2000, 2000, 3000, 5000])
+        self.assertEqual(transcript[0]["speaker_name"], "Participant One")
+        self.assertEqual(transcript[0]["transcription"]["transcript"], "utterance 1")
+        self.assertEqual(len(transcript[0]["transcription"]["words"]), 2)
+
+    def test_pages_follow_each_other_without_gaps_or_overlaps(self):
+        full_transcript = self._get(f"/api/v1/bots/{self.bot.object_id}/transcript").json()
+
+        pages = []
+        url = f"/api/v1/bots/{self.bot.object_id}/transcript?limit=2"
+        while url:
+            response = self._get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.json()["results"])
+            url = response.json()["next"]
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual([entry for page in pages for entry in page], full_transcript)
+
+    def test_invalid_limit_or_cursor_is_rejected(self):
+        for query in ["limit=0", "limit=1001", "limit=abc", "cursor=not-a-cursor"]:
+            response = self._get(f"/api/v1/bots/{self.bot.object_id}/transcript?{query}")
+            self.assertEqual(response.status_code, 400, query)
+
+    def test_ndjson_stream_leaves_out_words_unless_asked_for(self):
+        response = self._get(f"/api/v1/bots/{self.bot.object_id}/transcript", HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([line["timestamp_ms"] for line in lines], [1000, 2000, 2000, 3000, 5000])
+        self.assertEqual(lines[0]["transcription"], {"transcript": "utterance 1"})
+
+        response = self._get(f"/api/v1/bots/{self.bot.object_id}/transcript?format=ndjson&include_words=true")
+
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(len(lines), 5)
+        self.assertEqual(len(lines[0]["transcription"]["words"]), 2)
+
+    def test_ndjson_errors_are_a_line_of_json(self):
+        response = self._get("/api/v1/bots/bot_doesnotexist/transcript", HTTP_ACCEPT="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(json.loads(response.content), {"error": "Bot not found"})
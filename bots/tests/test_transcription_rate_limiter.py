@@ -0,0 +1,131 @@
+import uuid
+from unittest import mock
+
+import redis
+from django.test import TransactionTestCase
+
+from bots.models import Bot, Credentials, Organization, Project, Recording, TranscriptionProviders
+from bots.tasks.process_utterance_task import get_transcription, get_transcription_or_defer
+from bots.transcription_rate_limiter import IN_FLIGHT_RETRY_SECONDS, TranscriptionRateLimiter, TranscriptionRateLimitExceeded
+
+
+class TranscriptionRateLimiterTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Proj", organization=self.organization)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/xyz")
+        self.recording = Recording.objects.create(bot=self.bot, recording_type=1, transcription_type=1, transcription_provider=TranscriptionProviders.DEEPGRAM)
+        self.limiters = []
+
+    def tearDown(self):
+        for limiter in self.limiters:
+            limiter.redis_client.delete(*limiter._redis_keys())
+
+    def _limiter(self, **kwargs):
+        limiter = TranscriptionRateLimiter(key=f"test:{uuid.uuid4()}", **kwargs)
+        self.limiters.append(limiter)
+        return limiter
+
+    def test_token_bucket_allows_burst_then_asks_to_wait(self):
+        limiter = self._limiter(requests_per_second=1, burst=2, max_in_flight=0)
+
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(limiter.acquire(), 0)
+        retry_after = limiter.acquire()
+        self.assertGreater(retry_after, 0)
+        self.assertLessEqual(retry_after, 1)
+
+    def test_max_in_flight_is_shared_until_released(self):
+        limiter = self._limiter(requests_per_second=0, burst=0, max_in_flight=1)
+        other_worker_limiter = TranscriptionRateLimiter(key=limiter.key, requests_per_second=0, burst=0, max_in_flight=1)
+
+        self.assertEqual(limiter.acquire(), 0)
+        self.assertEqual(other_worker_limiter.acquire(), IN_FLIGHT_RETRY_SECONDS)
+
+        limiter.release()
+        self.assertEqual(other_worker_limiter.acquire(), 0)
+        other_worker_limiter.release()
+
+    def test_metrics_report_utilization_and_wait_time(self):
+        limiter = self._limiter(requests_per_second=0, burst=0, max_in_flight=2)
+        other_worker_limiter = TranscriptionRateLimiter(key=limiter.key, requests_per_second=0, burst=0, max_in_flight=2)
+        third_worker_limiter = TranscriptionRateLimiter(key=limiter.key, requests_per_second=0, burst=0, max_in_flight=2)
+
+        limiter.acquire()
+        other_worker_limiter.acquire()
+        third_worker_limiter.acquire()
+
+        metrics = limiter.metrics()
+        self.assertEqual(metrics["in_flight"], 2)
+        self.assertEqual(metrics["utilization"], 1.0)
+        self.assertEqual(metrics["acquired"], 2)
+        self.assertEqual(metrics["deferred"], 1)
+        self.assertEqual(metrics["average_wait_seconds"], IN_FLIGHT_RETRY_SECONDS)
+
+    def test_fails_open_when_redis_is_unavailable(self):
+        redis_client = mock.Mock()
+        redis_client.eval.side_effect = redis.exceptions.ConnectionError("down")
+        limiter = TranscriptionRateLimiter(key="test:down", requests_per_second=1, burst=1, max_in_flight=1, redis_client=redis_client)
+
+        self.assertEqual(limiter.acquire(), 0)
+        limiter.release()
+        redis_client.zrem.assert_not_called()
+
+    def test_for_recording_is_keyed_by_credentials(self):
+        self.assertEqual(TranscriptionRateLimiter.for_recording(self.recording).key, f"deepgram:project_{self.project.id}")
+
+        credentials = Credentials.objects.create(project=self.project, credential_type=Credentials.CredentialTypes.DEEPGRAM)
+        limiter = TranscriptionRateLimiter.for_recording(self.recording)
+
+        self.assertEqual(limiter.key, f"deepgram:credentials_{credentials.id}")
+        self.assertEqual(limiter.requests_per_second, 10)
+        self.assertEqual(limiter.burst, 20)
+        self.assertEqual(limiter.max_in_flight, 25)
+
+    def test_for_recording_skips_closed_captions(self):
+        self.recording.transcription_provider = TranscriptionProviders.CLOSED_CAPTION_FROM_PLATFORM
+        self.assertIsNone(TranscriptionRateLimiter.for_recording(self.recording))
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription_via_deepgram")
+    @mock.patch("bots.tasks.process_utterance_task.TranscriptionRateLimiter.for_recording")
+    def test_get_transcription_holds_a_slot_for_the_request(self, mock_for_recording, mock_deepgram):
+        limiter = self._limiter(requests_per_second=0, burst=0, max_in_flight=1)
+        mock_for_recording.return_value = limiter
+
+        def transcribe(utterance):
+            self.assertEqual(limiter.metrics()["in_flight"], 1)
+            return {"transcript": "hi"}, None
+
+        mock_deepgram.side_effect = transcribe
+
+        self.assertEqual(get_transcription(mock.Mock(), self.recording), ({"transcript": "hi"}, None))
+        self.assertEqual(limiter.metrics()["in_flight"], 0)
+
+    @mock.patch("bots.tasks.process_utterance_task.get_transcription_via_deepgram")
+    @mock.patch("bots.tasks.process_utterance_task.TranscriptionRateLimiter.for_recording")
+    def test_rate_limited_transcription_is_deferred_without_a_request(self, mock_for_recording, mock_deepgram):
+        limiter = self._limiter(requests_per_second=0.5, burst=1, max_in_flight=0)
+        limiter.acquire()
+        mock_for_recording.return_value = limiter
+
+        with self.assertRaises(TranscriptionRateLimitExceeded):
+            get_transcription(mock.Mock(), self.recording)
+
+        task = mock.Mock()
+        task.retry.return_value = Exception("retry")
+        with self.assertRaises(Exception):
+            get_transcription_or_defer(task, mock.Mock(id=1), self.recording)
+
+        mock_deepgram.assert_not_called()
+        task.retry.assert_called_once()
+        self.assertGreater(task.retry.call_args.kwargs["countdown"], 0)
+        self.assertLessEqual(task.retry.call_args.kwargs["countdown"], 2.5)
+
+    def test_all_keys_lists_provider_accounts(self):
+        limiter = self._limiter(requests_per_second=1, burst=1, max_in_flight=3)
+        limiter.acquire()
+
+        self.assertIn(limiter.key, TranscriptionRateLimiter.all_keys())
+        metrics = TranscriptionRateLimiter(key=limiter.key, requests_per_second=0, burst=0, max_in_flight=0).metrics()
+        self.assertEqual(metrics["max_in_flight"], 3)
+        self.assertEqual(metrics["utilization"], 1 / 3)
@@ -0,0 +1,118 @@
+import json
+from unittest.mock import patch
+
+from django.test import TransactionTestCase, override_settings
+
+from bots.bots_api_utils import create_webhook_subscriptions
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_webhook_task import deliver_webhook_batch, flush_webhook_batch
+from bots.webhook_utils import trigger_webhook, verify_signature
+
+
+class WebhookBatchingTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.webhook_subscription = WebhookSubscription.objects.create(
+            project=self.project,
+            url="https://example.com/webhook",
+            triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE, WebhookTriggerTypes.PARTICIPANT_EVENTS_JOIN_LEAVE],
+            batch_max_size=50,
+            batch_max_delay_ms=500,
+        )
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+
+    def _trigger_events(self, count):
+        for i in range(count):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": f"utterance {i}"})
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.apply_async")
+    def test_only_the_first_event_of_a_batch_schedules_a_flush(self, mock_flush_apply_async, mock_flush_delay, mock_deliver_webhook_delay):
+        self._trigger_events(30)
+
+        mock_flush_apply_async.assert_called_once_with(args=[self.webhook_subscription.id], countdown=0.5)
+        mock_flush_delay.assert_not_called()
+        mock_deliver_webhook_delay.assert_not_called()
+        self.webhook_subscription.refresh_from_db()
+        self.assertIsNotNone(self.webhook_subscription.batch_flush_due_at)
+
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.apply_async")
+    def test_a_full_batch_is_flushed_right_away(self, mock_flush_apply_async, mock_flush_delay):
+        self.webhook_subscription.batch_max_size = 3
+        self.webhook_subscription.save()
+
+        self._trigger_events(3)
+
+        mock_flush_apply_async.assert_called_once()
+        mock_flush_delay.assert_called_once_with(self.webhook_subscription.id)
+
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.apply_async")
+    def test_batch_is_sent_as_one_signed_array(self, mock_flush_apply_async, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+        self._trigger_events(30)
+
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.delay", side_effect=lambda key: deliver_webhook_batch.apply(args=[key])):
+            flush_webhook_batch(self.webhook_subscription.id)
+
+        mock_post.assert_called_once()
+        body = mock_post.call_args.kwargs["data"]
+        items = json.loads(body)
+        self.assertEqual([item["data"]["transcript"] for item in items], [f"utterance {i}" for i in range(30)])
+        self.assertTrue(verify_signature(items, mock_post.call_args.kwargs["headers"]["X-Webhook-Signature"], self.webhook_secret.get_secret()))
+
+        delivery_attempts = WebhookDeliveryAttempt.objects.filter(webhook_subscription=self.webhook_subscription)
+        self.assertEqual({item["idempotency_key"] for item in items}, {str(delivery_attempt.idempotency_key) for delivery_attempt in delivery_attempts})
+        self.assertEqual(len({delivery_attempt.batch_idempotency_key for delivery_attempt in delivery_attempts}), 1)
+        self.assertTrue(all(delivery_attempt.status == WebhookDeliveryAttemptStatus.SUCCESS and delivery_attempt.attempt_count == 1 for delivery_attempt in delivery_attempts))
+        self.webhook_subscription.refresh_from_db()
+        self.assertIsNone(self.webhook_subscription.batch_flush_due_at)
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.apply_async")
+    def test_events_beyond_the_max_size_go_in_the_next_batch(self, mock_flush_apply_async, mock_flush_delay, mock_deliver_webhook_batch_delay):
+        self.webhook_subscription.batch_max_size = 2
+        self.webhook_subscription.save()
+        self._trigger_events(5)
+        mock_flush_delay.reset_mock()
+
+        flush_webhook_batch(self.webhook_subscription.id)
+
+        mock_deliver_webhook_batch_delay.assert_called_once()
+        self.assertEqual(WebhookDeliveryAttempt.objects.filter(batch_idempotency_key=mock_deliver_webhook_batch_delay.call_args.args[0]).count(), 2)
+        mock_flush_delay.assert_called_once_with(self.webhook_subscription.id)
+
+    @override_settings(CELERY_TASK_EAGER_PROPAGATES=False)
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook_batch.delay")
+    @patch("bots.tasks.deliver_webhook_task.flush_webhook_batch.apply_async")
+    def test_failed_batch_is_retried_as_a_whole(self, mock_flush_apply_async, mock_deliver_webhook_batch_delay, mock_post):
+        mock_post.return_value.status_code = 500
+        mock_post.return_value.text = "Server Error"
+        self._trigger_events(4)
+        flush_webhook_batch(self.webhook_subscription.id)
+        batch_idempotency_key = mock_deliver_webhook_batch_delay.call_args.args[0]
+
+        # Retries run inline when the task is applied eagerly
+        deliver_webhook_batch.apply(args=[batch_idempotency_key])
+
+        self.assertEqual(mock_post.call_count, 3)
+        self.assertEqual(len({call.kwargs["data"] for call in mock_post.call_args_list}), 1)
+        for delivery_attempt in WebhookDeliveryAttempt.objects.filter(webhook_subscription=self.webhook_subscription):
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+            self.assertEqual(delivery_attempt.attempt_count, 3)
+            self.assertEqual(len(delivery_attempt.response_body_list), 3)
+
+    def test_batching_settings_are_validated(self):
+        create_webhook_subscriptions([{"url": "https://example.com/batched", "triggers": ["transcript.update"], "batch_max_size": 100}], self.project, self.bot)
+        webhook_subscription = WebhookSubscription.objects.get(url="https://example.com/batched")
+        self.assertEqual((webhook_subscription.batch_max_size, webhook_subscription.batch_max_delay_ms), (100, 1000))
+
+        with self.assertRaisesMessage(Exception, "batch_max_size must be between 1 and 1000"):
+            create_webhook_subscriptions([{"url": "https://example.com/too-big", "triggers": ["transcript.update"], "batch_max_size": 5000}], self.project, self.bot)
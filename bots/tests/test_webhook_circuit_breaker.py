@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.models import User, UserRole
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_webhook_task import deliver_webhook
+from bots.webhook_circuit_breaker import CLOSED, HALF_OPEN, OPEN, WebhookCircuitBreaker
+from bots.webhook_utils import trigger_webhook
+
+WEBHOOK_URL = "https://example.com/circuit-breaker-test"
+
+
+@override_settings(
+    WEBHOOK_CIRCUIT_BREAKER_ENABLED=True,
+    WEBHOOK_CIRCUIT_MIN_REQUESTS=4,
+    WEBHOOK_CIRCUIT_ERROR_RATE_THRESHOLD=0.5,
+    WEBHOOK_CIRCUIT_OPEN_SECONDS=30,
+    WEBHOOK_CIRCUIT_TARGET_LATENCY_MS=1000,
+    WEBHOOK_CIRCUIT_MIN_CONCURRENCY=1,
+    WEBHOOK_CIRCUIT_MAX_CONCURRENCY=4,
+)
+class WebhookCircuitBreakerTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        WebhookSecret.objects.create(project=self.project)
+        self.webhook_subscription = WebhookSubscription.objects.create(project=self.project, url=WEBHOOK_URL, triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        WebhookCircuitBreaker(WEBHOOK_URL).reset()
+        self.addCleanup(WebhookCircuitBreaker(WEBHOOK_URL).reset)
+
+    def _send(self, succeeded, latency_seconds=0.1):
+        circuit_breaker = WebhookCircuitBreaker(WEBHOOK_URL)
+        self.assertEqual(circuit_breaker.acquire(), 0)
+        circuit_breaker.release(succeeded=succeeded, latency_seconds=latency_seconds)
+
+    def _open_circuit(self):
+        for succeeded in [True, False, False, False]:
+            self._send(succeeded)
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["state"], OPEN)
+
+    def test_circuit_opens_once_the_error_rate_is_over_the_threshold(self):
+        for succeeded in [True, True, False]:
+            self._send(succeeded)
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["state"], CLOSED)
+
+        self._send(False)
+
+        status = WebhookCircuitBreaker(WEBHOOK_URL).status()
+        self.assertEqual(status["state"], OPEN)
+        self.assertEqual(status["error_rate"], 0.5)
+        self.assertGreater(status["retry_after_seconds"], 25)
+        self.assertGreaterEqual(WebhookCircuitBreaker(WEBHOOK_URL).acquire(), 25)
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def test_open_circuit_defers_delivery_without_sending(self, mock_post, mock_deliver_webhook_apply_async):
+        self._open_circuit()
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": "hi"})
+        delivery_attempt = WebhookDeliveryAttempt.objects.get()
+
+        deliver_webhook.apply(args=[delivery_attempt.id])
+
+        mock_post.assert_not_called()
+        self.assertEqual(mock_deliver_webhook_apply_async.call_args.kwargs["args"], [delivery_attempt.id])
+        self.assertGreaterEqual(mock_deliver_webhook_apply_async.call_args.kwargs["countdown"], 25)
+        delivery_attempt.refresh_from_db()
+        self.assertEqual(delivery_attempt.attempt_count, 0)
+        self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.PENDING)
+
+    @override_settings(WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS=60)
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook.apply_async")
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def test_delivery_deferred_for_too_long_is_marked_as_failed(self, mock_post, mock_deliver_webhook_apply_async):
+        self._open_circuit()
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": "hi"})
+        WebhookDeliveryAttempt.objects.update(created_at=timezone.now() - timezone.timedelta(minutes=5))
+        delivery_attempt = WebhookDeliveryAttempt.objects.get()
+
+        deliver_webhook.apply(args=[delivery_attempt.id])
+
+        mock_post.assert_not_called()
+        mock_deliver_webhook_apply_async.assert_not_called()
+        delivery_attempt.refresh_from_db()
+        self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+        self.assertEqual(delivery_attempt.response_body_list[0]["error_type"], "CircuitOpen")
+
+    @override_settings(WEBHOOK_CIRCUIT_OPEN_SECONDS=0)
+    def test_half_open_circuit_lets_one_probe_through(self):
+        self._open_circuit()
+
+        probe = WebhookCircuitBreaker(WEBHOOK_URL)
+        self.assertEqual(probe.acquire(), 0)
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["state"], HALF_OPEN)
+        # Nothing else goes through while the probe is in flight
+        self.assertGreater(WebhookCircuitBreaker(WEBHOOK_URL).acquire(), 0)
+
+        # A failed probe opens the circuit again
+        probe.release(succeeded=False, latency_seconds=0.1)
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["state"], OPEN)
+
+        # A successful one closes it, and concurrency starts again from the minimum
+        self._send(True)
+        status = WebhookCircuitBreaker(WEBHOOK_URL).status()
+        self.assertEqual(status["state"], CLOSED)
+        self.assertEqual(status["concurrency_limit"], 1)
+        self.assertIsNone(status["error_rate"])
+
+    def test_concurrency_limit_adapts_to_latency(self):
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["concurrency_limit"], 4)
+
+        # Slow responses shrink the limit down to the minimum
+        for _ in range(6):
+            self._send(True, latency_seconds=3)
+        self.assertEqual(WebhookCircuitBreaker(WEBHOOK_URL).status()["concurrency_limit"], 1)
+        in_flight = WebhookCircuitBreaker(WEBHOOK_URL)
+        self.assertEqual(in_flight.acquire(), 0)
+        self.assertGreater(WebhookCircuitBreaker(WEBHOOK_URL).acquire(), 0)
+        in_flight.release(succeeded=True, latency_seconds=3)
+
+        # Once the latency EWMA is back under the target, fast responses grow it again
+        for _ in range(30):
+            self._send(True, latency_seconds=0.05)
+        status = WebhookCircuitBreaker(WEBHOOK_URL).status()
+        self.assertEqual(status["concurrency_limit"], 4)
+        self.assertLess(status["latency_ewma_ms"], 1000)
+
+    def test_webhooks_page_shows_endpoint_health(self):
+        user = User.objects.create_user(username="admin", email="admin@example.com", password="testpassword123", role=UserRole.ADMIN)
+        user.organization = self.organization
+        user.save()
+        self._open_circuit()
+
+        client = Client()
+        client.force_login(user)
+        response = client.get(reverse("projects:project-webhooks", kwargs={"object_id": self.project.object_id}))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Circuit open")
+        self.assertContains(response, "75% errors in last 4 requests")
@@ -0,0 +1,183 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.webhook_circuit_breaker import OPEN, WebhookCircuitBreaker
+from bots.webhook_dispatcher import WebhookDispatcher
+from bots.webhook_utils import trigger_webhook, verify_signature
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """A local HTTP/1.1 endpoint that records what it receives, how many connections were opened and how many requests overlapped."""
+
+    daemon_threads = True
+
+    def __init__(self, status_code=200, response_delay_seconds=0):
+        self.status_code = status_code
+        self.response_delay_seconds = response_delay_seconds
+        self.requests = []
+        self.connection_count = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        super().__init__(("127.0.0.1", 0), WebhookReceiverHandler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/webhook"
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
+
+
+class WebhookReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def do_POST(self):
+        with self.server.lock:
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        time.sleep(self.server.response_delay_seconds)
+        with self.server.lock:
+            self.server.requests.append((body, self.headers["X-Webhook-Signature"]))
+            self.server.in_flight -= 1
+
+        response = b"OK"
+        self.send_response(self.server.status_code)
+        self.send_header("Content-Length", str(len(response)))
+        self.end_headers()
+        self.wfile.write(response)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(WEBHOOK_DELIVERY_BACKEND="dispatcher")
+class WebhookDispatcherTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+
+    def _subscribe(self, url):
+        return WebhookSubscription.objects.create(project=self.project, url=url, triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+
+    def _trigger_events(self, count):
+        for i in range(count):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": f"utterance {i}"})
+
+    def _dispatch(self, **kwargs):
+        asyncio.run(WebhookDispatcher(poll_interval_seconds=0.05, **kwargs).run(stop_when_idle=True))
+
+    @patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay")
+    def test_webhooks_are_delivered_over_pooled_connections(self, mock_deliver_webhook_delay):
+        with WebhookReceiver(response_delay_seconds=0.05) as receiver:
+            self._subscribe(receiver.url)
+            self._trigger_events(12)
+            mock_deliver_webhook_delay.assert_not_called()
+
+            self._dispatch(max_connections_per_host=3)
+
+        self.assertEqual(len(receiver.requests), 12)
+        # Connections are kept alive and reused, and never more than the per host limit are open at once
+        self.assertLessEqual(receiver.connection_count, 3)
+        self.assertLessEqual(receiver.max_in_flight, 3)
+        for body, signature in receiver.requests:
+            webhook_data = json.loads(body)
+            self.assertEqual(webhook_data["trigger"], "transcript.update")
+            self.assertTrue(verify_signature(webhook_data, signature, self.webhook_secret.get_secret()))
+
+        for delivery_attempt in WebhookDeliveryAttempt.objects.all():
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+            self.assertEqual(delivery_attempt.attempt_count, 1)
+            self.assertEqual(delivery_attempt.response_body_list, ["OK"])
+            self.assertIsNone(delivery_attempt.next_attempt_at)
+
+    def test_failed_deliveries_are_rescheduled_until_the_last_attempt(self):
+        with WebhookReceiver(status_code=500) as receiver:
+            self._subscribe(receiver.url)
+            self._trigger_events(1)
+
+            self._dispatch()
+            delivery_attempt = WebhookDeliveryAttempt.objects.get()
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+            self.assertEqual(delivery_attempt.attempt_count, 1)
+            self.assertIsNotNone(delivery_attempt.next_attempt_at)
+
+            for _ in range(2):
+                WebhookDeliveryAttempt.objects.update(next_attempt_at=timezone.now())
+                self._dispatch()
+
+        delivery_attempt.refresh_from_db()
+        self.assertEqual(len(receiver.requests), 3)
+        self.assertEqual(delivery_attempt.attempt_count, 3)
+        self.assertEqual(len(delivery_attempt.response_body_list), 3)
+        self.assertIsNone(delivery_attempt.next_attempt_at)
+
+    def test_a_slow_host_does_not_hold_up_other_hosts(self):
+        with WebhookReceiver(response_delay_seconds=1) as slow_receiver, WebhookReceiver() as fast_receiver:
+            self._subscribe(slow_receiver.url)
+            self._subscribe(fast_receiver.url)
+            self._trigger_events(4)
+
+            started_at = time.monotonic()
+            self._dispatch(max_connections_per_host=1)
+            elapsed = time.monotonic() - started_at
+
+        self.assertEqual(len(fast_receiver.requests), 4)
+        self.assertEqual(len(slow_receiver.requests), 4)
+        # The slow host's requests were sent one at a time, while the fast host's were all delivered before the first slow one finished
+        self.assertGreaterEqual(elapsed, 4)
+        self.assertEqual(slow_receiver.max_in_flight, 1)
+        fast_succeeded_at = WebhookDeliveryAttempt.objects.filter(webhook_subscription__url=fast_receiver.url).values_list("succeeded_at", flat=True)
+        slow_succeeded_at = WebhookDeliveryAttempt.objects.filter(webhook_subscription__url=slow_receiver.url).values_list("succeeded_at", flat=True)
+        self.assertLess(max(fast_succeeded_at), min(slow_succeeded_at))
+
+    def test_unreachable_endpoints_are_recorded_as_failures(self):
+        with WebhookReceiver() as receiver:
+            url = receiver.url
+        self._subscribe(url)
+        self._trigger_events(1)
+
+        self._dispatch()
+
+        delivery_attempt = WebhookDeliveryAttempt.objects.get()
+        self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.FAILURE)
+        self.assertEqual(delivery_attempt.response_body_list[0]["error_type"], "ConnectError")
+
+    @override_settings(WEBHOOK_CIRCUIT_BREAKER_ENABLED=True, WEBHOOK_CIRCUIT_MIN_REQUESTS=3)
+    def test_deliveries_to_an_unhealthy_endpoint_are_deferred(self):
+        with WebhookReceiver(status_code=500) as receiver:
+            self.addCleanup(WebhookCircuitBreaker(receiver.url).reset)
+            self._subscribe(receiver.url)
+            self._trigger_events(3)
+            self._dispatch(max_connections_per_host=1)
+            self.assertEqual(WebhookCircuitBreaker(receiver.url).status()["state"], OPEN)
+
+            self._trigger_events(1)
+            self._dispatch()
+
+        # The circuit opened after the first three failed, so the fourth wasn't sent
+        self.assertEqual(len(receiver.requests), 3)
+        deferred_delivery_attempt = WebhookDeliveryAttempt.objects.order_by("id").last()
+        self.assertEqual(deferred_delivery_attempt.attempt_count, 0)
+        self.assertGreater(deferred_delivery_attempt.next_attempt_at, timezone.now() + timezone.timedelta(seconds=20))
@@ -0,0 +1,102 @@
+import json
+import os
+import tempfile
+import uuid
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_webhook_task import deliver_webhook
+from bots.webhook_utils import canonical_json, trigger_webhook, verify_signature
+
+
+@override_settings(WEBHOOK_PAYLOAD_INLINE_LIMIT_BYTES=1024, CELERY_TASK_ALWAYS_EAGER=False)
+class WebhookPayloadStorageTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.webhook_subscription = WebhookSubscription.objects.create(
+            project=self.project,
+            url="https://example.com/webhook",
+            triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE],
+        )
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+        self.large_payload = {"speaker_name": "Ünïcode Speaker", "transcription": {"transcript": "hello world " * 500}}
+        self.storage_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.storage_dir.cleanup()
+
+    def _trigger(self, payload):
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload=payload)
+        return WebhookDeliveryAttempt.objects.get(bot=self.bot)
+
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def _deliver(self, delivery_attempt, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+        deliver_webhook.apply(args=[delivery_attempt.id])
+        return mock_post.call_args.kwargs
+
+    def test_small_payloads_are_stored_and_sent_inline(self):
+        delivery_attempt = self._trigger({"transcript": "hi"})
+
+        self.assertEqual(delivery_attempt.payload, {"transcript": "hi"})
+        self.assertFalse(delivery_attempt.payload_is_stored_out_of_line())
+        self.assertEqual(json.loads(self._deliver(delivery_attempt)["data"])["data"], {"transcript": "hi"})
+
+    def test_large_payloads_are_compressed_and_sent_as_signed_canonical_json(self):
+        delivery_attempt = self._trigger(self.large_payload)
+
+        self.assertEqual(delivery_attempt.payload, {})
+        self.assertEqual(delivery_attempt.payload_size, len(canonical_json(self.large_payload)))
+        self.assertLess(len(delivery_attempt.payload_blob), delivery_attempt.payload_size / 10)
+        self.assertTrue(delivery_attempt.payload_preview.startswith('{"speaker_name":"Ünïcode Speaker"'))
+        self.assertEqual(delivery_attempt.get_payload(), self.large_payload)
+
+        request_kwargs = self._deliver(delivery_attempt)
+        body = request_kwargs["data"]
+        webhook_data = json.loads(body)
+        self.assertEqual(webhook_data["data"], self.large_payload)
+        self.assertEqual(webhook_data["idempotency_key"], str(delivery_attempt.idempotency_key))
+        # The body is exactly what receivers would get by canonicalizing the parsed JSON, so existing signature checks keep working
+        self.assertEqual(body, canonical_json(webhook_data))
+        self.assertTrue(verify_signature(webhook_data, request_kwargs["headers"]["X-Webhook-Signature"], self.webhook_secret.get_secret()))
+
+    def test_large_payloads_can_be_kept_in_a_payload_store(self):
+        with override_settings(WEBHOOK_PAYLOAD_STORAGE_BACKEND="filesystem", WEBHOOK_PAYLOAD_STORAGE_PATH=self.storage_dir.name):
+            delivery_attempt = self._trigger(self.large_payload)
+            delivery_attempt = WebhookDeliveryAttempt.objects.get(id=delivery_attempt.id)
+
+            self.assertIsNone(delivery_attempt.payload_blob)
+            self.assertTrue(os.path.exists(os.path.join(self.storage_dir.name, delivery_attempt.payload_blob_key)))
+            self.assertEqual(json.loads(self._deliver(delivery_attempt)["data"])["data"], self.large_payload)
+
+    def test_payloads_are_purged_after_the_retention_period(self):
+        with override_settings(WEBHOOK_PAYLOAD_STORAGE_BACKEND="filesystem", WEBHOOK_PAYLOAD_STORAGE_PATH=self.storage_dir.name):
+            delivery_attempt = self._trigger(self.large_payload)
+            self._deliver(delivery_attempt)
+            pending_attempt = WebhookDeliveryAttempt.objects.create(webhook_subscription=self.webhook_subscription, webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, idempotency_key=uuid.uuid4())
+            pending_attempt.set_payload(self.large_payload)
+            pending_attempt.save()
+
+            # Nothing has passed the retention period yet
+            self.assertEqual(WebhookDeliveryAttempt.purge_expired_payloads(), 0)
+
+            WebhookDeliveryAttempt.objects.filter(id=delivery_attempt.id).update(succeeded_at=timezone.now() - timezone.timedelta(hours=25))
+            call_command("purge_webhook_payloads", stdout=StringIO())
+
+            delivery_attempt.refresh_from_db()
+            self.assertEqual(delivery_attempt.status, WebhookDeliveryAttemptStatus.SUCCESS)
+            self.assertIsNotNone(delivery_attempt.payload_purged_at)
+            self.assertIsNone(delivery_attempt.payload_blob_key)
+            self.assertIn("full payload purged", delivery_attempt.payload_preview_display())
+            self.assertEqual(len(os.listdir(os.path.join(self.storage_dir.name, "webhook_payloads"))), 1)
+            # Undelivered payloads are kept so they can still be retried
+            self.assertEqual(WebhookDeliveryAttempt.objects.get(id=pending_attempt.id).get_payload(), self.large_payload)
@@ -0,0 +1,70 @@
+import json
+from unittest.mock import patch
+
+from django.test import TransactionTestCase, override_settings
+
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_webhook_task import deliver_webhook
+from bots.webhook_subscription_cache import get_active_webhook_secret
+from bots.webhook_utils import canonical_json, sign_body, trigger_webhook
+
+
+class WebhookSigningTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        WebhookSubscription.objects.create(project=self.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING, metadata={"customer": "a"})
+        with patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay"):
+            trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": "hello", "words": [{"start": 0.5, "end": 1.25}]})
+        self.delivery_attempt = WebhookDeliveryAttempt.objects.get()
+
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def test_the_signed_bytes_are_sent_as_the_body(self, mock_post):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+
+        deliver_webhook.apply(args=[self.delivery_attempt.id])
+
+        body = mock_post.call_args.kwargs["data"]
+        headers = mock_post.call_args.kwargs["headers"]
+        self.assertNotIn("json", mock_post.call_args.kwargs)
+        self.assertEqual(headers["Content-Type"], "application/json")
+        self.assertEqual(headers["X-Webhook-Signature"], sign_body(body, self.webhook_secret.get_secret()))
+        # Receivers that canonicalize the parsed body get the same bytes
+        self.assertEqual(body, canonical_json(json.loads(body)))
+        self.assertEqual(json.loads(body)["data"], {"transcript": "hello", "words": [{"start": 0.5, "end": 1.25}]})
+
+    @override_settings(CELERY_TASK_EAGER_PROPAGATES=False)
+    @patch("bots.tasks.deliver_webhook_task.get_active_webhook_secret", wraps=get_active_webhook_secret)
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def test_retries_send_the_same_body_and_signature(self, mock_post, mock_get_active_webhook_secret):
+        mock_post.return_value.status_code = 500
+        mock_post.return_value.text = "Server Error"
+
+        deliver_webhook.apply(args=[self.delivery_attempt.id])
+        # Changes to the bot after the first try don't change what is sent
+        self.bot.metadata = {"customer": "b"}
+        self.bot.save()
+        deliver_webhook.apply(args=[self.delivery_attempt.id])
+
+        self.assertGreater(mock_post.call_count, 1)
+        bodies = {call.kwargs["data"] for call in mock_post.call_args_list}
+        signatures = {call.kwargs["headers"]["X-Webhook-Signature"] for call in mock_post.call_args_list}
+        self.assertEqual(len(bodies), 1)
+        self.assertEqual(len(signatures), 1)
+        self.assertEqual(json.loads(bodies.pop())["bot_metadata"], {"customer": "a"})
+        # Signed on the first try only
+        mock_get_active_webhook_secret.assert_called_once()
+        self.delivery_attempt.refresh_from_db()
+        self.assertEqual(self.delivery_attempt.signature, signatures.pop())
+
+
+class CanonicalJsonTest(TransactionTestCase):
+    def test_matches_sorted_compact_stdlib_json(self):
+        payload = {"b": [1, 2.5, None, True], "a": {"z": 'ünïcode   </script> "quoted"\n', "y": -0.125}, "c": 9223372036854775807}
+        self.assertEqual(canonical_json(payload), json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+    def test_integers_wider_than_64_bits_fall_back_to_stdlib_json(self):
+        self.assertEqual(canonical_json({"big": 2**70, "a": 1}), b'{"a":1,"big":1180591620717411303424}')
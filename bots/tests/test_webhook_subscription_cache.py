@@ -0,0 +1,71 @@
+from unittest.mock import patch
+
+import redis
+from django.test import TransactionTestCase
+
+from bots.models import Bot, BotStates, Organization, Project, WebhookDeliveryAttempt, WebhookSecret, WebhookSubscription, WebhookTriggerTypes
+from bots.tasks.deliver_webhook_task import deliver_webhook
+from bots.webhook_subscription_cache import get_active_webhook_subscriptions, invalidate_project
+from bots.webhook_utils import trigger_webhook
+
+
+@patch("bots.tasks.deliver_webhook_task.deliver_webhook.delay")
+class WebhookSubscriptionCacheTest(TransactionTestCase):
+    def setUp(self):
+        self.organization = Organization.objects.create(name="Test Org")
+        self.project = Project.objects.create(name="Test Project", organization=self.organization)
+        self.webhook_secret = WebhookSecret.objects.create(project=self.project)
+        self.webhook_subscription = WebhookSubscription.objects.create(project=self.project, url="https://example.com/webhook", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        self.bot = Bot.objects.create(project=self.project, meeting_url="https://zoom.us/j/123", state=BotStates.JOINED_RECORDING)
+
+    def _trigger(self):
+        return trigger_webhook(webhook_trigger_type=WebhookTriggerTypes.TRANSCRIPT_UPDATE, bot=self.bot, payload={"transcript": "hi"})
+
+    def test_warm_cache_only_inserts_the_delivery_attempt(self, mock_deliver_webhook_delay):
+        self._trigger()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self._trigger(), 1)
+
+    @patch("bots.tasks.deliver_webhook_task.requests.post")
+    def test_delivery_reads_the_secret_from_the_cache(self, mock_post, mock_deliver_webhook_delay):
+        mock_post.return_value.status_code = 200
+        mock_post.return_value.text = "OK"
+        self._trigger()
+        deliver_webhook.apply(args=[WebhookDeliveryAttempt.objects.first().id])
+        self._trigger()
+        delivery_attempt_id = WebhookDeliveryAttempt.objects.last().id
+
+        # Loading the attempt with its subscription and bot, and saving the result
+        with self.assertNumQueries(2):
+            deliver_webhook.apply(args=[delivery_attempt_id])
+
+    def test_subscription_changes_invalidate_the_cache(self, mock_deliver_webhook_delay):
+        self.assertEqual(self._trigger(), 1)
+
+        WebhookSubscription.objects.create(project=self.project, url="https://example.com/other", triggers=[WebhookTriggerTypes.TRANSCRIPT_UPDATE])
+        self.assertEqual(self._trigger(), 2)
+
+        self.webhook_subscription.is_active = False
+        self.webhook_subscription.save()
+        self.assertEqual(self._trigger(), 1)
+
+        # Bot-level subscriptions take over from the project-level ones
+        bot_webhook_subscription = WebhookSubscription.objects.create(project=self.project, bot=self.bot, url="https://example.com/bot", triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE])
+        self.assertEqual(self._trigger(), 0)
+
+        bot_webhook_subscription.delete()
+        self.assertEqual(self._trigger(), 1)
+
+    def test_changes_made_by_another_process_are_picked_up(self, mock_deliver_webhook_delay):
+        self.assertEqual(self._trigger(), 1)
+
+        # An update that doesn't send signals in this process, followed by the bump another process would make
+        WebhookSubscription.objects.filter(id=self.webhook_subscription.id).update(triggers=[WebhookTriggerTypes.BOT_STATE_CHANGE])
+        self.assertEqual(self._trigger(), 1)
+        invalidate_project(self.project.id)
+        self.assertEqual(self._trigger(), 0)
+
+    def test_falls_back_to_the_database_when_redis_is_unavailable(self, mock_deliver_webhook_delay):
+        with patch("bots.webhook_subscription_cache.get_redis_client", side_effect=redis.ConnectionError("unavailable")):
+            self.assertEqual(get_active_webhook_subscriptions(WebhookTriggerTypes.TRANSCRIPT_UPDATE, self.project.id, self.bot.id), [self.webhook_subscription])
@@ -1,5 +1,6 @@
+import json
 import logging
-import time
+import os
 
 from deepgram import (
     DeepgramClient,
@@ -8,15 +9,21 @@ from deepgram import (
     LiveTranscriptionEvents,
 )
 
+from bots.models import Credentials
+from bots.transcription_providers.streaming_transcriber import StreamingTranscriber
+
 logger = logging.getLogger(__name__)
 
 
-class DeepgramStreamingTranscriber:
-    def __init__(self, *, deepgram_api_key, interim_results, language, model, sample_rate, metadata, callback, redaction_settings=None):
-        # Configure the DeepgramClientOptions to enable KeepAlive for maintaining the WebSocket connection (only if necessary to your scenario)
-        config = DeepgramClientOptions(options={"keepalive": "true"})
+class DeepgramStreamingTranscriber(StreamingTranscriber):
+    credential_type = Credentials.CredentialTypes.DEEPGRAM
+
+    def __init__(self, *, deepgram_api_key, interim_results, language, model, sample_rate, metadata, callback, redaction_settings=None, url=None, on_final_callback=None, on_partial_callback=None):
+        super().__init__(on_final_callback=on_final_callback, on_partial_callback=on_partial_callback)
 
-        self.last_send_time = time.time()
+        # Configure the DeepgramClientOptions to enable KeepAlive for maintaining the WebSocket connection (only if necessary to your scenario)
+        # The url lets us point at a self-hosted Deepgram or a local stand-in server instead of the hosted API.
+        config = DeepgramClientOptions(url=url or "", options={"keepalive": "true"})
 
         # Create a websocket connection using the DEEPGRAM_API_KEY from environment variables
         self.deepgram = DeepgramClient(deepgram_api_key, config)
@@ -24,15 +31,12 @@ class DeepgramStreamingTranscriber:
         # Use the listen.live class to create the websocket connection
         self.dg_connection = self.deepgram.listen.websocket.v("1")
 
-        def on_message(self, result, **kwargs):
-            sentence = result.channel.alternatives[0].transcript
-            if len(sentence) == 0:
-                return
-            logger.info(f"Transcription: {sentence}")
+        def on_message(_, result, **kwargs):
+            self.handle_result(result)
 
         self.dg_connection.on(LiveTranscriptionEvents.Transcript, on_message)
 
-        def on_error(self, error, **kwargs):
+        def on_error(_, error, **kwargs):
             logger.error(f"Error in Deepgram streaming transcription: {error}")
 
         self.dg_connection.on(LiveTranscriptionEvents.Error, on_error)
@@ -51,9 +55,45 @@ class DeepgramStreamingTranscriber:
 
         self.dg_connection.start(options)
 
+    @classmethod
+    def create(cls, *, api_key, bot, sample_rate, metadata):
+        return cls(
+            deepgram_api_key=api_key,
+            interim_results=True,
+            language=bot.deepgram_language(),
+            model=bot.deepgram_model(),
+            callback=bot.deepgram_callback(),
+            sample_rate=sample_rate,
+            metadata=[f"{key}:{value}" for key, value in metadata.items()] if metadata else None,
+            redaction_settings=bot.deepgram_redaction_settings(),
+            url=os.getenv("DEEPGRAM_STREAMING_URL"),
+        )
+
+    @classmethod
+    def supports_pre_warming(cls, bot):
+        # Only bots that stream to Deepgram open connections. With a callback, Deepgram sends the transcripts straight to
+        # the customer along with the per-speaker metadata
+        return bot.deepgram_use_streaming() and bot.deepgram_callback() is None
+
+    def handle_result(self, result):
+        alternative = result.channel.alternatives[0]
+
+        if not result.is_final:
+            self.on_partial(alternative.transcript)
+            return
+
+        self.on_final(
+            transcript=alternative.transcript,
+            start=result.start,
+            duration=result.duration,
+            words=json.loads(alternative.to_json()).get("words") or [],
+            end_of_speech=result.speech_final,
+        )
+
     def send(self, data):
+        self.record_send(data)
         self.dg_connection.send(data)
-        self.last_send_time = time.time()
 
     def finish(self):
         self.dg_connection.finish()
+        super().finish()
@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from websockets import ConnectionClosed
+from websockets.sync.server import serve
+
+logger = logging.getLogger(__name__)
+
+
+class MockDeepgramStreamingServer:
+    """
+    Local stand-in for Deepgram's live transcription websocket, so streaming latency can be measured without an account.
+
+    For every phrase_duration_seconds of audio it receives on a connection, it sends an interim result halfway through
+    the phrase and a speech_final result once the phrase's audio has all arrived, each after processing_delay_seconds.
+    The transcript of the Nth phrase on a connection is "phrase N".
+    """
+
+    def __init__(self, *, phrase_duration_seconds=2.0, processing_delay_seconds=0.05, host="127.0.0.1", port=0):
+        self.phrase_duration_seconds = phrase_duration_seconds
+        self.processing_delay_seconds = processing_delay_seconds
+        self.host = host
+        self.port = port
+        self.server = None
+        self.server_thread = None
+
+    @property
+    def url(self):
+        # The Deepgram SDK turns an http:// url into a ws:// one
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self.server = serve(self.handle_connection, self.host, self.port)
+        self.port = self.server.socket.getsockname()[1]
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server_thread.join()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def result_message(self, *, request_id, phrase_index, start, duration, is_final):
+        transcript = f"phrase {phrase_index}" if is_final else "phrase"
+        word_duration = duration / len(transcript.split())
+        words = [{"word": word, "start": start + i * word_duration, "end": start + (i + 1) * word_duration, "confidence": 0.99, "punctuated_word": word} for i, word in enumerate(transcript.split())]
+        return {
+            "type": "Results",
+            "channel_index": [0, 1],
+            "duration": duration,
+            "start": start,
+            "is_final": is_final,
+            "speech_final": is_final,
+            "channel": {"alternatives": [{"transcript": transcript, "confidence": 0.99, "words": words}]},
+            "metadata": {"request_id": request_id, "model_info": {"name": "mock", "version": "0", "arch": "mock"}, "model_uuid": str(uuid.UUID(int=0))},
+        }
+
+    def send_later(self, websocket, message):
+        def send():
+            try:
+                websocket.send(json.dumps(message))
+            except ConnectionClosed:
+                pass
+
+        threading.Timer(self.processing_delay_seconds, send).start()
+
+    def handle_connection(self, websocket):
+        query = parse_qs(urlparse(websocket.request.path).query)
+        bytes_per_second = int(query.get("sample_rate", ["16000"])[0]) * 2
+        request_id = str(uuid.uuid4())
+
+        audio_bytes = 0
+        phrases_sent = 0
+        interim_sent = False
+        try:
+            for message in websocket:
+                if isinstance(message, str):
+                    # KeepAlive and Finalize need no reply
+                    if json.loads(message).get("type") == "CloseStream":
+                        break
+                    continue
+
+                audio_bytes += len(message)
+                audio_seconds = audio_bytes / bytes_per_second
+                phrase_start = phrases_sent * self.phrase_duration_seconds
+
+                if audio_seconds >= phrase_start + self.phrase_duration_seconds:
+                    self.send_later(websocket, self.result_message(request_id=request_id, phrase_index=phrases_sent, start=phrase_start, duration=self.phrase_duration_seconds, is_final=True))
+                    phrases_sent += 1
+                    interim_sent = False
+                elif not interim_sent and audio_seconds >= phrase_start + self.phrase_duration_seconds / 2:
+                    self.send_later(websocket, self.result_message(request_id=request_id, phrase_index=phrases_sent, start=phrase_start, duration=audio_seconds - phrase_start, is_final=False))
+                    interim_sent = True
+
+            # Finalize the partial phrase at the end of the stream, after any results that are still pending
+            time.sleep(self.processing_delay_seconds)
+            audio_seconds = audio_bytes / bytes_per_second
+            phrase_start = phrases_sent * self.phrase_duration_seconds
+            if audio_seconds > phrase_start:
+                websocket.send(json.dumps(self.result_message(request_id=request_id, phrase_index=phrases_sent, start=phrase_start, duration=audio_seconds - phrase_start, is_final=True)))
+            websocket.send(json.dumps({"type": "Metadata", "transaction_key": "deprecated", "request_id": request_id, "sha256": "", "created": "", "duration": audio_seconds, "channels": 1}))
+        except ConnectionClosed:
+            pass
+        except Exception as e:
+            logger.warning(f"Error in mock Deepgram streaming server: {e}")
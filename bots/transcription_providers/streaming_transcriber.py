@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+
+logger = logging.getLogger(__name__)
+
+
+class StreamingTranscriber(ABC):
+    """
+    Interface for a per-speaker streaming transcription connection.
+
+    Providers implement send and finish, and report results back through on_partial and on_final.
+    Final segments are coalesced into utterances here, so every provider persists utterances the same way.
+    """
+
+    # If the speaker never pauses long enough for the provider to mark the end of speech, we still persist
+    # the finalized segments once they add up to this duration.
+    MAX_UTTERANCE_DURATION_SECONDS = 30
+
+    # The credential type whose api_key the provider needs, or None if it doesn't need one
+    credential_type = None
+
+    def __init__(self, *, on_final_callback=None, on_partial_callback=None):
+        self.last_send_time = time.time()
+        # Provider timestamps are relative to the first audio we send, so we keep the wall clock time of that audio
+        self.audio_start_time = None
+
+        # Called with each utterance once all of its segments are final
+        self.on_final_callback = on_final_callback
+        # Called with the transcript of each interim result. Interim results are otherwise only kept in memory.
+        self.on_partial_callback = on_partial_callback
+        self.interim_transcript = None
+        self.final_segments = []
+        self.lock = threading.Lock()
+
+        self.bytes_sent = 0
+        self.partial_count = 0
+        self.final_count = 0
+        self.utterance_count = 0
+        # Seconds between the end of a final segment's audio being sent and the segment coming back
+        self.finalization_latencies = []
+
+    @classmethod
+    @abstractmethod
+    def create(cls, *, api_key, bot, sample_rate, metadata):
+        pass
+
+    @classmethod
+    def supports_pre_warming(cls, bot):
+        # Pre-warmed connections are opened before we know the speaker, so they can't carry per-speaker metadata
+        return False
+
+    @abstractmethod
+    def send(self, data):
+        pass
+
+    def finish(self):
+        # Persist whatever was finalized before the connection closed
+        with self.lock:
+            self.flush_final_segments()
+
+    def record_send(self, data):
+        now = time.time()
+        if self.audio_start_time is None:
+            self.audio_start_time = now
+        self.last_send_time = now
+        self.bytes_sent += len(data)
+
+    def on_partial(self, transcript):
+        with self.lock:
+            self.partial_count += 1
+            self.interim_transcript = transcript
+        if self.on_partial_callback:
+            self.on_partial_callback(transcript)
+
+    def on_final(self, *, transcript, start, duration, words, end_of_speech):
+        with self.lock:
+            self.final_count += 1
+            self.interim_transcript = None
+            if self.audio_start_time is not None:
+                self.finalization_latencies.append(time.time() - (self.audio_start_time + start + duration))
+
+            if transcript:
+                self.final_segments.append({"start": start, "duration": duration, "transcript": transcript, "words": words})
+
+            segments_duration = sum(segment["duration"] for segment in self.final_segments)
+            if end_of_speech or segments_duration >= self.MAX_UTTERANCE_DURATION_SECONDS:
+                self.flush_final_segments()
+
+    def flush_final_segments(self):
+        # Must be called with self.lock held
+        if not self.final_segments:
+            return
+
+        segments = self.final_segments
+        self.final_segments = []
+        self.utterance_count += 1
+
+        if not self.on_final_callback:
+            logger.info(f"Transcription: {' '.join(segment['transcript'] for segment in segments)}")
+            return
+
+        utterance_start = segments[0]["start"]
+        utterance_end = segments[-1]["start"] + segments[-1]["duration"]
+        words = []
+        for segment in segments:
+            for word in segment["words"]:
+                # Make the word timestamps relative to the start of the utterance, like they are for prerecorded transcriptions
+                words.append({**word, "start": word["start"] - utterance_start, "end": word["end"] - utterance_start})
+
+        self.on_final_callback(
+            {
+                "transcription": {"transcript": " ".join(segment["transcript"] for segment in segments), "words": words},
+                "timestamp_ms": int(((self.audio_start_time or time.time()) + utterance_start) * 1000),
+                "duration_ms": int((utterance_end - utterance_start) * 1000),
+            }
+        )
+
+    def metrics(self):
+        latencies = sorted(self.finalization_latencies)
+        return {
+            "bytes_sent": self.bytes_sent,
+            "partial_count": self.partial_count,
+            "final_count": self.final_count,
+            "utterance_count": self.utterance_count,
+            "finalization_latency_p50_seconds": latencies[len(latencies) // 2] if latencies else None,
+            "finalization_latency_max_seconds": latencies[-1] if latencies else None,
+        }
@@ -0,0 +1,192 @@
+import logging
+import os
+import uuid
+
+import redis
+
+from bots.models import Credentials, TranscriptionProviders
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Maps each provider we call from get_transcription to the key its limiter is stored under
+# and the credential type whose account the limits apply to.
+RATE_LIMITED_PROVIDERS = {
+    TranscriptionProviders.DEEPGRAM: ("deepgram", Credentials.CredentialTypes.DEEPGRAM),
+    TranscriptionProviders.GLADIA: ("gladia", Credentials.CredentialTypes.GLADIA),
+    TranscriptionProviders.OPENAI: ("openai", Credentials.CredentialTypes.OPENAI),
+    TranscriptionProviders.ASSEMBLY_AI: ("assembly_ai", Credentials.CredentialTypes.ASSEMBLY_AI),
+    TranscriptionProviders.SARVAM: ("sarvam", Credentials.CredentialTypes.SARVAM),
+    TranscriptionProviders.ELEVENLABS: ("elevenlabs", Credentials.CredentialTypes.ELEVENLABS),
+}
+
+# The limits of every provider account
+REQUESTS_PER_SECOND = float(os.getenv("TRANSCRIPTION_RATE_LIMIT_REQUESTS_PER_SECOND", 10))
+BURST = int(os.getenv("TRANSCRIPTION_RATE_LIMIT_BURST", 20))
+MAX_IN_FLIGHT = int(os.getenv("TRANSCRIPTION_RATE_LIMIT_MAX_IN_FLIGHT", 25))
+# How long a slot is held if the worker holding it dies without releasing it
+IN_FLIGHT_LEASE_SECONDS = int(os.getenv("TRANSCRIPTION_RATE_LIMIT_LEASE_SECONDS", 600))
+# How long to wait before trying again when every in flight slot is taken
+IN_FLIGHT_RETRY_SECONDS = float(os.getenv("TRANSCRIPTION_RATE_LIMIT_IN_FLIGHT_RETRY_SECONDS", 5))
+
+KEY_PREFIX = "transcription_rate_limit"
+
+# Token bucket plus a lease based semaphore, evaluated atomically so that every worker in the cluster
+# sees the same state. Returns {acquired, seconds to wait before trying again, requests in flight}.
+ACQUIRE_SCRIPT = """
+local bucket_key = KEYS[1]
+local in_flight_key = KEYS[2]
+local metrics_key = KEYS[3]
+local requests_per_second = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local max_in_flight = tonumber(ARGV[3])
+local lease_id = ARGV[4]
+local lease_seconds = tonumber(ARGV[5])
+local in_flight_retry_seconds = tonumber(ARGV[6])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("HSET", metrics_key, "max_in_flight", max_in_flight)
+
+redis.call("ZREMRANGEBYSCORE", in_flight_key, "-inf", now)
+local in_flight = redis.call("ZCARD", in_flight_key)
+if max_in_flight > 0 and in_flight >= max_in_flight then
+    redis.call("HINCRBY", metrics_key, "deferred", 1)
+    redis.call("HINCRBYFLOAT", metrics_key, "wait_seconds_total", in_flight_retry_seconds)
+    return {0, tostring(in_flight_retry_seconds), in_flight}
+end
+
+if requests_per_second > 0 then
+    local tokens = burst
+    local bucket = redis.call("HMGET", bucket_key, "tokens", "updated_at")
+    if bucket[1] then
+        tokens = math.min(burst, tonumber(bucket[1]) + math.max(0, now - tonumber(bucket[2])) * requests_per_second)
+    end
+
+    local wait_seconds = 0
+    if tokens < 1 then
+        wait_seconds = (1 - tokens) / requests_per_second
+    else
+        tokens = tokens - 1
+    end
+    redis.call("HSET", bucket_key, "tokens", tostring(tokens), "updated_at", tostring(now))
+    redis.call("EXPIRE", bucket_key, math.ceil(burst / requests_per_second) + 60)
+
+    if wait_seconds > 0 then
+        redis.call("HINCRBY", metrics_key, "deferred", 1)
+        redis.call("HINCRBYFLOAT", metrics_key, "wait_seconds_total", wait_seconds)
+        return {0, tostring(wait_seconds), in_flight}
+    end
+end
+
+if max_in_flight > 0 then
+    redis.call("ZADD", in_flight_key, now + lease_seconds, lease_id)
+    redis.call("EXPIRE", in_flight_key, lease_seconds)
+end
+redis.call("HINCRBY", metrics_key, "acquired", 1)
+return {1, "0", in_flight + 1}
+"""
+
+
+class TranscriptionRateLimitExceeded(Exception):
+    def __init__(self, key, retry_after):
+        super().__init__(f"Transcription rate limit exceeded for {key}, retry after {retry_after:.2f} seconds")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class TranscriptionRateLimiter:
+    """
+    Cluster-wide token bucket and max in flight semaphore for a single transcription provider account.
+    """
+
+    def __init__(self, key, requests_per_second, burst, max_in_flight, redis_client=None):
+        self.key = key
+        self.requests_per_second = requests_per_second
+        self.burst = burst
+        self.max_in_flight = max_in_flight
+        self.redis_client = redis_client or get_redis_client()
+        self.lease_id = None
+
+    @classmethod
+    def for_recording(cls, recording):
+        """Returns the limiter for the recording's provider account, or None if the provider isn't rate limited."""
+        if recording.transcription_provider not in RATE_LIMITED_PROVIDERS:
+            return None
+
+        provider_key, credential_type = RATE_LIMITED_PROVIDERS[recording.transcription_provider]
+        project = recording.bot.project
+        # Requests made with the same credentials count against the same provider account
+        credentials_id = project.credentials.filter(credential_type=credential_type).values_list("id", flat=True).first()
+        account = f"credentials_{credentials_id}" if credentials_id else f"project_{project.id}"
+        return cls(key=f"{provider_key}:{account}", requests_per_second=REQUESTS_PER_SECOND, burst=BURST, max_in_flight=MAX_IN_FLIGHT)
+
+    def _redis_keys(self):
+        return [f"{KEY_PREFIX}:{self.key}:bucket", f"{KEY_PREFIX}:{self.key}:in_flight", f"{KEY_PREFIX}:{self.key}:metrics"]
+
+    def acquire(self):
+        """Tries to take a slot. Returns 0 if it was taken, otherwise the number of seconds to wait before trying again."""
+        lease_id = str(uuid.uuid4())
+        try:
+            acquired, wait_seconds, in_flight = self.redis_client.eval(
+                ACQUIRE_SCRIPT,
+                3,
+                *self._redis_keys(),
+                self.requests_per_second,
+                self.burst,
+                self.max_in_flight,
+                lease_id,
+                IN_FLIGHT_LEASE_SECONDS,
+                IN_FLIGHT_RETRY_SECONDS,
+            )
+        except redis.exceptions.RedisError as e:
+            # Fail open, we'd rather risk a 429 from the provider than stop transcribing
+            logger.warning(f"Transcription rate limiter for {self.key} is unavailable, skipping it: {e}")
+            return 0
+
+        if not acquired:
+            logger.info(f"Transcription rate limiter for {self.key} has no capacity, waiting {float(wait_seconds):.2f} seconds ({in_flight} requests in flight)")
+            return float(wait_seconds)
+
+        self.lease_id = lease_id
+        return 0
+
+    def release(self):
+        if self.lease_id is None:
+            return
+        try:
+            self.redis_client.zrem(self._redis_keys()[1], self.lease_id)
+        except redis.exceptions.RedisError as e:
+            # The lease will expire on its own
+            logger.warning(f"Failed to release transcription rate limiter slot for {self.key}: {e}")
+        self.lease_id = None
+
+    @classmethod
+    def all_keys(cls, redis_client=None):
+        """Returns the key of every provider account the limiter has seen."""
+        redis_client = redis_client or get_redis_client()
+        return sorted(key.decode()[len(KEY_PREFIX) + 1 : -len(":metrics")] for key in redis_client.scan_iter(match=f"{KEY_PREFIX}:*:metrics"))
+
+    def metrics(self):
+        """Returns utilization and wait time for the provider account, as seen by every worker."""
+        _, in_flight_key, metrics_key = self._redis_keys()
+        pipeline = self.redis_client.pipeline(transaction=False)
+        pipeline.zcard(in_flight_key)
+        pipeline.hgetall(metrics_key)
+        in_flight, raw_metrics = pipeline.execute()
+        metrics = {k.decode(): float(v) for k, v in raw_metrics.items()}
+
+        acquired = int(metrics.get("acquired", 0))
+        deferred = int(metrics.get("deferred", 0))
+        wait_seconds_total = metrics.get("wait_seconds_total", 0.0)
+        max_in_flight = int(metrics.get("max_in_flight", self.max_in_flight))
+        return {
+            "key": self.key,
+            "in_flight": in_flight,
+            "max_in_flight": max_in_flight,
+            "utilization": in_flight / max_in_flight if max_in_flight > 0 else None,
+            "acquired": acquired,
+            "deferred": deferred,
+            "wait_seconds_total": wait_seconds_total,
+            "average_wait_seconds": wait_seconds_total / deferred if deferred else 0.0,
+        }
@@ -0,0 +1,292 @@
+import hashlib
+import logging
+import random
+import time
+import uuid
+
+import redis
+from django.conf import settings
+from django.utils import timezone
+
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "webhook_circuit"
+
+# How long a slot is held if the worker holding it dies without releasing it
+IN_FLIGHT_LEASE_SECONDS = 60
+# How long to wait before trying again when every slot of a closed circuit is taken, or a half open circuit's probe is in flight
+BUSY_RETRY_SECONDS = 2
+# The rolling error rate is counted in this many buckets spread over WEBHOOK_CIRCUIT_WINDOW_SECONDS
+WINDOW_BUCKET_COUNT = 6
+# Weight of the newest response in the latency EWMA
+LATENCY_EWMA_ALPHA = 0.2
+# The concurrency limit is multiplied by this after a failed or slow response, and grows by 1 / limit after a fast success
+CONCURRENCY_DECREASE_FACTOR = 0.75
+# Endpoints that haven't been sent anything for this long are forgotten
+STATE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Decides whether a request may be sent, and takes a slot for it if so. An open circuit lets nothing through until
+# open_seconds have passed, then it's half open and lets a single probe through. Returns {allowed, seconds to wait before trying again, state}.
+ACQUIRE_SCRIPT = """
+local state_key = KEYS[1]
+local in_flight_key = KEYS[2]
+local lease_id = ARGV[1]
+local lease_seconds = tonumber(ARGV[2])
+local busy_retry_seconds = tonumber(ARGV[3])
+local open_seconds = tonumber(ARGV[4])
+local max_concurrency = tonumber(ARGV[5])
+local state_ttl_seconds = tonumber(ARGV[6])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local circuit = redis.call("HMGET", state_key, "state", "opened_at", "concurrency_limit")
+local state = circuit[1] or "closed"
+
+if state == "open" then
+    local retry_after = tonumber(circuit[2]) + open_seconds - now
+    if retry_after > 0 then
+        redis.call("HINCRBY", state_key, "deferred", 1)
+        return {0, tostring(retry_after), state}
+    end
+    state = "half_open"
+    redis.call("HSET", state_key, "state", state)
+end
+
+redis.call("ZREMRANGEBYSCORE", in_flight_key, "-inf", now)
+local limit = 1
+if state == "closed" then
+    limit = math.max(1, math.floor(tonumber(circuit[3]) or max_concurrency))
+end
+if redis.call("ZCARD", in_flight_key) >= limit then
+    redis.call("HINCRBY", state_key, "deferred", 1)
+    return {0, tostring(busy_retry_seconds), state}
+end
+
+redis.call("ZADD", in_flight_key, now + lease_seconds, lease_id)
+redis.call("EXPIRE", in_flight_key, lease_seconds)
+redis.call("EXPIRE", state_key, state_ttl_seconds)
+return {1, "0", state}
+"""
+
+# Releases a slot and records the response. Opens a closed circuit whose rolling error rate is over the threshold, and
+# closes or reopens a half open circuit depending on how its probe went. Returns {new state, whether the circuit was just opened}.
+RELEASE_SCRIPT = """
+local state_key = KEYS[1]
+local in_flight_key = KEYS[2]
+local lease_id = ARGV[1]
+local succeeded = ARGV[2] == "1"
+local latency_ms = tonumber(ARGV[3])
+local window_seconds = tonumber(ARGV[4])
+local bucket_count = tonumber(ARGV[5])
+local min_requests = tonumber(ARGV[6])
+local error_rate_threshold = tonumber(ARGV[7])
+local latency_ewma_alpha = tonumber(ARGV[8])
+local target_latency_ms = tonumber(ARGV[9])
+local min_concurrency = tonumber(ARGV[10])
+local max_concurrency = tonumber(ARGV[11])
+local concurrency_decrease_factor = tonumber(ARGV[12])
+
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+redis.call("ZREM", in_flight_key, lease_id)
+
+local bucket = math.floor(now / (window_seconds / bucket_count))
+local slot = "bucket_" .. (bucket % bucket_count)
+if tonumber(redis.call("HGET", state_key, slot .. "_id")) ~= bucket then
+    redis.call("HSET", state_key, slot .. "_id", bucket, slot .. "_requests", 0, slot .. "_errors", 0)
+end
+redis.call("HINCRBY", state_key, slot .. "_requests", 1)
+if not succeeded then
+    redis.call("HINCRBY", state_key, slot .. "_errors", 1)
+end
+
+local circuit = redis.call("HMGET", state_key, "state", "latency_ewma_ms", "concurrency_limit")
+local state = circuit[1] or "closed"
+local opened = 0
+local latency_ewma_ms = latency_ms
+if circuit[2] then
+    latency_ewma_ms = latency_ewma_alpha * latency_ms + (1 - latency_ewma_alpha) * tonumber(circuit[2])
+end
+local concurrency_limit = tonumber(circuit[3]) or max_concurrency
+if succeeded and latency_ewma_ms <= target_latency_ms then
+    concurrency_limit = math.min(max_concurrency, concurrency_limit + 1 / concurrency_limit)
+else
+    concurrency_limit = math.max(min_concurrency, concurrency_limit * concurrency_decrease_factor)
+end
+
+if state == "half_open" then
+    if succeeded then
+        -- The endpoint has recovered. Forget the failures that opened the circuit and ramp back up from the minimum concurrency.
+        state = "closed"
+        concurrency_limit = min_concurrency
+        for i = 0, bucket_count - 1 do
+            redis.call("HDEL", state_key, "bucket_" .. i .. "_id", "bucket_" .. i .. "_requests", "bucket_" .. i .. "_errors")
+        end
+    else
+        state = "open"
+        opened = 1
+        redis.call("HSET", state_key, "opened_at", tostring(now))
+    end
+elseif state == "closed" then
+    local requests = 0
+    local errors = 0
+    for i = 0, bucket_count - 1 do
+        local counts = redis.call("HMGET", state_key, "bucket_" .. i .. "_id", "bucket_" .. i .. "_requests", "bucket_" .. i .. "_errors")
+        if counts[1] and tonumber(counts[1]) > bucket - bucket_count then
+            requests = requests + tonumber(counts[2])
+            errors = errors + tonumber(counts[3])
+        end
+    end
+    if requests >= min_requests and errors / requests >= error_rate_threshold then
+        state = "open"
+        opened = 1
+        redis.call("HSET", state_key, "opened_at", tostring(now))
+        redis.call("HINCRBY", state_key, "opened_count", 1)
+    end
+end
+
+redis.call("HSET", state_key, "state", state, "latency_ewma_ms", tostring(latency_ewma_ms), "concurrency_limit", tostring(concurrency_limit))
+return {state, opened}
+"""
+
+
+class WebhookCircuitBreaker:
+    """
+    Cluster-wide health tracking for a single webhook endpoint, so deliveries to an endpoint that is down are deferred
+    instead of each one waiting for a timeout. The rolling error rate, latency EWMA and adaptive concurrency limit are
+    kept in Redis and shared by every worker sending to the endpoint.
+    """
+
+    def __init__(self, url, redis_client=None):
+        self.url = url
+        self.redis_client = redis_client or get_redis_client()
+        self.lease_id = None
+        self.acquired_at = None
+
+    def _redis_keys(self):
+        endpoint_key = hashlib.sha256(self.url.encode("utf-8")).hexdigest()[:32]
+        return [f"{KEY_PREFIX}:{endpoint_key}:state", f"{KEY_PREFIX}:{endpoint_key}:in_flight"]
+
+    def acquire(self):
+        """Tries to take a slot. Returns 0 if it was taken, otherwise the number of seconds to wait before trying again."""
+        if not settings.WEBHOOK_CIRCUIT_BREAKER_ENABLED:
+            return 0
+
+        lease_id = str(uuid.uuid4())
+        try:
+            allowed, retry_after, state = self.redis_client.eval(
+                ACQUIRE_SCRIPT,
+                2,
+                *self._redis_keys(),
+                lease_id,
+                IN_FLIGHT_LEASE_SECONDS,
+                BUSY_RETRY_SECONDS,
+                settings.WEBHOOK_CIRCUIT_OPEN_SECONDS,
+                settings.WEBHOOK_CIRCUIT_MAX_CONCURRENCY,
+                STATE_TTL_SECONDS,
+            )
+        except redis.exceptions.RedisError as e:
+            # Fail open, an unhealthy endpoint only costs us timeouts
+            logger.warning(f"Webhook circuit breaker for {self.url} is unavailable, skipping it: {e}")
+            return 0
+
+        if not allowed:
+            # Spread out the deliveries that were deferred together, so they don't all come back at the same moment
+            return float(retry_after) * random.uniform(1, 1.5)
+
+        self.lease_id = lease_id
+        self.acquired_at = time.monotonic()
+        return 0
+
+    def release(self, succeeded, latency_seconds=None):
+        """Releases the slot and records how the request went. The latency defaults to the time since the slot was taken."""
+        if self.lease_id is None:
+            return
+        if latency_seconds is None:
+            latency_seconds = time.monotonic() - self.acquired_at
+
+        try:
+            _, opened = self.redis_client.eval(
+                RELEASE_SCRIPT,
+                2,
+                *self._redis_keys(),
+                self.lease_id,
+                1 if succeeded else 0,
+                latency_seconds * 1000,
+                settings.WEBHOOK_CIRCUIT_WINDOW_SECONDS,
+                WINDOW_BUCKET_COUNT,
+                settings.WEBHOOK_CIRCUIT_MIN_REQUESTS,
+                settings.WEBHOOK_CIRCUIT_ERROR_RATE_THRESHOLD,
+                LATENCY_EWMA_ALPHA,
+                settings.WEBHOOK_CIRCUIT_TARGET_LATENCY_MS,
+                settings.WEBHOOK_CIRCUIT_MIN_CONCURRENCY,
+                settings.WEBHOOK_CIRCUIT_MAX_CONCURRENCY,
+                CONCURRENCY_DECREASE_FACTOR,
+            )
+            if opened:
+                logger.warning(f"Webhook circuit for {self.url} opened, deferring deliveries for {settings.WEBHOOK_CIRCUIT_OPEN_SECONDS} seconds")
+        except redis.exceptions.RedisError as e:
+            # The lease will expire on its own
+            logger.warning(f"Failed to record webhook response for the circuit breaker of {self.url}: {e}")
+        self.lease_id = None
+
+    def status(self):
+        """Returns the endpoint's circuit state, rolling error rate, latency and concurrency, or None if it can't be read."""
+        state_key, in_flight_key = self._redis_keys()
+        try:
+            pipeline = self.redis_client.pipeline(transaction=False)
+            pipeline.hgetall(state_key)
+            pipeline.zcount(in_flight_key, time.time(), "+inf")
+            raw_circuit, in_flight = pipeline.execute()
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Could not read the webhook circuit state for {self.url}: {e}")
+            return None
+        circuit = {k.decode(): v.decode() for k, v in raw_circuit.items()}
+
+        now = time.time()
+        bucket = int(now // (settings.WEBHOOK_CIRCUIT_WINDOW_SECONDS / WINDOW_BUCKET_COUNT))
+        requests = 0
+        errors = 0
+        for i in range(WINDOW_BUCKET_COUNT):
+            if int(circuit.get(f"bucket_{i}_id", -1)) > bucket - WINDOW_BUCKET_COUNT:
+                requests += int(circuit[f"bucket_{i}_requests"])
+                errors += int(circuit[f"bucket_{i}_errors"])
+
+        state = circuit.get("state", CLOSED)
+        retry_after = None
+        if state == OPEN:
+            retry_after = max(0.0, float(circuit["opened_at"]) + settings.WEBHOOK_CIRCUIT_OPEN_SECONDS - now)
+        return {
+            "state": state,
+            "requests": requests,
+            "error_rate": errors / requests if requests else None,
+            "latency_ewma_ms": float(circuit["latency_ewma_ms"]) if "latency_ewma_ms" in circuit else None,
+            "concurrency_limit": int(float(circuit.get("concurrency_limit", settings.WEBHOOK_CIRCUIT_MAX_CONCURRENCY))),
+            "in_flight": in_flight,
+            "retry_after_seconds": retry_after,
+            "deferred": int(circuit.get("deferred", 0)),
+            "opened_count": int(circuit.get("opened_count", 0)),
+        }
+
+    def reset(self):
+        self.redis_client.delete(*self._redis_keys())
+
+
+def deferred_for_too_long(delivery):
+    """Whether a delivery has been waiting on its endpoint's circuit for longer than WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS."""
+    return timezone.now() - delivery.created_at > timezone.timedelta(seconds=settings.WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS)
+
+
+def circuit_open_response(url):
+    return {
+        "status_code": None,  # No HTTP status since no request was sent
+        "error_type": "CircuitOpen",
+        "error_message": f"Webhook endpoint was unhealthy for more than {settings.WEBHOOK_CIRCUIT_MAX_DEFER_SECONDS} seconds",
+        "request_url": url,
+    }
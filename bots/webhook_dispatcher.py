@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus
+from bots.tasks.deliver_webhook_task import build_signed_delivery_body
+from bots.webhook_circuit_breaker import WebhookCircuitBreaker, circuit_open_response, deferred_for_too_long
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed attempt is reserved for the dispatcher that claimed it. If that dispatcher dies, another one picks it up after this.
+CLAIM_LEASE_SECONDS = 300
+# Limit response body storage to prevent DB issues with large responses
+MAX_RESPONSE_BODY_LENGTH = 10000
+
+
+@dataclass
+class DispatchedDelivery:
+    delivery: WebhookDeliveryAttempt
+    # The body and signature are None if the subscription is no longer active, or the delivery was deferred by the endpoint's circuit breaker
+    body: bytes | None
+    signature: str | None
+    circuit_breaker: WebhookCircuitBreaker | None = None
+    deferred_seconds: float = 0
+    response_body: str | dict | None = None
+    attempted_at: datetime | None = None
+    latency_seconds: float | None = None
+    succeeded: bool = False
+
+
+def retry_delay_seconds(attempt_count):
+    # Exponential backoff with full jitter, the same as Celery's retry_backoff
+    return random.uniform(0, min(settings.WEBHOOK_RETRY_BACKOFF_MAX_SECONDS, 2**attempt_count))
+
+
+class WebhookDispatcher:
+    """
+    Delivers webhooks from an asyncio loop rather than with a Celery task per delivery.
+
+    Attempts are claimed from the database in batches once their next_attempt_at has passed, sent over a shared pool of
+    keep-alive connections, and their results are written back with bulk updates. Each host gets at most
+    max_connections_per_host requests in flight, so a slow endpoint only ties up its own slots.
+    """
+
+    def __init__(self, max_in_flight=200, max_connections_per_host=10, timeout_seconds=10, poll_interval_seconds=1):
+        self.max_in_flight = max_in_flight
+        self.max_connections_per_host = max_connections_per_host
+        self.timeout_seconds = timeout_seconds
+        self.poll_interval_seconds = poll_interval_seconds
+        self.host_semaphores = {}
+        self.keep_running = True
+
+    def stop(self):
+        self.keep_running = False
+
+    def claim_due_deliveries(self, limit):
+        close_old_connections()
+        now = timezone.now()
+        with transaction.atomic():
+            deliveries = list(WebhookDeliveryAttempt.objects.select_for_update(skip_locked=True, of=("self",)).filter(next_attempt_at__lte=now).select_related("webhook_subscription", "bot", "calendar").order_by("next_attempt_at")[:limit])
+            WebhookDeliveryAttempt.objects.filter(id__in=[delivery.id for delivery in deliveries]).update(next_attempt_at=now + timezone.timedelta(seconds=CLAIM_LEASE_SECONDS))
+
+        dispatched_deliveries = []
+        for delivery in deliveries:
+            subscription = delivery.webhook_subscription
+            if not subscription.is_active:
+                dispatched_deliveries.append(DispatchedDelivery(delivery=delivery, body=None, signature=None))
+                continue
+            circuit_breaker = WebhookCircuitBreaker(subscription.url)
+            retry_after = circuit_breaker.acquire()
+            if retry_after:
+                dispatched_deliveries.append(DispatchedDelivery(delivery=delivery, body=None, signature=None, deferred_seconds=retry_after))
+                continue
+            body = build_signed_delivery_body(delivery)
+            dispatched_deliveries.append(DispatchedDelivery(delivery=delivery, body=body, signature=delivery.signature, circuit_breaker=circuit_breaker))
+        return dispatched_deliveries
+
+    def record_results(self, dispatched_deliveries):
+        now = timezone.now()
+        deliveries = []
+        for dispatched_delivery in dispatched_deliveries:
+            delivery = dispatched_delivery.delivery
+            subscription = delivery.webhook_subscription
+            deliveries.append(delivery)
+            delivery.next_attempt_at = None
+
+            # A deferred delivery is put back without counting as an attempt
+            if dispatched_delivery.deferred_seconds:
+                if deferred_for_too_long(delivery):
+                    delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+                    delivery.add_to_response_body_list(circuit_open_response(subscription.url))
+                else:
+                    delivery.next_attempt_at = now + timezone.timedelta(seconds=dispatched_delivery.deferred_seconds)
+                continue
+
+            if dispatched_delivery.body is None:
+                delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+                delivery.add_to_response_body_list(
+                    {
+                        "status_code": None,
+                        "error_type": "InactiveSubscription",
+                        "error_message": "Webhook subscription is no longer active",
+                        "request_url": subscription.url,
+                    }
+                )
+                continue
+
+            dispatched_delivery.circuit_breaker.release(succeeded=dispatched_delivery.succeeded, latency_seconds=dispatched_delivery.latency_seconds)
+            delivery.attempt_count += 1
+            delivery.last_attempt_at = dispatched_delivery.attempted_at
+            delivery.add_to_response_body_list(dispatched_delivery.response_body)
+            if dispatched_delivery.succeeded:
+                delivery.status = WebhookDeliveryAttemptStatus.SUCCESS
+                delivery.succeeded_at = now
+                continue
+
+            delivery.status = WebhookDeliveryAttemptStatus.FAILURE
+            if delivery.attempt_count >= settings.WEBHOOK_MAX_ATTEMPTS:
+                logger.error(f"Webhook delivery failed after {delivery.attempt_count} attempts. " + f"Webhook ID: {delivery.id}, URL: {subscription.url}, " + f"Event: {delivery.webhook_trigger_type}, Status: {delivery.status}")
+            else:
+                delivery.next_attempt_at = now + timezone.timedelta(seconds=retry_delay_seconds(delivery.attempt_count))
+
+        WebhookDeliveryAttempt.objects.bulk_update(deliveries, ["status", "attempt_count", "last_attempt_at", "succeeded_at", "next_attempt_at", "response_body_list", "webhook_data", "signature"])
+
+    async def send(self, client, dispatched_delivery):
+        if dispatched_delivery.body is None:
+            return dispatched_delivery
+
+        url = dispatched_delivery.delivery.webhook_subscription.url
+        semaphore = self.host_semaphores.setdefault(urlsplit(url).netloc, asyncio.Semaphore(self.max_connections_per_host))
+        async with semaphore:
+            dispatched_delivery.attempted_at = timezone.now()
+            started_at = time.monotonic()
+            try:
+                response = await client.post(
+                    url,
+                    content=dispatched_delivery.body,
+                    headers={
+                        "Content-Type": "application/json",
+                        "User-Agent": "Attendee-Webhook/1.0",
+                        "X-Webhook-Signature": dispatched_delivery.signature,
+                    },
+                )
+                dispatched_delivery.response_body = response.text[:MAX_RESPONSE_BODY_LENGTH]
+                dispatched_delivery.succeeded = 200 <= response.status_code < 300
+            except httpx.HTTPError as e:
+                # Handle network errors, timeouts, etc.
+                dispatched_delivery.response_body = {
+                    "status_code": None,  # No HTTP status since request failed
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                    "request_url": url,
+                }
+            dispatched_delivery.latency_seconds = time.monotonic() - started_at
+        return dispatched_delivery
+
+    async def run(self, stop_when_idle=False):
+        """
+        Deliver due webhooks until stop() is called, or until nothing is due or in flight if stop_when_idle is set.
+        In-flight deliveries are finished before returning.
+        """
+        limits = httpx.Limits(max_connections=self.max_in_flight, max_keepalive_connections=self.max_in_flight)
+        in_flight = set()
+        async with httpx.AsyncClient(limits=limits, timeout=self.timeout_seconds) as client:
+            while self.keep_running or in_flight:
+                if self.keep_running and len(in_flight) < self.max_in_flight:
+                    for dispatched_delivery in await sync_to_async(self.claim_due_deliveries)(self.max_in_flight - len(in_flight)):
+                        in_flight.add(asyncio.create_task(self.send(client, dispatched_delivery)))
+
+                if not in_flight:
+                    if stop_when_idle:
+                        break
+                    await asyncio.sleep(self.poll_interval_seconds)
+                    continue
+
+                done, in_flight = await asyncio.wait(in_flight, timeout=self.poll_interval_seconds, return_when=asyncio.FIRST_COMPLETED)
+                if done:
+                    await sync_to_async(self.record_results)([task.result() for task in done])
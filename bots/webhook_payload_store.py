@@ -0,0 +1,13 @@
+from django.conf import settings
+
+from bots.object_store import build_object_store
+
+
+def get_webhook_payload_store():
+    # Returns None when large webhook payloads are kept compressed in the database
+    backend = settings.WEBHOOK_PAYLOAD_STORAGE_BACKEND
+    if backend == "database":
+        return None
+    if backend == "s3":
+        return build_object_store(backend, settings.AWS_WEBHOOK_PAYLOAD_STORAGE_BUCKET_NAME)
+    return build_object_store(backend, settings.WEBHOOK_PAYLOAD_STORAGE_PATH)
@@ -0,0 +1,94 @@
+import logging
+import threading
+
+import redis
+from cachetools import TTLCache
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from bots.models import WebhookSecret, WebhookSubscription
+from bots.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY_PREFIX = "webhook_subscriptions_version"
+
+# Returned when the version can't be read, so the cache is bypassed rather than trusted
+VERSION_UNAVAILABLE = object()
+
+# Each process, whether it's serving the API, running Celery tasks or running a bot, keeps its own copy of the webhook
+# subscriptions and secret of the projects and bots it triggers webhooks for. Every entry is tagged with its project's
+# version number from Redis, which is bumped whenever a subscription or secret in the project changes, so a change made
+# in one process is picked up by all of them on their next lookup. The TTL is only a backstop in case a bump is lost.
+_cache = TTLCache(maxsize=settings.WEBHOOK_SUBSCRIPTION_CACHE_MAX_ENTRIES, ttl=settings.WEBHOOK_SUBSCRIPTION_CACHE_TTL_SECONDS)
+_cache_lock = threading.Lock()
+
+
+def version_key(project_id):
+    return f"{VERSION_KEY_PREFIX}:{project_id}"
+
+
+def get_project_version(project_id):
+    try:
+        return get_redis_client().get(version_key(project_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not read the webhook subscriptions version for project {project_id}, bypassing the cache: {e}")
+        return VERSION_UNAVAILABLE
+
+
+def get_cached(cache_key, version, load):
+    if version is VERSION_UNAVAILABLE:
+        return load()
+
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    # The version was read before loading, so if the project changes while we load, the next lookup sees a newer version and reloads
+    value = load()
+    with _cache_lock:
+        _cache[cache_key] = (version, value)
+    return value
+
+
+def get_active_webhook_subscriptions(webhook_trigger_type, project_id, bot_id=None):
+    """
+    Returns the active subscriptions that should receive a webhook trigger.
+    Bot-level subscriptions are used exclusively if the bot has any, otherwise the project-level ones are used.
+    """
+    version = get_project_version(project_id)
+
+    subscriptions = []
+    if bot_id is not None:
+        subscriptions = get_cached(("bot", bot_id), version, lambda: list(WebhookSubscription.objects.filter(bot_id=bot_id)))
+    if not subscriptions:
+        subscriptions = get_cached(("project", project_id), version, lambda: list(WebhookSubscription.objects.filter(project_id=project_id, bot__isnull=True)))
+
+    return [subscription for subscription in subscriptions if subscription.is_active and webhook_trigger_type in subscription.triggers]
+
+
+def get_active_webhook_secret(project_id):
+    """
+    Returns the project's most recently created WebhookSecret, which is the one webhooks are signed with.
+    """
+    return get_cached(("secret", project_id), get_project_version(project_id), lambda: WebhookSecret.objects.filter(project_id=project_id).order_by("-created_at").first())
+
+
+def invalidate_project(project_id):
+    try:
+        get_redis_client().incr(version_key(project_id))
+    except redis.RedisError as e:
+        logger.warning(f"Could not bump the webhook subscriptions version for project {project_id}, other processes will see the change once their cache expires: {e}")
+
+
+@receiver(post_save, sender=WebhookSubscription)
+@receiver(post_delete, sender=WebhookSubscription)
+@receiver(post_save, sender=WebhookSecret)
+@receiver(post_delete, sender=WebhookSecret)
+def invalidate_project_on_change(sender, instance, **kwargs):
+    # Wait for the commit, so that no process can reload the old state after the bump
+    project_id = instance.project_id
+    transaction.on_commit(lambda: invalidate_project(project_id))
@@ -5,6 +5,11 @@ import json
 import logging
 import uuid
 
+import orjson
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,62 +19,112 @@ def trigger_webhook(webhook_trigger_type, bot=None, calendar=None, payload=None)
     Prioritizes bot-level webhook subscriptions over project-level ones.
     """
     from bots.models import WebhookDeliveryAttempt
+    from bots.task_outbox import enqueue_task
+    from bots.webhook_subscription_cache import get_active_webhook_subscriptions
 
     if bot:
-        project = bot.project
+        project_id = bot.project_id
     elif calendar:
-        project = calendar.project
+        project_id = calendar.project_id
     else:
         raise ValueError("Either bot or calendar must be provided")
 
     if not payload:
         raise ValueError("Payload must be provided")
 
-    # If bot was provided and has any bot-level webhook subscriptions, use those exclusively
-    if bot and bot.bot_webhook_subscriptions.exists():
-        subscriptions = bot.bot_webhook_subscriptions.filter(triggers__contains=[webhook_trigger_type], is_active=True)
-    else:
-        # Otherwise, fall back to project-level webhook subscriptions
-        subscriptions = project.webhook_subscriptions.filter(
-            bot__isnull=True,  # Only project-level (not bot-specific)
-            triggers__contains=[webhook_trigger_type],
-            is_active=True,
-        )
+    # If bot was provided and has any bot-level webhook subscriptions, those are used exclusively.
+    # Otherwise, fall back to project-level webhook subscriptions.
+    subscriptions = get_active_webhook_subscriptions(webhook_trigger_type, project_id, bot_id=bot.id if bot else None)
+
+    # Serialized once, since it decides whether the payload is stored out of line for every subscription
+    payload_json = canonical_json(payload)
 
     delivery_attempts = []
     for subscription in subscriptions:
         # Create a webhook delivery attempt record
-        delivery_attempt = WebhookDeliveryAttempt.objects.create(
+        delivery_attempt = WebhookDeliveryAttempt(
             webhook_subscription=subscription,
             webhook_trigger_type=webhook_trigger_type,
             idempotency_key=uuid.uuid4(),
             bot=bot,
             calendar=calendar,
-            payload=payload,
         )
+        delivery_attempt.set_payload(payload, payload_json=payload_json)
+        # The webhook dispatcher picks up attempts once their next_attempt_at has passed
+        delivers_with_dispatcher = settings.WEBHOOK_DELIVERY_BACKEND == "dispatcher" and not subscription.delivers_in_batches()
+        if delivers_with_dispatcher:
+            delivery_attempt.next_attempt_at = timezone.now()
+        delivery_attempt.save()
         delivery_attempts.append(delivery_attempt)
 
-        from bots.tasks.deliver_webhook_task import deliver_webhook
+        if subscription.delivers_in_batches():
+            schedule_webhook_batch_flush(subscription)
+        elif not delivers_with_dispatcher:
+            from bots.tasks.deliver_webhook_task import deliver_webhook
 
-        deliver_webhook.delay(delivery_attempt.id)
+            # When called inside a transaction, e.g. from BotEventManager.create_event, the task is only published once it commits
+            enqueue_task(deliver_webhook, [delivery_attempt.id])
 
     return len(delivery_attempts)
 
 
-def sign_payload(payload, secret):
+def schedule_webhook_batch_flush(subscription):
     """
-    Sign a webhook payload using HMAC-SHA256. Returns a base64-encoded HMAC-SHA256 signature
+    Make sure the pending batch of a subscription that delivers in batches gets flushed.
+    The batch is flushed as soon as it is full, otherwise batch_max_delay_ms after the event that started it.
+    """
+    from bots.models import WebhookDeliveryAttempt, WebhookDeliveryAttemptStatus, WebhookSubscription
+    from bots.task_outbox import enqueue_task
+    from bots.tasks.deliver_webhook_task import flush_webhook_batch
+
+    pending_count = WebhookDeliveryAttempt.objects.filter(webhook_subscription=subscription, status=WebhookDeliveryAttemptStatus.PENDING, batch_idempotency_key__isnull=True).count()
+    if pending_count and pending_count % subscription.batch_max_size == 0:
+        enqueue_task(flush_webhook_batch, [subscription.id])
+        return
+
+    # Only the event that starts a batch schedules its flush. A flush that is past due was lost or is about to run, so scheduling another is harmless.
+    now = timezone.now()
+    flush_due_at = now + timezone.timedelta(milliseconds=subscription.batch_max_delay_ms)
+    if WebhookSubscription.objects.filter(Q(batch_flush_due_at__isnull=True) | Q(batch_flush_due_at__lt=now), id=subscription.id).update(batch_flush_due_at=flush_due_at):
+        enqueue_task(flush_webhook_batch, [subscription.id], countdown=subscription.batch_max_delay_ms / 1000)
+
+
+def canonical_json(payload):
+    """
+    Serialize a payload to the canonical JSON bytes that webhook signatures are computed over: sorted keys, no whitespace and UTF-8.
     """
-    # Convert the payload to a canonical JSON string
-    payload_json = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    try:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # orjson only handles integers that fit in 64 bits
+        return json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
 
-    # Create the signature
-    signature = hmac.new(secret, payload_json.encode("utf-8"), hashlib.sha256).digest()
 
-    # Return base64 encoded signature
+def build_webhook_body(webhook_data, data_json):
+    """
+    Build the canonical JSON body of a webhook whose data is already serialized as canonical JSON,
+    without parsing and re-serializing the data. The result is the same as canonical_json({**webhook_data, "data": data}).
+    """
+    fields = {key: canonical_json(value) for key, value in webhook_data.items()}
+    fields["data"] = data_json
+    return b"{" + b",".join(canonical_json(key) + b":" + fields[key] for key in sorted(fields)) + b"}"
+
+
+def sign_body(body, secret):
+    """
+    Sign canonical JSON bytes using HMAC-SHA256. Returns a base64-encoded HMAC-SHA256 signature
+    """
+    signature = hmac.new(secret, body, hashlib.sha256).digest()
     return base64.b64encode(signature).decode("utf-8")
 
 
+def sign_payload(payload, secret):
+    """
+    Sign a webhook payload using HMAC-SHA256. Returns a base64-encoded HMAC-SHA256 signature
+    """
+    return sign_body(canonical_json(payload), secret)
+
+
 def verify_signature(payload, signature, secret):
     """
     Verify a webhook signature. Not used in production, but useful for testing.